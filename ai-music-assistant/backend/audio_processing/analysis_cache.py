@@ -0,0 +1,207 @@
+"""音頻分析緩存模組
+
+以音頻內容哈希為鍵，緩存 Basic Pitch 的模型輸出、音符事件、波形元數據與基頻曲線，
+同一段音頻在多個方法或多次請求之間只需推理一次。緩存分為記憶體LRU層與
+有容量上限的磁盤層，磁盤層按最後訪問時間淘汰。
+
+磁盤層以 pickle 保存條目，讀取時會執行文件中的代碼，因此默認停用；啟用時目錄
+必須屬於應用自己（權限 0700），不屬於當前進程用戶的文件一律不讀取。
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from ..mcp.storage.cache_keys import KeyLocks, content_hash
+from ..mcp.storage.disk_cache import PickleDiskCache
+from ..mcp.storage.memory_cache import MemoryCache
+
+logger = logging.getLogger(__name__)
+
+# 分析結果格式版本，格式變化時遞增以避免讀到舊的磁盤緩存
+ANALYSIS_VERSION = 1
+
+@dataclass
+class AudioAnalysis:
+    """一段音頻的分析結果"""
+    key: str
+    model_output: Dict[str, Any]
+    midi_data: Any
+    note_events: List[Any]
+    # 解碼後的波形元數據（首次需要時填充）
+    sample_rate: Optional[int] = None
+    num_samples: Optional[int] = None
+    duration: Optional[float] = None
+    # pYIN 基頻曲線（Hz，無聲幀為 NaN）
+    f0: Any = None
+    voiced_flag: Any = None
+    voiced_probs: Any = None
+    extras: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def has_waveform_info(self) -> bool:
+        """是否已填充波形元數據"""
+        return self.sample_rate is not None
+
+    @property
+    def has_f0(self) -> bool:
+        """是否已計算基頻曲線"""
+        return self.f0 is not None
+
+
+class AnalysisCache:
+    """音頻分析緩存類"""
+
+    def __init__(self,
+                 cache_dir: Optional[str] = None,
+                 memory_max_entries: int = 32,
+                 memory_max_bytes: int = 256 * 1024 * 1024,
+                 disk_max_bytes: int = 1024 * 1024 * 1024,
+                 ttl: int = 24 * 3600):
+        """初始化分析緩存
+
+        Args:
+            cache_dir: 磁盤緩存目錄，為None或空字符串時停用磁盤層
+            memory_max_entries: 記憶體層最大條目數
+            memory_max_bytes: 記憶體層最大估算字節數
+            disk_max_bytes: 磁盤層最大字節數
+            ttl: 記憶體層條目的存活時間（秒）
+        """
+        self.memory = MemoryCache(memory_max_entries, memory_max_bytes)
+        self.disk = PickleDiskCache(cache_dir, disk_max_bytes, ANALYSIS_VERSION, "分析緩存")
+        self.ttl = ttl
+
+        # 保護記憶體層
+        self._lock = threading.Lock()
+        # 每個鍵一把鎖，同一音頻的並發請求只推理一次
+        self._key_locks = KeyLocks()
+
+        self.disk_hits = 0
+        self.computations = 0
+
+    @property
+    def disk_evictions(self) -> int:
+        """磁盤層淘汰的條目數"""
+        return self.disk.evictions
+
+    @staticmethod
+    def make_key(audio_file_path: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """由音頻內容與分析參數生成緩存鍵
+
+        Args:
+            audio_file_path: 音頻文件路徑
+            params: 影響分析結果的參數（模型路徑、頻率範圍等）
+
+        Returns:
+            str: 緩存鍵
+        """
+        key = content_hash(audio_file_path)
+        if params:
+            items = repr(sorted(params.items())).encode('utf-8')
+            key = f"{key}-{hashlib.sha256(items).hexdigest()[:16]}"
+        return key
+
+    def get(self, key: str) -> Optional[AudioAnalysis]:
+        """獲取分析結果
+
+        Args:
+            key: 緩存鍵
+
+        Returns:
+            Optional[AudioAnalysis]: 分析結果，未命中時返回None
+        """
+        with self._lock:
+            hit, analysis = self.memory.get(key)
+        if hit:
+            return analysis
+
+        analysis = self.disk.load(key)
+        if analysis is None:
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self.memory.set(key, analysis, self.ttl)
+        return analysis
+
+    def put(self, analysis: AudioAnalysis):
+        """寫入（或更新）分析結果
+
+        Args:
+            analysis: 分析結果
+        """
+        with self._lock:
+            self.memory.set(analysis.key, analysis, self.ttl)
+        self.disk.store(analysis.key, analysis)
+
+    def locked(self, key: str):
+        """持有鍵鎖，供補充已有條目（如基頻曲線）的調用方使用
+
+        鎖不可重入，持有期間不能再調用同一個鍵的 get_or_compute。
+
+        Args:
+            key: 緩存鍵
+
+        Returns:
+            上下文管理器
+        """
+        return self._key_locks.hold(key)
+
+    def get_or_compute(self, key: str, compute: Callable[[str], AudioAnalysis]) -> AudioAnalysis:
+        """獲取分析結果，未命中時計算並緩存
+
+        Args:
+            key: 緩存鍵
+            compute: 接收緩存鍵並返回分析結果的函數
+
+        Returns:
+            AudioAnalysis: 分析結果
+        """
+        analysis = self.get(key)
+        if analysis is not None:
+            return analysis
+
+        with self._key_locks.hold(key):
+            # 等待期間其他線程可能已完成計算
+            analysis = self.get(key)
+            if analysis is None:
+                self.computations += 1
+                analysis = compute(key)
+                self.put(analysis)
+            return analysis
+
+    def clear(self):
+        """清除所有緩存條目"""
+        with self._lock:
+            self.memory.clear()
+        self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """獲取緩存統計"""
+        return {
+            "memory": self.memory.stats(),
+            "disk_enabled": self.disk.enabled,
+            "disk_hits": self.disk_hits,
+            "disk_evictions": self.disk_evictions,
+            "computations": self.computations
+        }
+
+
+# 進程內共享的分析緩存
+_analysis_cache: Optional[AnalysisCache] = None
+_analysis_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """獲取共享的分析緩存，首次調用時建立
+
+    設置環境變量 BASIC_PITCH_ANALYSIS_CACHE_DIR 時啟用該目錄下的磁盤層。
+    """
+    global _analysis_cache
+    with _analysis_cache_lock:
+        if _analysis_cache is None:
+            _analysis_cache = AnalysisCache(cache_dir=os.environ.get("BASIC_PITCH_ANALYSIS_CACHE_DIR", ""))
+        return _analysis_cache
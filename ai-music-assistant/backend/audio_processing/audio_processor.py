@@ -7,18 +7,20 @@ import numpy as np
 from typing import Dict, List, Tuple, Optional
 import logging
 
+from ..mcp.lazy_import import lazy_import, modules_available
+
 logger = logging.getLogger(__name__)
 
-# 嘗試導入相依套件
-try:
-    import librosa
-    from basic_pitch import ICASSP_2022_MODEL_PATH
-    from basic_pitch.inference import predict
-    DEPENDENCIES_AVAILABLE = True
-except ImportError as e:
-    logger.warning(f"音頻處理相依套件導入失敗: {str(e)}")
+# librosa 與 Basic Pitch 導入耗時，延遲到首次分析時才導入
+librosa = lazy_import("librosa")
+basic_pitch = lazy_import("basic_pitch")
+basic_pitch_inference = lazy_import("basic_pitch.inference")
+
+DEPENDENCIES_AVAILABLE = modules_available("librosa", "basic_pitch")
+if not DEPENDENCIES_AVAILABLE:
+    logger.warning("找不到音頻處理相依套件（librosa、basic_pitch）")
     logger.warning("AudioProcessor 將以有限功能運行，或者可能無法運行")
-    DEPENDENCIES_AVAILABLE = False
+
 
 class AudioProcessor:
     """音頻處理器"""
@@ -35,7 +37,7 @@ class AudioProcessor:
                 logger.warning("由於相依套件缺失，無法加載Basic Pitch模型")
                 return
                 
-            self.model = ICASSP_2022_MODEL_PATH
+            self.model = basic_pitch.ICASSP_2022_MODEL_PATH
             logger.info("Basic Pitch模型加載成功")
         except Exception as e:
             logger.error(f"加載Basic Pitch模型失敗: {str(e)}")
@@ -90,7 +92,7 @@ class AudioProcessor:
                 return {"error": "缺少必要的相依套件，無法提取音高"}
                 
             # 使用Basic Pitch提取音高
-            model_output, midi_data, note_events = predict(
+            model_output, midi_data, note_events = basic_pitch_inference.predict(
                 self.model,
                 audio_data,
                 sample_rate
@@ -4,26 +4,37 @@
 """
 
 import os
+import shutil
 import tempfile
 import logging
-from typing import Dict, Any, Optional, Tuple, List
+import threading
+from typing import Dict, Any, Optional, Tuple, List, Callable, Iterator
+
+import numpy as np
+
+from ..mcp.lazy_import import lazy_import, modules_available
 
 logger = logging.getLogger(__name__)
 
-# 嘗試導入相依套件
-try:
-    import numpy as np
-    from basic_pitch import ICASSP_2022_MODEL_PATH
-    from basic_pitch.inference import predict
-    from basic_pitch.note_creation import notes_and_rests_to_midi
-    DEPENDENCIES_AVAILABLE = True
-except ImportError as e:
-    logger.warning(f"Basic Pitch 相依套件導入失敗: {str(e)}")
+# Basic Pitch 會載入 TensorFlow，延遲到首次推理時才導入
+basic_pitch = lazy_import("basic_pitch")
+basic_pitch_inference = lazy_import("basic_pitch.inference")
+basic_pitch_note_creation = lazy_import("basic_pitch.note_creation")
+
+DEPENDENCIES_AVAILABLE = modules_available("basic_pitch")
+if not DEPENDENCIES_AVAILABLE:
+    logger.warning("找不到 Basic Pitch 相依套件")
     logger.warning("BasicPitchService 將以有限功能運行，或者可能無法運行")
-    DEPENDENCIES_AVAILABLE = False
-    
-    # 建立一個空的變數以避免引用錯誤
-    ICASSP_2022_MODEL_PATH = None
+
+from .pitch_quantizer import scale_table, snap_to_scale
+from ..music_theory.key_detection import detect_key_from_histogram
+from .analysis_cache import AnalysisCache, AudioAnalysis, get_analysis_cache
+from .streaming_transcriber import (
+    MODEL_SAMPLE_RATE, NoteEvent, NoteStitcher, iter_audio_windows, normalize_note_event, write_note_events_midi
+)
+
+# 串流進度回調：(進度 0-1, 進度消息)
+ProgressCallback = Callable[[float, str], None]
 
 
 class BasicPitchService:
@@ -32,20 +43,262 @@ class BasicPitchService:
     使用 Spotify 的 Basic Pitch 開源庫進行音高偵測，將音頻轉換為 MIDI 格式
     """
 
-    def __init__(self, model_path: Optional[str] = None):
+    # 所有方法共用的推理參數，使同一音頻的分析結果可以在方法之間重用
+    PREDICT_PARAMS = {
+        "minimum_frequency": 50.0,  # Hz
+        "maximum_frequency": 2000.0,  # Hz
+        "melodia_trick": True
+    }
+
+    def __init__(self, model_path: Optional[str] = None, analysis_cache: Optional[AnalysisCache] = None):
         """初始化 Basic Pitch 服務
 
         Args:
             model_path: 模型路徑，如未指定則使用默認模型
+            analysis_cache: 分析結果緩存，如未指定則使用進程內共享的緩存
         """
+        self.analysis_cache = analysis_cache or get_analysis_cache()
+
+        # 推理模型在首次使用時載入一次，之後每次推理共用
+        self._model = None
+        self._model_lock = threading.Lock()
+
         if not DEPENDENCIES_AVAILABLE:
             logger.warning("由於相依套件缺失，BasicPitchService 將無法正常運作")
             self.model_path = None
             return
             
-        self.model_path = model_path or ICASSP_2022_MODEL_PATH
+        self.model_path = model_path or basic_pitch.ICASSP_2022_MODEL_PATH
         logger.info(f"初始化 Basic Pitch 服務，使用模型：{self.model_path}")
 
+    def model(self) -> Any:
+        """獲取已載入的推理模型，首次調用時載入
+
+        Returns:
+            basic_pitch.inference.Model: 推理模型
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    logger.info(f"載入 Basic Pitch 模型：{self.model_path}")
+                    self._model = basic_pitch_inference.Model(self.model_path)
+        return self._model
+
+    def analyze(self, audio_file_path: str, y: Optional[np.ndarray] = None,
+                sr: Optional[int] = None) -> AudioAnalysis:
+        """對音頻進行 Basic Pitch 推理，同一內容的音頻只推理一次
+
+        Args:
+            audio_file_path: 輸入音頻文件路徑（同時用於計算緩存鍵）
+            y: 已解碼的單聲道PCM，提供時不再重新解碼文件
+            sr: PCM 的採樣率
+
+        Returns:
+            AudioAnalysis: 包含模型輸出與音符事件的分析結果
+        """
+        key = AnalysisCache.make_key(audio_file_path, {"model_path": str(self.model_path), **self.PREDICT_PARAMS})
+
+        def compute(key: str) -> AudioAnalysis:
+            logger.info(f"執行 Basic Pitch 推理：{audio_file_path}")
+            if y is None:
+                model_output, midi_data, note_events = basic_pitch_inference.predict(
+                    audio_file_path,
+                    self.model(),
+                    **self.PREDICT_PARAMS
+                )
+            else:
+                model_output, midi_data, note_events = self._predict_pcm(y, sr)
+            return AudioAnalysis(key, model_output, midi_data, note_events)
+
+        return self.analysis_cache.get_or_compute(key, compute)
+
+    def _predict_pcm(self, y: np.ndarray, sr: int) -> Tuple[Dict[str, Any], Any, List[Any]]:
+        """以已解碼的PCM推理
+
+        Basic Pitch 只接受文件路徑：PCM 重採樣到模型採樣率後寫成私有臨時目錄中的
+        未壓縮 WAV，模型讀取時不必再解碼原始格式，也不必再重採樣。
+
+        Args:
+            y: 單聲道PCM
+            sr: 採樣率
+
+        Returns:
+            (模型輸出, MIDI數據, 音符事件)
+        """
+        import soundfile as sf
+
+        if sr != MODEL_SAMPLE_RATE:
+            import librosa
+            y = librosa.resample(np.asarray(y, dtype=np.float32), orig_sr=sr, target_sr=MODEL_SAMPLE_RATE)
+
+        pcm_dir = tempfile.mkdtemp(prefix="basic_pitch_pcm_")
+        try:
+            pcm_path = os.path.join(pcm_dir, "audio.wav")
+            sf.write(pcm_path, y, MODEL_SAMPLE_RATE, subtype="FLOAT")
+            return basic_pitch_inference.predict(pcm_path, self.model(), **self.PREDICT_PARAMS)
+        finally:
+            shutil.rmtree(pcm_dir, ignore_errors=True)
+
+    def analyze_f0(self, audio_file_path: str, y: Optional[np.ndarray] = None,
+                   sr: Optional[int] = None) -> AudioAnalysis:
+        """在分析結果中補充波形元數據與 pYIN 基頻曲線（已計算時直接返回）
+
+        Args:
+            audio_file_path: 輸入音頻文件路徑
+            y: 已解碼的單聲道PCM，提供時不再重新解碼文件
+            sr: PCM 的採樣率
+
+        Returns:
+            AudioAnalysis: 包含基頻曲線的分析結果
+        """
+        import librosa
+
+        analysis = self.analyze(audio_file_path)
+        if analysis.has_f0:
+            return analysis
+
+        # 同一音頻的並發請求只計算一次基頻
+        with self.analysis_cache.locked(analysis.key):
+            # 等待期間其他請求可能已完成計算
+            cached = self.analysis_cache.get(analysis.key)
+            if cached is not None:
+                analysis = cached
+            if analysis.has_f0:
+                return analysis
+
+            if y is None:
+                y, sr = librosa.load(audio_file_path, sr=None)
+            f0, voiced_flag, voiced_probs = librosa.pyin(
+                y,
+                fmin=librosa.note_to_hz('C2'),
+                fmax=librosa.note_to_hz('C7'),
+                sr=sr
+            )
+
+            analysis.sample_rate = int(sr)
+            analysis.num_samples = len(y)
+            analysis.duration = len(y) / sr
+            analysis.f0 = f0
+            analysis.voiced_flag = voiced_flag
+            analysis.voiced_probs = voiced_probs
+            self.analysis_cache.put(analysis)
+        return analysis
+
+    def stream_note_events(self,
+                           audio_file_path: str,
+                           window_seconds: float = 30.0,
+                           overlap_seconds: float = 2.0,
+                           progress_callback: Optional[ProgressCallback] = None) -> Iterator[List[NoteEvent]]:
+        """以重疊窗口逐段轉錄音頻，逐窗口產出已拼接完成的音符事件
+
+        每次只解碼並推理一個窗口，記憶體佔用與文件長度無關。
+
+        Args:
+            audio_file_path: 輸入音頻文件路徑
+            window_seconds: 窗口長度（秒）
+            overlap_seconds: 相鄰窗口的重疊長度（秒）
+            progress_callback: 每處理完一個窗口時調用的進度回調
+
+        Yields:
+            List[NoteEvent]: 新確定的 (開始, 結束, 音高, 振幅) 音符事件，按開始時間排序
+        """
+        if not DEPENDENCIES_AVAILABLE:
+            error_msg = "Basic Pitch 相依套件不可用，無法轉錄音頻"
+            logger.error(error_msg)
+            raise ImportError(error_msg)
+
+        import soundfile as sf
+
+        model = self.model()
+        stitcher = NoteStitcher(overlap_seconds)
+        # 窗口文件放在只有當前用戶可訪問的私有臨時目錄中
+        window_dir = tempfile.mkdtemp(prefix="basic_pitch_windows_")
+        window_path = os.path.join(window_dir, "window.wav")
+
+        try:
+            for window in iter_audio_windows(audio_file_path, window_seconds, overlap_seconds):
+                sf.write(window_path, window.samples, window.sample_rate)
+                _, _, note_events = basic_pitch_inference.predict(window_path, model, **self.PREDICT_PARAMS)
+
+                events = stitcher.add_window(
+                    window.offset,
+                    window.duration,
+                    [normalize_note_event(event) for event in note_events],
+                    is_last=window.is_last
+                )
+                if window.is_last:
+                    events = sorted(events + stitcher.finish())
+
+                if progress_callback is not None:
+                    progress_callback(
+                        window.progress,
+                        f"已轉錄 {window.offset + window.duration:.0f}/{window.total_duration:.0f} 秒"
+                    )
+                yield events
+        finally:
+            shutil.rmtree(window_dir, ignore_errors=True)
+
+    def stream_melody(self,
+                      audio_file_path: str,
+                      window_seconds: float = 30.0,
+                      overlap_seconds: float = 2.0,
+                      progress_callback: Optional[ProgressCallback] = None) -> Iterator['MelodyInput']:
+        """串流模式的旋律提取，逐窗口產出部分旋律
+
+        Args:
+            audio_file_path: 輸入音頻文件路徑
+            window_seconds: 窗口長度（秒）
+            overlap_seconds: 相鄰窗口的重疊長度（秒）
+            progress_callback: 進度回調
+
+        Yields:
+            MelodyInput: 本窗口新確定的音符組成的部分旋律
+        """
+        from backend.mcp.mcp_schema import Note, MelodyInput
+
+        for events in self.stream_note_events(audio_file_path, window_seconds, overlap_seconds, progress_callback):
+            notes = [
+                Note(
+                    pitch=pitch,
+                    start_time=start,
+                    duration=end - start,
+                    velocity=max(1, min(int(amplitude * 127), 127))
+                )
+                for start, end, pitch, amplitude in events
+                if end > start
+            ]
+            yield MelodyInput(notes=notes, tempo=120)
+
+    def audio_to_midi_streaming(self,
+                                audio_file_path: str,
+                                output_midi_path: Optional[str] = None,
+                                window_seconds: float = 30.0,
+                                overlap_seconds: float = 2.0,
+                                progress_callback: Optional[ProgressCallback] = None) -> str:
+        """串流模式的音頻轉MIDI，適用於長錄音
+
+        Args:
+            audio_file_path: 輸入音頻文件路徑
+            output_midi_path: 輸出 MIDI 文件路徑，如未指定則創建臨時文件
+            window_seconds: 窗口長度（秒）
+            overlap_seconds: 相鄰窗口的重疊長度（秒）
+            progress_callback: 進度回調
+
+        Returns:
+            str: 輸出 MIDI 文件路徑
+        """
+        if not output_midi_path:
+            file_name = os.path.basename(audio_file_path).split('.')[0]
+            output_midi_path = os.path.join(tempfile.gettempdir(), f"{file_name}_output.mid")
+
+        events: List[NoteEvent] = []
+        for chunk in self.stream_note_events(audio_file_path, window_seconds, overlap_seconds, progress_callback):
+            events.extend(chunk)
+
+        write_note_events_midi(events, output_midi_path)
+        logger.info(f"串流轉換完成，共 {len(events)} 個音符，MIDI 文件保存至：{output_midi_path}")
+        return output_midi_path
+
     def audio_to_midi(self, audio_file_path: str, output_midi_path: Optional[str] = None) -> str:
         """將音頻文件轉換為 MIDI 文件
 
@@ -64,18 +317,8 @@ class BasicPitchService:
         try:
             logger.info(f"開始處理音頻文件：{audio_file_path}")
 
-            # 使用 Basic Pitch 進行音高預測
-            model_output, midi_data, note_events = predict(
-                audio_file_path,
-                self.model_path,
-                # 附加處理參數
-                minimum_frequency=50.0,  # Hz
-                maximum_frequency=2000.0,  # Hz
-                melodia_trick=True,
-                onset_threshold=0.5,
-                inference_overlap=0.5,
-                chunk_size=None
-            )
+            # 使用 Basic Pitch 進行音高預測（命中緩存時不再推理）
+            note_events = self.analyze(audio_file_path).note_events
 
             # 如果未指定輸出路徑，創建臨時文件
             if not output_midi_path:
@@ -84,7 +327,7 @@ class BasicPitchService:
                 output_midi_path = os.path.join(temp_dir, f"{file_name}_output.mid")
 
             # 將音符轉換為 MIDI 文件
-            notes_and_rests_to_midi(
+            basic_pitch_note_creation.notes_and_rests_to_midi(
                 note_events, 
                 output_midi_path, 
                 os.path.basename(audio_file_path), 
@@ -98,11 +341,14 @@ class BasicPitchService:
             logger.error(f"音頻轉換過程中出錯：{str(e)}", exc_info=True)
             raise
 
-    def audio_to_melody(self, audio_file_path: str) -> 'MelodyInput':
+    def audio_to_melody(self, audio_file_path: str, y: Optional[np.ndarray] = None,
+                        sr: Optional[int] = None) -> 'MelodyInput':
         """將音頻文件轉換為旋律對象
 
         Args:
             audio_file_path: 輸入音頻文件路徑
+            y: 已解碼的單聲道PCM，提供時不再重新解碼文件
+            sr: PCM 的採樣率
 
         Returns:
             MelodyInput: 包含旋律信息的對象
@@ -118,14 +364,9 @@ class BasicPitchService:
             
             logger.info(f"從音頻中提取旋律：{audio_file_path}")
 
-            # 使用 Basic Pitch 進行音高預測
-            model_output, midi_data, note_events = predict(
-                audio_file_path,
-                self.model_path,
-                minimum_frequency=50.0,
-                maximum_frequency=2000.0,
-                melodia_trick=True
-            )
+            # 使用 Basic Pitch 進行音高預測（命中緩存時不再推理）
+            analysis = self.analyze(audio_file_path, y=y, sr=sr)
+            model_output, note_events = analysis.model_output, analysis.note_events
 
             # 獲取 MIDI 速度（如果可用）
             tempo = self._estimate_tempo(model_output) or 120
@@ -171,29 +412,43 @@ class BasicPitchService:
             logger.warning(f"無法估計速度：{str(e)}")
             return None
 
-    def detect_key(self, audio_file_path: str) -> str:
-        """從音頻文件中檢測調性
+    def detect_key(self, audio_file_path: Optional[str] = None, y: Optional[np.ndarray] = None,
+                   sr: Optional[int] = None) -> str:
+        """從音頻中檢測調性
+
+        以色度特徵的總和作為音級分佈，與調性輪廓比對。
 
         Args:
-            audio_file_path: 輸入音頻文件路徑
+            audio_file_path: 輸入音頻文件路徑，未提供PCM時解碼該文件
+            y: 已解碼的單聲道PCM
+            sr: PCM 的採樣率
 
         Returns:
             str: 檢測到的調性，例如 "C" 或 "Am"
         """
-        if not DEPENDENCIES_AVAILABLE:
-            logger.warning("相依套件不可用，返回默認調性")
+        try:
+            import librosa
+        except ImportError:
+            logger.warning("librosa 不可用，返回默認調性")
             return "C"  # 默認值
-            
-        # 這個功能可能需要使用其他工具，如 music21 或 librosa
-        # 此處為簡單實現
-        return "C"  # 默認值
 
-    def correct_pitch(self, audio_file_path: str, output_path: Optional[str] = None) -> str:
+        if y is None:
+            if audio_file_path is None:
+                raise ValueError("需要提供音頻文件路徑或已解碼的PCM")
+            y, sr = librosa.load(audio_file_path, sr=None)
+
+        chroma = librosa.feature.chroma_stft(y=np.asarray(y, dtype=np.float32), sr=sr)
+        return detect_key_from_histogram(chroma.sum(axis=1)).name
+
+    def correct_pitch(self, audio_file_path: str, output_path: Optional[str] = None,
+                      y: Optional[np.ndarray] = None, sr: Optional[int] = None) -> str:
         """對音頻文件進行音準校正
 
         Args:
             audio_file_path: 輸入音頻文件路徑
             output_path: 輸出音頻文件路徑，如未指定則創建臨時文件
+            y: 已解碼的單聲道PCM，提供時基頻分析與調性檢測不再重新解碼文件
+            sr: PCM 的採樣率
 
         Returns:
             str: 校正後的音頻文件路徑
@@ -206,7 +461,6 @@ class BasicPitchService:
         try:
             import librosa
             import numpy as np
-            import soundfile as sf
             
             logger.info(f"開始對音頻文件進行音準校正: {audio_file_path}")
             
@@ -216,32 +470,16 @@ class BasicPitchService:
                 file_name = os.path.basename(audio_file_path).split('.')[0]
                 output_path = os.path.join(temp_dir, f"{file_name}_pitch_corrected.wav")
             
-            # 加載音頻
-            y, sr = librosa.load(audio_file_path, sr=None)
-            
-            # 使用CREPE或basic_pitch提取音高
-            model_output, midi_data, note_events = predict(
-                audio_file_path,
-                self.model_path,
-                minimum_frequency=50.0,
-                maximum_frequency=2000.0,
-                melodia_trick=True
-            )
+            # 使用basic_pitch提取音符並用pYIN提取基頻（f0）曲線，同一音頻只分析一次
+            analysis = self.analyze_f0(audio_file_path, y, sr)
+            note_events = analysis.note_events
             
             # 獲取音頻的調性
-            key = self.detect_key(audio_file_path)
+            key = self.detect_key(audio_file_path, y, sr)
             scale_midi_values = self._get_scale_midi_values(key)
             
-            # 提取基頻（f0）曲線
-            f0, voiced_flag, voiced_probs = librosa.pyin(
-                y, 
-                fmin=librosa.note_to_hz('C2'),
-                fmax=librosa.note_to_hz('C7'),
-                sr=sr
-            )
-            
             # 將頻率轉換為MIDI音符
-            midi_pitch = librosa.hz_to_midi(f0)
+            midi_pitch = librosa.hz_to_midi(analysis.f0)
             
             # 對檢測到的音高進行校正
             corrected_midi = self._snap_to_scale(midi_pitch, scale_midi_values)
@@ -255,7 +493,7 @@ class BasicPitchService:
             
             # 將音符轉換為MIDI文件
             temp_midi_path = os.path.join(tempfile.gettempdir(), f"{file_name}_temp.mid")
-            notes_and_rests_to_midi(
+            basic_pitch_note_creation.notes_and_rests_to_midi(
                 note_events, 
                 temp_midi_path, 
                 os.path.basename(audio_file_path), 
@@ -264,21 +502,18 @@ class BasicPitchService:
             
             # 使用FluidSynth將MIDI文件合成為校正後的音頻
             try:
-                import fluidsynth
-                fs = fluidsynth.Synth()
-                fs.start()
+                import soundfile as sf
+                from ..rendering.synth_pool import get_synth_pool
                 
-                # 加載音色庫
+                # 使用共享的合成器池（音色庫只加載一次，默認鋼琴音色）
                 current_dir = os.path.dirname(os.path.abspath(__file__))
                 soundfont_path = os.path.join(current_dir, "../rendering/soundfonts/GeneralUser.sf2")
-                sfid = fs.sfload(soundfont_path)
-                
-                # 設置合成器參數
-                fs.program_select(0, sfid, 0, 0)  # 選擇鋼琴音色
+                synth_pool = get_synth_pool(soundfont_path)
                 
                 # 合成音頻
-                fs.midi_to_audio(temp_midi_path, output_path)
-                fs.delete()
+                with open(temp_midi_path, 'rb') as f:
+                    audio = synth_pool.render(f.read())
+                sf.write(output_path, audio, synth_pool.sample_rate)
                 
                 # 清除臨時文件
                 os.remove(temp_midi_path)
@@ -302,66 +537,31 @@ class BasicPitchService:
             shutil.copy(audio_file_path, output_path)
             return output_path
 
-    def _get_scale_midi_values(self, key: str) -> List[int]:
+    def _get_scale_midi_values(self, key: str) -> "np.ndarray":
         """獲取指定調性的所有音階MIDI值
 
         Args:
             key: 調性，例如 "C" 或 "Am"
 
         Returns:
-            List[int]: 調性中所有音符的MIDI值
+            np.ndarray: 調性中所有音符的MIDI值（預先計算的只讀查找表）
         """
         try:
-            # 將調性轉換為music21格式
-            from music21 import key as m21_key
-            
-            if key.endswith('m'):
-                k = m21_key.Key(key[:-1], 'minor')
-            else:
-                k = m21_key.Key(key)
-            
-            # 獲取調性中的所有音符名稱
-            scale_pitches = k.getPitches()
-            
-            # 將音符名稱轉換為MIDI值
-            import music21
-            midi_values = []
-            for octave in range(1, 8):  # 覆蓋MIDI音符範圍的多個八度
-                for pitch in scale_pitches:
-                    p = music21.pitch.Pitch(pitch.name)
-                    p.octave = octave
-                    midi_values.append(int(p.midi))
-            
-            return sorted(midi_values)
-        except ImportError:
-            # 如果music21不可用，返回一個簡單的C大調音階MIDI值
-            c_major_scale = [0, 2, 4, 5, 7, 9, 11]  # C大調的相對音程
-            midi_values = []
-            for octave in range(1, 8):  # 覆蓋多個八度
-                for interval in c_major_scale:
-                    midi_values.append(12 * octave + interval)
-            return sorted(midi_values)
-
-    def _snap_to_scale(self, midi_pitch, scale_midi_values: List[int]):
+            return scale_table(key)
+        except ValueError as e:
+            # 無法識別的調性使用C大調
+            logger.warning(f"{str(e)}，使用C大調")
+            return scale_table("C")
+
+    def _snap_to_scale(self, midi_pitch, scale_midi_values, hysteresis: float = 0.0):
         """將MIDI音符值校正到最近的音階值
 
         Args:
             midi_pitch: 原始MIDI音符值數組
-            scale_midi_values: 調性中所有音符的MIDI值列表
+            scale_midi_values: 調性中所有音符的MIDI值（已排序）
+            hysteresis: 切換音符所需的遲滯量（半音），0表示不使用
 
         Returns:
             np.ndarray: 校正後的MIDI音符值數組
         """
-        import numpy as np
-        
-        # 複製輸入陣列以避免修改原始數據
-        corrected_pitch = midi_pitch.copy()
-        
-        # 對每個有效的音高值進行校正
-        for i in range(len(corrected_pitch)):
-            if not np.isnan(corrected_pitch[i]):
-                # 找到最接近的音階值
-                closest_pitch = min(scale_midi_values, key=lambda x: abs(x - corrected_pitch[i]))
-                corrected_pitch[i] = closest_pitch
-        
-        return corrected_pitch 
\ No newline at end of file
+        return snap_to_scale(midi_pitch, scale_midi_values, hysteresis=hysteresis)
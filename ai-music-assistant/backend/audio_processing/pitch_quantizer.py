@@ -0,0 +1,173 @@
+"""音高量化模組
+
+將基頻曲線（以MIDI音高表示）校正到調性音階上。所有主音與調式的音階查找表在
+模組載入時預先計算一次，校正時對整條曲線做向量化的最近鄰搜索。
+"""
+
+import logging
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 音名到音級（C = 0）
+NOTE_PITCH_CLASSES = {
+    'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11
+}
+
+# 各調式相對主音的音程
+MODE_INTERVALS: Dict[str, Tuple[int, ...]] = {
+    'major': (0, 2, 4, 5, 7, 9, 11),
+    'minor': (0, 2, 3, 5, 7, 8, 10),
+    'harmonic_minor': (0, 2, 3, 5, 7, 8, 11),
+    'melodic_minor': (0, 2, 3, 5, 7, 9, 11),
+    'dorian': (0, 2, 3, 5, 7, 9, 10),
+    'phrygian': (0, 1, 3, 5, 7, 8, 10),
+    'lydian': (0, 2, 4, 6, 7, 9, 11),
+    'mixolydian': (0, 2, 4, 5, 7, 9, 10),
+    'locrian': (0, 1, 3, 5, 6, 8, 10),
+    'major_pentatonic': (0, 2, 4, 7, 9),
+    'minor_pentatonic': (0, 3, 5, 7, 10),
+    'chromatic': tuple(range(12)),
+}
+
+# 調式別名
+MODE_ALIASES = {
+    'maj': 'major', 'ionian': 'major',
+    'min': 'minor', 'm': 'minor', 'aeolian': 'minor',
+}
+
+# 查找表覆蓋的MIDI音高範圍
+MIDI_MIN = 0
+MIDI_MAX = 127
+
+
+def _build_table(tonic: int, mode: str) -> np.ndarray:
+    """建立某個主音與調式在整個MIDI範圍內的音階值（只讀）"""
+    intervals = np.array(MODE_INTERVALS[mode])
+    octaves = np.arange(-12, MIDI_MAX + 12, 12)
+    values = (octaves[:, None] + tonic + intervals[None, :]).ravel()
+    table = np.sort(values[(values >= MIDI_MIN) & (values <= MIDI_MAX)]).astype(np.float64)
+    table.flags.writeable = False
+    return table
+
+
+# (主音音級, 調式) -> 排序後的音階MIDI值
+SCALE_TABLES: Dict[Tuple[int, str], np.ndarray] = {
+    (tonic, mode): _build_table(tonic, mode)
+    for tonic in range(12)
+    for mode in MODE_INTERVALS
+}
+
+
+@lru_cache(maxsize=256)
+def parse_key(key: str) -> Tuple[int, str]:
+    """解析調性字符串
+
+    支持 "C"、"F#"、"Bb"、"Am"、"C#m"、"A minor"、"D dorian" 等寫法。
+
+    Args:
+        key: 調性字符串
+
+    Returns:
+        (主音音級, 調式)
+
+    Raises:
+        ValueError: 無法解析的調性
+    """
+    text = key.strip()
+    if not text or text[0].upper() not in NOTE_PITCH_CLASSES:
+        raise ValueError(f"無法解析的調性: {key}")
+
+    tonic = NOTE_PITCH_CLASSES[text[0].upper()]
+    rest = text[1:]
+    while rest[:1] in ('#', 'b', '-'):
+        tonic += 1 if rest[0] == '#' else -1
+        rest = rest[1:]
+
+    mode = rest.strip().lower().replace(' ', '_') or 'major'
+    mode = MODE_ALIASES.get(mode, mode)
+    if mode not in MODE_INTERVALS:
+        raise ValueError(f"不支持的調式: {key}")
+    return tonic % 12, mode
+
+
+def scale_table(key: str) -> np.ndarray:
+    """獲取調性的音階查找表
+
+    Args:
+        key: 調性字符串，例如 "C" 或 "Am"
+
+    Returns:
+        np.ndarray: 排序後的音階MIDI值（只讀）
+    """
+    return SCALE_TABLES[parse_key(key)]
+
+
+def nearest_in_scale(midi_pitch: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """查找每個音高在音階中最近的值（距離相同時取較低者）
+
+    Args:
+        midi_pitch: MIDI音高數組，可包含 NaN
+        scale: 排序後的音階值
+
+    Returns:
+        np.ndarray: 最近的音階值，NaN 位置保持為 NaN
+    """
+    pitch = np.asarray(midi_pitch, dtype=np.float64)
+    upper = np.clip(np.searchsorted(scale, pitch), 1, len(scale) - 1)
+    below = scale[upper - 1]
+    above = scale[upper]
+    nearest = np.where(above - pitch < pitch - below, above, below)
+    nearest[np.isnan(pitch)] = np.nan
+    return nearest
+
+
+def snap_to_scale(midi_pitch: np.ndarray,
+                  scale: np.ndarray,
+                  hysteresis: float = 0.0) -> np.ndarray:
+    """將音高曲線校正到音階上
+
+    Args:
+        midi_pitch: MIDI音高數組（無聲幀為 NaN）
+        scale: 排序後的音階值，見 scale_table
+        hysteresis: 遲滯量（半音）。大於0時，只有當新音符比當前保持的音符更接近
+            超過該值時才切換，避免音高在兩個音階音之間抖動；遇到無聲幀後重新開始
+
+    Returns:
+        np.ndarray: 校正後的音高數組，NaN 原樣保留
+    """
+    pitch = np.asarray(midi_pitch, dtype=np.float64)
+    nearest = nearest_in_scale(pitch, scale)
+    if hysteresis <= 0 or len(pitch) == 0:
+        return nearest
+
+    # 按最近音符（無聲幀記為 -1）切分成段，逐段而非逐幀處理
+    labels = np.where(np.isnan(nearest), -1.0, nearest)
+    starts = np.concatenate(([0], np.flatnonzero(labels[1:] != labels[:-1]) + 1))
+    ends = np.append(starts[1:], len(labels))
+
+    result = nearest.copy()
+    held: Optional[float] = None
+    for start, end in zip(starts, ends):
+        candidate = labels[start]
+        if candidate < 0:
+            held = None
+            continue
+        if held is None or held == candidate:
+            held = candidate
+            continue
+
+        segment = pitch[start:end]
+        switch = np.abs(segment - held) - np.abs(segment - candidate) > hysteresis
+        if not switch.any():
+            result[start:end] = held
+            continue
+
+        first = int(np.argmax(switch))
+        result[start:start + first] = held
+        held = candidate
+
+    return result
@@ -0,0 +1,248 @@
+"""串流轉錄模組
+
+長錄音按重疊窗口逐段解碼與轉錄，記憶體佔用只與窗口長度有關，與文件長度無關。
+相鄰窗口的重疊區按中點劃分歸屬，跨越窗口邊界的音符在下一個窗口中接續合併。
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Iterator, List, Tuple, Union
+
+import numpy as np
+
+from ..mcp.note_array import NoteArray
+from ..mcp.smf_writer import SMFTrack, write_smf
+
+logger = logging.getLogger(__name__)
+
+# Basic Pitch 模型的輸入採樣率
+MODEL_SAMPLE_RATE = 22050
+
+# 判斷音符觸及窗口邊界、以及合併跨窗口音符時的時間容差（秒）
+BOUNDARY_TOLERANCE = 0.05
+
+
+@dataclass
+class AudioWindow:
+    """一段解碼後的音頻窗口"""
+    index: int
+    offset: float
+    samples: np.ndarray
+    sample_rate: int
+    total_duration: float
+    is_last: bool
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def progress(self) -> float:
+        """處理完此窗口後的進度（0-1）"""
+        if self.is_last or self.total_duration <= 0:
+            return 1.0
+        return min(1.0, (self.offset + self.duration) / self.total_duration)
+
+
+# (開始時間, 結束時間, MIDI音高, 振幅)
+NoteEvent = Tuple[float, float, int, float]
+
+
+def _to_mono(block: np.ndarray, source_rate: int, sample_rate: int) -> np.ndarray:
+    """轉為單聲道並重採樣到目標採樣率"""
+    mono = block.mean(axis=1) if block.ndim == 2 else block
+    if source_rate != sample_rate:
+        import librosa
+        mono = librosa.resample(mono, orig_sr=source_rate, target_sr=sample_rate)
+    return mono.astype(np.float32, copy=False)
+
+
+def iter_audio_windows(audio_file_path: str,
+                       window_seconds: float = 30.0,
+                       overlap_seconds: float = 2.0,
+                       sample_rate: int = MODEL_SAMPLE_RATE) -> Iterator[AudioWindow]:
+    """按重疊窗口逐段解碼音頻
+
+    libsndfile 支持的格式（WAV/FLAC/OGG 等）逐塊讀取；其他格式（如 webm）
+    無法按塊讀取，會先整體解碼再切分。
+
+    Args:
+        audio_file_path: 音頻文件路徑
+        window_seconds: 窗口長度（秒）
+        overlap_seconds: 相鄰窗口的重疊長度（秒）
+        sample_rate: 輸出採樣率
+
+    Yields:
+        AudioWindow: 單聲道 float32 音頻窗口
+    """
+    if overlap_seconds >= window_seconds:
+        raise ValueError("窗口重疊長度必須小於窗口長度")
+
+    import soundfile as sf
+
+    try:
+        sound_file = sf.SoundFile(audio_file_path)
+    except Exception as e:
+        logger.warning(f"無法按塊讀取音頻，改為整體解碼: {str(e)}")
+        yield from _iter_decoded_windows(audio_file_path, window_seconds, overlap_seconds, sample_rate)
+        return
+
+    with sound_file:
+        source_rate = sound_file.samplerate
+        frames = sound_file.frames
+        window = int(window_seconds * source_rate)
+        hop = window - int(overlap_seconds * source_rate)
+
+        for index, start in enumerate(range(0, max(frames, 1), hop)):
+            sound_file.seek(start)
+            block = sound_file.read(window, dtype='float32', always_2d=True)
+            yield AudioWindow(
+                index=index,
+                offset=start / source_rate,
+                samples=_to_mono(block, source_rate, sample_rate),
+                sample_rate=sample_rate,
+                total_duration=frames / source_rate,
+                is_last=start + window >= frames
+            )
+            if start + window >= frames:
+                break
+
+
+def _iter_decoded_windows(audio_file_path: str,
+                          window_seconds: float,
+                          overlap_seconds: float,
+                          sample_rate: int) -> Iterator[AudioWindow]:
+    """整體解碼後切分窗口（用於不支持按塊讀取的格式）"""
+    import librosa
+
+    audio, _ = librosa.load(audio_file_path, sr=sample_rate, mono=True)
+    window = int(window_seconds * sample_rate)
+    hop = window - int(overlap_seconds * sample_rate)
+
+    for index, start in enumerate(range(0, max(len(audio), 1), hop)):
+        yield AudioWindow(
+            index=index,
+            offset=start / sample_rate,
+            samples=audio[start:start + window],
+            sample_rate=sample_rate,
+            total_duration=len(audio) / sample_rate,
+            is_last=start + window >= len(audio)
+        )
+        if start + window >= len(audio):
+            break
+
+
+def normalize_note_event(event: Any) -> NoteEvent:
+    """將 Basic Pitch 的音符事件轉換為 (開始, 結束, 音高, 振幅)
+
+    支持 Basic Pitch 的元組格式 (start, end, pitch, amplitude, pitch_bends)
+    以及包含 start_time/duration/pitch/amplitude 的字典。
+    """
+    if isinstance(event, dict):
+        start = float(event['start_time'])
+        end = float(event.get('end_time', start + float(event.get('duration', 0.0))))
+        return start, end, int(event['pitch']), float(event.get('amplitude', 0.8))
+    start, end, pitch, amplitude = event[:4]
+    return float(start), float(end), int(pitch), float(amplitude)
+
+
+class NoteStitcher:
+    """跨窗口音符拼接類
+
+    每個窗口只保留開始時間落在其歸屬區間內的音符（重疊區以中點為界），
+    觸及窗口末端的音符暫存起來，與下一個窗口中同音高、時間相接的音符合併。
+    """
+
+    def __init__(self, overlap_seconds: float, tolerance: float = BOUNDARY_TOLERANCE):
+        """初始化
+
+        Args:
+            overlap_seconds: 相鄰窗口的重疊長度（秒）
+            tolerance: 時間容差（秒）
+        """
+        self.overlap_seconds = overlap_seconds
+        self.tolerance = tolerance
+        self._owned_from = 0.0
+        self._pending: List[List[float]] = []
+
+    def add_window(self,
+                   offset: float,
+                   duration: float,
+                   events: List[NoteEvent],
+                   is_last: bool = False) -> List[NoteEvent]:
+        """加入一個窗口的音符事件（時間相對於窗口開始）
+
+        Args:
+            offset: 窗口在文件中的開始時間（秒）
+            duration: 窗口長度（秒）
+            events: 窗口內的音符事件
+            is_last: 是否為最後一個窗口
+
+        Returns:
+            List[NoteEvent]: 已確定不會再變化的音符（絕對時間）
+        """
+        window_end = offset + duration
+        owned_end = window_end if is_last else window_end - self.overlap_seconds / 2
+
+        notes = sorted([offset + start, offset + end, pitch, amplitude]
+                       for start, end, pitch, amplitude in events)
+
+        # 與上一窗口末端未結束的音符合併
+        remaining = []
+        for note in notes:
+            match = next((pending for pending in self._pending
+                          if pending[2] == note[2] and note[0] <= pending[1] + self.tolerance), None)
+            if match is not None:
+                match[1] = max(match[1], note[1])
+                match[3] = max(match[3], note[3])
+            else:
+                remaining.append(note)
+
+        finalized: List[List[float]] = []
+        pending: List[List[float]] = []
+
+        def touches_end(note: List[float]) -> bool:
+            return not is_last and note[1] >= window_end - self.tolerance
+
+        for note in self._pending:
+            (pending if touches_end(note) else finalized).append(note)
+
+        for note in remaining:
+            # 重疊區內由相鄰窗口負責的音符
+            if note[0] < self._owned_from or note[0] >= owned_end:
+                continue
+            (pending if touches_end(note) else finalized).append(note)
+
+        self._owned_from = owned_end
+        self._pending = pending
+        return self._as_events(finalized)
+
+    def finish(self) -> List[NoteEvent]:
+        """返回仍未結束的音符"""
+        pending, self._pending = self._pending, []
+        return self._as_events(pending)
+
+    @staticmethod
+    def _as_events(notes: List[List[float]]) -> List[NoteEvent]:
+        return sorted((start, end, int(pitch), amplitude) for start, end, pitch, amplitude in notes)
+
+
+def write_note_events_midi(events: Union[List[NoteEvent], NoteArray],
+                           output_path: str,
+                           tempo: int = 120,
+                           ticks_per_beat: int = 480):
+    """將音符事件寫為MIDI文件（一個音符音軌）
+
+    Args:
+        events: 音符事件（絕對時間），或時間以秒為單位的音符數組
+        output_path: 輸出路徑
+        tempo: 速度（BPM）
+        ticks_per_beat: 每拍 tick 數
+    """
+    if not isinstance(events, NoteArray):
+        data = np.array([event[:4] for event in events], dtype=np.float64).reshape(-1, 4)
+        events = NoteArray(data[:, 2], data[:, 0], data[:, 1] - data[:, 0], (data[:, 3] * 127).astype(np.int64))
+
+    # 秒轉換為拍
+    notes = events.scale_time(tempo / 60.0)
+    write_smf(output_path, [SMFTrack(notes)], tempo=tempo, ticks_per_beat=ticks_per_beat)
@@ -0,0 +1,340 @@
+"""上傳音頻接收模組
+
+音頻端點共用的上傳處理。Starlette 解析 multipart 表單時會先把整個請求體緩衝到
+臨時文件，因此大小上限由 UploadSizeLimitMiddleware 在接收請求流時強制執行：
+Content-Length 超限的請求不讀取請求體直接返回413，分塊傳輸的請求在累計字節超限時
+中止。ingest_upload 再把緩衝的文件複製到本次請求的私有臨時目錄（供需要文件路徑的
+庫使用），同時計算內容哈希並檢查文件大小與聲明的時長；解碼後的PCM緩衝區只生成
+一次，供所有使用者共享。臨時目錄在請求結束（或響應發送完成）時確定性地刪除。
+"""
+
+import os
+import shutil
+import struct
+import hashlib
+import logging
+import tempfile
+from typing import Any, Callable, Optional, Tuple
+
+import numpy as np
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+# 每次從請求體讀取的字節數
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# 默認上限
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_MAX_DURATION = 20 * 60.0
+
+# 嘗試從文件頭讀取時長所需的最少字節數
+HEADER_PROBE_BYTES = 64 * 1024
+
+# multipart 表單中文件以外的部分（邊界、字段頭、其他字段）允許的額外字節數
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadLimitError(ValueError):
+    """上傳超出大小或時長上限"""
+
+    def __init__(self, message: str, limit: float):
+        super().__init__(message)
+        self.limit = limit
+
+
+class UploadTooLargeError(UploadLimitError):
+    """上傳文件超出大小上限"""
+
+
+class UploadTooLongError(UploadLimitError):
+    """上傳音頻超出時長上限"""
+
+
+def _wav_declared_duration(path: str) -> Optional[float]:
+    """解析 RIFF/WAVE 文件頭中 data 塊聲明的時長（文件可以尚未寫完）"""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_PROBE_BYTES)
+    if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        return None
+
+    byte_rate = None
+    position = 12
+    while position + 8 <= len(header):
+        chunk_id = header[position:position + 4]
+        chunk_size = struct.unpack('<I', header[position + 4:position + 8])[0]
+        if chunk_id == b'fmt ' and position + 20 <= len(header):
+            byte_rate = struct.unpack('<I', header[position + 16:position + 20])[0]
+        elif chunk_id == b'data':
+            if not byte_rate or chunk_size in (0, 0xFFFFFFFF):
+                return None
+            return chunk_size / byte_rate
+        position += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """從文件頭讀取音頻時長，不解碼音頻數據
+
+    Args:
+        path: 音頻文件路徑（可以是尚未寫完的文件）
+
+    Returns:
+        Optional[float]: 時長（秒），格式不支持時返回None
+    """
+    try:
+        duration = _wav_declared_duration(path)
+    except (OSError, struct.error):
+        duration = None
+    if duration is not None:
+        return duration
+
+    try:
+        import soundfile as sf
+        info = sf.info(path)
+    except Exception:
+        return None
+    if info.samplerate <= 0 or info.frames <= 0:
+        return None
+    return info.frames / info.samplerate
+
+
+class AudioUpload:
+    """已接收的上傳音頻
+
+    可作為（異步）上下文管理器使用，退出時刪除臨時目錄。需要在響應發送後
+    才刪除文件時（如 FileResponse），調用 defer_cleanup 取得清理函數交給響應。
+    """
+
+    def __init__(self, workdir: str, path: str, size: int, content_hash: str,
+                 max_duration: Optional[float] = None):
+        """初始化
+
+        Args:
+            workdir: 本次請求的臨時目錄（輸出文件也應寫在這裡）
+            path: 上傳文件路徑
+            size: 字節數
+            content_hash: 內容的 SHA-256 哈希
+            max_duration: 時長上限（秒）
+        """
+        self.workdir = workdir
+        self.path = path
+        self.size = size
+        self.content_hash = content_hash
+        self.max_duration = max_duration
+
+        self._pcm: Optional[np.ndarray] = None
+        self._sample_rate: Optional[int] = None
+        self._cleanup_deferred = False
+        self._closed = False
+
+    def output_path(self, name: str) -> str:
+        """獲取臨時目錄內的輸出文件路徑"""
+        return os.path.join(self.workdir, name)
+
+    def decode(self) -> Tuple[np.ndarray, int]:
+        """解碼為單聲道 float32 PCM（只解碼一次）
+
+        Returns:
+            (只讀的PCM數組, 採樣率)
+
+        Raises:
+            UploadTooLongError: 音頻超出時長上限
+        """
+        if self._pcm is None:
+            pcm, sample_rate = self._read_pcm()
+            duration = len(pcm) / sample_rate if sample_rate else 0.0
+            if self.max_duration is not None and duration > self.max_duration:
+                raise UploadTooLongError(
+                    f"音頻時長 {duration:.1f} 秒超出上限 {self.max_duration:.0f} 秒", self.max_duration
+                )
+            pcm.flags.writeable = False
+            self._pcm, self._sample_rate = pcm, sample_rate
+        return self._pcm, self._sample_rate
+
+    def _read_pcm(self) -> Tuple[np.ndarray, int]:
+        """讀取音頻，libsndfile 不支持的格式（如 webm）使用 librosa 解碼"""
+        try:
+            import soundfile as sf
+            data, sample_rate = sf.read(self.path, dtype='float32', always_2d=True)
+            pcm = data[:, 0].copy() if data.shape[1] == 1 else data.mean(axis=1, dtype=np.float32)
+            return pcm, int(sample_rate)
+        except Exception:
+            import librosa
+            pcm, sample_rate = librosa.load(self.path, sr=None, mono=True)
+            return pcm.astype(np.float32, copy=False), int(sample_rate)
+
+    @property
+    def pcm(self) -> np.ndarray:
+        """解碼後的PCM"""
+        return self.decode()[0]
+
+    @property
+    def sample_rate(self) -> int:
+        """解碼後的採樣率"""
+        return self.decode()[1]
+
+    @property
+    def duration(self) -> float:
+        """音頻時長（秒）"""
+        pcm, sample_rate = self.decode()
+        return len(pcm) / sample_rate
+
+    def defer_cleanup(self) -> Callable[[], None]:
+        """將臨時目錄的刪除推遲到響應發送之後
+
+        Returns:
+            刪除臨時目錄的函數，應交給響應的後台任務執行
+        """
+        self._cleanup_deferred = True
+        return self.cleanup
+
+    def cleanup(self):
+        """刪除臨時目錄"""
+        if self._closed:
+            return
+        self._closed = True
+        self._pcm = None
+        shutil.rmtree(self.workdir, ignore_errors=True)
+        logger.debug(f"已清理上傳臨時目錄: {self.workdir}")
+
+    def close(self):
+        """結束請求時調用；除非已推遲，否則立即刪除臨時目錄"""
+        if not self._cleanup_deferred:
+            self.cleanup()
+
+    def __enter__(self) -> 'AudioUpload':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    async def __aenter__(self) -> 'AudioUpload':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class UploadSizeLimitMiddleware:
+    """在接收請求流時強制執行上傳大小上限的 ASGI 中間件
+
+    只作用於路徑以 path_prefix 開頭的 POST 請求。
+    """
+
+    def __init__(self, app: Any,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 path_prefix: str = "/api/audio/",
+                 overhead_bytes: int = MULTIPART_OVERHEAD_BYTES):
+        """初始化
+
+        Args:
+            app: 下游 ASGI 應用
+            max_bytes: 上傳文件的大小上限（字節）
+            path_prefix: 受限的路徑前綴
+            overhead_bytes: 請求體中文件以外部分允許的額外字節數
+        """
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+        self.limit = max_bytes + overhead_bytes
+
+    def _message(self) -> str:
+        return f"上傳文件超出大小上限 {self.max_bytes} 字節"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.limit:
+            response = JSONResponse({"detail": self._message()}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    # 在解析請求體時拋出，由應用的異常處理返回413
+                    raise HTTPException(status_code=413, detail=self._message())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _check_declared_duration(path: str, max_duration: Optional[float]):
+    """檢查文件頭聲明的時長是否超出上限"""
+    if max_duration is None:
+        return
+    duration = probe_duration(path)
+    if duration is not None and duration > max_duration:
+        raise UploadTooLongError(f"音頻時長 {duration:.1f} 秒超出上限 {max_duration:.0f} 秒", max_duration)
+
+
+async def ingest_upload(upload: Any,
+                        max_bytes: int = DEFAULT_MAX_BYTES,
+                        max_duration: Optional[float] = DEFAULT_MAX_DURATION,
+                        suffix: Optional[str] = None,
+                        chunk_size: int = UPLOAD_CHUNK_SIZE) -> AudioUpload:
+    """將上傳文件逐塊複製到私有臨時目錄
+
+    請求體的大小上限應由 UploadSizeLimitMiddleware 在接收請求時強制執行；這裡的
+    檢查針對文件本身，並在文件頭到達後立即檢查聲明的時長。
+
+    Args:
+        upload: 具有異步 read(size) 方法的上傳對象（如 fastapi.UploadFile）
+        max_bytes: 大小上限（字節）
+        max_duration: 時長上限（秒），為None時不限制
+        suffix: 臨時文件擴展名，默認取自上傳文件名
+        chunk_size: 每次讀取的字節數
+
+    Returns:
+        AudioUpload: 已接收的上傳
+
+    Raises:
+        UploadTooLargeError: 超出大小上限
+        UploadTooLongError: 文件頭聲明的時長超出上限
+    """
+    if suffix is None:
+        filename = getattr(upload, 'filename', None) or ''
+        suffix = os.path.splitext(filename)[1] or '.webm'
+
+    workdir = tempfile.mkdtemp(prefix="upload_")
+    path = os.path.join(workdir, f"input{suffix}")
+    digest = hashlib.sha256()
+    size = 0
+    probed = False
+
+    try:
+        with open(path, 'wb') as f:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"上傳文件超出大小上限 {max_bytes} 字節", max_bytes)
+                f.write(chunk)
+                digest.update(chunk)
+
+                # 文件頭到達後立即檢查聲明的時長，避免接收整個超長文件
+                if not probed and size >= HEADER_PROBE_BYTES:
+                    probed = True
+                    f.flush()
+                    _check_declared_duration(path, max_duration)
+
+        if not probed:
+            _check_declared_duration(path, max_duration)
+    except BaseException:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+
+    logger.debug(f"已接收上傳文件 {path}，{size} 字節")
+    return AudioUpload(workdir, path, size, digest.hexdigest(), max_duration)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""和弦識別基準測試
+
+比較舊版逐小節建立 music21 BellmanBudge 分析器的和弦識別與音級遮罩查找表的耗時。
+兩者都從已解析的樂譜開始計時（不含 MIDI 解析）。未指定 MIDI 文件時生成一首
+指定小節數的柱式和弦加旋律的樂曲。
+
+用法:
+    python backend/benchmarks/bench_chord_recognition.py song1.mid song2.mid
+    python backend/benchmarks/bench_chord_recognition.py --bars 200
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import music21
+from music21 import converter
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.note_array import NoteArray
+from backend.music_theory.chord_recognition import merge_chords, recognize_chords
+
+
+def generate_midi(bars: int, path: str):
+    """生成 I-vi-IV-V 循環的柱式和弦與隨機旋律"""
+    rng = np.random.default_rng(0)
+    cycle = [[48, 52, 55], [45, 48, 52], [41, 45, 48], [43, 47, 50]]
+    score = music21.stream.Score()
+    harmony, melody = music21.stream.Part(), music21.stream.Part()
+    for bar in range(bars):
+        voicing = cycle[bar % len(cycle)]
+        harmony.append(music21.chord.Chord(voicing, quarterLength=4.0))
+        for _ in range(4):
+            melody.append(music21.note.Note(int(rng.choice(voicing)) + 24, quarterLength=1.0))
+    score.insert(0, harmony)
+    score.insert(0, melody)
+    score.write('midi', fp=path)
+
+
+def legacy_chords(score) -> int:
+    """重現舊版 _analyze_chords 的逐小節分析"""
+    score.analyze('key')
+    count = 0
+    for measure in score.measures(0, None):
+        chord_analyzer = music21.analysis.discrete.BellmanBudge()
+        try:
+            chord_analyzer.getSolution(measure)
+        except Exception:
+            pass
+        notes_in_measure = measure.flatten().notes.stream()
+        if notes_in_measure:
+            music21.chord.Chord([n.pitch for n in notes_in_measure if hasattr(n, 'pitch')]).commonName
+            count += 1
+    return count
+
+
+def table_chords(score) -> int:
+    """音級遮罩查找表（含樂譜展平）"""
+    pitches, starts, durations = [], [], []
+    for element in score.flatten().notes:
+        for element_pitch in (element.pitches if element.isChord else [element.pitch]):
+            pitches.append(element_pitch.midi)
+            starts.append(float(element.offset))
+            durations.append(float(element.quarterLength))
+    labels = recognize_chords(NoteArray(pitches, starts, durations), segment_length=4.0)
+    return len(merge_chords(labels))
+
+
+def timed(func, repeat: int) -> float:
+    """返回多次執行的平均耗時（秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="和弦識別基準測試")
+    parser.add_argument("files", nargs="*", help="MIDI 文件")
+    parser.add_argument("--bars", type=int, default=200, help="未指定文件時生成的小節數")
+    parser.add_argument("--repeat", type=int, default=5, help="查找表的重複次數")
+    args = parser.parse_args()
+
+    files = args.files
+    if not files:
+        handle, path = tempfile.mkstemp(suffix=".mid")
+        os.close(handle)
+        generate_midi(args.bars, path)
+        files = [path]
+
+    print(f"{'文件':<32}{'舊版(ms)':>12}{'查找表(ms)':>12}{'加速比':>10}{'和弦數':>8}")
+    for path in files:
+        score = converter.parse(path)
+        legacy = timed(lambda: legacy_chords(score), 1)
+        fast = timed(lambda: table_chords(score), args.repeat)
+        print(f"{Path(path).name[:30]:<32}{legacy * 1000:>12.1f}{fast * 1000:>12.2f}"
+              f"{legacy / fast:>10.1f}{table_chords(score):>8}")
+
+    if not args.files:
+        os.unlink(files[0])
+
+
+if __name__ == "__main__":
+    main()
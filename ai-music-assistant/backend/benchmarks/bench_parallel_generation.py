@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""並行音軌生成基準測試
+
+比較順序生成與在進程池中並行生成各音軌的牆鐘時間。默認生成3分鐘、12個音軌的
+古典樂曲，兩種方式使用相同種子，並檢查合併後的 MIDI 完全相同。進程池的啟動時間
+（首次生成）單獨列出，不計入平均耗時。
+
+用法:
+    python backend/benchmarks/bench_parallel_generation.py
+    python backend/benchmarks/bench_parallel_generation.py --duration 300 --workers 4 --repeat 5
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.model_coordinator.music_generator import MAX_TRACKS, MusicGenerator, shutdown_track_pool
+
+INSTRUMENTS = [
+    'violin', 'viola', 'cello', 'double_bass', 'flute', 'oboe',
+    'clarinet', 'bassoon', 'french_horn', 'trumpet', 'timpani', 'percussion'
+]
+
+
+def timed(func, repeat: int) -> float:
+    """返回多次執行的平均耗時（秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="並行音軌生成基準測試")
+    parser.add_argument("--duration", type=int, default=180, help="樂曲時長（秒）")
+    parser.add_argument("--tracks", type=int, default=MAX_TRACKS, help="音軌數")
+    parser.add_argument("--tempo", type=int, default=120, help="速度")
+    parser.add_argument("--workers", type=int, default=None, help="工作進程數，默認為CPU核數")
+    parser.add_argument("--repeat", type=int, default=3, help="重複次數")
+    parser.add_argument("--seed", type=int, default=0, help="隨機種子")
+    args = parser.parse_args()
+
+    params = {
+        "tempo": args.tempo,
+        "key": "C",
+        "genre": "classical",
+        "complexity": 5,
+        "instruments": INSTRUMENTS[:args.tracks],
+        "duration": args.duration,
+        "seed": args.seed
+    }
+    sequential = MusicGenerator()
+    parallel = MusicGenerator(parallel_tracks=True, max_workers=args.workers)
+
+    # 首次並行生成包含進程池啟動
+    start = time.perf_counter()
+    parallel_result = parallel.generate_music(dict(params))
+    startup = time.perf_counter() - start
+    sequential_result = sequential.generate_music(dict(params))
+
+    sequential_time = timed(lambda: sequential.generate_music(dict(params)), args.repeat)
+    parallel_time = timed(lambda: parallel.generate_music(dict(params)), args.repeat)
+    shutdown_track_pool()
+
+    analysis = sequential_result["analysis"]
+    print(f"{analysis['track_count']} 個音軌，{args.duration} 秒，CPU 核數 {os.cpu_count()}")
+    print(f"{'方式':<12}{'耗時(ms)':>12}{'加速比':>10}")
+    print(f"{'順序':<12}{sequential_time * 1000:>12.1f}{1.0:>10.2f}")
+    print(f"{'並行':<12}{parallel_time * 1000:>12.1f}{sequential_time / parallel_time:>10.2f}")
+    print(f"進程池啟動（首次生成）：{startup * 1000:.1f} ms")
+    print(f"結果一致：{parallel_result['midi_data'] == sequential_result['midi_data']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""音高量化基準測試
+
+比較舊版逐幀 lambda 搜索（每次調用都用 music21 重建音階）與預計算查找表加
+向量化最近鄰搜索的耗時。默認曲線長度相當於 pYIN 默認跳步下約5分鐘的人聲。
+
+用法:
+    python backend/benchmarks/bench_pitch_quantizer.py --frames 26000 --repeat 5
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.audio_processing.pitch_quantizer import scale_table, snap_to_scale
+
+
+def legacy_scale(key: str):
+    """重現舊版 _get_scale_midi_values"""
+    try:
+        import music21
+        from music21 import key as m21_key
+    except ImportError:
+        return [12 * octave + interval for octave in range(1, 8) for interval in (0, 2, 4, 5, 7, 9, 11)]
+
+    k = m21_key.Key(key[:-1], 'minor') if key.endswith('m') else m21_key.Key(key)
+    values = []
+    for octave in range(1, 8):
+        for pitch in k.getPitches():
+            p = music21.pitch.Pitch(pitch.name)
+            p.octave = octave
+            values.append(int(p.midi))
+    return sorted(values)
+
+
+def legacy_snap(midi_pitch: np.ndarray, scale) -> np.ndarray:
+    """重現舊版 _snap_to_scale"""
+    corrected = midi_pitch.copy()
+    for i in range(len(corrected)):
+        if not np.isnan(corrected[i]):
+            corrected[i] = min(scale, key=lambda x: abs(x - corrected[i]))
+    return corrected
+
+
+def timed(func, repeat: int) -> float:
+    """返回多次執行的平均耗時（秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="音高量化基準測試")
+    parser.add_argument("--frames", type=int, default=26000, help="f0 曲線幀數")
+    parser.add_argument("--repeat", type=int, default=5, help="重複次數")
+    parser.add_argument("--key", default="Am", help="調性")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # 帶顫音的隨機游走音高曲線，約30%為無聲幀
+    pitch = 60 + np.cumsum(rng.normal(0, 0.05, args.frames)) + 0.3 * np.sin(np.arange(args.frames) * 0.3)
+    pitch[rng.random(args.frames) < 0.3] = np.nan
+
+    rows = [
+        ("舊版 music21 + lambda", timed(lambda: legacy_snap(pitch, legacy_scale(args.key)), 1)),
+        ("查找表 + 向量化", timed(lambda: snap_to_scale(pitch, scale_table(args.key)), args.repeat)),
+        ("查找表 + 向量化 (遲滯0.3)",
+         timed(lambda: snap_to_scale(pitch, scale_table(args.key), hysteresis=0.3), args.repeat)),
+    ]
+
+    baseline = rows[0][1]
+    print(f"{'實現':<28}{'耗時(ms)':>12}{'加速比':>10}")
+    for name, elapsed in rows:
+        print(f"{name:<28}{elapsed * 1000:>12.2f}{baseline / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""混響基準測試
+
+比較舊版逐樣本延遲線混響與塊處理 Freeverb 的耗時，並輸出實時因子
+（處理耗時 / 音頻時長，小於 1 表示快於實時）。
+
+用法:
+    python backend/benchmarks/bench_reverb.py --seconds 180 --sample-rate 44100
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.rendering.reverb import FreeverbReverb
+
+
+def legacy_reverb(audio: np.ndarray, sample_rate: int, room_size=0.5, damping=0.5,
+                  wet_level=0.3, dry_level=0.7) -> np.ndarray:
+    """重現舊版 TimbreEngine._apply_reverb 的逐樣本實現"""
+    delay_samples = int(room_size * sample_rate * 0.3)
+    decay = 1.0 - damping * 0.9
+    delay_buffer = np.zeros(len(audio) + delay_samples)
+    output = np.zeros_like(delay_buffer)
+    delay_buffer[:len(audio)] = audio
+    output[:len(audio)] = audio * dry_level
+    for i in range(4):
+        current_delay = delay_samples // (i + 1)
+        current_decay = decay ** (i + 1)
+        for j in range(len(audio)):
+            idx = j + current_delay
+            if idx < len(output):
+                output[idx] += delay_buffer[j] * wet_level * current_decay
+    return output[:len(audio)]
+
+
+def timed(func, *args) -> float:
+    """返回函數執行耗時（秒）"""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="混響基準測試")
+    parser.add_argument("--seconds", type=float, default=180.0, help="Freeverb 測試的音頻時長")
+    parser.add_argument("--legacy-seconds", type=float, default=4.0, help="舊實現測試的音頻時長")
+    parser.add_argument("--sample-rate", type=int, default=44100, help="採樣率")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    sample_rate = args.sample_rate
+
+    legacy_audio = rng.uniform(-0.5, 0.5, int(args.legacy_seconds * sample_rate))
+    mono_audio = rng.uniform(-0.5, 0.5, int(args.seconds * sample_rate))
+    stereo_audio = rng.uniform(-0.5, 0.5, (int(args.seconds * sample_rate), 2))
+
+    reverb = FreeverbReverb(sample_rate=sample_rate)
+    rows = [
+        ("舊版逐樣本 (單聲道)", args.legacy_seconds, timed(legacy_reverb, legacy_audio, sample_rate)),
+        ("Freeverb (單聲道)", args.seconds, timed(reverb.process, mono_audio)),
+        ("Freeverb (立體聲)", args.seconds, timed(reverb.process, stereo_audio)),
+    ]
+
+    print(f"{'實現':<24}{'音頻時長(s)':>12}{'耗時(s)':>10}{'實時因子':>10}")
+    for name, seconds, elapsed in rows:
+        print(f"{name:<24}{seconds:>12.1f}{elapsed:>10.3f}{elapsed / seconds:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""MIDI 文件寫入基準測試
+
+比較數組編碼器與 midiutil、mido 寫出同一首多音軌樂曲的耗時。三者都從已生成的
+音符（每個音軌一個音符數組）開始計時，輸出到內存中的 bytes。
+
+用法:
+    python backend/benchmarks/bench_smf_writer.py
+    python backend/benchmarks/bench_smf_writer.py --tracks 12 --notes 20000 --repeat 5
+"""
+
+import io
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import mido
+import numpy as np
+from midiutil import MIDIFile
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.note_array import NoteArray
+from backend.mcp.smf_writer import SMFTrack, encode_smf
+
+TICKS_PER_BEAT = 960
+
+
+def generate_tracks(tracks: int, notes: int, seed: int = 0):
+    """生成每個音軌 notes 個音符的隨機單聲部樂曲（時間單位為拍）
+
+    midiutil 在同音高音符相互重疊時會出錯，因此每個音軌的音符首尾相接。
+    """
+    rng = np.random.default_rng(seed)
+    parts = []
+    for _ in range(tracks):
+        durations = rng.choice([0.25, 0.5, 1.0, 2.0], notes)
+        starts = np.cumsum(durations) - durations
+        parts.append(NoteArray(rng.integers(36, 96, notes), starts, durations, rng.integers(40, 120, notes)))
+    return parts
+
+
+def write_midiutil(parts, tempo: int) -> bytes:
+    midi = MIDIFile(len(parts), ticks_per_quarternote=TICKS_PER_BEAT)
+    for index, notes in enumerate(parts):
+        midi.addTempo(index, 0, tempo)
+        for pitch, start, duration, velocity in zip(notes.pitch.tolist(), notes.start.tolist(),
+                                                    notes.duration.tolist(), notes.velocity.tolist()):
+            midi.addNote(index, 0, pitch, start, duration, velocity)
+    buffer = io.BytesIO()
+    midi.writeFile(buffer)
+    return buffer.getvalue()
+
+
+def write_mido(parts, tempo: int) -> bytes:
+    midi_file = mido.MidiFile(ticks_per_beat=TICKS_PER_BEAT)
+    conductor = mido.MidiTrack([mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(tempo), time=0)])
+    midi_file.tracks.append(conductor)
+    for notes in parts:
+        events = []
+        for pitch, start, end, velocity in zip(notes.pitch.tolist(), notes.start.tolist(),
+                                               notes.end.tolist(), notes.velocity.tolist()):
+            events.append((round(end * TICKS_PER_BEAT), 0, pitch, 0))
+            events.append((round(start * TICKS_PER_BEAT), 1, pitch, velocity))
+        events.sort(key=lambda event: event[:2])
+        track = mido.MidiTrack()
+        now = 0
+        for tick, on, pitch, velocity in events:
+            track.append(mido.Message('note_on' if on else 'note_off', note=pitch, velocity=velocity, time=tick - now))
+            now = tick
+        midi_file.tracks.append(track)
+    buffer = io.BytesIO()
+    midi_file.save(file=buffer)
+    return buffer.getvalue()
+
+
+def write_array(parts, tempo: int) -> bytes:
+    return encode_smf([SMFTrack(notes) for notes in parts], tempo=tempo, ticks_per_beat=TICKS_PER_BEAT)
+
+
+def timed(func, repeat: int) -> float:
+    """返回多次執行的平均耗時（秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MIDI 文件寫入基準測試")
+    parser.add_argument("--tracks", type=int, default=12, help="音軌數")
+    parser.add_argument("--notes", type=int, default=5000, help="每個音軌的音符數")
+    parser.add_argument("--tempo", type=int, default=120, help="速度")
+    parser.add_argument("--repeat", type=int, default=3, help="重複次數")
+    args = parser.parse_args()
+
+    parts = generate_tracks(args.tracks, args.notes)
+    writers = [("midiutil", write_midiutil), ("mido", write_mido), ("數組編碼器", write_array)]
+
+    results = []
+    for name, writer in writers:
+        seconds = timed(lambda: writer(parts, args.tempo), args.repeat)
+        results.append((name, seconds, len(writer(parts, args.tempo))))
+
+    baseline = results[0][1]
+    print(f"{args.tracks} 個音軌，每軌 {args.notes} 個音符")
+    print(f"{'寫入方式':<14}{'耗時(ms)':>12}{'相對midiutil':>14}{'大小(KB)':>12}")
+    for name, seconds, size in results:
+        print(f"{name:<14}{seconds * 1000:>12.1f}{baseline / seconds:>14.1f}{size / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""SQLiteStorage 吞吐量基準測試
+
+比較三種寫入路徑的每秒操作數：
+1. 舊實現：每次操作新建連接，先 SELECT 再 INSERT/UPDATE，每個鍵單獨提交
+2. 連接池 + 單語句 upsert
+3. 連接池 + 寫入批次器（write-behind）
+
+用法:
+    python backend/benchmarks/bench_sqlite_storage.py --ops 2000 --keys 50
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import aiosqlite
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.storage.sqlite_storage import SQLiteStorage
+
+
+async def legacy_save(db_path: str, table_name: str, key: str, data: dict):
+    """重現舊版 save：每次連接、SELECT 後再寫入並提交"""
+    serialized_data = json.dumps(data, ensure_ascii=False)
+    now = datetime.now().isoformat()
+    async with aiosqlite.connect(db_path) as db:
+        cursor = await db.execute(f"SELECT key FROM {table_name} WHERE key = ?", (key,))
+        exists = await cursor.fetchone()
+        if exists:
+            await db.execute(
+                f"UPDATE {table_name} SET data = ?, updated_at = ? WHERE key = ?",
+                (serialized_data, now, key)
+            )
+        else:
+            await db.execute(
+                f"INSERT INTO {table_name} (key, data, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (key, serialized_data, now, now)
+            )
+        await db.commit()
+
+
+def progress_payload(i: int) -> dict:
+    """模擬 update_task_progress 寫入的進度數據"""
+    return {
+        "command_id": f"cmd-{i}",
+        "status": "PROCESSING",
+        "progress": i % 100,
+        "message": "模型處理中...",
+        "updated_at": datetime.now()
+    }
+
+
+async def run_legacy(db_dir: str, ops: int, keys: int) -> float:
+    storage = SQLiteStorage(db_path=os.path.join(db_dir, "legacy.db"), table_name="bench")
+    # 舊實現不使用WAL
+    async with aiosqlite.connect(storage.db_path) as db:
+        await db.execute("PRAGMA journal_mode=DELETE")
+    await storage.close()
+
+    start = time.perf_counter()
+    for i in range(ops):
+        await legacy_save(storage.db_path, "bench", f"key-{i % keys}",
+                          storage._prepare_data_for_serialization(progress_payload(i)))
+    return ops / (time.perf_counter() - start)
+
+
+async def run_storage(db_dir: str, name: str, ops: int, keys: int, concurrency: int, **kwargs) -> float:
+    storage = SQLiteStorage(db_path=os.path.join(db_dir, f"{name}.db"), table_name="bench", **kwargs)
+
+    async def worker(offset: int):
+        for i in range(offset, ops, concurrency):
+            await storage.save(f"key-{i % keys}", progress_payload(i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    await storage.flush()
+    elapsed = time.perf_counter() - start
+    await storage.close()
+    return ops / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="SQLiteStorage 吞吐量基準測試")
+    parser.add_argument("--ops", type=int, default=2000, help="寫入次數")
+    parser.add_argument("--keys", type=int, default=50, help="不同鍵的數量（模擬並行任務數）")
+    parser.add_argument("--concurrency", type=int, default=8, help="並行寫入協程數")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        legacy = await run_legacy(db_dir, args.ops, args.keys)
+        pooled = await run_storage(db_dir, "pooled", args.ops, args.keys, args.concurrency)
+        batched = await run_storage(db_dir, "batched", args.ops, args.keys, args.concurrency,
+                                    batch_writes=True)
+
+    print(f"{'path':<28}{'ops/sec':>12}{'speedup':>10}")
+    for name, value in (("legacy (connect per op)", legacy),
+                        ("pooled + upsert", pooled),
+                        ("pooled + write batching", batched)):
+        print(f"{name:<28}{value:>12.0f}{value / legacy:>9.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
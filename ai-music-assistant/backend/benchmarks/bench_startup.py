@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""冷啟動基準測試
+
+在新的解釋器中多次導入 API 入口模組，報告牆鐘時間的中位數與各套件的導入耗時，
+並可作為回歸門檻：中位數超過預算，或導入了應延遲載入的重型套件時以非零狀態退出。
+
+用法:
+    python backend/benchmarks/bench_startup.py --runs 5 --budget 3.0
+    python backend/benchmarks/bench_startup.py --module backend.music_generation
+"""
+
+import sys
+import argparse
+import statistics
+from pathlib import Path
+
+# 添加專案根目錄到Python路徑
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.mcp.lazy_import import format_import_report, profile_imports
+
+# 啟動時不應導入的重型套件（都應通過延遲導入在首次使用時載入）
+DEFERRED_PACKAGES = ("tensorflow", "music21", "librosa", "basic_pitch", "magenta", "note_seq", "pretty_midi")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷啟動基準測試")
+    parser.add_argument("--module", default="backend.main", help="要導入的模組")
+    parser.add_argument("--runs", type=int, default=3, help="重複次數")
+    parser.add_argument("--top", type=int, default=15, help="報告中列出的套件數")
+    parser.add_argument("--budget", type=float, default=None, help="中位數牆鐘時間上限（秒），超過時退出碼為1")
+    parser.add_argument("--allow", nargs="*", default=[], help="允許在啟動時導入的重型套件")
+    args = parser.parse_args()
+
+    profiles = [profile_imports(args.module, cwd=str(PROJECT_ROOT)) for _ in range(args.runs)]
+    median = statistics.median(profile.wall_seconds for profile in profiles)
+    slowest = max(profiles, key=lambda profile: profile.wall_seconds)
+
+    print(format_import_report(slowest, args.top))
+    print(f"\n{args.runs} 次冷啟動中位數：{median:.2f} 秒")
+
+    failures = []
+    if not slowest.ok:
+        failures.append(f"導入失敗：{slowest.error}")
+
+    imported = {cost.module.split(".")[0] for cost in slowest.costs}
+    eager = sorted(imported.intersection(DEFERRED_PACKAGES) - set(args.allow))
+    if eager:
+        failures.append(f"啟動時導入了應延遲載入的套件：{', '.join(eager)}")
+
+    if args.budget is not None and median > args.budget:
+        failures.append(f"冷啟動 {median:.2f} 秒超過預算 {args.budget:.2f} 秒")
+
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""串流渲染基準測試
+
+比較一次性渲染（整首渲染後編碼為 WAV，再以 Base64 放入結果 JSON）與逐塊串流渲染
+的首個音頻數據延遲、總耗時與峰值內存（tracemalloc 統計的 Python 與 NumPy 分配）。
+
+用法:
+    python backend/benchmarks/bench_streaming_render.py
+    python backend/benchmarks/bench_streaming_render.py --minutes 10 --tracks 8 --block-seconds 0.25
+"""
+
+import sys
+import time
+import base64
+import argparse
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.note_array import NoteArray
+from backend.mcp.smf_writer import DRUM_CHANNEL, SMFTrack, encode_smf
+from backend.rendering.midi_renderer import render_midi_to_wav, stream_midi_to_wav
+
+TEMPO = 120
+WAV_HEADER_SIZE = 44
+
+
+def build_piece(minutes: float, tracks: int, seed: int = 0) -> bytes:
+    """生成指定長度的多音軌MIDI，最後一個音軌為打擊樂"""
+    rng = np.random.default_rng(seed)
+    beats = minutes * TEMPO
+    parts = []
+    for index in range(tracks):
+        durations = rng.choice([0.5, 1.0, 2.0], int(beats))
+        starts = np.cumsum(durations) - durations
+        keep = starts < beats
+        notes = NoteArray(rng.integers(40, 84, keep.sum()), starts[keep], durations[keep],
+                          rng.integers(50, 110, keep.sum()))
+        channel = DRUM_CHANNEL if index == tracks - 1 else index
+        parts.append(SMFTrack(notes, channel=channel))
+    return encode_smf(parts, tempo=TEMPO)
+
+
+def measure(func):
+    """返回 (首個音頻數據的耗時, 總耗時, 輸出字節數)，WAV 文件頭不算音頻數據"""
+    start = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in func():
+        size += len(chunk)
+        if first is None and size > WAV_HEADER_SIZE:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start, size
+
+
+def peak_memory(func) -> int:
+    """返回迭代輸出過程中的峰值內存字節（tracemalloc 會拖慢解析，與計時分開測量）"""
+    tracemalloc.start()
+    for _ in func():
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="串流渲染基準測試")
+    parser.add_argument("--minutes", type=float, default=5.0, help="樂曲長度（分鐘）")
+    parser.add_argument("--tracks", type=int, default=6, help="音軌數")
+    parser.add_argument("--sample-rate", type=int, default=44100, help="採樣率")
+    parser.add_argument("--block-seconds", type=float, default=0.5, help="串流塊長（秒）")
+    args = parser.parse_args()
+
+    midi_data = build_piece(args.minutes, args.tracks)
+
+    def full():
+        # 舊路徑：整首渲染，再以 Base64 放入結果 JSON 一次返回
+        wav_data = render_midi_to_wav(midi_data, args.sample_rate)
+        yield base64.b64encode(wav_data)
+
+    def streaming():
+        return stream_midi_to_wav(midi_data, args.sample_rate, block_seconds=args.block_seconds)
+
+    print(f"{args.minutes:g} 分鐘，{args.tracks} 個音軌，採樣率 {args.sample_rate}，塊長 {args.block_seconds:g} 秒")
+    print(f"{'渲染方式':<12}{'首塊(ms)':>12}{'總耗時(ms)':>14}{'峰值內存(MB)':>16}{'響應大小(MB)':>16}")
+    for name, func in [("一次性+Base64", full), ("串流", streaming)]:
+        first, total, size = measure(func)
+        peak = peak_memory(func)
+        print(f"{name:<12}{first * 1000:>12.1f}{total * 1000:>14.1f}{peak / 2 ** 20:>16.1f}{size / 2 ** 20:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""基本合成基準測試
+
+比較舊版逐音符合成（每個音符重建時間軸、波形和 ADSR 包絡）與批次波表合成的耗時。
+
+用法:
+    python backend/benchmarks/bench_synth.py --notes 5000 --sample-rate 44100
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.rendering.synth import BatchSynthesizer
+
+
+def legacy_synthesize(notes, sample_rate: int) -> np.ndarray:
+    """重現舊版 TimbreEngine._synthesize_basic 的弦樂路徑"""
+    max_time = max(n.start_time + n.duration for n in notes)
+    audio_length = int(max_time * sample_rate)
+    audio = np.zeros(audio_length)
+
+    def waveform_fn(t, freq):
+        return 0.7 * np.sin(2 * np.pi * freq * t) + 0.3 * np.abs(2 * (t * freq - np.floor(t * freq + 0.5)))
+
+    for note in notes:
+        freq = 440 * (2 ** ((note.pitch - 69) / 12))
+        start_sample = int(note.start_time * sample_rate)
+        end_sample = min(int((note.start_time + note.duration) * sample_rate), audio_length)
+        t = np.arange(end_sample - start_sample) / sample_rate
+        signal = note.velocity / 127.0 * waveform_fn(t, freq)
+
+        envelope = np.ones_like(signal)
+        note_length = len(signal) / sample_rate
+        attack = int(min(0.1, note_length * 0.2) * sample_rate)
+        decay = int(min(0.2, note_length * 0.2) * sample_rate)
+        release = int(min(0.3, note_length * 0.3) * sample_rate)
+        sustain_end = len(envelope) - release
+        if 0 < attack < len(envelope):
+            envelope[:attack] = np.linspace(0, 1, attack)
+        if decay > 0 and attack + decay < len(envelope):
+            envelope[attack:attack + decay] = np.linspace(1, 0.7, decay)
+        if attack + decay < sustain_end:
+            envelope[attack + decay:sustain_end] = 0.7
+        if release > 0 and sustain_end < len(envelope):
+            envelope[sustain_end:] = np.linspace(0.7, 0, len(envelope) - sustain_end)
+
+        audio[start_sample:start_sample + len(signal)] += signal * envelope
+
+    return audio / np.max(np.abs(audio)) * 0.9
+
+
+def make_notes(count: int, seed: int = 0):
+    """生成類似實際編曲的音符：有限的音高集合和量化的時值"""
+    rng = np.random.default_rng(seed)
+    pitches = rng.choice([48, 52, 55, 60, 62, 64, 65, 67, 69, 71, 72], count)
+    durations = rng.choice([0.125, 0.25, 0.5, 1.0], count)
+    starts = np.sort(rng.integers(0, count // 4, count)) * 0.125
+    return [
+        SimpleNamespace(pitch=int(p), start_time=float(s), duration=float(d), velocity=int(v))
+        for p, s, d, v in zip(pitches, starts, durations, rng.integers(40, 127, count))
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基本合成基準測試")
+    parser.add_argument("--notes", type=int, default=5000, help="音符數")
+    parser.add_argument("--sample-rate", type=int, default=44100, help="採樣率")
+    args = parser.parse_args()
+
+    notes = make_notes(args.notes)
+    duration = max(n.start_time + n.duration for n in notes)
+
+    start = time.perf_counter()
+    legacy_synthesize(notes, args.sample_rate)
+    legacy_time = time.perf_counter() - start
+
+    synth = BatchSynthesizer()
+    start = time.perf_counter()
+    synth.render(notes, args.sample_rate, instrument_type='string')
+    cold_time = time.perf_counter() - start
+
+    out = np.zeros(int(duration * args.sample_rate), dtype=np.float32)
+    start = time.perf_counter()
+    synth.render(notes, args.sample_rate, instrument_type='string', out=out)
+    warm_time = time.perf_counter() - start
+
+    print(f"音符數: {args.notes}，音頻時長: {duration:.1f}s")
+    print(f"{'實現':<28}{'耗時(s)':>10}{'加速比':>10}")
+    print(f"{'舊版逐音符':<28}{legacy_time:>10.3f}{1.0:>10.1f}")
+    print(f"{'批次波表（首次）':<28}{cold_time:>10.3f}{legacy_time / cold_time:>10.1f}")
+    print(f"{'批次波表（預分配緩衝區）':<28}{warm_time:>10.3f}{legacy_time / warm_time:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
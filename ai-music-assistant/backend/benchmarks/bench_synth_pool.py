@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""FluidSynth 合成器池基準測試
+
+比較每次渲染都新建合成器並載入 SoundFont 與使用預先初始化的合成器池的每秒渲染數。
+需要安裝 pyfluidsynth、FluidSynth 庫以及一個 SoundFont 文件。
+
+用法:
+    python backend/benchmarks/bench_synth_pool.py --soundfont backend/rendering/soundfonts/GeneralUser.sf2 --renders 40
+"""
+
+import os
+import sys
+import time
+import argparse
+from io import BytesIO
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import mido
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.rendering.synth_pool import FluidSynthPool
+
+
+def build_midi(seconds: float) -> bytes:
+    """建立指定長度的簡單旋律MIDI（120 BPM，八分音符）"""
+    midi_file = mido.MidiFile(ticks_per_beat=480)
+    track = mido.MidiTrack()
+    midi_file.tracks.append(track)
+    for i in range(int(seconds * 4)):
+        note = 60 + (i * 5) % 12
+        track.append(mido.Message('note_on', note=note, velocity=90, time=0))
+        track.append(mido.Message('note_off', note=note, velocity=0, time=240))
+    buffer = BytesIO()
+    midi_file.save(file=buffer)
+    return buffer.getvalue()
+
+
+def render_without_pool(soundfont: str, midi_data: bytes):
+    """每次渲染都新建合成器（舊行為）"""
+    pool = FluidSynthPool(soundfont, size=1)
+    try:
+        pool.render(midi_data)
+    finally:
+        pool.close()
+
+
+def measure(func, renders: int, workers: int) -> float:
+    """返回每秒渲染數"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda _: func(), range(renders)))
+    return renders / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FluidSynth 合成器池基準測試")
+    parser.add_argument("--soundfont", required=True, help="SoundFont 文件路徑")
+    parser.add_argument("--renders", type=int, default=40, help="渲染次數")
+    parser.add_argument("--seconds", type=float, default=5.0, help="每個MIDI的長度（秒）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="並行線程數")
+    args = parser.parse_args()
+
+    midi_data = build_midi(args.seconds)
+
+    pool = FluidSynthPool(args.soundfont, size=args.workers)
+    pool.warm_up()
+
+    rows = [
+        ("每次新建合成器 (串行)", measure(lambda: render_without_pool(args.soundfont, midi_data), args.renders, 1)),
+        ("合成器池 (串行)", measure(lambda: pool.render(midi_data), args.renders, 1)),
+        (f"合成器池 ({args.workers} 線程)", measure(lambda: pool.render(midi_data), args.renders, args.workers)),
+    ]
+    pool.close()
+
+    print(f"MIDI長度: {args.seconds}s，渲染次數: {args.renders}")
+    print(f"{'模式':<28}{'渲染/秒':>10}")
+    for name, rate in rows:
+        print(f"{name:<28}{rate:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,22 +5,24 @@
 
 import os
 import json
+import base64
 import asyncio
 import logging
 import traceback
 from datetime import datetime
-from typing import Optional, Dict, Any, List, Union
-import tempfile
+from typing import Optional, Dict, Any, List, Set, Union, Tuple
 import shutil
 import sys
 
 # 將當前目錄添加到路徑中，以便能夠正確導入模組
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI, HTTPException, Request, BackgroundTasks, Depends, status, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, Request, BackgroundTasks, Depends, status, File, UploadFile, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from starlette.background import BackgroundTask
 
 # 嘗試導入pydantic，如果不可用則使用簡單替代模型
 try:
@@ -44,13 +46,25 @@ from backend.mcp.mcp_schema import (
     MCPCommand,
     MCPResponse,
     MusicParameters,
-    CommandStatus
+    CommandStatus,
+    BatchCommandRequest,
+    BatchCommandItem,
+    BatchCommandResponse
 )
 from backend.mcp.model_coordinator import (
-    ModelCoordinator,
+    WorkflowExecutor,
+    BatchGroup,
+    plan_batch,
+    GenerationCache,
+    ReusePolicy,
+    get_coordinator,
+    reset_coordinator,
+    shutdown_track_pool,
     setup_logger,
     Config
 )
+from backend.mcp.model_coordinator.exceptions import ExecutorSaturatedError, TaskCancelledError
+from backend.mcp.model_coordinator.workflow import init_worker
 from backend.mcp.error_types import (
     MCPError, 
     ErrorCode, 
@@ -64,19 +78,25 @@ from backend.mcp.error_types import (
 from backend.mcp.storage import (
     CommandStorage,
     CacheService,
+    ProgressBus,
     generate_id
 )
+from backend.mcp.storage.progress_bus import is_terminal
 
-# 導入音頻處理模組
-from backend.audio_processing.basic_pitch_service import BasicPitchService
-from backend.audio_processing.audio_processor import AudioProcessor
+from backend.mcp.lazy_import import LazyService, lazy_import_stats
 
-# 導入自動編曲模組
-from backend.music_generation.accompaniment_generator.chord_generator import ChordGenerator
-from backend.music_generation.accompaniment_generator.accompaniment_generator import AccompanimentGenerator
+# 導入音頻處理模組（Basic Pitch 與 librosa 延遲到首次使用時才導入）
+from backend.audio_processing.upload_ingest import (
+    AudioUpload,
+    UploadLimitError,
+    UploadSizeLimitMiddleware,
+    ingest_upload,
+    DEFAULT_MAX_BYTES,
+    DEFAULT_MAX_DURATION
+)
 
 # 導入音樂理論 API 路由
-from music_theory.music_theory_api import router as theory_router
+from backend.music_theory.music_theory_api import router as theory_router
 
 # 設置日誌
 logger = setup_logger("main")
@@ -100,14 +120,30 @@ result_cache = CacheService(
     base_dir=config.get("storage.cache_dir", "data/cache")
 )
 
-# 創建進度緩存
+# 創建生成結果緩存（按命令內容共用結果）
+generation_cache = GenerationCache(
+    CacheService(
+        storage_type=config.get("storage.cache_storage_type", "sqlite"),
+        namespace="generations",
+        default_ttl=config.get("storage.generation_cache_ttl", 7 * 86400),  # 默認緩存7天
+        db_path=config.get("storage.cache_db_path", "data/cache.db"),
+        base_dir=config.get("storage.cache_dir", "data/cache")
+    ),
+    ReusePolicy(config.get("generation_cache.reuse_modes", None))
+)
+
+# 創建進度緩存（進度更新頻繁且可丟失，使用批次寫入）
 progress_cache = CacheService(
     storage_type="sqlite",
     namespace="progress",
     default_ttl=1800,  # 默認緩存30分鐘
-    db_path="data/progress.db"
+    db_path="data/progress.db",
+    batch_writes=True
 )
 
+# 創建進度推送總線（供 SSE / WebSocket 訂閱）
+progress_bus = ProgressBus(max_buffer=config.get("progress.stream_buffer", 16))
+
 # 創建應用
 app = FastAPI(
     title="AI Music Assistant API",
@@ -124,8 +160,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 在接收請求流時強制執行音頻上傳的大小上限（表單解析會先緩衝整個請求體）
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=config.get("upload.max_bytes", DEFAULT_MAX_BYTES),
+    path_prefix="/api/audio/"
+)
+
 # 掛載靜態文件
-app.mount("/static", StaticFiles(directory="backend/static"), name="static")
+app.mount("/static", StaticFiles(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")), name="static")
 
 # 註冊路由
 app.include_router(theory_router)
@@ -145,29 +188,128 @@ default_parameters = MusicParameters(
 # 活躍的任務進度
 active_tasks = {}
 
-# 初始化音頻處理服務
-try:
-    basic_pitch_service = BasicPitchService()
-    audio_processor = AudioProcessor()
-    logger.info("音頻處理服務初始化成功")
-except Exception as e:
-    logger.warning(f"音頻處理服務初始化失敗: {str(e)}")
-    logger.warning("音頻處理相關功能將不可用")
-    # 創建空的對象以避免引用錯誤
-    basic_pitch_service = None
-    audio_processor = None
-
-# 初始化自動編曲服務
-try:
-    chord_generator = ChordGenerator()
-    accompaniment_generator = AccompanimentGenerator()
-    logger.info("自動編曲服務初始化成功")
-except Exception as e:
-    logger.warning(f"自動編曲服務初始化失敗: {str(e)}")
-    logger.warning("自動編曲相關功能將不可用")
-    # 創建空的對象以避免引用錯誤
-    chord_generator = None
-    accompaniment_generator = None
+# 啟動事件建立的背景任務，保留引用以免任務在完成前被垃圾回收
+background_jobs: Set[asyncio.Task] = set()
+
+
+def _background_job_done(task: asyncio.Task):
+    """移除已結束的背景任務並記錄其異常"""
+    background_jobs.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"背景任務 {task.get_name()} 失敗: {task.exception()}", exc_info=task.exception())
+
+
+def start_background_job(coro, name: str) -> asyncio.Task:
+    """啟動背景任務，關閉事件時取消尚未結束的任務
+    
+    Args:
+        coro: 要執行的協程
+        name: 任務名稱
+        
+    Returns:
+        背景任務
+    """
+    task = asyncio.create_task(coro, name=name)
+    background_jobs.add(task)
+    task.add_done_callback(_background_job_done)
+    return task
+
+
+async def cancel_background_jobs():
+    """取消並等待尚未結束的背景任務"""
+    tasks = list(background_jobs)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def create_basic_pitch_service():
+    """建立 Basic Pitch 服務"""
+    from backend.audio_processing.basic_pitch_service import BasicPitchService
+    return BasicPitchService()
+
+
+def create_audio_processor():
+    """建立音頻處理器"""
+    from backend.audio_processing.audio_processor import AudioProcessor
+    return AudioProcessor()
+
+
+def create_chord_generator():
+    """建立和弦生成器"""
+    from backend.music_generation.accompaniment_generator.chord_generator import ChordGenerator
+    return ChordGenerator()
+
+
+def create_accompaniment_generator():
+    """建立伴奏生成器"""
+    from backend.music_generation.accompaniment_generator.accompaniment_generator import AccompanimentGenerator
+    return AccompanimentGenerator()
+
+
+# 音頻處理與自動編曲服務依賴 music21、librosa、TensorFlow 等重型套件，
+# 在首次請求時才導入並建立，啟動時只註冊代理
+basic_pitch_service = LazyService(create_basic_pitch_service, "Basic Pitch 服務")
+audio_processor = LazyService(create_audio_processor, "音頻處理器")
+chord_generator = LazyService(create_chord_generator, "和弦生成器")
+accompaniment_generator = LazyService(create_accompaniment_generator, "伴奏生成器")
+
+
+@app.on_event("startup")
+async def migrate_command_storage():
+    """在背景分塊回填指令表的索引列（舊版數據庫升級）"""
+    async def run_backfill():
+        result = await command_storage.backfill_indexed_columns()
+        if result.success:
+            logger.info(result.message)
+        else:
+            logger.error(result.message)
+    
+    start_background_job(run_backfill(), "command-storage-backfill")
+
+
+@app.on_event("startup")
+async def warm_up_coordinator():
+    """建立共享的模型協調器並預熱已配置的工作流程與執行池的工作進程"""
+    try:
+        # 多音軌並行生成使用獨立的進程池，默認關閉
+        track_options = (
+            config.get("generation.parallel_tracks", False),
+            config.get("generation.track_workers", None)
+        )
+        # 請求在執行池的工作進程中處理，每個工作進程啟動時各自預熱並按配置建立音樂生成器
+        executor = WorkflowExecutor(
+            config.get("executor.pools", None),
+            initializer=init_worker,
+            initargs=track_options
+        )
+        coordinator = await asyncio.to_thread(get_coordinator, executor)
+        if config.get("executor.start_workers", True):
+            await asyncio.to_thread(
+                coordinator.warm_up,
+                config.get("models.warm_up_workflows", None)
+            )
+    except Exception as e:
+        logger.warning(f"模型協調器預熱失敗: {str(e)}")
+
+
+@app.on_event("shutdown")
+async def close_storage():
+    """關閉存儲連接池、工作流程執行池與音軌生成進程池，提交尚未寫入的批次數據"""
+    # 先結束仍在使用存儲的背景任務（如索引列回填）
+    await cancel_background_jobs()
+    
+    for storage in (progress_cache, result_cache, generation_cache.cache, command_storage):
+        try:
+            await storage.close()
+        except Exception as e:
+            logger.warning(f"關閉存儲失敗: {str(e)}")
+    
+    # 關閉工作流程執行池（進程池的工作進程退出時各自關閉音軌進程池），
+    # 再關閉線程池中的生成任務在主進程建立的音軌進程池；
+    # 預熱失敗時還沒有協調器，不為關閉而新建
+    reset_coordinator()
+    shutdown_track_pool()
 
 
 # 自定義錯誤處理器
@@ -184,9 +326,15 @@ async def mcp_error_handler(request: Request, exc: MCPError):
     """
     logger.error(f"MCPError: {exc.message} [Code: {exc.error_code.value}]")
     
+    status_code = exc.get_http_status_code()
+    headers = None
+    if status_code == 429:
+        headers = {"Retry-After": str(exc.details.get("retry_after", 5))}
+    
     return JSONResponse(
-        status_code=exc.get_http_status_code(),
-        content=exc.to_dict()
+        status_code=status_code,
+        content=exc.to_dict(),
+        headers=headers
     )
 
 
@@ -236,56 +384,105 @@ async def update_task_progress(command_id: str, status: str, progress: float, me
         "updated_at": datetime.now()
     }
     
-    # 更新緩存
-    await progress_cache.set(command_id, progress_data)
+    # 工作線程的進度回調排入事件循環的時間不確定，可能晚於最終狀態；
+    # 已寫入終結狀態後忽略之後的非終結進度，在第一個 await 之前判斷並記錄
+    previous = active_tasks.get(command_id)
+    if previous is not None and is_terminal(previous) and not is_terminal(progress_data):
+        logger.debug(f"忽略指令 {command_id} 在 {previous['status']} 之後的進度更新")
+        return
     
     # 更新活躍任務
     active_tasks[command_id] = progress_data
+    
+    # 推送給訂閱者
+    progress_bus.publish(command_id, progress_data)
+    
+    # 更新緩存；寫入期間若已寫入終結狀態，以終結狀態覆蓋，避免緩存停在處理中
+    await progress_cache.set(command_id, progress_data)
+    latest = active_tasks.get(command_id)
+    if latest is not None and latest is not progress_data and is_terminal(latest) and not is_terminal(progress_data):
+        await progress_cache.set(command_id, latest)
+
+
+def make_progress_reporter(command_id: str):
+    """建立可在工作線程中調用的進度回調
+    
+    Args:
+        command_id: 用於查詢進度的ID
+        
+    Returns:
+        接收 (進度 0-1, 消息) 的回調函數，進度轉發到 update_task_progress
+    """
+    loop = asyncio.get_running_loop()
+    
+    def report(fraction: float, message: str):
+        asyncio.run_coroutine_threadsafe(
+            update_task_progress(command_id, "PROCESSING", round(fraction * 100, 1), message),
+            loop
+        )
+    
+    return report
 
 
 # 任務管理函數
-async def process_command_task(
+async def execute_command(
     command_id: str,
     command: MCPCommand,
     background_tasks: BackgroundTasks
-):
-    """處理指令任務
+) -> Tuple[CommandStatus, Dict[str, Any]]:
+    """執行指令並記錄結果
     
     Args:
         command_id: 指令ID
         command: 指令對象
         background_tasks: 背景任務
+        
+    Returns:
+        (最終狀態, 寫入結果緩存的數據)
     """
     try:
         # 更新任務狀態為處理中
         await update_task_progress(command_id, "PROCESSING", 10, "初始化處理...")
         
         # 處理指令
-        coordinator = ModelCoordinator()
+        coordinator = get_coordinator()
         
         # 更新狀態
         await update_task_progress(command_id, "PROCESSING", 30, "模型處理中...")
         
         # 處理
-        result = await coordinator.process_command(command, command_id)
+        result_data = await coordinator.process_command(command, command_id)
         
         # 更新狀態
         await update_task_progress(command_id, "COMPLETED", 100, "處理完成")
         
         # 緩存結果
-        await result_cache.set(command_id, result.model_dump())
+        await result_cache.set(command_id, result_data)
         
         # 更新指令狀態
         await command_storage.update_command_status(
             command_id,
             CommandStatus.COMPLETED,
-            result=result.model_dump()
+            result=result_data
         )
         
         # 清理舊指令和過期緩存（作為背景任務）
         background_tasks.add_task(command_storage.cleanup_old_commands)
         background_tasks.add_task(result_cache.cleanup_expired)
         
+        return CommandStatus.COMPLETED, result_data
+        
+    except TaskCancelledError as e:
+        # 取消不是失敗：保留 CANCELLED 狀態，也不緩存錯誤結果
+        logger.info(str(e))
+        await update_task_progress(command_id, "CANCELLED", 0, "任務已取消")
+        await command_storage.update_command_status(
+            command_id,
+            CommandStatus.CANCELLED,
+            error="任務已被用戶取消"
+        )
+        return CommandStatus.CANCELLED, {"command_id": command_id, "status": "CANCELLED"}
+        
     except Exception as e:
         # 記錄錯誤
         error_message = str(e)
@@ -314,21 +511,171 @@ async def process_command_task(
             error_data = error.to_dict()
         
         # 緩存錯誤結果
-        await result_cache.set(
-            command_id,
-            {
-                "command_id": command_id,
-                "status": "FAILED",
-                "error": error_data
-            }
-        )
+        failure_data = {
+            "command_id": command_id,
+            "status": "FAILED",
+            "error": error_data
+        }
+        await result_cache.set(command_id, failure_data)
+        
+        return CommandStatus.FAILED, failure_data
+
+
+async def run_command(
+    command_id: str,
+    command: MCPCommand,
+    background_tasks: BackgroundTasks
+) -> Tuple[CommandStatus, Dict[str, Any]]:
+    """執行指令；結果可重用時先查詢生成結果緩存，並與內容相同的進行中指令合併
+    
+    Args:
+        command_id: 指令ID
+        command: 指令對象
+        background_tasks: 背景任務
+        
+    Returns:
+        (最終狀態, 寫入結果緩存的數據)
+    """
+    outcome = await generation_cache.run(
+        command_id,
+        command,
+        lambda: execute_command(command_id, command, background_tasks)
+    )
+    if outcome.reused:
+        await share_command_result(outcome.origin_id or "緩存結果", command_id, outcome.status, outcome.data)
+    return outcome.status, outcome.data
+
+
+async def expire_active_task(command_id: str, delay_seconds: float = 600):
+    """保留一段時間後從活躍任務列表中刪除
+    
+    Args:
+        command_id: 指令ID
+        delay_seconds: 保留秒數
+    """
+    if command_id in active_tasks:
+        await asyncio.sleep(delay_seconds)
+        active_tasks.pop(command_id, None)
+
+
+async def process_command_task(
+    command_id: str,
+    command: MCPCommand,
+    background_tasks: BackgroundTasks
+):
+    """處理指令任務
+    
+    Args:
+        command_id: 指令ID
+        command: 指令對象
+        background_tasks: 背景任務
+    """
+    try:
+        await run_command(command_id, command, background_tasks)
     finally:
-        # 從活躍任務中移除
-        if command_id in active_tasks:
-            # 保留10分鐘後自動從活躍任務列表中刪除
-            await asyncio.sleep(600)
-            if command_id in active_tasks:
-                del active_tasks[command_id]
+        # 任務未能提交到執行池時釋放預留的名額
+        get_coordinator().executor.release(command_id)
+        
+        # 保留10分鐘後自動從活躍任務列表中刪除
+        await expire_active_task(command_id)
+
+
+# 批次執行時等待執行池名額的重試間隔（秒）
+BATCH_RESERVE_RETRY_SECONDS = 0.5
+
+
+async def reserve_when_available(command_id: str, command_type: str):
+    """等待執行池出現空閒名額後為命令預留
+    
+    Args:
+        command_id: 指令ID
+        command_type: 指令類型
+    """
+    executor = get_coordinator().executor
+    while True:
+        try:
+            executor.reserve(command_id, command_type)
+            return
+        except ExecutorSaturatedError:
+            await asyncio.sleep(BATCH_RESERVE_RETRY_SECONDS)
+
+
+async def share_command_result(
+    source_id: str,
+    target_id: str,
+    status: CommandStatus,
+    data: Dict[str, Any]
+):
+    """將實際執行的指令結果記錄到共用結果的指令
+    
+    Args:
+        source_id: 實際執行的指令ID
+        target_id: 共用結果的指令ID
+        status: 最終狀態
+        data: 結果數據
+    """
+    await result_cache.set(target_id, data)
+    if status == CommandStatus.COMPLETED:
+        await command_storage.update_command_status(target_id, status, result=data)
+        await update_task_progress(target_id, "COMPLETED", 100, f"處理完成（與 {source_id} 共用結果）")
+    elif status == CommandStatus.CANCELLED:
+        await command_storage.update_command_status(target_id, status, error="共用結果的指令已被取消")
+        await update_task_progress(target_id, "CANCELLED", 0, f"任務已取消（與 {source_id} 共用結果）")
+    else:
+        await command_storage.update_command_status(target_id, status, error=str(data.get("error")))
+        await update_task_progress(target_id, "FAILED", 0, f"處理失敗（與 {source_id} 共用結果）")
+
+
+async def process_batch_task(
+    batch_id: str,
+    groups: List[BatchGroup],
+    commands: Dict[str, MCPCommand],
+    background_tasks: BackgroundTasks
+):
+    """處理批次指令：每組相同的指令只執行一次，各類型並發數不超過執行池的工作者數
+    
+    Args:
+        batch_id: 批次ID
+        groups: 去重後的指令組
+        commands: 指令ID到指令對象的映射
+        background_tasks: 背景任務
+    """
+    executor = get_coordinator().executor
+    limits: Dict[str, asyncio.Semaphore] = {}
+    finished = 0
+    
+    async def run_group(group: BatchGroup):
+        nonlocal finished
+        if group.command_type not in limits:
+            limits[group.command_type] = asyncio.Semaphore(executor.config_for(group.command_type).max_workers)
+        
+        try:
+            async with limits[group.command_type]:
+                await reserve_when_available(group.leader_id, group.command_type)
+                status, data = await run_command(group.leader_id, commands[group.leader_id], background_tasks)
+            
+            for follower_id in group.follower_ids:
+                await share_command_result(group.leader_id, follower_id, status, data)
+        finally:
+            executor.release(group.leader_id)
+            finished += 1
+            await update_task_progress(
+                batch_id,
+                "COMPLETED" if finished == len(groups) else "PROCESSING",
+                round(finished / len(groups) * 100, 1),
+                f"已完成 {finished}/{len(groups)} 個指令"
+            )
+    
+    results = await asyncio.gather(*(run_group(group) for group in groups), return_exceptions=True)
+    for group, outcome in zip(groups, results):
+        if isinstance(outcome, Exception):
+            logger.error(f"批次 {batch_id} 中的指令 {group.leader_id} 處理失敗: {str(outcome)}")
+    
+    # 保留10分鐘後自動從活躍任務列表中刪除
+    await asyncio.gather(
+        expire_active_task(batch_id),
+        *(expire_active_task(command_id) for command_id in commands)
+    )
 
 
 @app.get("/")
@@ -355,10 +702,23 @@ async def process_command(command: MCPCommand, background_tasks: BackgroundTasks
         # 記錄命令開始處理
         logger.info(
             f"開始處理命令: id={command_id}, "
-            f"type={command.command_type}, "
+            f"type={command.type}, "
             f"text_input={command.text_input}"
         )
         
+        # 預留執行池名額，執行池已滿時直接拒絕（HTTP 429）
+        executor = get_coordinator().executor
+        try:
+            executor.reserve(command_id, command.type)
+        except ExecutorSaturatedError as e:
+            raise MCPError(
+                message=e.message,
+                error_code=ErrorCode.RESOURCE_EXHAUSTED,
+                details={"command_type": e.command_type, "limit": e.limit, "retry_after": 5},
+                recovery_hints=["請稍後重試"],
+                command_id=command_id
+            )
+        
         # 複製命令並設置ID和狀態
         command_with_id = command.model_copy(deep=True)
         command_with_id.command_id = command_id
@@ -369,6 +729,7 @@ async def process_command(command: MCPCommand, background_tasks: BackgroundTasks
         # 保存命令
         save_result = await command_storage.save_command(command_with_id)
         if not save_result:
+            executor.release(command_id)
             logger.error(f"保存命令失敗: {save_result.message}")
             raise storage_error(
                 message=f"保存命令失敗: {save_result.message}",
@@ -406,6 +767,116 @@ async def process_command(command: MCPCommand, background_tasks: BackgroundTasks
         )
 
 
+@app.post("/api/commands/batch", response_model=BatchCommandResponse)
+async def process_command_batch(
+    request: BatchCommandRequest,
+    background_tasks: BackgroundTasks
+) -> BatchCommandResponse:
+    """批次提交命令
+    
+    規範化後內容相同的命令只執行一次，其餘命令共用其結果；
+    每個命令都會分配新的命令ID。
+    
+    Args:
+        request: 批次命令請求
+        background_tasks: 背景任務
+        
+    Returns:
+        批次響應，包含各命令ID與批次ID（批次進度可通過 /api/command/{batch_id}/progress 查詢）
+    """
+    try:
+        batch_id = generate_id()
+        command_ids = [generate_id() for _ in request.commands]
+        groups = plan_batch(request.commands, command_ids)
+        
+        logger.info(f"開始處理批次: id={batch_id}, 命令數={len(command_ids)}, 去重後={len(groups)}")
+        
+        # 複製命令並設置ID和狀態
+        now = datetime.now()
+        commands: Dict[str, MCPCommand] = {}
+        for command, command_id in zip(request.commands, command_ids):
+            command_with_id = command.model_copy(deep=True)
+            command_with_id.command_id = command_id
+            command_with_id.status = CommandStatus.PENDING
+            command_with_id.created_at = now
+            command_with_id.updated_at = now
+            commands[command_id] = command_with_id
+        
+        # 保存命令
+        for command_id, command_with_id in commands.items():
+            save_result = await command_storage.save_command(command_with_id)
+            if not save_result:
+                logger.error(f"保存命令失敗: {save_result.message}")
+                raise storage_error(
+                    message=f"保存命令失敗: {save_result.message}",
+                    error_code=ErrorCode.STORAGE_WRITE_FAILURE,
+                    command_id=command_id
+                )
+            await update_task_progress(command_id, "PENDING", 0, "正在排隊...")
+        
+        items = []
+        for group in groups:
+            for index, command_id in group.members:
+                items.append(BatchCommandItem(
+                    index=index,
+                    command_id=command_id,
+                    shared_with=group.leader_id,
+                    deduplicated=len(group.members) > 1
+                ))
+        items.sort(key=lambda item: item.index)
+        
+        response = BatchCommandResponse(
+            batch_id=batch_id,
+            total=len(command_ids),
+            unique=len(groups),
+            commands=items
+        )
+        
+        # 記錄批次信息並初始化批次進度
+        await result_cache.set(f"batch:{batch_id}", response.model_dump(mode="json"))
+        await update_task_progress(batch_id, "PENDING", 0, f"共 {len(groups)} 個指令排隊中")
+        
+        # 在背景處理批次
+        background_tasks.add_task(process_batch_task, batch_id, groups, commands, background_tasks)
+        
+        return response
+        
+    except MCPError:
+        raise
+        
+    except Exception as e:
+        logger.error(f"批次命令初始化錯誤: {str(e)}", exc_info=True)
+        raise system_error(
+            message=f"批次命令初始化失敗: {str(e)}",
+            error_code=ErrorCode.INTERNAL_SERVER_ERROR,
+            details={"error": str(e)}
+        )
+
+
+@app.get("/api/commands/batch/{batch_id}")
+async def get_command_batch(batch_id: str):
+    """獲取批次信息與進度
+    
+    Args:
+        batch_id: 批次ID
+        
+    Returns:
+        批次中各命令的ID、共用關係與批次進度
+    """
+    batch_result = await result_cache.get(f"batch:{batch_id}")
+    if not batch_result.success:
+        raise input_validation_error(
+            message=f"找不到批次: {batch_id}",
+            error_code=ErrorCode.RESOURCE_NOT_FOUND
+        )
+    
+    progress_result = await progress_cache.get(batch_id)
+    return {
+        **batch_result.data,
+        "progress": progress_result.data if progress_result.success else None
+    }
+
+
 @app.get("/api/command/{command_id}", response_model=MCPResponse)
 async def get_command_status(command_id: str) -> MCPResponse:
     """獲取命令狀態
@@ -511,13 +982,14 @@ async def cancel_command(command_id: str):
         )
         
         # 取消實際任務
-        coordinator = ModelCoordinator()
+        coordinator = get_coordinator()
         cancel_result = coordinator.cancel_command(command_id)
         
         return {
             "success": True,
             "message": "任務已取消",
-            "command_id": command_id
+            "command_id": command_id,
+            "task_found": cancel_result
         }
         
     except Exception as e:
@@ -530,6 +1002,78 @@ async def cancel_command(command_id: str):
         )
 
 
+async def load_progress(command_id: str) -> Dict[str, Any]:
+    """讀取命令當前的進度快照
+    
+    Args:
+        command_id: 命令ID
+        
+    Returns:
+        進度信息
+        
+    Raises:
+        MCPError: 找不到命令
+    """
+    # 從緩存中獲取進度
+    progress_result = await progress_cache.get(command_id)
+    
+    if progress_result.success:
+        progress_data = progress_result.data
+        return {
+            "command_id": command_id,
+            "status": progress_data["status"],
+            "progress": progress_data["progress"],
+            "message": progress_data["message"],
+            "updated_at": progress_data["updated_at"]
+        }
+    
+    # 從指令存儲獲取
+    cmd_result = await command_storage.get_command(command_id)
+    if not cmd_result.success:
+        raise input_validation_error(
+            message=f"找不到命令: {command_id}",
+            error_code=ErrorCode.RESOURCE_NOT_FOUND,
+            command_id=command_id
+        )
+        
+    command_data = cmd_result.data
+    status = command_data.get("status", "UNKNOWN")
+    
+    # 根據狀態返回進度
+    if status == "COMPLETED":
+        return {
+            "command_id": command_id,
+            "status": "COMPLETED",
+            "progress": 100,
+            "message": "處理完成",
+            "updated_at": command_data.get("updated_at", datetime.now())
+        }
+    elif status == "FAILED":
+        return {
+            "command_id": command_id,
+            "status": "FAILED",
+            "progress": 0,
+            "message": f"處理失敗: {command_data.get('error', '未知錯誤')}",
+            "updated_at": command_data.get("updated_at", datetime.now())
+        }
+    elif status == "CANCELLED":
+        return {
+            "command_id": command_id,
+            "status": "CANCELLED",
+            "progress": 0,
+            "message": "任務已取消",
+            "updated_at": command_data.get("updated_at", datetime.now())
+        }
+    else:
+        return {
+            "command_id": command_id,
+            "status": status,
+            "progress": 0,
+            "message": "無進度信息",
+            "updated_at": command_data.get("updated_at", datetime.now())
+        }
+
+
 @app.get("/api/command/{command_id}/progress")
 async def get_command_progress(command_id: str):
     """獲取命令處理進度
@@ -541,64 +1085,7 @@ async def get_command_progress(command_id: str):
         進度信息
     """
     try:
-        # 從緩存中獲取進度
-        progress_result = await progress_cache.get(command_id)
-        
-        if progress_result.success:
-            progress_data = progress_result.data
-            return {
-                "command_id": command_id,
-                "status": progress_data["status"],
-                "progress": progress_data["progress"],
-                "message": progress_data["message"],
-                "updated_at": progress_data["updated_at"]
-            }
-        
-        # 從指令存儲獲取
-        cmd_result = await command_storage.get_command(command_id)
-        if not cmd_result.success:
-            raise input_validation_error(
-                message=f"找不到命令: {command_id}",
-                error_code=ErrorCode.RESOURCE_NOT_FOUND,
-                command_id=command_id
-            )
-            
-        command_data = cmd_result.data
-        status = command_data.get("status", "UNKNOWN")
-        
-        # 根據狀態返回進度
-        if status == "COMPLETED":
-            return {
-                "command_id": command_id,
-                "status": "COMPLETED",
-                "progress": 100,
-                "message": "處理完成",
-                "updated_at": command_data.get("updated_at", datetime.now())
-            }
-        elif status == "FAILED":
-            return {
-                "command_id": command_id,
-                "status": "FAILED",
-                "progress": 0,
-                "message": f"處理失敗: {command_data.get('error', '未知錯誤')}",
-                "updated_at": command_data.get("updated_at", datetime.now())
-            }
-        elif status == "CANCELLED":
-            return {
-                "command_id": command_id,
-                "status": "CANCELLED",
-                "progress": 0,
-                "message": "任務已取消",
-                "updated_at": command_data.get("updated_at", datetime.now())
-            }
-        else:
-            return {
-                "command_id": command_id,
-                "status": status,
-                "progress": 0,
-                "message": "無進度信息",
-                "updated_at": command_data.get("updated_at", datetime.now())
-            }
+        return await load_progress(command_id)
             
     except MCPError as e:
         # 直接重新拋出MCPError
@@ -614,18 +1101,249 @@ async def get_command_progress(command_id: str):
         )
 
 
+# 進度推送的心跳間隔（秒），避免代理關閉閒置連接，也用於及早發現已斷開的客戶端
+PROGRESS_HEARTBEAT_SECONDS = 15.0
+
+
+async def stream_progress(command_id: str):
+    """產生命令的進度事件：先產生當前快照，之後產生推送的更新，到達終結狀態後結束
+    
+    先訂閱再讀取快照，兩者之間的更新不會遺漏。等待超過心跳間隔時產生None。
+    
+    Args:
+        command_id: 命令ID
+        
+    Yields:
+        進度信息，或表示心跳的None
+    """
+    subscription = progress_bus.subscribe(command_id)
+    try:
+        snapshot = await load_progress(command_id)
+        yield snapshot
+        if is_terminal(snapshot):
+            return
+        
+        while True:
+            event = await subscription.get(timeout=PROGRESS_HEARTBEAT_SECONDS)
+            yield event
+            if event is not None and is_terminal(event):
+                return
+    finally:
+        subscription.close()
+
+
+@app.get("/api/command/{command_id}/progress/stream")
+async def stream_command_progress(command_id: str):
+    """以 Server-Sent Events 推送命令處理進度
+    
+    Args:
+        command_id: 命令ID
+        
+    Returns:
+        text/event-stream 響應，每次進度變化發送一個 progress 事件
+    """
+    # 在開始響應前確認命令存在
+    await load_progress(command_id)
+    
+    async def event_source():
+        async for event in stream_progress(command_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                payload = json.dumps(jsonable_encoder(event), ensure_ascii=False)
+                yield f"event: progress\ndata: {payload}\n\n"
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.websocket("/ws/command/{command_id}/progress")
+async def websocket_command_progress(websocket: WebSocket, command_id: str):
+    """以 WebSocket 推送命令處理進度
+    
+    Args:
+        websocket: WebSocket 連接
+        command_id: 命令ID
+    """
+    await websocket.accept()
+    try:
+        async for event in stream_progress(command_id):
+            if event is None:
+                await websocket.send_json({"type": "heartbeat"})
+            else:
+                await websocket.send_json({"type": "progress", "data": jsonable_encoder(event)})
+        await websocket.close()
+    except MCPError as e:
+        await websocket.send_json({"type": "error", "error": jsonable_encoder(e.to_dict())})
+        await websocket.close(code=1008)
+    except WebSocketDisconnect:
+        logger.debug(f"進度訂閱客戶端已斷開: {command_id}")
+
+
+async def load_command_midi(command_id: str) -> bytes:
+    """讀取已完成命令生成的MIDI數據
+    
+    Args:
+        command_id: 命令ID
+        
+    Returns:
+        MIDI文件數據
+        
+    Raises:
+        MCPError: 找不到命令或命令沒有MIDI數據
+    """
+    cache_result = await result_cache.get(command_id)
+    if cache_result.success:
+        result = cache_result.data
+    else:
+        cmd_result = await command_storage.get_command(command_id)
+        if not cmd_result.success:
+            raise input_validation_error(
+                message=f"找不到命令: {command_id}",
+                error_code=ErrorCode.RESOURCE_NOT_FOUND,
+                command_id=command_id
+            )
+        result = cmd_result.data.get("result") or {}
+    
+    # 文本到音樂的結果在頂層帶 midi_data，音頻到音樂的結果放在 music_data 中
+    midi_data = result.get("midi_data") or (result.get("music_data") or {}).get("midi_data")
+    if not midi_data:
+        raise input_validation_error(
+            message=f"命令沒有可渲染的MIDI數據: {command_id}",
+            error_code=ErrorCode.RESOURCE_NOT_FOUND,
+            command_id=command_id
+        )
+    # 兼容帶 data URL 前綴的結果
+    return base64.b64decode(midi_data.split(",", 1)[-1])
+
+
+# 等待空閒合成器的默認最長秒數，超時返回503
+DEFAULT_SYNTH_WAIT_SECONDS = 5.0
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """串流結束、出錯或客戶端斷開時關閉同步迭代器
+    
+    Starlette 只在迭代完成時結束同步迭代器；客戶端中途斷開時迭代器停在原處，
+    其持有的資源（如借出的合成器）要等垃圾回收才釋放。
+    """
+    
+    def __init__(self, content, **kwargs):
+        super().__init__(content, **kwargs)
+        self._content = content
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            close = getattr(self._content, "close", None)
+            if close is not None:
+                close()
+
+
+def open_audio_stream(midi_data: bytes, sample_rate: int, block_seconds: float):
+    """建立逐塊渲染的WAV串流
+    
+    配置了 rendering.soundfont_path 且可導入 FluidSynth 時使用共享合成器池，
+    否則使用 NumPy 波表合成器。使用合成器池時在返回前借出合成器，等待超過
+    rendering.synth_wait_seconds 時拋出 SynthPoolBusyError。
+    
+    Args:
+        midi_data: MIDI文件數據
+        sample_rate: 採樣率
+        block_seconds: 每塊的秒數
+        
+    Returns:
+        產生WAV文件頭與PCM數據塊的迭代器
+    """
+    from backend.rendering.midi_renderer import iter_wav, stream_midi_to_wav
+    
+    soundfont_path = config.get("rendering.soundfont_path", None)
+    if soundfont_path and os.path.exists(soundfont_path):
+        try:
+            from backend.rendering.synth_pool import get_synth_pool
+            pool = get_synth_pool(soundfont_path, sample_rate=sample_rate)
+            num_samples = pool.render_length(midi_data)
+            blocks = pool.render_blocks(
+                midi_data,
+                block_seconds=block_seconds,
+                timeout=config.get("rendering.synth_wait_seconds", DEFAULT_SYNTH_WAIT_SECONDS)
+            )
+            return iter_wav(blocks, num_samples, sample_rate, channels=2)
+        except ImportError as e:
+            logger.warning(f"FluidSynth 不可用，使用後備渲染: {str(e)}")
+    
+    return stream_midi_to_wav(midi_data, sample_rate=sample_rate, block_seconds=block_seconds)
+
+
+@app.get("/api/command/{command_id}/audio/stream")
+async def stream_command_audio(command_id: str, sample_rate: int = 44100, block_seconds: float = 0.5):
+    """以分塊傳輸串流渲染命令生成的音樂
+    
+    先發送WAV文件頭，之後每渲染一塊就發送一塊16位PCM數據。客戶端收到第一塊即可
+    開始播放，無需等待整首渲染完成，也無需從結果JSON中解碼 Base64 音頻；
+    每個請求的內存只與塊長有關。
+    
+    Args:
+        command_id: 命令ID
+        sample_rate: 採樣率
+        block_seconds: 每塊的秒數
+        
+    Returns:
+        audio/wav 串流響應
+    """
+    if not 8000 <= sample_rate <= 96000 or not 0.05 <= block_seconds <= 10:
+        raise input_validation_error(
+            message="採樣率須在 8000-96000 之間，塊長須在 0.05-10 秒之間",
+            error_code=ErrorCode.INVALID_PARAMETER_VALUE,
+            command_id=command_id
+        )
+    
+    from backend.rendering.synth_pool import SynthPoolBusyError
+    
+    midi_data = await load_command_midi(command_id)
+    
+    try:
+        # 在開始響應前完成解析並借出合成器，錯誤仍以普通錯誤響應返回
+        chunks = await asyncio.to_thread(open_audio_stream, midi_data, sample_rate, block_seconds)
+    except SynthPoolBusyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"渲染資源繁忙，請稍後重試: {str(e)}",
+            headers={"Retry-After": "5"}
+        )
+    except (ValueError, OSError, EOFError) as e:
+        raise input_validation_error(
+            message=f"無法渲染命令的MIDI數據: {str(e)}",
+            error_code=ErrorCode.INVALID_PARAMETER_VALUE,
+            command_id=command_id
+        )
+    
+    # 同步迭代器由 Starlette 在線程池中逐塊讀取，不阻塞事件循環；斷開時關閉以歸還合成器
+    return ClosingStreamingResponse(
+        chunks,
+        media_type="audio/wav",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/commands/history")
 async def get_command_history(
     limit: int = 10,
     offset: int = 0,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    cursor: Optional[str] = None
 ):
     """獲取命令歷史
     
     Args:
         limit: 返回數量限制
-        offset: 起始偏移
+        offset: 起始偏移（舊版分頁，建議改用 cursor）
         status: 過濾狀態
+        cursor: 上一頁響應中的 next_cursor，用於游標分頁
         
     Returns:
         命令歷史列表
@@ -639,12 +1357,30 @@ async def get_command_history(
             else:
                 status_filter = status
         
-        # 獲取指令歷史
-        result = await command_storage.get_command_history(
-            limit=limit,
-            offset=offset,
-            status=status_filter
-        )
+        next_cursor = None
+        if offset == 0:
+            # 游標分頁：每頁開銷與翻頁深度無關
+            result = await command_storage.get_command_page(
+                limit=limit,
+                cursor=cursor,
+                status=status_filter
+            )
+            if isinstance(result.error, ValueError):
+                raise input_validation_error(
+                    message=result.message,
+                    error_code=ErrorCode.INVALID_PARAMETER_VALUE,
+                    details={"cursor": cursor}
+                )
+            if result.success:
+                next_cursor = result.data["next_cursor"]
+                result.data = result.data["commands"]
+        else:
+            # 獲取指令歷史
+            result = await command_storage.get_command_history(
+                limit=limit,
+                offset=offset,
+                status=status_filter
+            )
         
         if not result.success:
             raise storage_error(
@@ -659,7 +1395,8 @@ async def get_command_history(
             "commands": result.data,
             "total": total_count,
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": next_cursor
         }
         
     except MCPError as e:
@@ -717,7 +1454,21 @@ async def get_system_status():
                 "failed": failed_count,
                 "cancelled": cancelled_count,
                 "total": pending_count + processing_count + completed_count + failed_count + cancelled_count
-            }
+            },
+            "cache_stats": {
+                "results": result_cache.stats(),
+                "generations": generation_cache.stats(),
+                "progress": progress_cache.stats()
+            },
+            "progress_stream": progress_bus.stats(),
+            "services": {
+                "basic_pitch": basic_pitch_service.status(),
+                "audio_processor": audio_processor.status(),
+                "chord_generator": chord_generator.status(),
+                "accompaniment_generator": accompaniment_generator.status()
+            },
+            "lazy_imports": lazy_import_stats(),
+            "coordinator": get_coordinator().metrics()
         }
         
         return system_info
@@ -734,6 +1485,28 @@ async def get_system_status():
 
 # 音頻處理相關端點
 
+async def receive_audio(audio: UploadFile) -> AudioUpload:
+    """串流接收上傳的音頻，超出大小或時長上限時返回413
+    
+    Args:
+        audio: 上傳的音頻文件
+        
+    Returns:
+        已接收的上傳，使用完畢後需要關閉以刪除臨時目錄
+    """
+    try:
+        return await ingest_upload(
+            audio,
+            max_bytes=config.get("upload.max_bytes", DEFAULT_MAX_BYTES),
+            max_duration=config.get("upload.max_duration", DEFAULT_MAX_DURATION)
+        )
+    except UploadLimitError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+
+
 @app.post("/api/audio/upload")
 async def upload_audio(audio: UploadFile = File(...)):
     """上傳音頻文件
@@ -745,22 +1518,15 @@ async def upload_audio(audio: UploadFile = File(...)):
         處理結果及文件ID
     """
     try:
-        # 創建臨時目錄存儲上傳的文件
-        temp_dir = tempfile.mkdtemp()
-        temp_file_path = os.path.join(temp_dir, f"upload_{generate_id()}.webm")
-        
-        # 保存上傳的文件
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(audio.file, buffer)
-        
-        # 生成文件ID
-        file_id = generate_id()
-        
-        # 實際項目中，這裡可能需要將文件移動到永久存儲位置
-        target_dir = os.path.join("data", "audio")
-        os.makedirs(target_dir, exist_ok=True)
-        target_path = os.path.join(target_dir, f"{file_id}.webm")
-        shutil.copy(temp_file_path, target_path)
+        async with await receive_audio(audio) as upload:
+            # 生成文件ID
+            file_id = generate_id()
+            
+            # 實際項目中，這裡可能需要將文件移動到永久存儲位置
+            target_dir = os.path.join("data", "audio")
+            os.makedirs(target_dir, exist_ok=True)
+            target_path = os.path.join(target_dir, f"{file_id}.webm")
+            shutil.move(upload.path, target_path)
         
         logger.info(f"音頻文件已上傳，ID：{file_id}，路徑：{target_path}")
         
@@ -770,16 +1536,15 @@ async def upload_audio(audio: UploadFile = File(...)):
             "message": "音頻上傳成功"
         }
         
+    except HTTPException:
+        # 重新拋出HTTP異常
+        raise
     except Exception as e:
         logger.error(f"音頻上傳失敗: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"音頻上傳失敗: {str(e)}"
         )
-    finally:
-        # 清理臨時目錄
-        if 'temp_dir' in locals():
-            shutil.rmtree(temp_dir, ignore_errors=True)
 
 
 @app.post("/api/audio/correct-pitch")
@@ -792,27 +1557,35 @@ async def correct_pitch(audio: UploadFile = File(...)):
     Returns:
         校正後的音頻文件
     """
-    if basic_pitch_service is None:
+    if not await basic_pitch_service.ready():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="音高校正服務不可用，可能缺少必要的依賴庫"
         )
         
+    # 接收上傳的文件
+    upload = await receive_audio(audio)
+    
     try:
-        # 創建臨時目錄存儲上傳的文件
-        temp_dir = tempfile.mkdtemp()
-        input_path = os.path.join(temp_dir, f"input_{generate_id()}.webm")
-        output_path = os.path.join(temp_dir, f"output_{generate_id()}.wav")
+        output_path = upload.output_path(f"output_{generate_id()}.wav")
         
-        # 保存上傳的文件
-        with open(input_path, "wb") as buffer:
-            shutil.copyfileobj(audio.file, buffer)
+        # 解碼上傳的音頻（只解碼一次，基頻分析與調性檢測共用）
+        try:
+            y, sr = await asyncio.to_thread(upload.decode)
+        except UploadLimitError as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
         
         # 使用 Basic Pitch 服務進行音高校正
         try:
-            corrected_path = basic_pitch_service.correct_pitch(
-                audio_file_path=input_path,
-                output_path=output_path
+            corrected_path = await asyncio.to_thread(
+                basic_pitch_service.correct_pitch,
+                audio_file_path=upload.path,
+                output_path=output_path,
+                y=y,
+                sr=sr
             )
             
             logger.info(f"音高校正成功，輸出文件：{corrected_path}")
@@ -821,7 +1594,8 @@ async def correct_pitch(audio: UploadFile = File(...)):
             return FileResponse(
                 path=corrected_path,
                 media_type="audio/wav",
-                filename="pitch_corrected.wav"
+                filename="pitch_corrected.wav",
+                background=BackgroundTask(upload.defer_cleanup())
             )
             
         except Exception as e:
@@ -831,6 +1605,9 @@ async def correct_pitch(audio: UploadFile = File(...)):
                 detail=f"音高校正失敗: {str(e)}"
             )
         
+    except HTTPException:
+        # 重新拋出HTTP異常
+        raise
     except Exception as e:
         logger.error(f"處理請求失敗: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -838,10 +1615,7 @@ async def correct_pitch(audio: UploadFile = File(...)):
             detail=f"處理請求失敗: {str(e)}"
         )
     finally:
-        # 清理臨時目錄
-        if 'temp_dir' in locals():
-            # 延遲一點時間清理，確保文件已經被返回
-            asyncio.create_task(delayed_cleanup(temp_dir))
+        upload.close()
 
 
 @app.post("/api/audio/analyze")
@@ -854,31 +1628,23 @@ async def analyze_audio(audio: UploadFile = File(...)):
     Returns:
         分析結果
     """
-    if audio_processor is None or basic_pitch_service is None:
+    if not await audio_processor.ready() or not await basic_pitch_service.ready():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="音頻分析服務不可用，可能缺少必要的依賴庫"
         )
         
+    # 接收上傳的文件
+    upload = await receive_audio(audio)
+    
     try:
-        # 創建臨時目錄存儲上傳的文件
-        temp_dir = tempfile.mkdtemp()
-        temp_file_path = os.path.join(temp_dir, f"analyze_{generate_id()}.webm")
-        
-        # 保存上傳的文件
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(audio.file, buffer)
-        
         # 分析音頻
         try:
-            import librosa
-            import numpy as np
-            
-            # 加載音頻
-            y, sr = librosa.load(temp_file_path, sr=None)
+            # 解碼上傳的音頻（只解碼一次，得到共享的只讀PCM）
+            y, sr = await asyncio.to_thread(upload.decode)
             
             # 使用音頻處理器分析
-            analysis_results = audio_processor.analyze_audio(audio_data=y, sample_rate=sr)
+            analysis_results = await asyncio.to_thread(audio_processor.analyze_audio, audio_data=y, sample_rate=sr)
             
             # 檢查是否有錯誤
             if 'error' in analysis_results:
@@ -887,10 +1653,12 @@ async def analyze_audio(audio: UploadFile = File(...)):
                     detail=analysis_results['error']
                 )
             
+            detected_key = await asyncio.to_thread(basic_pitch_service.detect_key, y=y, sr=sr)
+            
             # 提取主要信息，避免返回過大的數據
             simplified_results = {
                 "tempo": analysis_results["rhythm"]["tempo"],
-                "key": basic_pitch_service.detect_key(temp_file_path),
+                "key": detected_key,
                 "pitches": [],
                 "rhythm_complexity": analysis_results["rhythm"]["pattern"]["complexity"]
             }
@@ -901,6 +1669,11 @@ async def analyze_audio(audio: UploadFile = File(...)):
                 "success": True,
                 "analysis": simplified_results
             }
+        except UploadLimitError as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
         except ImportError as e:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -917,43 +1690,50 @@ async def analyze_audio(audio: UploadFile = File(...)):
             detail=f"音頻分析失敗: {str(e)}"
         )
     finally:
-        # 清理臨時目錄
-        if 'temp_dir' in locals():
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        upload.close()
 
 
 @app.post("/api/audio/to-midi")
-async def audio_to_midi(audio: UploadFile = File(...)):
+async def audio_to_midi(audio: UploadFile = File(...), progress_id: Optional[str] = Form(None)):
     """將音頻轉換為MIDI
     
     Args:
         audio: 上傳的音頻文件
+        progress_id: 進度ID；提供時使用串流模式按窗口轉錄長錄音，
+            進度可通過 /api/command/{progress_id}/progress 查詢
         
     Returns:
         轉換後的MIDI文件
     """
-    if basic_pitch_service is None:
+    if not await basic_pitch_service.ready():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="音頻轉MIDI服務不可用，可能缺少必要的依賴庫"
         )
         
+    # 接收上傳的文件
+    upload = await receive_audio(audio)
+    
     try:
-        # 創建臨時目錄存儲上傳的文件
-        temp_dir = tempfile.mkdtemp()
-        input_path = os.path.join(temp_dir, f"input_{generate_id()}.webm")
-        output_path = os.path.join(temp_dir, f"output_{generate_id()}.mid")
-        
-        # 保存上傳的文件
-        with open(input_path, "wb") as buffer:
-            shutil.copyfileobj(audio.file, buffer)
+        output_path = upload.output_path(f"output_{generate_id()}.mid")
         
         # 使用 Basic Pitch 服務轉換為 MIDI
         try:
-            midi_path = basic_pitch_service.audio_to_midi(
-                audio_file_path=input_path,
-                output_midi_path=output_path
-            )
+            if progress_id:
+                await update_task_progress(progress_id, "PROCESSING", 0, "開始轉錄...")
+                midi_path = await asyncio.to_thread(
+                    basic_pitch_service.audio_to_midi_streaming,
+                    upload.path,
+                    output_path,
+                    progress_callback=make_progress_reporter(progress_id)
+                )
+                await update_task_progress(progress_id, "COMPLETED", 100, "轉換完成")
+            else:
+                midi_path = await asyncio.to_thread(
+                    basic_pitch_service.audio_to_midi,
+                    audio_file_path=upload.path,
+                    output_midi_path=output_path
+                )
             
             logger.info(f"音頻轉換為MIDI成功，輸出文件：{midi_path}")
             
@@ -961,7 +1741,8 @@ async def audio_to_midi(audio: UploadFile = File(...)):
             return FileResponse(
                 path=midi_path,
                 media_type="audio/midi",
-                filename="converted.mid"
+                filename="converted.mid",
+                background=BackgroundTask(upload.defer_cleanup())
             )
             
         except ImportError as e:
@@ -971,6 +1752,8 @@ async def audio_to_midi(audio: UploadFile = File(...)):
             )
         except Exception as e:
             logger.error(f"音頻轉換失敗: {str(e)}", exc_info=True)
+            if progress_id:
+                await update_task_progress(progress_id, "FAILED", 0, f"轉換失敗: {str(e)}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"音頻轉換失敗: {str(e)}"
@@ -986,10 +1769,7 @@ async def audio_to_midi(audio: UploadFile = File(...)):
             detail=f"處理請求失敗: {str(e)}"
         )
     finally:
-        # 清理臨時目錄
-        if 'temp_dir' in locals():
-            # 延遲一點時間清理，確保文件已經被返回
-            asyncio.create_task(delayed_cleanup(temp_dir))
+        upload.close()
 
 
 @app.post("/api/audio/generate-chords")
@@ -1006,24 +1786,20 @@ async def generate_chords(audio: UploadFile = File(...),
     Returns:
         生成的和弦進行
     """
-    if basic_pitch_service is None or chord_generator is None:
+    if not await basic_pitch_service.ready() or not await chord_generator.ready():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="和弦生成服務不可用，可能缺少必要的依賴庫"
         )
         
+    # 接收上傳的文件
+    upload = await receive_audio(audio)
+    
     try:
-        # 創建臨時目錄存儲上傳的文件
-        temp_dir = tempfile.mkdtemp()
-        input_path = os.path.join(temp_dir, f"input_{generate_id()}.webm")
-        
-        # 保存上傳的文件
-        with open(input_path, "wb") as buffer:
-            shutil.copyfileobj(audio.file, buffer)
-        
         # 從音頻提取旋律
         try:
-            melody_input = basic_pitch_service.audio_to_melody(input_path)
+            y, sr = await asyncio.to_thread(upload.decode)
+            melody_input = await asyncio.to_thread(basic_pitch_service.audio_to_melody, upload.path, y, sr)
             
             # 生成和弦進行
             chord_progression = chord_generator.generate_chords(
@@ -1039,6 +1815,11 @@ async def generate_chords(audio: UploadFile = File(...),
                 "chord_progression": chord_progression
             }
             
+        except UploadLimitError as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
         except ImportError as e:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -1061,9 +1842,7 @@ async def generate_chords(audio: UploadFile = File(...),
             detail=f"處理請求失敗: {str(e)}"
         )
     finally:
-        # 清理臨時目錄
-        if 'temp_dir' in locals():
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        upload.close()
 
 
 @app.post("/api/audio/generate-accompaniment")
@@ -1082,25 +1861,22 @@ async def generate_accompaniment(audio: UploadFile = File(...),
     Returns:
         生成的伴奏軌道或MIDI文件
     """
-    if basic_pitch_service is None or accompaniment_generator is None:
+    if not await basic_pitch_service.ready() or not await accompaniment_generator.ready():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="伴奏生成服務不可用，可能缺少必要的依賴庫"
         )
         
+    # 接收上傳的文件
+    upload = await receive_audio(audio)
+    
     try:
-        # 創建臨時目錄存儲上傳的文件
-        temp_dir = tempfile.mkdtemp()
-        input_path = os.path.join(temp_dir, f"input_{generate_id()}.webm")
-        output_path = os.path.join(temp_dir, f"accompaniment_{generate_id()}.mid")
-        
-        # 保存上傳的文件
-        with open(input_path, "wb") as buffer:
-            shutil.copyfileobj(audio.file, buffer)
+        output_path = upload.output_path(f"accompaniment_{generate_id()}.mid")
         
         # 從音頻提取旋律
         try:
-            melody_input = basic_pitch_service.audio_to_melody(input_path)
+            y, sr = await asyncio.to_thread(upload.decode)
+            melody_input = await asyncio.to_thread(basic_pitch_service.audio_to_melody, upload.path, y, sr)
             
             # 生成伴奏
             accompaniment = accompaniment_generator.generate_accompaniment(
@@ -1155,7 +1931,8 @@ async def generate_accompaniment(audio: UploadFile = File(...),
                     return FileResponse(
                         path=output_path,
                         media_type="audio/midi",
-                        filename="accompaniment.mid"
+                        filename="accompaniment.mid",
+                        background=BackgroundTask(upload.defer_cleanup())
                     )
                 except ImportError as e:
                     logger.error(f"MIDI生成失敗，可能缺少music21: {str(e)}")
@@ -1174,6 +1951,11 @@ async def generate_accompaniment(audio: UploadFile = File(...),
                     "accompaniment": accompaniment
                 }
             
+        except UploadLimitError as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
         except ImportError as e:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -1196,27 +1978,7 @@ async def generate_accompaniment(audio: UploadFile = File(...),
             detail=f"處理請求失敗: {str(e)}"
         )
     finally:
-        # 清理臨時目錄
-        if 'temp_dir' in locals() and not return_midi:
-            shutil.rmtree(temp_dir, ignore_errors=True)
-        elif return_midi and 'temp_dir' in locals():
-            # 延遲清理，確保文件已經被傳送
-            asyncio.create_task(delayed_cleanup(temp_dir))
-
-
-async def delayed_cleanup(directory_path, delay_seconds=5):
-    """延遲清理目錄
-    
-    Args:
-        directory_path: 要清理的目錄路徑
-        delay_seconds: 延遲秒數
-    """
-    await asyncio.sleep(delay_seconds)
-    try:
-        shutil.rmtree(directory_path, ignore_errors=True)
-        logger.debug(f"已清理臨時目錄: {directory_path}")
-    except Exception as e:
-        logger.error(f"清理臨時目錄失敗: {str(e)}")
+        upload.close()
 
 
 if __name__ == "__main__":
@@ -6,11 +6,21 @@
 from .mcp_schema import *
 from .model_coordinator import *
 from .command_parser import *
+from .note_array import NoteArray
+from .smf_writer import SMFTrack, encode_smf, write_smf
+from .lazy_import import LazyModule, LazyService, lazy_import
 
 __all__ = [
     'MCPCommand',
     'MCPResponse',
     'MusicParameters',
+    'NoteArray',
+    'SMFTrack',
+    'encode_smf',
+    'write_smf',
+    'LazyModule',
+    'LazyService',
+    'lazy_import',
     'CommandStatus',
     'MusicKey',
     'Genre',
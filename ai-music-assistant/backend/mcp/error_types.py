@@ -180,6 +180,7 @@ class MCPError(Exception):
             ErrorCode.PROCESSING_TIMEOUT: 408,               # Request Timeout
             ErrorCode.UNAUTHORIZED_ACCESS: 401,              # Unauthorized
             ErrorCode.MODEL_UNAVAILABLE: 503,                # Service Unavailable
+            ErrorCode.RESOURCE_EXHAUSTED: 429,               # Too Many Requests
             ErrorCode.TASK_CANCELLED: 499                    # Client Closed Request
         }
         
@@ -0,0 +1,322 @@
+"""延遲導入模組
+
+music21、librosa、TensorFlow、Basic Pitch 等套件導入一次要數百毫秒到數秒。
+本模組提供在首次訪問屬性時才真正導入的模組代理、首次使用時才建立的服務代理，
+以及基於 `python -X importtime` 的導入耗時分析，用於縮短 API 進程的冷啟動時間。
+"""
+
+import os
+import re
+import sys
+import asyncio
+import time
+import types
+import logging
+import importlib
+import importlib.util
+import subprocess
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+# 模組名稱 -> 延遲模組代理
+_lazy_modules: Dict[str, 'LazyModule'] = {}
+# 模組名稱 -> 實際導入耗時（秒）
+_load_times: Dict[str, float] = {}
+
+# -X importtime 的輸出行："import time:       123 |        456 |   package.module"
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+class LazyModule(types.ModuleType):
+    """延遲導入的模組代理
+
+    首次訪問模組屬性時才導入實際模組，之後的訪問直接轉發。代理不放入
+    sys.modules，其他地方正常導入同一模組不受影響。
+    """
+
+    def __init__(self, name: str):
+        """初始化
+
+        Args:
+            name: 完整模組名稱，例如 "basic_pitch.inference"
+        """
+        super().__init__(name)
+        self.__dict__["_module"] = None
+
+    def _load(self) -> types.ModuleType:
+        """導入實際模組（只導入一次）"""
+        module = self.__dict__["_module"]
+        if module is not None:
+            return module
+
+        with _lock:
+            module = self.__dict__["_module"]
+            if module is None:
+                start = time.perf_counter()
+                module = importlib.import_module(self.__name__)
+                elapsed = time.perf_counter() - start
+                _load_times[self.__name__] = elapsed
+                logger.info(f"延遲導入 {self.__name__}，耗時 {elapsed * 1000:.1f} 毫秒")
+                self.__dict__["_module"] = module
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        """實際模組是否已導入"""
+        return self.__dict__["_module"] is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+    def __dir__(self) -> List[str]:
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "已導入" if self.loaded else "未導入"
+        return f"<LazyModule {self.__name__} ({state})>"
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """取得延遲導入的模組
+
+    模組已導入時直接返回實際模組；否則返回代理，首次訪問屬性時導入。
+    模組不存在時在首次訪問屬性時才拋出 ImportError。
+
+    Args:
+        name: 完整模組名稱
+
+    Returns:
+        types.ModuleType: 實際模組或 LazyModule 代理
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    with _lock:
+        proxy = _lazy_modules.get(name)
+        if proxy is None:
+            proxy = _lazy_modules[name] = LazyModule(name)
+        return proxy
+
+
+def modules_available(*names: str) -> bool:
+    """檢查模組是否已安裝（只查找模組，不導入）
+
+    已安裝但自身依賴缺失的模組（如缺少 TensorFlow 的 basic_pitch）仍返回True，
+    這類錯誤在首次使用時以 ImportError 的形式出現。
+
+    Args:
+        names: 模組名稱
+
+    Returns:
+        bool: 全部模組都能找到時為True
+    """
+    for name in names:
+        if name in sys.modules:
+            continue
+        try:
+            if importlib.util.find_spec(name) is None:
+                return False
+        except (ImportError, ValueError):
+            return False
+    return True
+
+
+def lazy_import_stats() -> Dict[str, Any]:
+    """延遲導入的統計信息
+
+    Returns:
+        Dict[str, Any]: 尚未導入的模組、已導入模組及其耗時（毫秒）
+    """
+    with _lock:
+        deferred = sorted(name for name, proxy in _lazy_modules.items() if not proxy.loaded)
+        loaded = {name: round(seconds * 1000, 1) for name, seconds in sorted(_load_times.items())}
+    return {
+        "deferred": deferred,
+        "loaded_ms": loaded,
+        "total_load_ms": round(sum(loaded.values()), 1)
+    }
+
+
+class LazyService:
+    """首次使用時才建立的服務代理
+
+    取代模組載入時直接建立服務實例的寫法。建立失敗時記錄警告，代理的布爾值為False，
+    與原先失敗時將服務設為None的行為一致。
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: str):
+        """初始化
+
+        Args:
+            factory: 建立服務實例的函數，可以在函數內導入服務所在的模組
+            name: 服務名稱（用於日誌與狀態）
+        """
+        self._factory = factory
+        self._name = name
+        self._instance = None
+        self._error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[Any]:
+        """取得服務實例，首次調用時建立
+
+        Returns:
+            Optional[Any]: 服務實例，建立失敗時為None
+        """
+        if self._instance is not None or self._error is not None:
+            return self._instance
+
+        with self._lock:
+            if self._instance is None and self._error is None:
+                start = time.perf_counter()
+                try:
+                    self._instance = self._factory()
+                    logger.info(f"{self._name} 初始化成功，耗時 {time.perf_counter() - start:.2f} 秒")
+                except Exception as e:
+                    self._error = str(e)
+                    logger.warning(f"{self._name} 初始化失敗: {str(e)}")
+                    logger.warning(f"{self._name} 相關功能將不可用")
+        return self._instance
+
+    async def ready(self) -> bool:
+        """在工作線程中建立服務（避免首次導入阻塞事件循環），返回服務是否可用"""
+        if self.status() == "deferred":
+            await asyncio.to_thread(self.get)
+        return self._instance is not None
+
+    def status(self) -> str:
+        """服務狀態："deferred"（尚未建立）、"ready" 或 "failed" """
+        if self._instance is not None:
+            return "ready"
+        return "failed" if self._error is not None else "deferred"
+
+    def __bool__(self) -> bool:
+        return self.get() is not None
+
+    def __getattr__(self, name: str) -> Any:
+        instance = self.get()
+        if instance is None:
+            raise RuntimeError(f"{self._name} 不可用: {self._error}")
+        return getattr(instance, name)
+
+    def __repr__(self) -> str:
+        return f"<LazyService {self._name} ({self.status()})>"
+
+
+@dataclass(frozen=True)
+class ImportCost:
+    """單個模組的導入耗時"""
+    module: str
+    # 模組自身的耗時（不含其導入的子模組）
+    self_seconds: float
+    # 含子模組的總耗時
+    cumulative_seconds: float
+    # 導入嵌套深度（0 為頂層）
+    depth: int
+
+
+@dataclass
+class ImportProfile:
+    """一次冷啟動導入的分析結果"""
+    module: str
+    # 子進程從啟動到退出的牆鐘時間（含解釋器啟動）
+    wall_seconds: float
+    returncode: int
+    costs: List[ImportCost] = field(default_factory=list)
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+    def heaviest(self, top: int = 20, top_level_only: bool = True) -> List[ImportCost]:
+        """耗時最多的模組
+
+        Args:
+            top: 返回的數量
+            top_level_only: 只統計頂層套件（子模組計入所屬套件的累計耗時）
+
+        Returns:
+            List[ImportCost]: 按累計耗時從高到低排列
+        """
+        costs = self.costs
+        if top_level_only:
+            costs = [cost for cost in costs if "." not in cost.module]
+        return sorted(costs, key=lambda cost: cost.cumulative_seconds, reverse=True)[:top]
+
+
+def parse_importtime(output: str) -> List[ImportCost]:
+    """解析 `python -X importtime` 寫入 stderr 的輸出
+
+    Args:
+        output: stderr 內容
+
+    Returns:
+        List[ImportCost]: 按導入完成順序排列的耗時
+    """
+    costs = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            costs.append(ImportCost(
+                module=module,
+                self_seconds=int(self_us) / 1e6,
+                cumulative_seconds=int(cumulative_us) / 1e6,
+                depth=max(len(indent) - 1, 0) // 2
+            ))
+    return costs
+
+
+def profile_imports(module: str,
+                    python: Optional[str] = None,
+                    cwd: Optional[str] = None,
+                    timeout: float = 300.0) -> ImportProfile:
+    """在新的解釋器中導入模組並記錄各模組的導入耗時
+
+    Args:
+        module: 要導入的模組，例如 "backend.main"
+        python: 解釋器路徑，默認為當前解釋器
+        cwd: 子進程的工作目錄
+        timeout: 超時（秒）
+
+    Returns:
+        ImportProfile: 分析結果；導入失敗時 error 為最後一行錯誤信息
+    """
+    command = [python or sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True, timeout=timeout)
+    wall = time.perf_counter() - start
+
+    error = ""
+    if completed.returncode != 0:
+        lines = [line for line in completed.stderr.splitlines()
+                 if line.strip() and not line.startswith("import time:")]
+        error = lines[-1] if lines else f"退出碼 {completed.returncode}"
+    return ImportProfile(module, wall, completed.returncode, parse_importtime(completed.stderr), error)
+
+
+def format_import_report(profile: ImportProfile, top: int = 20) -> str:
+    """將導入分析結果格式化為文字報告
+
+    Args:
+        profile: 分析結果
+        top: 列出的模組數
+
+    Returns:
+        str: 報告
+    """
+    lines = [f"導入 {profile.module}：{profile.wall_seconds:.2f} 秒（含解釋器啟動）"]
+    if not profile.ok:
+        lines.append(f"導入失敗：{profile.error}")
+    lines.append(f"{'模組':<40}{'累計(ms)':>12}{'自身(ms)':>12}")
+    for cost in profile.heaviest(top):
+        lines.append(f"{cost.module[:38]:<40}{cost.cumulative_seconds * 1000:>12.1f}{cost.self_seconds * 1000:>12.1f}")
+    return "\n".join(lines)
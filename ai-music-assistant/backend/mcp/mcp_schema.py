@@ -239,6 +239,14 @@ class MCPCommand(BaseModel):
         None,
         description="音樂參數"
     )
+    model: Optional[str] = Field(
+        None,
+        description="指定使用的模型，為空時使用默認模型"
+    )
+    seed: Optional[int] = Field(
+        None,
+        description="隨機種子，指定後相同請求的生成結果可重現"
+    )
     status: CommandStatus = Field(
         default=CommandStatus.PENDING,
         description="命令狀態"
@@ -281,4 +289,62 @@ class MCPResponse(BaseModel):
     error: Optional[str] = Field(
         None,
         description="錯誤信息"
-    ) 
\ No newline at end of file
+    )
+
+# 單個批次請求最多包含的命令數
+MAX_BATCH_COMMANDS = 100
+
+class BatchCommandRequest(BaseModel):
+    """批次命令請求模型"""
+    commands: List[MCPCommand] = Field(
+        ...,
+        description="命令列表（每個命令都會分配新的命令ID）",
+        min_length=1,
+        max_length=MAX_BATCH_COMMANDS
+    )
+
+class BatchCommandItem(BaseModel):
+    """批次中單個命令的提交結果"""
+    index: int = Field(
+        ...,
+        description="命令在請求中的位置"
+    )
+    command_id: str = Field(
+        ...,
+        description="命令ID"
+    )
+    shared_with: str = Field(
+        ...,
+        description="實際執行的命令ID，與其他相同命令共用結果時為該命令的ID"
+    )
+    deduplicated: bool = Field(
+        False,
+        description="是否與批次中的其他命令合併執行"
+    )
+    status: CommandStatus = Field(
+        default=CommandStatus.PENDING,
+        description="命令狀態"
+    )
+
+class BatchCommandResponse(BaseModel):
+    """批次命令響應模型"""
+    batch_id: str = Field(
+        ...,
+        description="批次ID，可用於查詢批次進度"
+    )
+    total: int = Field(
+        ...,
+        description="命令總數"
+    )
+    unique: int = Field(
+        ...,
+        description="去重後實際執行的命令數"
+    )
+    commands: List[BatchCommandItem] = Field(
+        ...,
+        description="各命令的提交結果"
+    )
+    created_at: datetime = Field(
+        default_factory=datetime.now,
+        description="創建時間"
+    )
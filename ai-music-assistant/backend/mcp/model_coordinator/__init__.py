@@ -3,9 +3,12 @@
 提供協調模型和工作流程的功能
 """
 
-from .coordinator import ModelCoordinator
+from .coordinator import ModelCoordinator, get_coordinator, reset_coordinator
 from .workflow import TextToMusicWorkflow
-from .music_generator import MusicGenerator
+from .executor import WorkflowExecutor, ExecutorPoolConfig
+from .batch import BatchGroup, plan_batch, command_fingerprint
+from .generation_cache import GenerationCache, GenerationOutcome, ReusePolicy
+from .music_generator import MusicGenerator, shutdown_track_pool
 from .score_generator import ScoreGenerator
 from .analysis import MusicAnalysis
 from .logger import setup_logger
@@ -14,8 +17,19 @@ from .utils import save_command, get_command
 
 __all__ = [
     'ModelCoordinator',
+    'get_coordinator',
+    'reset_coordinator',
     'TextToMusicWorkflow',
+    'WorkflowExecutor',
+    'ExecutorPoolConfig',
+    'BatchGroup',
+    'plan_batch',
+    'command_fingerprint',
+    'GenerationCache',
+    'GenerationOutcome',
+    'ReusePolicy',
     'MusicGenerator',
+    'shutdown_track_pool',
     'ScoreGenerator',
     'MusicAnalysis',
     'setup_logger',
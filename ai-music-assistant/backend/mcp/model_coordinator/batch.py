@@ -0,0 +1,91 @@
+"""批次命令規劃
+
+將批次中的命令按規範化後的內容分組：內容相同的命令只執行一次（組長），
+其餘成員共用組長的結果。
+"""
+
+import json
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from ..mcp_schema import MCPCommand
+
+logger = logging.getLogger(__name__)
+
+# 不影響命令結果的字段，規範化時忽略
+VOLATILE_FIELDS = {
+    "command_id", "status", "result", "error", "created_at", "updated_at", "completed_at"
+}
+
+
+def _normalize(value: Any) -> Any:
+    """遞歸規範化：折疊文字中的空白，移除空值"""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def canonical_command(command: MCPCommand) -> Dict[str, Any]:
+    """獲取命令的規範化內容
+
+    Args:
+        command: 命令
+
+    Returns:
+        Dict[str, Any]: 只包含影響結果的字段，枚舉已轉換為值
+    """
+    data = command.model_dump(mode="json", exclude=VOLATILE_FIELDS)
+    return _normalize(data)
+
+
+def command_fingerprint(command: MCPCommand) -> str:
+    """計算命令規範化內容的哈希，內容相同的命令具有相同的指紋"""
+    payload = json.dumps(canonical_command(command), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class BatchGroup:
+    """內容相同的一組命令"""
+    fingerprint: str
+    command_type: str
+    leader_id: str
+    # (請求中的位置, 命令ID)
+    members: List[Tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def follower_ids(self) -> List[str]:
+        """共用組長結果的其他命令ID"""
+        return [command_id for _, command_id in self.members if command_id != self.leader_id]
+
+
+def plan_batch(commands: List[MCPCommand], command_ids: List[str]) -> List[BatchGroup]:
+    """將批次命令分組
+
+    Args:
+        commands: 命令列表
+        command_ids: 為各命令分配的ID
+
+    Returns:
+        List[BatchGroup]: 按首次出現順序排列的命令組
+    """
+    if len(commands) != len(command_ids):
+        raise ValueError("命令數與命令ID數不一致")
+
+    groups: Dict[str, BatchGroup] = {}
+    for index, (command, command_id) in enumerate(zip(commands, command_ids)):
+        fingerprint = command_fingerprint(command)
+        group = groups.get(fingerprint)
+        if group is None:
+            group = BatchGroup(fingerprint, command.type, command_id)
+            groups[fingerprint] = group
+        group.members.append((index, command_id))
+
+    logger.info(f"批次共 {len(commands)} 個命令，去重後 {len(groups)} 個")
+    return list(groups.values())
@@ -6,6 +6,7 @@
 import os
 import logging
 from pathlib import Path
+from typing import Any
 
 # 嘗試導入pydantic，如果不可用則使用簡單替代模型
 try:
@@ -27,6 +28,9 @@ except ImportError:
 
 class Config(BaseModel):
     """配置類"""
+    # 保留自定義配置（如 storage、executor 等分組字典）
+    model_config = {"extra": "allow"}
+    
     # 基本路徑
     base_dir: str = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
     
@@ -57,5 +61,27 @@ class Config(BaseModel):
         """創建必要的目錄"""
         for dir_path in [self.temp_dir, self.log_dir, self.font_dir, self.soundfont_dir]:
             os.makedirs(dir_path, exist_ok=True)
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """獲取配置值
+        
+        Args:
+            key: 配置鍵，可以使用點號分隔的路徑，如 "storage.db_path"
+            default: 默認值，如果配置不存在則返回
+            
+        Returns:
+            配置值
+        """
+        value: Any = self
+        for part in key.split("."):
+            if isinstance(value, dict):
+                if part not in value:
+                    return default
+                value = value[part]
+            elif hasattr(value, part):
+                value = getattr(value, part)
+            else:
+                return default
+        return value
 
 __all__ = ['Config'] 
\ No newline at end of file
@@ -3,58 +3,203 @@
 負責協調各個組件的工作
 """
 
+import time
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+import threading
+from typing import Dict, Any, Iterable, Optional, Set
 from datetime import datetime
 
 from ..mcp_schema import MCPCommand, CommandStatus
-from .workflow import TextToMusicWorkflow
-from .exceptions import CommandProcessingError
-from .utils import save_command
+from .workflow import WORKFLOW_HANDLERS, run_workflow
+from .executor import WorkflowExecutor
+from .exceptions import CommandProcessingError, TaskCancelledError
 
 logger = logging.getLogger(__name__)
 
+# 進程內共享的協調器實例
+_coordinator: Optional["ModelCoordinator"] = None
+_coordinator_lock = threading.Lock()
+
+
 class ModelCoordinator:
     """模型協調器類"""
     
-    def __init__(self):
-        """初始化協調器"""
-        self.workflows = {
-            "text_to_music": TextToMusicWorkflow()
+    def __init__(self, executor: Optional[WorkflowExecutor] = None):
+        """初始化協調器
+        
+        Args:
+            executor: 工作流程執行器，默認使用默認配置建立
+        """
+        start_time = time.perf_counter()
+        
+        # CPU密集的工作流程在執行池中運行，不阻塞事件循環
+        self.executor = executor or WorkflowExecutor()
+        
+        # 處理中的命令 -> 等待執行結果的asyncio任務，用於取消
+        self.active_commands: Dict[str, asyncio.Task] = {}
+        self._cancel_requested: Set[str] = set()
+        
+        # 構建與預熱耗時（秒）
+        self.construction_time = time.perf_counter() - start_time
+        self.warm_up_times: Dict[str, float] = {}
+        self.created_at = datetime.now()
+        
+        logger.info(f"模型協調器初始化完成，耗時 {self.construction_time * 1000:.1f}ms")
+    
+    def warm_up(self, workflow_names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """預熱工作流程，讓第一個請求不必承擔模型載入的開銷
+        
+        工作流程在執行池的工作進程中運行，只在 API 進程中導入模組沒有作用；
+        預熱即預先啟動工作流程的執行池，各工作進程啟動時由 initializer 完成預熱。
+        會阻塞調用線程。
+        
+        Args:
+            workflow_names: 要預熱的工作流程，默認為全部
+            
+        Returns:
+            工作流程名稱 -> 預熱耗時（秒）
+        """
+        names = list(workflow_names) if workflow_names is not None else list(WORKFLOW_HANDLERS)
+        for name in names:
+            if name not in WORKFLOW_HANDLERS:
+                logger.warning(f"跳過未知的工作流程預熱: {name}")
+                continue
+            
+            start_time = time.perf_counter()
+            try:
+                self.executor.start_workers([name])
+            except Exception as e:
+                logger.warning(f"預熱工作流程 {name} 失敗: {str(e)}")
+                continue
+            self.warm_up_times[name] = time.perf_counter() - start_time
+            logger.info(f"工作流程 {name} 預熱完成，耗時 {self.warm_up_times[name] * 1000:.1f}ms")
+        
+        return dict(self.warm_up_times)
+    
+    def metrics(self) -> Dict[str, Any]:
+        """獲取協調器指標
+        
+        Returns:
+            構建耗時、預熱耗時與處理中的命令數
+        """
+        return {
+            "construction_time_ms": self.construction_time * 1000,
+            "warm_up_time_ms": {
+                name: seconds * 1000 for name, seconds in self.warm_up_times.items()
+            },
+            "workflows": list(WORKFLOW_HANDLERS),
+            "active_commands": len(self.active_commands),
+            "executor": self.executor.stats(),
+            "created_at": self.created_at.isoformat()
         }
+    
+    def cancel_command(self, command_id: str) -> bool:
+        """取消處理中的命令
+        
+        Args:
+            command_id: 命令ID
+            
+        Returns:
+            是否找到並取消了對應的任務
+        """
+        found = self.executor.cancel(command_id)
+        
+        task = self.active_commands.get(command_id)
+        if task is not None and not task.done():
+            self._cancel_requested.add(command_id)
+            task.cancel()
+            found = True
+        return found
+    
+    def shutdown(self) -> None:
+        """關閉執行池"""
+        self.executor.shutdown()
         
-    async def process_command(self, command: MCPCommand) -> None:
+    async def process_command(self, command: MCPCommand, command_id: Optional[str] = None) -> Dict[str, Any]:
         """處理命令
         
+        只更新命令對象的狀態，持久化由調用方的指令存儲負責。
+        
         Args:
             command: 要處理的命令
+            command_id: 命令ID，默認使用 command.command_id
+            
+        Returns:
+            工作流程的處理結果
+            
+        Raises:
+            TaskCancelledError: 命令被取消
+            CommandProcessingError: 命令處理失敗
         """
+        command_id = command_id or command.command_id
+        
         try:
-            logger.info(f"開始處理指令 {command.command_id} 類型: {command.command_type}")
+            command_type = command.type
+            logger.info(f"開始處理指令 {command_id} 類型: {command_type}")
             
-            # 獲取對應的工作流程
-            workflow = self.workflows.get(command.command_type)
-            if not workflow:
+            if command_type not in WORKFLOW_HANDLERS:
                 raise CommandProcessingError(
-                    command.command_id,
-                    f"不支持的命令類型: {command.command_type}"
+                    command_id,
+                    f"不支持的命令類型: {command_type}"
                 )
             
-            # 執行工作流程
-            result = await workflow.execute(command)
+            # 在執行池中運行工作流程；用獨立的任務等待結果，取消時不影響調用方的任務
+            run_task = asyncio.ensure_future(
+                self.executor.run(command_id, command_type, run_workflow, command_type, command)
+            )
+            self.active_commands[command_id] = run_task
+            try:
+                result = await run_task
+            except asyncio.CancelledError:
+                if command_id not in self._cancel_requested:
+                    raise
+                raise TaskCancelledError(command_id)
             
             # 更新命令狀態
             command.status = CommandStatus.COMPLETED
             command.completed_at = datetime.now()
             command.result = result
+            return result
             
-            # 保存命令
-            save_command(command)
+        except TaskCancelledError as e:
+            logger.info(str(e))
+            command.status = CommandStatus.CANCELLED
+            command.completed_at = datetime.now()
+            raise
             
         except Exception as e:
             logger.error(f"處理命令時發生錯誤: {str(e)}")
             command.status = CommandStatus.FAILED
             command.error = str(e)
             command.completed_at = datetime.now()
-            save_command(command)
-            raise CommandProcessingError(command.command_id, str(e)) 
\ No newline at end of file
+            raise CommandProcessingError(command.command_id, str(e))
+        finally:
+            self.active_commands.pop(command_id, None)
+            self._cancel_requested.discard(command_id)
+
+
+def get_coordinator(executor: Optional[WorkflowExecutor] = None) -> ModelCoordinator:
+    """獲取進程內共享的協調器，首次調用時建立
+    
+    Args:
+        executor: 首次建立時使用的工作流程執行器
+    
+    Returns:
+        協調器實例
+    """
+    global _coordinator
+    if _coordinator is None:
+        with _coordinator_lock:
+            if _coordinator is None:
+                _coordinator = ModelCoordinator(executor)
+    return _coordinator
+
+
+def reset_coordinator() -> None:
+    """丟棄共享的協調器，下次調用 get_coordinator 時重新建立"""
+    global _coordinator
+    with _coordinator_lock:
+        if _coordinator is not None:
+            _coordinator.shutdown()
+        _coordinator = None
@@ -44,4 +44,22 @@ class SoundFontNotFoundError(MCPError):
 class AudioConversionError(MCPError):
     """音頻轉換異常"""
     def __init__(self, message: str):
-        super().__init__(f"轉換音頻時發生錯誤: {message}") 
\ No newline at end of file
+        super().__init__(f"轉換音頻時發生錯誤: {message}")
+
+class ExecutorSaturatedError(MCPError):
+    """執行器已滿異常"""
+    def __init__(self, command_type: str, limit: int):
+        self.command_type = command_type
+        self.limit = limit
+        super().__init__(f"{command_type} 的待處理任務已達上限 ({limit})，請稍後重試")
+
+class TaskTimeoutError(MCPError):
+    """任務超時異常"""
+    def __init__(self, command_id: str, timeout: float):
+        self.timeout = timeout
+        super().__init__(f"命令 {command_id} 執行超過 {timeout} 秒")
+
+class TaskCancelledError(MCPError):
+    """任務已取消異常"""
+    def __init__(self, command_id: str):
+        super().__init__(f"命令 {command_id} 已被取消")
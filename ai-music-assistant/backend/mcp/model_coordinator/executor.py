@@ -0,0 +1,315 @@
+"""工作流程執行器模組
+
+將CPU密集的工作流程從事件循環分派到按命令類型配置的進程池或線程池，
+並提供有界隊列、背壓、超時與取消
+"""
+
+import os
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Set, Tuple, Union
+
+from .exceptions import ExecutorSaturatedError, TaskTimeoutError, TaskCancelledError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ExecutorPoolConfig:
+    """單一命令類型的執行池配置"""
+    # "process" 使用獨立進程（不受GIL限制），"thread" 使用線程
+    kind: str = "process"
+    # 同時執行的任務數
+    max_workers: int = 2
+    # 等待執行的任務上限，超過時拒絕新任務
+    max_queue: int = 8
+    # 單個任務的超時秒數，None 表示不限制
+    timeout: Optional[float] = 300.0
+
+    @property
+    def capacity(self) -> int:
+        """執行中與排隊中任務的總上限"""
+        return self.max_workers + self.max_queue
+
+
+# 默認配置：生成與轉錄都是CPU密集型，放到進程池中
+DEFAULT_POOL_CONFIGS: Dict[str, ExecutorPoolConfig] = {
+    "text_to_music": ExecutorPoolConfig(kind="process", max_workers=2, max_queue=8, timeout=300.0),
+    "audio_to_music": ExecutorPoolConfig(kind="process", max_workers=1, max_queue=4, timeout=600.0),
+}
+
+
+def _worker_ready() -> int:
+    """預熱時提交到工作進程的空任務，返回進程ID"""
+    return os.getpid()
+
+
+class WorkflowExecutor:
+    """工作流程執行器類
+
+    每個命令類型有獨立的執行池和名額。名額在接受請求時預留（reserve），
+    在池中的任務真正結束時釋放，因此已超時或被取消但仍在工作進程中運行的任務
+    也會佔用名額，直到它結束為止。
+    """
+
+    def __init__(
+        self,
+        pool_configs: Optional[Mapping[str, Union[ExecutorPoolConfig, Dict[str, Any]]]] = None,
+        default_config: Optional[ExecutorPoolConfig] = None,
+        initializer: Optional[Callable[..., None]] = None,
+        initargs: Tuple[Any, ...] = ()
+    ):
+        """初始化執行器
+
+        Args:
+            pool_configs: 命令類型 -> 執行池配置，會覆蓋默認配置
+            default_config: 未配置的命令類型使用的配置
+            initializer: 每個工作進程（或線程）啟動時調用的函數，使用進程池時必須可pickle
+            initargs: initializer 的參數
+        """
+        self.pool_configs: Dict[str, ExecutorPoolConfig] = dict(DEFAULT_POOL_CONFIGS)
+        for command_type, config in (pool_configs or {}).items():
+            if isinstance(config, dict):
+                config = ExecutorPoolConfig(**config)
+            self.pool_configs[command_type] = config
+        self.default_config = default_config or ExecutorPoolConfig(kind="thread")
+        self.initializer = initializer
+        self.initargs = tuple(initargs)
+
+        self._pools: Dict[str, Executor] = {}
+        self._lock = threading.RLock()
+
+        # command_id -> command_type，已預留名額的命令
+        self._reserved: Dict[str, str] = {}
+        # command_id -> 已提交到池中的任務
+        self._futures: Dict[str, Future] = {}
+        # 在提交前就被取消的命令
+        self._cancelled: Set[str] = set()
+
+        self.submitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    def config_for(self, command_type: str) -> ExecutorPoolConfig:
+        """獲取命令類型的執行池配置
+
+        Args:
+            command_type: 命令類型
+
+        Returns:
+            執行池配置
+        """
+        return self.pool_configs.get(command_type, self.default_config)
+
+    def _get_pool(self, command_type: str) -> Executor:
+        """獲取（必要時建立）命令類型對應的執行池"""
+        pool = self._pools.get(command_type)
+        if pool is not None:
+            return pool
+
+        config = self.config_for(command_type)
+        with self._lock:
+            pool = self._pools.get(command_type)
+            if pool is None:
+                if config.kind == "process":
+                    # 使用 spawn，避免在帶有工作線程的進程中 fork
+                    pool = ProcessPoolExecutor(
+                        max_workers=config.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=self.initializer,
+                        initargs=self.initargs
+                    )
+                elif config.kind == "thread":
+                    pool = ThreadPoolExecutor(
+                        max_workers=config.max_workers,
+                        thread_name_prefix=f"workflow-{command_type}",
+                        initializer=self.initializer,
+                        initargs=self.initargs
+                    )
+                else:
+                    raise ValueError(f"不支持的執行池類型: {config.kind}")
+                self._pools[command_type] = pool
+        return pool
+
+    def start_workers(self, command_types: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """預先啟動進程池的全部工作進程
+
+        進程池按需啟動工作進程，首個請求要承擔啟動進程、導入模組與 initializer
+        的開銷。此方法向每個進程池提交與工作進程數相同的空任務並等待完成，
+        讓各工作進程在接受請求前就已啟動並完成初始化。會阻塞調用線程。
+
+        Args:
+            command_types: 要啟動的命令類型，默認為全部已配置的類型
+
+        Returns:
+            命令類型 -> 已啟動的工作進程數
+        """
+        started = {}
+        for command_type in (command_types if command_types is not None else list(self.pool_configs)):
+            config = self.config_for(command_type)
+            if config.kind != "process":
+                continue
+            pool = self._get_pool(command_type)
+            # 前一個空任務完成前沒有空閒進程，每次提交都會啟動一個新進程
+            futures = [pool.submit(_worker_ready) for _ in range(config.max_workers)]
+            started[command_type] = len({future.result() for future in futures})
+            logger.info(f"{command_type} 執行池已啟動 {started[command_type]} 個工作進程")
+        return started
+
+    def _in_use(self, command_type: str) -> int:
+        """命令類型已佔用的名額數"""
+        return sum(1 for reserved_type in self._reserved.values() if reserved_type == command_type)
+
+    def reserve(self, command_id: str, command_type: str) -> None:
+        """為命令預留名額，應在接受請求時調用
+
+        Args:
+            command_id: 命令ID
+            command_type: 命令類型
+
+        Raises:
+            ExecutorSaturatedError: 執行中與排隊中的任務已達上限
+        """
+        config = self.config_for(command_type)
+        with self._lock:
+            if command_id in self._reserved:
+                return
+            if self._in_use(command_type) >= config.capacity:
+                self.rejected += 1
+                raise ExecutorSaturatedError(command_type, config.capacity)
+            self._reserved[command_id] = command_type
+
+    def release(self, command_id: str) -> None:
+        """釋放尚未提交到池中的預留名額
+
+        已提交的任務在結束時自動釋放名額，此方法對它們無效。
+
+        Args:
+            command_id: 命令ID
+        """
+        with self._lock:
+            if command_id not in self._futures:
+                self._reserved.pop(command_id, None)
+                self._cancelled.discard(command_id)
+
+    def _finish(self, command_id: str):
+        """池中的任務結束後釋放名額"""
+        with self._lock:
+            self._futures.pop(command_id, None)
+            self._reserved.pop(command_id, None)
+            self._cancelled.discard(command_id)
+
+    async def run(self, command_id: str, command_type: str, func: Callable[..., Any], *args: Any) -> Any:
+        """在命令類型對應的執行池中運行函數
+
+        Args:
+            command_id: 命令ID
+            command_type: 命令類型
+            func: 要執行的函數；使用進程池時必須是可pickle的模塊級函數
+            *args: 函數參數
+
+        Returns:
+            函數返回值
+
+        Raises:
+            ExecutorSaturatedError: 未預留名額且執行池已滿
+            TaskTimeoutError: 執行超時
+            TaskCancelledError: 命令在提交前已被取消
+        """
+        self.reserve(command_id, command_type)
+        config = self.config_for(command_type)
+
+        with self._lock:
+            if command_id in self._cancelled:
+                submit = False
+            else:
+                future = self._get_pool(command_type).submit(func, *args)
+                self._futures[command_id] = future
+                self.submitted += 1
+                submit = True
+
+        if not submit:
+            self.release(command_id)
+            raise TaskCancelledError(command_id)
+
+        future.add_done_callback(lambda _: self._finish(command_id))
+
+        try:
+            # 取消或超時會同時取消池中尚未開始的任務
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=config.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning(f"命令 {command_id} 執行超時 ({config.timeout}秒)")
+            raise TaskTimeoutError(command_id, config.timeout)
+
+    def cancel(self, command_id: str) -> bool:
+        """取消命令
+
+        排隊中的任務會直接從池中移除；已開始執行的任務無法中斷，
+        其結果會被丟棄（由等待方的 asyncio 任務取消負責）。
+
+        Args:
+            command_id: 命令ID
+
+        Returns:
+            是否找到了該命令
+        """
+        with self._lock:
+            future = self._futures.get(command_id)
+            if future is None:
+                if command_id not in self._reserved:
+                    return False
+                self._cancelled.add(command_id)
+                self.cancelled += 1
+                return True
+
+        if future.cancel():
+            self.cancelled += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """獲取執行器統計
+
+        Returns:
+            各命令類型的名額使用情況與累計計數
+        """
+        with self._lock:
+            in_use: Dict[str, int] = {}
+            for command_type in self._reserved.values():
+                in_use[command_type] = in_use.get(command_type, 0) + 1
+            running = sum(1 for future in self._futures.values() if future.running())
+
+        pools = {}
+        for command_type in set(self.pool_configs) | set(in_use):
+            config = self.config_for(command_type)
+            pools[command_type] = {
+                "kind": config.kind,
+                "max_workers": config.max_workers,
+                "capacity": config.capacity,
+                "in_use": in_use.get(command_type, 0)
+            }
+
+        return {
+            "pools": pools,
+            "running": running,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled
+        }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """關閉所有執行池並取消排隊中的任務
+
+        Args:
+            wait: 是否等待執行中的任務結束
+        """
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.shutdown(wait=wait, cancel_futures=True)
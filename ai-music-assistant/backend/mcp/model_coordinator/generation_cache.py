@@ -0,0 +1,216 @@
+"""生成結果緩存
+
+以命令規範化內容的哈希（命令類型、參數、文字、模型與隨機種子）為鍵緩存生成結果，
+內容相同的請求直接重用已完成的結果；同一時間內容相同的進行中請求合併為一次執行。
+是否允許重用由 ReusePolicy 按命令類型決定。
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ..mcp_schema import MCPCommand, CommandStatus
+from .batch import command_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# 重用模式
+REUSE_ALWAYS = "always"    # 結果足夠確定，總是重用
+REUSE_SEEDED = "seeded"    # 只有指定了隨機種子時才重用
+REUSE_NEVER = "never"      # 不重用
+
+REUSE_MODES = (REUSE_ALWAYS, REUSE_SEEDED, REUSE_NEVER)
+
+# 默認重用策略：生成類命令在指定種子時可重現，其餘類型不重用
+DEFAULT_REUSE_MODES = {
+    "text_to_music": REUSE_SEEDED,
+    "audio_to_music": REUSE_SEEDED,
+}
+
+# 結果來源
+SOURCE_EXECUTED = "executed"
+SOURCE_CACHE = "cache"
+SOURCE_COALESCED = "coalesced"
+
+
+class ReusePolicy:
+    """生成結果重用策略"""
+
+    def __init__(self, modes: Optional[Dict[str, str]] = None, default_mode: str = REUSE_NEVER):
+        """初始化
+
+        Args:
+            modes: 命令類型到重用模式的映射，未列出的類型使用 default_mode
+            default_mode: 默認重用模式
+        """
+        modes = {**DEFAULT_REUSE_MODES, **(modes or {})}
+        for mode in (*modes.values(), default_mode):
+            if mode not in REUSE_MODES:
+                raise ValueError(f"未知的重用模式: {mode}")
+        self.modes = modes
+        self.default_mode = default_mode
+
+    def mode_for(self, command_type: str) -> str:
+        """獲取命令類型的重用模式"""
+        return self.modes.get(command_type, self.default_mode)
+
+    def is_reusable(self, command: MCPCommand) -> bool:
+        """判斷命令的結果是否可以重用
+
+        Args:
+            command: 命令
+
+        Returns:
+            bool: 相同內容的命令可以共用結果時返回True
+        """
+        mode = self.mode_for(command.type)
+        if mode == REUSE_ALWAYS:
+            return True
+        if mode == REUSE_SEEDED:
+            return command.seed is not None
+        return False
+
+
+@dataclass
+class GenerationOutcome:
+    """命令的執行結果及其來源"""
+    status: CommandStatus
+    data: Dict[str, Any]
+    # SOURCE_EXECUTED / SOURCE_CACHE / SOURCE_COALESCED
+    source: str
+    # 實際執行該內容的命令ID（來自緩存時為寫入緩存的命令）
+    origin_id: Optional[str] = None
+
+    @property
+    def reused(self) -> bool:
+        """結果是否來自其他命令"""
+        return self.source != SOURCE_EXECUTED
+
+
+class GenerationCache:
+    """生成結果緩存類
+
+    只緩存成功完成的結果。進行中的請求以 asyncio.Future 登記，內容相同的後續請求
+    等待同一個 Future 而不重複執行；執行失敗時等待者共用失敗結果，執行者被取消時
+    等待者各自重新執行。
+    """
+
+    def __init__(self, cache: Any, policy: Optional[ReusePolicy] = None, ttl: Optional[int] = None):
+        """初始化
+
+        Args:
+            cache: 持久化緩存（CacheService）
+            policy: 重用策略
+            ttl: 結果的過期時間（秒），為None時使用緩存的默認值
+        """
+        self.cache = cache
+        self.policy = policy or ReusePolicy()
+        self.ttl = ttl
+
+        # 內容鍵 -> (執行者命令ID, 等待結果的 Future)
+        self._in_flight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bypassed = 0
+        self.stores = 0
+
+    def key_for(self, command: MCPCommand) -> Optional[str]:
+        """獲取命令的內容鍵，不可重用的命令返回None"""
+        if not self.policy.is_reusable(command):
+            return None
+        return command_fingerprint(command)
+
+    async def run(
+        self,
+        command_id: str,
+        command: MCPCommand,
+        execute: Callable[[], Awaitable[Tuple[CommandStatus, Dict[str, Any]]]]
+    ) -> GenerationOutcome:
+        """執行命令，可重用時先查詢緩存並合併相同的進行中請求
+
+        Args:
+            command_id: 命令ID
+            command: 命令
+            execute: 實際執行命令的協程函數，返回 (最終狀態, 結果數據)
+
+        Returns:
+            GenerationOutcome: 執行結果及其來源
+        """
+        key = self.key_for(command)
+        if key is None:
+            self.bypassed += 1
+            status, data = await execute()
+            return GenerationOutcome(status, data, SOURCE_EXECUTED, command_id)
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            leader_id, future = in_flight
+            try:
+                status, data = await asyncio.shield(future)
+                self.coalesced += 1
+                logger.info(f"指令 {command_id} 與進行中的指令 {leader_id} 內容相同，共用結果")
+                return GenerationOutcome(status, data, SOURCE_COALESCED, leader_id)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # 執行者被取消，重新嘗試（可能成為新的執行者）
+                return await self.run(command_id, command, execute)
+
+        # 先登記再查詢緩存，避免查詢期間到達的相同請求重複執行
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (command_id, future)
+        try:
+            cached = await self.cache.get(key)
+            if cached.success:
+                self.hits += 1
+                origin_id = cached.data.get("origin_id")
+                outcome = GenerationOutcome(CommandStatus.COMPLETED, cached.data["data"], SOURCE_CACHE, origin_id)
+                future.set_result((outcome.status, outcome.data))
+                logger.info(f"指令 {command_id} 命中生成結果緩存（來自 {origin_id}）")
+                return outcome
+
+            self.misses += 1
+            status, data = await execute()
+            if status == CommandStatus.CANCELLED:
+                # 執行者被用戶取消，等待者各自重新執行
+                future.cancel()
+                return GenerationOutcome(status, data, SOURCE_EXECUTED, command_id)
+            if status == CommandStatus.COMPLETED:
+                stored = await self.cache.set(key, {"origin_id": command_id, "data": data}, self.ttl)
+                if stored.success:
+                    self.stores += 1
+            future.set_result((status, data))
+            return GenerationOutcome(status, data, SOURCE_EXECUTED, command_id)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 沒有等待者時避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            if self._in_flight.get(key, (None, None))[1] is future:
+                del self._in_flight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """獲取緩存統計
+
+        Returns:
+            Dict[str, Any]: 命中、合併、未命中與略過次數，以及重用率
+        """
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "in_flight": len(self._in_flight),
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "policy": {"modes": dict(self.policy.modes), "default": self.policy.default_mode},
+            "storage": self.cache.stats()
+        }
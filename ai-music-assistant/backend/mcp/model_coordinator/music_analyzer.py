@@ -1,9 +1,15 @@
 import logging
 from typing import Dict, List, Any
-from music21 import stream, key, chord, meter, analysis, converter
 import tempfile
 import os
 
+from ..lazy_import import lazy_import
+
+# music21 導入耗時，延遲到首次分析時才導入
+converter = lazy_import("music21.converter")
+meter = lazy_import("music21.meter")
+chord = lazy_import("music21.chord")
+
 logger = logging.getLogger(__name__)
 
 class MusicAnalyzer:
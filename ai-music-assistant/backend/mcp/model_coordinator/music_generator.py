@@ -1,13 +1,24 @@
 """音樂生成器
 
 實現音樂生成的核心邏輯
+
+生成分兩步：先規劃整首曲子共用的和聲骨架（和弦進行、小節數、拍號），再按骨架
+逐軌生成音符事件。各音軌只依賴骨架與自己的隨機種子，因此可以在進程池中並行生成，
+按音軌順序合併後的結果與順序生成完全相同。
 """
 
+import os
 import logging
 import json
-from typing import Dict, Any, List, Optional, Union
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple, Union
 from ..mcp_schema import MusicParameters
-from midiutil import MIDIFile
+from ..note_array import NoteArray
+from ..smf_writer import SMFTrack, encode_smf
 import io
 from .style_manager import StyleManager, PlayingStyle, RhythmPattern
 import random
@@ -17,11 +28,163 @@ import time
 
 logger = logging.getLogger(__name__)
 
+# 默認生成參數
+DEFAULT_TEMPO = 120
+DEFAULT_KEY = "C"
+DEFAULT_INSTRUMENTS = ["piano", "bass", "drums"]
+DEFAULT_COMPLEXITY = 3
+DEFAULT_TIME_SIGNATURE = "4/4"
+
+# 音軌數上限（古典風格擴展樂器組合時使用）
+MAX_TRACKS = 12
+
+# 音符事件：(通道, 音高, 開始拍, 時值拍數, 力度)
+NoteEvent = Tuple[int, int, float, float, int]
+
+
+@dataclass(frozen=True)
+class HarmonicSkeleton:
+    """整首曲子共用的和聲骨架，各音軌只依賴它與自己的種子生成"""
+    key: str
+    genre: str
+    total_bars: int
+    beats_per_bar: int
+    complexity: float
+    mood: str
+    style: str
+    # 和弦名稱進行，例如 ("C", "G", "Am", "F")，按小節循環
+    progression: Tuple[str, ...]
+    # 每個和弦的MIDI音高
+    chords: Tuple[Tuple[int, ...], ...]
+    # 整首曲子的隨機種子，各音軌的種子由它與音軌號導出
+    seed: int
+
+
+@dataclass(frozen=True)
+class TrackPlan:
+    """單個音軌的生成任務"""
+    index: int
+    instrument: str
+    program: int
+    # 生成方法名稱，例如 "_generate_melody"
+    method: str
+    # 是否為對位旋律（只用於旋律生成）
+    counter_melody: bool = False
+
+
+def track_seed(seed: int, index: int) -> int:
+    """由整首曲子的種子與音軌號導出音軌的種子
+
+    Args:
+        seed: 整首曲子的種子
+        index: 音軌號
+
+    Returns:
+        int: 音軌種子
+    """
+    return random.Random(f"{seed}:{index}").getrandbits(32)
+
+
+class TrackEvents:
+    """單個音軌的音符事件記錄
+
+    接口與 midiutil 的 MIDIFile.addNote 相同，生成方法可以直接寫入，
+    之後按音軌順序編碼為 MIDI 文件。
+    """
+
+    def __init__(self):
+        self.notes: List[NoteEvent] = []
+
+    def addNote(self, track: int, channel: int, pitch: int, time: float, duration: float,
+                volume: int, annotation: Any = None):
+        self.notes.append((channel, pitch, time, duration, volume))
+
+
+def events_to_track(events: List[NoteEvent], program: int, name: Optional[str] = None) -> SMFTrack:
+    """將一個音軌的音符事件轉換為 SMF 音軌（音軌的通道取第一個事件的通道）
+
+    Args:
+        events: 音符事件
+        program: General MIDI 程序號
+        name: 音軌名稱
+
+    Returns:
+        SMFTrack: SMF 音軌
+    """
+    if not events:
+        return SMFTrack(NoteArray.empty(), program=program, name=name)
+    channels, pitches, starts, durations, velocities = zip(*events)
+    return SMFTrack(NoteArray(pitches, starts, durations, velocities),
+                    channel=channels[0], program=program, name=name)
+
+
+# 進程共享的音軌生成進程池
+_track_pool: Optional[ProcessPoolExecutor] = None
+_track_pool_lock = threading.Lock()
+
+# 工作進程內的生成器實例（每個進程建立一次）
+_worker_generator: Optional['MusicGenerator'] = None
+
+
+def get_track_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """獲取（必要時建立）音軌生成進程池
+
+    Args:
+        max_workers: 首次建立時的工作進程數，默認為CPU核數（最多 MAX_TRACKS）
+
+    Returns:
+        ProcessPoolExecutor: 進程池
+    """
+    global _track_pool
+    with _track_pool_lock:
+        if _track_pool is None:
+            workers = max_workers or min(os.cpu_count() or 1, MAX_TRACKS)
+            # 使用 spawn，避免在帶有工作線程的進程中 fork
+            _track_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _track_pool
+
+
+def shutdown_track_pool():
+    """關閉音軌生成進程池"""
+    global _track_pool
+    with _track_pool_lock:
+        if _track_pool is not None:
+            _track_pool.shutdown(wait=True)
+            _track_pool = None
+
+
+def _generate_track_in_worker(skeleton: HarmonicSkeleton, plan: TrackPlan) -> List[NoteEvent]:
+    """在工作進程中生成單個音軌的音符事件"""
+    global _worker_generator
+    if _worker_generator is None:
+        _worker_generator = MusicGenerator()
+    return _worker_generator.generate_track(skeleton, plan)
+
+
 class MusicGenerator:
     """音樂生成器類"""
     
-    def __init__(self):
-        """初始化音樂生成器"""
+    def __init__(self, parallel_tracks: bool = False, max_workers: Optional[int] = None):
+        """初始化音樂生成器
+
+        Args:
+            parallel_tracks: 是否默認在進程池中並行生成各音軌
+            max_workers: 音軌生成進程池的工作進程數
+        """
+        self.parallel_tracks = parallel_tracks
+        self.max_workers = max_workers
+
+        # 生成音軌時使用的隨機數生成器，每個音軌按自己的種子重建
+        self.rng = random.Random()
+        # 當前生成所依據的和聲骨架
+        self.skeleton: Optional[HarmonicSkeleton] = None
+        self.beats_per_bar = 4
+        # 骨架中各和弦的MIDI音高，供旋律與低音使用
+        self.chord_progression: List[List[int]] = []
+
         # 音符到MIDI音高的映射
         self.note_to_midi = {
             'C': 60, 'C#': 61, 'Db': 61, 'D': 62, 'D#': 63, 'Eb': 63,
@@ -85,11 +248,12 @@ class MusicGenerator:
         base_note = self.note_to_midi[note_name]
         return base_note + (octave - 4) * 12
     
-    def generate_music(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    def generate_music(self, parameters: Dict[str, Any], parallel: Optional[bool] = None) -> Dict[str, Any]:
         """根據參數生成音樂
         
         Args:
-            parameters: 音樂參數
+            parameters: 音樂參數，可包含 seed 以得到可重現的結果
+            parallel: 是否在進程池中並行生成各音軌，默認使用初始化時的設置
             
         Returns:
             Dict: 包含MIDI數據的字典
@@ -117,6 +281,13 @@ class MusicGenerator:
             mood = parameters.get("mood", "neutral").lower()
             style = parameters.get("style", "normal").lower()
             time_signature = parameters.get("time_signature", DEFAULT_TIME_SIGNATURE)
+            # 複製樂器列表，擴展樂器組合時不修改調用方的參數
+            instruments = list(parameters.get("instruments") or DEFAULT_INSTRUMENTS)
+            
+            # 未指定種子時隨機選擇，並在分析結果中返回以便重現
+            seed = parameters.get("seed")
+            if seed is None:
+                seed = random.randrange(2 ** 32)
             
             # 確保持續時間至少3分鐘
             duration = max(180, parameters.get("duration", 180))
@@ -142,8 +313,7 @@ class MusicGenerator:
                 genre = genre.value
             
             # 處理列表中的枚舉類型
-            if instruments and isinstance(instruments, list):
-                instruments = [i.value if hasattr(i, 'value') else i for i in instruments]
+            instruments = [i.value if hasattr(i, 'value') else i for i in instruments]
             
             logger.info(f"開始生成音樂，參數: tempo={tempo}, key={key}, genre={genre}, instruments={instruments}")
             
@@ -154,7 +324,7 @@ class MusicGenerator:
                 base_tracks = max(4, track_count)  # 至少4個音軌
                 # 複雜度影響音軌數量
                 complexity_factor = 1 + (complexity * 0.5)  # 複雜度為5時增加2.5倍
-                target_tracks = min(12, int(base_tracks * complexity_factor))  # 最多12個音軌
+                target_tracks = min(MAX_TRACKS, int(base_tracks * complexity_factor))  # 最多12個音軌
                 
                 # 如果需要擴展現有樂器列表
                 if track_count < target_tracks:
@@ -193,60 +363,19 @@ class MusicGenerator:
             # 更新音軌數量
             track_count = len(instruments)
             
-            # 創建MIDI文件
-            midi = MIDIFile(track_count)
+            # 規劃共用的和聲骨架，再按骨架生成各音軌
+            skeleton = self.plan_skeleton(key, genre, total_bars, beats_per_bar, complexity, mood, style, seed)
+            plans = self.plan_tracks(instruments, genre)
+            if parallel is None:
+                parallel = self.parallel_tracks
+            track_events = self._generate_tracks(skeleton, plans, parallel)
             
-            # 設置速度
-            for i in range(track_count):
-                midi.addTempo(i, 0, tempo)
-            
-            # 計算小節數（假設4/4拍）
-            beats_per_bar = 4
-            beats_per_minute = tempo
-            total_beats = (duration * beats_per_minute) / 60
-            total_bars = int(total_beats / beats_per_bar)
-            
-            # 設置樂器
-            for i, instrument in enumerate(instruments):
-                # 將文字樂器名轉換為General MIDI程序號
-                program = self._instrument_name_to_program(instrument)
-                midi.addProgramChange(i, 0, 0, program)
-                
-                # 生成音樂
-                # 根據樂器和風格選擇適合的生成方法
-                if instrument in ['drums', 'percussion']:
-                    self._generate_percussion(midi, i, total_bars, key, genre, complexity, mood, style)
-                elif instrument in ['bass', 'double_bass', 'synth_bass']:
-                    self._generate_bass_line(midi, i, total_bars, key, genre, complexity, mood, style)
-                elif instrument in ['piano', 'keyboard', 'synth']:
-                    # 決定鋼琴是旋律還是和弦功能
-                    if i == 0 or (genre == 'classical' and i == 1):  # 第一軌通常是主旋律
-                        self._generate_melody(midi, i, total_bars, key, genre, complexity, mood, style)
-                    else:
-                        self._generate_chord_accompaniment(midi, i, total_bars, key, genre, complexity, mood, style)
-                elif instrument in ['violin', 'flute', 'trumpet', 'saxophone', 'synth_lead']:
-                    # 首席樂器通常負責旋律
-                    if i <= 2:  # 前兩軌可以是不同旋律
-                        self._generate_melody(midi, i, total_bars, key, genre, complexity, mood, style, 
-                                              is_counter_melody=(i > 0))  # 第二個旋律是對位
-                    else:
-                        # 其他樂器提供和聲支持
-                        self._generate_harmony_support(midi, i, total_bars, key, genre, complexity, mood, style)
-                elif instrument in ['viola', 'cello', 'french_horn', 'trombone']:
-                    # 中音域樂器通常提供和聲或對位
-                    self._generate_harmony_support(midi, i, total_bars, key, genre, complexity, mood, style)
-                elif instrument in ['harp', 'pad', 'strings', 'synth_pad']:
-                    # 這些樂器常用於提供和弦背景
-                    self._generate_chord_accompaniment(midi, i, total_bars, key, genre, complexity, mood, style)
-                elif instrument in ['arpeggio', 'synth_arp']:
-                    # 分解和弦
-                    self._generate_arpeggios(midi, i, total_bars, key, genre, complexity, mood, style)
-                else:
-                    # 默認生成方法
-                    self._generate_music_by_style(midi, i, total_bars, key, genre, complexity, mood, style)
-            
-            # 轉換為MIDI數據
-            midi_data = self._midi_to_bytes(midi)
+            # 按音軌順序合併事件並編碼為MIDI數據
+            tracks = [events_to_track(events, plan.program, plan.instrument)
+                      for plan, events in zip(plans, track_events)]
+            midi_data = encode_smf(tracks, tempo=tempo, time_signature=time_signature)
+            logger.info(f"音樂生成完成，{track_count} 個音軌，耗時 {time.time() - start_time:.2f} 秒"
+                        f"（{'並行' if parallel else '順序'}生成）")
             
             # 分析生成的音樂
             analysis = {
@@ -257,7 +386,9 @@ class MusicGenerator:
                 "track_count": track_count,
                 "instruments": instruments,
                 "complexity": complexity,
-                "mood": mood
+                "mood": mood,
+                "chord_progression": list(skeleton.progression),
+                "seed": seed
             }
             
             return {
@@ -269,6 +400,153 @@ class MusicGenerator:
             logger.error(f"生成音樂時發生錯誤: {str(e)}", exc_info=True)
             raise
 
+    def plan_skeleton(self, key: str, genre: str, total_bars: int, beats_per_bar: int,
+                      complexity: float, mood: str, style: str, seed: int) -> HarmonicSkeleton:
+        """規劃整首曲子共用的和聲骨架
+
+        Args:
+            key: 調性
+            genre: 風格
+            total_bars: 總小節數
+            beats_per_bar: 每小節拍數
+            complexity: 複雜度 (0-1)
+            mood: 情緒
+            style: 演奏風格
+            seed: 隨機種子
+
+        Returns:
+            HarmonicSkeleton: 和聲骨架
+        """
+        self.skeleton = None
+        self.rng = random.Random(seed)
+        progression = self._get_harmony_progression(key, genre)
+        key_scale = self.key_to_scale.get(key, self.key_to_scale["C"])
+        chords = tuple(tuple(self._get_chord_notes(chord, key_scale)) for chord in progression)
+        return HarmonicSkeleton(
+            key=key,
+            genre=genre,
+            total_bars=total_bars,
+            beats_per_bar=beats_per_bar,
+            complexity=complexity,
+            mood=mood,
+            style=style,
+            progression=tuple(progression),
+            chords=chords,
+            seed=seed
+        )
+
+    def plan_tracks(self, instruments: List[str], genre: str) -> List[TrackPlan]:
+        """根據樂器和風格決定各音軌的生成方法
+
+        Args:
+            instruments: 樂器列表，順序即音軌順序
+            genre: 風格
+
+        Returns:
+            List[TrackPlan]: 各音軌的生成任務
+        """
+        plans = []
+        for i, instrument in enumerate(instruments):
+            counter_melody = False
+            if instrument in ['drums', 'percussion']:
+                method = '_generate_percussion'
+            elif instrument in ['bass', 'double_bass', 'synth_bass']:
+                method = '_generate_bass_line'
+            elif instrument in ['piano', 'keyboard', 'synth']:
+                # 決定鋼琴是旋律還是和弦功能
+                if i == 0 or (genre == 'classical' and i == 1):  # 第一軌通常是主旋律
+                    method = '_generate_melody'
+                else:
+                    method = '_generate_chord_accompaniment'
+            elif instrument in ['violin', 'flute', 'trumpet', 'saxophone', 'synth_lead']:
+                # 首席樂器通常負責旋律
+                if i <= 2:  # 前兩軌可以是不同旋律
+                    method = '_generate_melody'
+                    counter_melody = i > 0  # 第二個旋律是對位
+                else:
+                    # 其他樂器提供和聲支持
+                    method = '_generate_harmony_support'
+            elif instrument in ['viola', 'cello', 'french_horn', 'trombone']:
+                # 中音域樂器通常提供和聲或對位
+                method = '_generate_harmony_support'
+            elif instrument in ['harp', 'pad', 'strings', 'synth_pad']:
+                # 這些樂器常用於提供和弦背景
+                method = '_generate_chord_accompaniment'
+            elif instrument in ['arpeggio', 'synth_arp']:
+                # 分解和弦
+                method = '_generate_arpeggios'
+            else:
+                # 默認生成方法
+                method = '_generate_music_by_style'
+            
+            # 將文字樂器名轉換為General MIDI程序號
+            program = self._instrument_name_to_program(instrument)
+            plans.append(TrackPlan(i, instrument, program, method, counter_melody))
+        return plans
+
+    def generate_track(self, skeleton: HarmonicSkeleton, plan: TrackPlan) -> List[NoteEvent]:
+        """按和聲骨架生成單個音軌的音符事件
+
+        結果只取決於骨架與音軌種子，在哪個進程中生成都相同。
+
+        Args:
+            skeleton: 和聲骨架
+            plan: 音軌生成任務
+
+        Returns:
+            List[NoteEvent]: 按生成順序排列的音符事件
+        """
+        self.skeleton = skeleton
+        self.beats_per_bar = skeleton.beats_per_bar
+        self.chord_progression = [list(chord) for chord in skeleton.chords]
+        self.rng = random.Random(track_seed(skeleton.seed, plan.index))
+        
+        events = TrackEvents()
+        generate = getattr(self, plan.method)
+        options = {"is_counter_melody": True} if plan.counter_melody else {}
+        try:
+            generate(events, plan.index, skeleton.total_bars, skeleton.key, skeleton.genre,
+                     skeleton.complexity, skeleton.mood, skeleton.style, **options)
+        finally:
+            self.skeleton = None
+        return events.notes
+
+    def _generate_tracks(self, skeleton: HarmonicSkeleton, plans: List[TrackPlan],
+                         parallel: bool) -> List[List[NoteEvent]]:
+        """生成全部音軌的音符事件，結果按音軌順序排列
+
+        Args:
+            skeleton: 和聲骨架
+            plans: 各音軌的生成任務
+            parallel: 是否在進程池中並行生成
+
+        Returns:
+            List[List[NoteEvent]]: 各音軌的音符事件
+        """
+        if parallel and len(plans) > 1:
+            try:
+                pool = get_track_pool(self.max_workers)
+                futures = [pool.submit(_generate_track_in_worker, skeleton, plan) for plan in plans]
+                return [future.result() for future in futures]
+            except BrokenProcessPool as e:
+                # 種子只取決於骨架與音軌號，順序重新生成的結果相同
+                logger.warning(f"音軌生成進程池不可用，改為順序生成: {str(e)}")
+                shutdown_track_pool()
+        return [self.generate_track(skeleton, plan) for plan in plans]
+
+    def _get_scale_for_key(self, key: str) -> List[int]:
+        """獲取調性音階的MIDI音高
+
+        Args:
+            key: 調性
+
+        Returns:
+            List[int]: 中音區的音階MIDI音高
+        """
+        key_root = key.split("_")[0] if "_" in key else key
+        scale = self.key_to_scale.get(key_root, self.key_to_scale["C"])
+        return [self.note_to_midi_number(note + "4") for note in scale]
+
     def _instrument_name_to_program(self, instrument_name: str) -> int:
         """將樂器名稱轉換為General MIDI程序號
         
@@ -415,7 +693,7 @@ class MusicGenerator:
         # 返回默認值 (大鋼琴) 如果未找到匹配
         return instrument_map.get(instrument_name.lower(), 0)
 
-    def _generate_harmony_support(self, midi: MIDIFile, track: int, total_bars: int, key: str, 
+    def _generate_harmony_support(self, midi: TrackEvents, track: int, total_bars: int, key: str, 
                                  genre: str, complexity: float, mood: str, style: str):
         """生成和聲支持音軌
         
@@ -468,24 +746,24 @@ class MusicGenerator:
             for i in range(notes_per_bar):
                 # 選擇和弦音
                 if middle_chord_notes:
-                    note = random.choice(middle_chord_notes)
+                    note = self.rng.choice(middle_chord_notes)
                     
                     # 稍微變化音高以增加多樣性，但仍保持在和弦內
-                    if random.random() < complexity * 0.3:
+                    if self.rng.random() < complexity * 0.3:
                         note_options = [n for n in middle_chord_notes if abs(n - note) <= 7]
                         if note_options:
-                            note = random.choice(note_options)
+                            note = self.rng.choice(note_options)
                     
                     # 隨機調整音符時長
                     note_duration = duration_per_note
-                    if random.random() < complexity * 0.4:
-                        note_duration *= random.choice([0.5, 0.75, 1.0, 1.5])
+                    if self.rng.random() < complexity * 0.4:
+                        note_duration *= self.rng.choice([0.5, 0.75, 1.0, 1.5])
                     
                     # 限制在一個小節內
                     note_duration = min(note_duration, bar_length - (i * (bar_length / notes_per_bar)))
                     
                     # 添加力度變化
-                    velocity = random.randint(60, 90)
+                    velocity = self.rng.randint(60, 90)
                     if genre == "classical":
                         # 古典音樂通常有更多的力度變化
                         velocity = self._dynamic_curve(bar, total_bars, base=70, amplitude=20)
@@ -497,7 +775,7 @@ class MusicGenerator:
             # 更新當前時間
             current_time += bar_length
 
-    def _generate_arpeggios(self, midi: MIDIFile, track: int, total_bars: int, key: str, 
+    def _generate_arpeggios(self, midi: TrackEvents, track: int, total_bars: int, key: str, 
                            genre: str, complexity: float, mood: str, style: str):
         """生成分解和弦
         
@@ -576,15 +854,15 @@ class MusicGenerator:
                 note = chord_notes[chord_idx]
                 
                 # 加入八度變化以增加豐富性
-                if random.random() < complexity * 0.2:
-                    octave_shift = random.choice([-12, 0, 12])
+                if self.rng.random() < complexity * 0.2:
+                    octave_shift = self.rng.choice([-12, 0, 12])
                     note += octave_shift
                 
                 # 限制音符在合理範圍內
                 note = max(36, min(96, note))
                 
                 # 添加力度變化
-                velocity = random.randint(70, 100)
+                velocity = self.rng.randint(70, 100)
                 
                 # 添加音符
                 start_time = current_time + (i * duration_per_note)
@@ -633,6 +911,10 @@ class MusicGenerator:
         Returns:
             List[str]: 和弦進行列表
         """
+        # 按骨架生成時所有音軌共用骨架中的和弦進行
+        if self.skeleton is not None:
+            return list(self.skeleton.progression)
+        
         # 基本的和弦進行模板
         progressions = {
             "classical": [
@@ -667,7 +949,7 @@ class MusicGenerator:
         style_progressions = progressions.get(genre, progressions["pop"])
         
         # 隨機選擇一個進行
-        selected_progression = random.choice(style_progressions)
+        selected_progression = self.rng.choice(style_progressions)
         
         # 根據調性和和弦進行生成完整和弦
         key_root = key.split("_")[0] if "_" in key else key  # 從類似"C_MAJOR"提取"C"
@@ -783,7 +1065,7 @@ class MusicGenerator:
 
     def _generate_music_by_style(
         self, 
-        midi: MIDIFile, 
+        midi: TrackEvents, 
         track: int, 
         total_bars: int, 
         key: str, 
@@ -870,7 +1152,7 @@ class MusicGenerator:
             time = bar * 4.0  # 假設每小節4拍
             
             # 獲取和弦音符
-            chord_notes = self._get_chord_notes(chord, self.key_to_scale[key])
+            chord_notes = self._get_chord_notes(chord, self.key_to_scale.get(key, self.key_to_scale["C"]))
             
             # 添加和弦音符
             for note in chord_notes:
@@ -881,14 +1163,14 @@ class MusicGenerator:
             if complexity > 0.7:
                 # 添加一些裝飾音
                 for note in chord_notes:
-                    if random.random() < 0.3:  # 30% 的機率添加裝飾音
-                        decoration_time = time + random.random() * duration
+                    if self.rng.random() < 0.3:  # 30% 的機率添加裝飾音
+                        decoration_time = time + self.rng.random() * duration
                         decoration_duration = duration * 0.25
                         if note + 2 <= 127:  # 確保音符在有效範圍內
                             midi.addNote(track, 0, note + 2, decoration_time, 
                                        decoration_duration, int(velocity * 0.8))
 
-    def _generate_piano(self, midi: MIDIFile, track: int, total_bars: int, key: str):
+    def _generate_piano(self, midi: TrackEvents, track: int, total_bars: int, key: str):
         """生成鋼琴部分
         
         Args:
@@ -937,7 +1219,7 @@ class MusicGenerator:
             logger.error(f"生成鋼琴部分時發生錯誤: {str(e)}", exc_info=True)
             raise
 
-    def _generate_strings(self, midi: MIDIFile, track: int, total_bars: int, key: str):
+    def _generate_strings(self, midi: TrackEvents, track: int, total_bars: int, key: str):
         """生成弦樂部分
         
         Args:
@@ -964,7 +1246,7 @@ class MusicGenerator:
             for note in chord_notes:
                 midi.addNote(track, 0, note, bar * 4, beats_per_chord, 48)
 
-    def _generate_guitar(self, midi: MIDIFile, track: int, total_bars: int, key: str):
+    def _generate_guitar(self, midi: TrackEvents, track: int, total_bars: int, key: str):
         """生成吉他部分
         
         Args:
@@ -991,7 +1273,7 @@ class MusicGenerator:
             for i, note in enumerate(chord_notes):
                 midi.addNote(track, 0, note, bar * 4 + i, 1, 64)
 
-    def _generate_bass(self, midi: MIDIFile, track: int, total_bars: int, key: str):
+    def _generate_bass(self, midi: TrackEvents, track: int, total_bars: int, key: str):
         """生成貝斯部分
         
         Args:
@@ -1017,7 +1299,7 @@ class MusicGenerator:
             # 添加根音
             midi.addNote(track, 0, root_note - 24, bar * 4, beats_per_chord, 80)
 
-    def _generate_drums(self, midi: MIDIFile, track: int, total_bars: int):
+    def _generate_drums(self, midi: TrackEvents, track: int, total_bars: int):
         """生成鼓組部分
         
         Args:
@@ -1044,12 +1326,12 @@ class MusicGenerator:
             for beat in range(4):
                 midi.addNote(track, 9, hihat, bar * 4 + beat, 1, 60)
 
-    def _generate_melody(self, midi: MIDIFile, track: int, total_bars: int, key: str, 
+    def _generate_melody(self, midi: TrackEvents, track: int, total_bars: int, key: str, 
                         genre: str, complexity: float, mood: str, style: str, is_counter_melody: bool = False):
         """生成旋律
         
         Args:
-            midi: MIDIFile對象
+            midi: TrackEvents對象
             track: 軌道編號
             total_bars: 總小節數
             key: 調性
@@ -1076,7 +1358,7 @@ class MusicGenerator:
         # 設置旋律基本參數
         register_offset = 0
         if is_counter_melody:
-            register_offset = -12 if random.random() < 0.7 else 12  # 對位旋律通常在不同音域
+            register_offset = -12 if self.rng.random() < 0.7 else 12  # 對位旋律通常在不同音域
         
         # 根據情緒調整音符力度
         velocity_base = 70  # 默認基礎力度
@@ -1099,8 +1381,8 @@ class MusicGenerator:
             
             # 為每個小節計算音符數量
             # 偶爾變化音符密度以創造更自然的旋律
-            if random.random() < 0.3:
-                note_count = max(2, note_density + random.randint(-2, 2))
+            if self.rng.random() < 0.3:
+                note_count = max(2, note_density + self.rng.randint(-2, 2))
             else:
                 note_count = note_density
             
@@ -1120,12 +1402,12 @@ class MusicGenerator:
             for i in range(note_count):
                 # 根據旋律連續性和和弦結構選擇下一個音符
                 # 70%的機率使用和弦音，30%使用音階上的其他音
-                if random.random() < 0.7:
+                if self.rng.random() < 0.7:
                     # 選擇和弦音
-                    pitch_class = random.choice(chord_tones)
+                    pitch_class = self.rng.choice(chord_tones)
                 else:
                     # 選擇音階上的音符
-                    scale_degree = random.randint(0, len(key_scale) - 1)
+                    scale_degree = self.rng.randint(0, len(key_scale) - 1)
                     pitch_class = key_scale[scale_degree] % 12
                 
                 # 決定最終音高(考慮八度)
@@ -1184,7 +1466,7 @@ class MusicGenerator:
         
         logger.info(f"旋律生成完成，共 {total_bars} 小節，音符數: ~{note_density * total_bars}")
     
-    def _generate_rhythm(self, midi: MIDIFile, track: int, rhythm_pattern: RhythmPattern,
+    def _generate_rhythm(self, midi: TrackEvents, track: int, rhythm_pattern: RhythmPattern,
                         playing_style: PlayingStyle, complexity: float):
         """生成節奏
         
@@ -1275,21 +1557,21 @@ class MusicGenerator:
                 # 每8小節添加一些變奏
                 if bar % 2 == 1 and complexity > 0.6:
                     # 添加一些隨機變奏
-                    if random.random() < 0.3:
+                    if self.rng.random() < 0.3:
                         # 隨機添加額外的鼓點
-                        rand_drum = random.choice(list(drum_notes.keys()))
-                        rand_time = time_point + random.choice([0.125, 0.25, 0.375])
+                        rand_drum = self.rng.choice(list(drum_notes.keys()))
+                        rand_time = time_point + self.rng.choice([0.125, 0.25, 0.375])
                         midi.addNote(
                             track, 0, 
                             drum_notes[rand_drum], 
                             rand_time, 
                             0.1, 
-                            70 + random.randint(-10, 10)
+                            70 + self.rng.randint(-10, 10)
                         )
         
         logger.info(f"節奏部分生成完成，節奏型態: {rhythm_pattern}，小節數: {num_bars}")
     
-    def _generate_pad(self, midi: MIDIFile, track: int, chord_progression: List[str],
+    def _generate_pad(self, midi: TrackEvents, track: int, chord_progression: List[str],
                      playing_style: PlayingStyle, complexity: float, scale: List[str], key: str):
         """生成襯底聲部
         
@@ -1370,7 +1652,7 @@ class MusicGenerator:
                     next_notes = chord_notes[next_chord]
                     
                     # 選擇一個過渡音符
-                    transition_note = random.choice(next_notes)
+                    transition_note = self.rng.choice(next_notes)
                     pitch = self.note_to_midi_number(transition_note)
                     
                     # 在和弦結束前稍早添加過渡音符
@@ -1451,7 +1733,7 @@ class MusicGenerator:
         
         return base_notes.get(root, 48)
 
-    def _add_chord(self, midi: MIDIFile, track: int, bar: int, key: str, chord: str, duration: float, velocity: int):
+    def _add_chord(self, midi: TrackEvents, track: int, bar: int, key: str, chord: str, duration: float, velocity: int):
         """添加和弦到 MIDI 文件
         
         Args:
@@ -1504,7 +1786,7 @@ class MusicGenerator:
             if note >= 0 and note <= 127:  # MIDI 音符範圍檢查
                 midi.addNote(track, 0, note, time, duration, velocity) 
 
-    def _generate_chord_accompaniment(self, midi: MIDIFile, track: int, total_bars: int, key: str, 
+    def _generate_chord_accompaniment(self, midi: TrackEvents, track: int, total_bars: int, key: str, 
                                genre: str, complexity: float, mood: str, style: str):
         """生成和弦伴奏
         
@@ -1586,12 +1868,12 @@ class MusicGenerator:
         
         logger.info(f"和弦伴奏生成完成，共 {total_bars} 小節")
 
-    def _generate_bass_line(self, midi: MIDIFile, track: int, total_bars: int, key: str, 
+    def _generate_bass_line(self, midi: TrackEvents, track: int, total_bars: int, key: str, 
                       genre: str, complexity: float, mood: str, style: str):
         """生成低音聲部
         
         Args:
-            midi: MIDIFile對象
+            midi: TrackEvents對象
             track: 軌道編號
             total_bars: 總小節數
             key: 調性
@@ -1641,15 +1923,15 @@ class MusicGenerator:
                     velocity = 80 + int(10 * complexity)  # 力度稍強
                 else:
                     # 隨機選擇和弦內音符或經過音
-                    if random.random() < 0.7:  # 70%機率使用和弦音
-                        chord_tone_idx = random.randint(0, len(chord) - 1)
+                    if self.rng.random() < 0.7:  # 70%機率使用和弦音
+                        chord_tone_idx = self.rng.randint(0, len(chord) - 1)
                         note = chord[chord_tone_idx]
                         # 確保在低音區域
                         while note >= 48:
                             note -= 12
                     else:  # 30%機率使用經過音
-                        note = bass_note + random.choice([1, 2, 3, 5, 7, 8, 10])
-                    velocity = 60 + random.randint(-10, 10)
+                        note = bass_note + self.rng.choice([1, 2, 3, 5, 7, 8, 10])
+                    velocity = 60 + self.rng.randint(-10, 10)
                 
                 # 根據情緒調整力度
                 if mood == "sad" or mood == "calm":
@@ -1666,7 +1948,7 @@ class MusicGenerator:
         
         logger.info(f"低音聲部生成完成，共 {total_bars} 小節")
 
-    def _generate_harmony_support(self, midi: MIDIFile, track: int, total_bars: int, key: str, 
+    def _generate_harmony_support(self, midi: TrackEvents, track: int, total_bars: int, key: str, 
                            genre: str, complexity: float, mood: str, style: str):
         """生成和聲支持聲部
         
@@ -1717,24 +1999,24 @@ class MusicGenerator:
             for i in range(notes_per_bar):
                 # 選擇和弦音
                 if middle_chord_notes:
-                    note = random.choice(middle_chord_notes)
+                    note = self.rng.choice(middle_chord_notes)
                     
                     # 稍微變化音高以增加多樣性，但仍保持在和弦內
-                    if random.random() < complexity * 0.3:
+                    if self.rng.random() < complexity * 0.3:
                         note_options = [n for n in middle_chord_notes if abs(n - note) <= 7]
                         if note_options:
-                            note = random.choice(note_options)
+                            note = self.rng.choice(note_options)
                     
                     # 隨機調整音符時長
                     note_duration = duration_per_note
-                    if random.random() < complexity * 0.4:
-                        note_duration *= random.choice([0.5, 0.75, 1.0, 1.5])
+                    if self.rng.random() < complexity * 0.4:
+                        note_duration *= self.rng.choice([0.5, 0.75, 1.0, 1.5])
                     
                     # 限制在一個小節內
                     note_duration = min(note_duration, bar_length - (i * (bar_length / notes_per_bar)))
                     
                     # 添加力度變化
-                    velocity = random.randint(60, 90)
+                    velocity = self.rng.randint(60, 90)
                     if genre == "classical":
                         # 古典音樂通常有更多的力度變化
                         velocity = self._dynamic_curve(bar, total_bars, base=70, amplitude=20)
@@ -1748,12 +2030,12 @@ class MusicGenerator:
         
         logger.info(f"和聲支持聲部生成完成，共 {total_bars} 小節")
 
-    def _generate_percussion(self, midi: MIDIFile, track: int, total_bars: int, key: str, 
+    def _generate_percussion(self, midi: TrackEvents, track: int, total_bars: int, key: str, 
                        genre: str, complexity: float, mood: str, style: str):
         """生成打擊樂聲部
         
         Args:
-            midi: MIDIFile對象
+            midi: TrackEvents對象
             track: 軌道編號
             total_bars: 總小節數
             key: 調性 (對打擊樂不太重要)
@@ -1794,64 +2076,36 @@ class MusicGenerator:
         # 生成所有小節的打擊樂
         for bar in range(total_bars):
             # 添加強拍的大鼓
-            if random.random() < 0.8:  # 80%機率
-                midi.addNote(track, 9, KICK, current_time, 0.2, base_velocity + random.randint(-10, 10))
+            if self.rng.random() < 0.8:  # 80%機率
+                midi.addNote(track, 9, KICK, current_time, 0.2, base_velocity + self.rng.randint(-10, 10))
             
             # 添加弱拍的小鼓 (通常在2、4拍)
             for beat in range(1, int(beats_per_bar), 2):  # 2、4拍...
-                if random.random() < 0.7:  # 70%機率
-                    midi.addNote(track, 9, SNARE, current_time + beat, 0.2, base_velocity + random.randint(-10, 10))
+                if self.rng.random() < 0.7:  # 70%機率
+                    midi.addNote(track, 9, SNARE, current_time + beat, 0.2, base_velocity + self.rng.randint(-10, 10))
             
             # 添加高帽 (更密集)
             for i in range(beat_density):
                 time = current_time + (bar_length * i / beat_density)
                 # 隨機選擇閉合或開放高帽
-                hat_type = CLOSED_HH if random.random() < 0.8 else OPEN_HH
+                hat_type = CLOSED_HH if self.rng.random() < 0.8 else OPEN_HH
                 # 隨機調整力度
-                velocity = base_velocity - 20 + random.randint(-10, 10)
+                velocity = base_velocity - 20 + self.rng.randint(-10, 10)
                 midi.addNote(track, 9, hat_type, time, 0.1, velocity)
             
             # 根據複雜度添加額外的打擊樂元素
             if complexity > 0.5:
                 # 偶爾添加強鈸
-                if bar % 8 == 0 or random.random() < 0.1:  # 每8小節或10%機率
+                if bar % 8 == 0 or self.rng.random() < 0.1:  # 每8小節或10%機率
                     midi.addNote(track, 9, CRASH, current_time, 0.3, base_velocity + 10)
                 
                 # 偶爾添加嗵鼓
-                if random.random() < 0.2 * complexity:  # 最高20%*complexity機率
-                    tom = random.choice([TOM_H, TOM_M, TOM_L])
-                    time = current_time + random.random() * bar_length
+                if self.rng.random() < 0.2 * complexity:  # 最高20%*complexity機率
+                    tom = self.rng.choice([TOM_H, TOM_M, TOM_L])
+                    time = current_time + self.rng.random() * bar_length
                     midi.addNote(track, 9, tom, time, 0.2, base_velocity)
             
             # 更新當前時間到下一小節
             current_time += bar_length
         
         logger.info(f"打擊樂聲部生成完成，共 {total_bars} 小節")
-
-    def _midi_to_bytes(self, midi: MIDIFile) -> bytes:
-        """將MIDI對象轉換為字節數據
-        
-        Args:
-            midi: MIDI文件對象
-            
-        Returns:
-            bytes: MIDI文件的字節數據
-        """
-        import io
-        
-        # 創建一個內存文件對象
-        midi_file = io.BytesIO()
-        
-        # 將MIDI數據寫入內存文件
-        midi.writeFile(midi_file)
-        
-        # 重置文件指針到開頭
-        midi_file.seek(0)
-        
-        # 讀取字節數據
-        midi_bytes = midi_file.read()
-        
-        # 關閉內存文件
-        midi_file.close()
-        
-        return midi_bytes
\ No newline at end of file
@@ -7,18 +7,21 @@ import logging
 import json
 import base64
 import os
-import tempfile
+import atexit
 import subprocess
 import time
+import importlib
 from typing import Dict, Any, List, Optional
 from abc import ABC, abstractmethod
 from datetime import datetime
 from ..mcp_schema import MCPCommand, MusicParameters, CommandStatus
-from .music_generator import MusicGenerator
+from .music_generator import MusicGenerator, shutdown_track_pool
 from .music_analyzer import MusicAnalyzer
 from .score_generator import ScoreGenerator
 from .exceptions import CommandProcessingError
 from .utils import save_command
+from ...rendering.synth import BatchSynthesizer
+from ...rendering.midi_renderer import MidiNote, parse_midi_notes, render_notes, encode_wav
 import numpy as np
 import random
 
@@ -43,7 +46,38 @@ class Workflow(ABC):
         """
         pass
 
-# 初始化音樂生成器
+# 生成與渲染時才導入的模組，預熱時提前載入
+WARM_UP_MODULES = ("reportlab.pdfgen.canvas", "reportlab.lib.pagesizes")
+
+def warm_up_modules() -> None:
+    """預先載入延遲導入的模組，避免首個請求承擔導入開銷"""
+    for module_name in WARM_UP_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except ImportError:
+            logger.debug(f"預熱時無法導入 {module_name}，略過")
+
+def init_worker(parallel_tracks: bool = False, track_workers: Optional[int] = None) -> None:
+    """執行池工作進程的初始化函數
+    
+    請求在執行池的工作進程中處理，只在主進程中預熱無法讓工作進程受益；
+    每個工作進程啟動時導入本模組（連同生成器、分析器與渲染器）並預先載入延遲導入的模組。
+    工作流程使用的音樂生成器也在工作進程中按配置建立，音軌進程池在工作進程退出時關閉。
+    
+    Args:
+        parallel_tracks: 是否在音軌進程池中並行生成各音軌
+        track_workers: 音軌生成進程池的工作進程數
+    """
+    global music_generator
+    start_time = time.perf_counter()
+    warm_up_modules()
+    music_generator = MusicGenerator(parallel_tracks=parallel_tracks, max_workers=track_workers)
+    # 線程池的每個線程都會調用本函數，先移除已註冊的關閉函數，避免重複註冊
+    atexit.unregister(shutdown_track_pool)
+    atexit.register(shutdown_track_pool)
+    logger.info(f"工作進程 {os.getpid()} 預熱完成，耗時 {(time.perf_counter() - start_time) * 1000:.1f}ms")
+
+# 初始化音樂生成器（執行池的工作進程由 init_worker 按配置重新建立）
 music_generator = MusicGenerator()
 
 # 初始化音樂分析器
@@ -52,6 +86,15 @@ music_analyzer = MusicAnalyzer()
 class SoundRenderer:
     """音頻渲染器"""
     
+    # 後備渲染的音頻參數
+    SAMPLE_RATE = 44100
+    DEFAULT_DURATION = 10.0
+    VOLUME = 0.5
+    
+    def __init__(self):
+        """初始化渲染器"""
+        self.synthesizer = BatchSynthesizer()
+    
     def render_midi_to_audio(self, midi_data: bytes) -> bytes:
         """將 MIDI 數據渲染為音頻數據
         
@@ -75,118 +118,44 @@ class SoundRenderer:
             except Exception as e:
                 logger.warning(f"無法顯示MIDI頭部: {str(e)}")
             
-            # 創建臨時目錄儲存文件
-            tmp_dir = tempfile.mkdtemp()
-            midi_path = os.path.join(tmp_dir, "temp.mid")
-            wav_path = os.path.join(tmp_dir, "output.wav")
-            
-            # 保存MIDI文件
-            with open(midi_path, 'wb') as f:
-                f.write(midi_data)
-            
-            # 使用 midiutil 生成音頻
+            # 解析 MIDI 事件並以 NumPy 合成音頻
             return self._generate_audio_from_midi(midi_data)
                 
         except Exception as e:
             logger.error(f"音頻渲染失敗: {str(e)}")
             return self._generate_audio_from_midi(midi_data)
-            
-        finally:
-            # 清理臨時文件
-            try:
-                if os.path.exists(midi_path):
-                    os.remove(midi_path)
-                if os.path.exists(wav_path):
-                    os.remove(wav_path)
-                os.rmdir(tmp_dir)
-            except Exception as e:
-                logger.warning(f"清理臨時文件失敗: {str(e)}")
                 
     def _generate_audio_from_midi(self, midi_data: bytes) -> bytes:
         """從 MIDI 數據生成音頻
         
+        解析 MIDI 事件得到帶時間的音符並以波表合成；無法解析或沒有音符時
+        以默認和弦生成一段音頻。
+        
         Args:
             midi_data: MIDI 數據
             
         Returns:
             bytes: WAV 格式的音頻數據
         """
-        import struct
-        import math
-        import random
-        from midiutil import MIDIFile
-        from io import BytesIO
-        
-        # 音頻參數
-        sample_rate = 44100  # 採樣率
-        duration = 10.0  # 持續時間
-        volume = 0.5  # 音量
-        
-        # 從 MIDI 數據中提取音符信息
-        midi_notes = []
+        notes = []
         if midi_data and len(midi_data) > 10:
             try:
-                midi_file = BytesIO(midi_data)
-                for i, track in enumerate(midi_file.readlines()):
-                    if track.startswith(b'MTrk'):
-                        for event in track[4:]:
-                            if event & 0x90 == 0x90:  # Note On 事件
-                                note = event & 0x7F
-                                midi_notes.append(note)
+                notes = parse_midi_notes(midi_data)
             except Exception as e:
                 logger.warning(f"無法解析MIDI數據: {str(e)}")
         
         # 如果沒有提取到音符，使用默認音符
-        if not midi_notes:
-            midi_notes = [60, 64, 67, 72]  # C大調和弦
+        if not notes:
+            notes = [
+                MidiNote(pitch, 0.0, self.DEFAULT_DURATION, 80)
+                for pitch in (60, 64, 67, 72)  # C大調和弦
+            ]
         
-        # 計算樣本數
-        num_samples = int(sample_rate * duration)
-        samples = []
+        audio = render_notes(notes, self.SAMPLE_RATE, self.synthesizer, peak=self.VOLUME)
+        wav = encode_wav(audio, self.SAMPLE_RATE)
         
-        # 生成音頻
-        for i in range(num_samples):
-            t = i / sample_rate
-            sample = 0.0
-            
-            # 為每個音符生成正弦波
-            for note in midi_notes:
-                freq = 440.0 * (2 ** ((note - 69) / 12.0))  # MIDI音符到頻率的轉換
-                sample += 0.25 * math.sin(2 * math.pi * freq * t)
-            
-            # 添加一些隨機變化使聲音更自然
-            sample += 0.05 * (random.random() * 2 - 1)
-            
-            # 應用音量並轉換為16位整數
-            sample = int(volume * sample * 32767)
-            samples.append(max(-32768, min(32767, sample)))
-        
-        # 生成WAV文件
-        wav = bytearray()
-        
-        # RIFF頭部
-        wav.extend(b'RIFF')
-        wav.extend(struct.pack('<I', 36 + len(samples) * 2))
-        wav.extend(b'WAVE')
-        
-        # fmt塊
-        wav.extend(b'fmt ')
-        wav.extend(struct.pack('<I', 16))
-        wav.extend(struct.pack('<H', 1))
-        wav.extend(struct.pack('<H', 1))
-        wav.extend(struct.pack('<I', sample_rate))
-        wav.extend(struct.pack('<I', sample_rate * 2))
-        wav.extend(struct.pack('<H', 2))
-        wav.extend(struct.pack('<H', 16))
-        
-        # data塊
-        wav.extend(b'data')
-        wav.extend(struct.pack('<I', len(samples) * 2))
-        for sample in samples:
-            wav.extend(struct.pack('<h', sample))
-        
-        logger.info(f"生成了音頻數據，時長: {duration}秒，大小: {len(wav)}字節")
-        return bytes(wav)
+        logger.info(f"生成了音頻數據，時長: {len(audio) / self.SAMPLE_RATE:.1f}秒，大小: {len(wav)}字節")
+        return wav
 
 # 使用音頻渲染器
 sound_renderer = SoundRenderer()
@@ -498,6 +467,26 @@ class TextToMusicWorkflow(Workflow):
         
         return params
 
+def generation_parameters(command: MCPCommand) -> Dict[str, Any]:
+    """獲取傳給音樂生成器的參數
+    
+    命令指定了隨機種子時合併到參數中，相同種子的命令生成相同的MIDI。
+    
+    Args:
+        command: MCP命令
+        
+    Returns:
+        Dict: 生成參數（不修改命令本身的參數）
+    """
+    parameters = command.parameters
+    if parameters is None:
+        parameters = {}
+    elif not isinstance(parameters, dict):
+        parameters = parameters.model_dump(mode="json", exclude_none=True)
+    if command.seed is not None:
+        parameters = {**parameters, "seed": command.seed}
+    return parameters
+
 def process_text_to_music(command: MCPCommand) -> Dict[str, Any]:
     """處理文本到音樂的轉換
     
@@ -562,7 +551,7 @@ def process_text_to_music(command: MCPCommand) -> Dict[str, Any]:
         
         # 生成音樂
         logger.info("開始生成音樂...")
-        music_data = music_generator.generate_music(command.parameters)
+        music_data = music_generator.generate_music(generation_parameters(command))
         if not music_data or "midi_data" not in music_data:
             logger.error("❌ 音樂生成失敗，返回的數據無效")
             raise ValueError("音樂生成失敗")
@@ -633,10 +622,10 @@ def process_audio_to_music(command: MCPCommand) -> Dict[str, Any]:
         Dict: 生成的音樂數據
     """
     try:
-        logger.info(f"執行音頻到音樂工作流程，輸入文字: {command.text}")
+        logger.info(f"執行音頻到音樂工作流程，輸入文字: {command.text_input}")
         
         # 使用音樂生成器生成音樂
-        music_data = music_generator.generate_music(command.parameters)
+        music_data = music_generator.generate_music(generation_parameters(command))
         
         # 渲染音頻
         audio_data = sound_renderer.render_midi_to_audio(music_data["midi_data"])
@@ -659,6 +648,27 @@ def process_audio_to_music(command: MCPCommand) -> Dict[str, Any]:
         logger.error(f"處理音頻到音樂轉換時發生錯誤: {str(e)}")
         raise 
 
+# 命令類型 -> 可在工作進程中執行的處理函數（必須是模塊級函數才能被pickle）
+WORKFLOW_HANDLERS = {
+    "text_to_music": process_text_to_music,
+    "audio_to_music": process_audio_to_music
+}
+
+def run_workflow(command_type: str, command: MCPCommand) -> Dict[str, Any]:
+    """執行命令類型對應的處理函數，供執行池調用
+    
+    Args:
+        command_type: 命令類型
+        command: MCP命令
+        
+    Returns:
+        Dict: 處理結果
+    """
+    handler = WORKFLOW_HANDLERS.get(command_type)
+    if handler is None:
+        raise ValueError(f"不支持的命令類型: {command_type}")
+    return handler(command)
+
 def generate_enhanced_test_audio(midi_data: bytes = None) -> bytes:
     """生成增強的測試音頻數據，根據MIDI數據特性
     
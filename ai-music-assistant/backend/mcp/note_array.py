@@ -0,0 +1,274 @@
+"""音符數組模組
+
+以結構化數組（音高、開始時間、持續時間、力度各為一個 NumPy 數組）表示一組音符，
+取代逐個音符的 Python 對象。分析與渲染的熱路徑直接對整個數組做向量化運算，
+只在與現有接口交互時才轉換為 Note 對象或字典。
+"""
+
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# MIDI 音高與力度範圍
+MIDI_PITCH_MIN = 0
+MIDI_PITCH_MAX = 127
+MIDI_VELOCITY_MIN = 1
+MIDI_VELOCITY_MAX = 127
+
+DEFAULT_VELOCITY = 64
+
+
+def _field(note: Any, name: str, default: Any = None) -> Any:
+    """讀取音符對象或字典的字段"""
+    if isinstance(note, dict):
+        return note.get(name, default)
+    return getattr(note, name, default)
+
+
+class NoteArray:
+    """音符數組類
+
+    所有數組長度相同，第 i 個音符由各數組的第 i 個元素組成。時間單位由使用者決定
+    （秒或拍），與來源的音符類型保持一致。
+    """
+
+    __slots__ = ("pitch", "start", "duration", "velocity")
+
+    def __init__(self,
+                 pitch: Sequence[int],
+                 start: Sequence[float],
+                 duration: Sequence[float],
+                 velocity: Optional[Sequence[int]] = None):
+        """初始化
+
+        Args:
+            pitch: MIDI 音高
+            start: 開始時間
+            duration: 持續時間
+            velocity: 力度，為None時全部使用默認力度
+        """
+        self.pitch = np.asarray(pitch, dtype=np.int16).reshape(-1)
+        self.start = np.asarray(start, dtype=np.float64).reshape(-1)
+        self.duration = np.asarray(duration, dtype=np.float64).reshape(-1)
+        if velocity is None:
+            self.velocity = np.full(len(self.pitch), DEFAULT_VELOCITY, dtype=np.int16)
+        else:
+            self.velocity = np.asarray(velocity, dtype=np.int16).reshape(-1)
+
+        lengths = {len(self.pitch), len(self.start), len(self.duration), len(self.velocity)}
+        if len(lengths) != 1:
+            raise ValueError("音高、開始時間、持續時間與力度數組的長度必須相同")
+
+    @classmethod
+    def empty(cls) -> 'NoteArray':
+        """建立空的音符數組"""
+        return cls([], [], [], [])
+
+    @classmethod
+    def from_notes(cls, notes: Union['NoteArray', Iterable[Any]]) -> 'NoteArray':
+        """從音符對象或字典建立
+
+        支持 mcp_schema.Note、各模組中具有 pitch/start_time/duration/velocity
+        屬性的 Note 類，以及伴奏生成器使用的音符字典。沒有開始時間的音符
+        （如 theory_validator.Note）按順序首尾相接排列。
+
+        Args:
+            notes: 音符序列，已是 NoteArray 時原樣返回
+
+        Returns:
+            NoteArray: 音符數組
+        """
+        if isinstance(notes, NoteArray):
+            return notes
+
+        notes = list(notes)
+        if not notes:
+            return cls.empty()
+
+        pitch = [_field(note, "pitch") for note in notes]
+        duration = np.array([_field(note, "duration", 0.0) for note in notes], dtype=np.float64)
+        velocity = [_field(note, "velocity", DEFAULT_VELOCITY) or DEFAULT_VELOCITY for note in notes]
+        starts = [_field(note, "start_time") for note in notes]
+
+        if any(start is None for start in starts):
+            # 沒有開始時間的音符接在前一個音符之後
+            start = np.concatenate(([0.0], np.cumsum(duration)[:-1]))
+        else:
+            start = starts
+        return cls(pitch, start, duration, velocity)
+
+    @classmethod
+    def from_events(cls, events: Iterable[Tuple[float, float, int, float]]) -> 'NoteArray':
+        """從 (開始, 結束, 音高, 振幅) 事件建立，振幅 0-1 轉換為力度"""
+        events = list(events)
+        if not events:
+            return cls.empty()
+        data = np.array([event[:4] for event in events], dtype=np.float64)
+        velocity = np.clip(np.round(data[:, 3] * MIDI_VELOCITY_MAX), MIDI_VELOCITY_MIN, MIDI_VELOCITY_MAX)
+        return cls(data[:, 2], data[:, 0], data[:, 1] - data[:, 0], velocity)
+
+    @classmethod
+    def concatenate(cls, arrays: Iterable['NoteArray']) -> 'NoteArray':
+        """合併多個音符數組（不排序）"""
+        arrays = [cls.from_notes(array) for array in arrays]
+        if not arrays:
+            return cls.empty()
+        return cls(
+            np.concatenate([array.pitch for array in arrays]),
+            np.concatenate([array.start for array in arrays]),
+            np.concatenate([array.duration for array in arrays]),
+            np.concatenate([array.velocity for array in arrays])
+        )
+
+    def to_notes(self, note_factory: Optional[Callable[..., Any]] = None) -> List[Any]:
+        """轉換為音符對象列表
+
+        Args:
+            note_factory: 以 pitch/start_time/duration/velocity 關鍵字參數建立音符的函數，
+                默認建立 mcp_schema.Note（跳過逐個驗證，可先調用 validate 一次檢查整個數組）
+
+        Returns:
+            List[Any]: 音符對象列表
+        """
+        if note_factory is None:
+            from .mcp_schema import Note
+            note_factory = Note.model_construct
+        return [
+            note_factory(pitch=pitch, start_time=start, duration=duration, velocity=velocity)
+            for pitch, start, duration, velocity in zip(
+                self.pitch.tolist(), self.start.tolist(), self.duration.tolist(), self.velocity.tolist()
+            )
+        ]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """轉換為音符字典列表（伴奏生成器與渲染器使用的格式）"""
+        return [
+            {"pitch": pitch, "start_time": start, "duration": duration, "velocity": velocity}
+            for pitch, start, duration, velocity in zip(
+                self.pitch.tolist(), self.start.tolist(), self.duration.tolist(), self.velocity.tolist()
+            )
+        ]
+
+    def to_events(self) -> List[Tuple[float, float, int, float]]:
+        """轉換為 (開始, 結束, 音高, 振幅) 事件"""
+        return list(zip(
+            self.start.tolist(),
+            self.end.tolist(),
+            self.pitch.tolist(),
+            (self.velocity / MIDI_VELOCITY_MAX).tolist()
+        ))
+
+    def copy(self) -> 'NoteArray':
+        """複製數組"""
+        return NoteArray(self.pitch.copy(), self.start.copy(), self.duration.copy(), self.velocity.copy())
+
+    def __len__(self) -> int:
+        return len(self.pitch)
+
+    def __bool__(self) -> bool:
+        return len(self.pitch) > 0
+
+    def __getitem__(self, index: Any) -> Union['NoteArray', Any]:
+        """整數索引返回單個 mcp_schema.Note；切片、布爾遮罩或索引數組返回 NoteArray"""
+        if isinstance(index, (int, np.integer)):
+            if not -len(self) <= index < len(self):
+                raise IndexError(f"音符索引超出範圍: {index}")
+            position = int(index) % len(self)
+            return self[position:position + 1].to_notes()[0]
+        return NoteArray(self.pitch[index], self.start[index], self.duration[index], self.velocity[index])
+
+    def __iter__(self):
+        return iter(self.to_notes())
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, NoteArray):
+            return NotImplemented
+        return (np.array_equal(self.pitch, other.pitch)
+                and np.array_equal(self.start, other.start)
+                and np.array_equal(self.duration, other.duration)
+                and np.array_equal(self.velocity, other.velocity))
+
+    def __repr__(self) -> str:
+        return f"NoteArray({len(self)} notes, span={self.total_duration:.3f})"
+
+    @property
+    def end(self) -> np.ndarray:
+        """各音符的結束時間"""
+        return self.start + self.duration
+
+    @property
+    def pitch_class(self) -> np.ndarray:
+        """各音符的音級（0-11）"""
+        return self.pitch % 12
+
+    @property
+    def total_duration(self) -> float:
+        """最後一個音符的結束時間"""
+        return float(self.end.max()) if len(self) else 0.0
+
+    def pitch_class_histogram(self, weighted: bool = True) -> np.ndarray:
+        """音級分佈
+
+        Args:
+            weighted: 為True時按持續時間加權，否則按音符數計數
+
+        Returns:
+            np.ndarray: 長度為12的數組
+        """
+        weights = self.duration if weighted else None
+        return np.bincount(self.pitch_class, weights=weights, minlength=12).astype(np.float64)
+
+    def sorted(self) -> 'NoteArray':
+        """按開始時間（相同時按音高）排序"""
+        return self[np.lexsort((self.pitch, self.start))]
+
+    def transpose(self, semitones: int) -> 'NoteArray':
+        """移調，結果限制在 MIDI 音高範圍內"""
+        pitch = np.clip(self.pitch.astype(np.int32) + semitones, MIDI_PITCH_MIN, MIDI_PITCH_MAX)
+        return NoteArray(pitch, self.start, self.duration, self.velocity)
+
+    def shift(self, offset: float) -> 'NoteArray':
+        """平移時間"""
+        return NoteArray(self.pitch, self.start + offset, self.duration, self.velocity)
+
+    def scale_time(self, factor: float) -> 'NoteArray':
+        """縮放時間，例如乘以 tempo / 60 將秒轉換為拍"""
+        return NoteArray(self.pitch, self.start * factor, self.duration * factor, self.velocity)
+
+    def window(self, start: float, end: float, clip: bool = False) -> 'NoteArray':
+        """選取與時間區間 [start, end) 重疊的音符
+
+        Args:
+            start: 區間開始
+            end: 區間結束
+            clip: 為True時將音符裁剪到區間內
+
+        Returns:
+            NoteArray: 區間內的音符（時間仍為絕對時間）
+        """
+        selected = self[(self.start < end) & (self.end > start)]
+        if not clip or not len(selected):
+            return selected
+        new_start = np.maximum(selected.start, start)
+        new_end = np.minimum(selected.end, end)
+        return NoteArray(selected.pitch, new_start, new_end - new_start, selected.velocity)
+
+    def validate(self):
+        """檢查音高、力度與時間是否合法（與 mcp_schema.Note 的約束相同）
+
+        Raises:
+            ValueError: 存在不合法的音符
+        """
+        checks = [
+            ((self.pitch < MIDI_PITCH_MIN) | (self.pitch > MIDI_PITCH_MAX), "音高超出 0-127"),
+            ((self.velocity < MIDI_VELOCITY_MIN) | (self.velocity > MIDI_VELOCITY_MAX), "力度超出 1-127"),
+            (~(self.start >= 0), "開始時間不能為負數"),
+            (~(self.duration > 0), "持續時間必須為正數"),
+        ]
+        for invalid, message in checks:
+            if invalid.any():
+                index = int(np.argmax(invalid))
+                raise ValueError(f"第 {index} 個音符{message}")
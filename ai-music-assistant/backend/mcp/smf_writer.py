@@ -0,0 +1,191 @@
+"""標準 MIDI 文件寫入模組
+
+以音符數組為輸入的 SMF（Standard MIDI File）編碼器。每個音軌的音符開始與結束事件
+用 NumPy 一次排序，delta 時間的可變長度編碼與事件字節批量生成後直接寫入 bytes，
+不為每個事件建立 Python 對象。生成、渲染與轉錄都經由這裡寫出 MIDI。
+"""
+
+import os
+import math
+import struct
+import logging
+from dataclasses import dataclass
+from typing import BinaryIO, Optional, Sequence, Union
+
+import numpy as np
+
+from .note_array import NoteArray, MIDI_PITCH_MAX, MIDI_VELOCITY_MAX, MIDI_VELOCITY_MIN
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TICKS_PER_BEAT = 960
+
+# 打擊樂使用的 MIDI 通道（第10通道）
+DRUM_CHANNEL = 9
+
+# 可變長度編碼最多4個字節
+MAX_DELTA_TICKS = 0x0FFFFFFF
+
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+PROGRAM_CHANGE = 0xC0
+
+END_OF_TRACK = b"\x00\xff\x2f\x00"
+
+
+@dataclass
+class SMFTrack:
+    """一個音軌的音符與設置"""
+    # 時間單位為拍
+    notes: NoteArray
+    channel: int = 0
+    # General MIDI 程序號，None 表示不寫入音色變更
+    program: Optional[int] = None
+    name: Optional[str] = None
+
+
+def encode_vlq(value: int) -> bytes:
+    """將非負整數編碼為 MIDI 可變長度數值
+
+    Args:
+        value: 0 到 0x0FFFFFFF 的整數
+
+    Returns:
+        bytes: 1-4 個字節
+    """
+    if not 0 <= value <= MAX_DELTA_TICKS:
+        raise ValueError(f"可變長度數值超出範圍: {value}")
+    encoded = [value & 0x7F]
+    value >>= 7
+    while value:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(encoded))
+
+
+def _meta_event(meta_type: int, data: bytes) -> bytes:
+    """delta 為0的元事件"""
+    return b"\x00\xff" + bytes([meta_type]) + encode_vlq(len(data)) + data
+
+
+def encode_note_events(notes: NoteArray, channel: int = 0, ticks_per_beat: int = DEFAULT_TICKS_PER_BEAT) -> bytes:
+    """將音符數組編碼為音軌中的音符事件字節
+
+    同一 tick 上先結束舊音符再開始新音符，時間相同的事件保持輸入順序。
+    連續相同的狀態字節使用 running status 省略。
+
+    Args:
+        notes: 音符數組，時間單位為拍
+        channel: MIDI 通道（0-15）
+        ticks_per_beat: 每拍 tick 數
+
+    Returns:
+        bytes: 音符事件（不含音軌頭與結束事件）
+    """
+    if not 0 <= channel <= 15:
+        raise ValueError(f"MIDI 通道超出範圍: {channel}")
+    if not len(notes):
+        return b""
+
+    start_ticks = np.rint(np.maximum(notes.start, 0.0) * ticks_per_beat).astype(np.int64)
+    end_ticks = np.maximum(start_ticks + 1, np.rint(notes.end * ticks_per_beat).astype(np.int64))
+
+    count = len(notes)
+    ticks = np.concatenate((end_ticks, start_ticks))
+    is_on = np.repeat(np.array([False, True]), count)
+    order = np.lexsort((is_on, ticks))
+    ticks, is_on = ticks[order], is_on[order]
+
+    deltas = np.diff(ticks, prepend=0)
+    if deltas.max() > MAX_DELTA_TICKS:
+        raise ValueError("音符間隔超出 MIDI 可變長度數值範圍")
+
+    pitch = np.clip(notes.pitch, 0, MIDI_PITCH_MAX).astype(np.uint8)
+    velocity = np.clip(notes.velocity, MIDI_VELOCITY_MIN, MIDI_VELOCITY_MAX).astype(np.uint8)
+    status = np.where(is_on, NOTE_ON | channel, NOTE_OFF | channel).astype(np.uint8)
+
+    # 每個事件一行：4個可變長度字節槽位、狀態、音高、力度，再按行選出實際使用的字節
+    rows = np.empty((len(ticks), 7), dtype=np.uint8)
+    rows[:, 0] = ((deltas >> 21) & 0x7F) | 0x80
+    rows[:, 1] = ((deltas >> 14) & 0x7F) | 0x80
+    rows[:, 2] = ((deltas >> 7) & 0x7F) | 0x80
+    rows[:, 3] = deltas & 0x7F
+    rows[:, 4] = status
+    rows[:, 5] = np.concatenate((pitch, pitch))[order]
+    rows[:, 6] = np.where(is_on, np.concatenate((velocity, velocity))[order], 0)
+
+    lengths = 1 + (deltas >= 1 << 7) + (deltas >= 1 << 14) + (deltas >= 1 << 21)
+    keep = np.ones(rows.shape, dtype=bool)
+    keep[:, :4] = np.arange(4) >= (4 - lengths)[:, None]
+    keep[1:, 4] = status[1:] != status[:-1]
+    return rows[keep].tobytes()
+
+
+def _track_chunk(events: bytes) -> bytes:
+    return b"MTrk" + struct.pack(">I", len(events) + len(END_OF_TRACK)) + events + END_OF_TRACK
+
+
+def _conductor_track(tempo: float, time_signature: str) -> bytes:
+    """速度與拍號所在的第一個音軌"""
+    numerator, denominator = (int(part) for part in time_signature.split("/"))
+    if denominator <= 0 or denominator & (denominator - 1):
+        raise ValueError(f"拍號分母必須是2的冪: {time_signature}")
+    microseconds_per_beat = int(round(60_000_000 / tempo))
+    events = (_meta_event(0x51, microseconds_per_beat.to_bytes(3, "big"))
+              + _meta_event(0x58, bytes([numerator, int(math.log2(denominator)), 24, 8])))
+    return _track_chunk(events)
+
+
+def encode_smf(tracks: Sequence[SMFTrack],
+               tempo: float = 120.0,
+               time_signature: str = "4/4",
+               ticks_per_beat: int = DEFAULT_TICKS_PER_BEAT) -> bytes:
+    """將音軌編碼為格式1的標準 MIDI 文件
+
+    第一個音軌只包含速度與拍號，之後每個 SMFTrack 一個音軌。
+
+    Args:
+        tracks: 音軌
+        tempo: 速度（BPM）
+        time_signature: 拍號，例如 "3/4"
+        ticks_per_beat: 每拍 tick 數
+
+    Returns:
+        bytes: MIDI 文件內容
+    """
+    if not 0 < ticks_per_beat < 0x8000:
+        raise ValueError(f"每拍 tick 數超出範圍: {ticks_per_beat}")
+
+    chunks = [
+        b"MThd" + struct.pack(">IHHH", 6, 1, len(tracks) + 1, ticks_per_beat),
+        _conductor_track(tempo, time_signature)
+    ]
+    for track in tracks:
+        header = b""
+        if track.name:
+            header += _meta_event(0x03, track.name.encode("utf-8"))
+        if track.program is not None:
+            header += bytes([0, PROGRAM_CHANGE | track.channel, max(0, min(127, int(track.program)))])
+        notes = NoteArray.from_notes(track.notes)
+        chunks.append(_track_chunk(header + encode_note_events(notes, track.channel, ticks_per_beat)))
+    return b"".join(chunks)
+
+
+def write_smf(output: Union[str, os.PathLike, BinaryIO], tracks: Sequence[SMFTrack], **options) -> int:
+    """將音軌寫入 MIDI 文件
+
+    Args:
+        output: 文件路徑或以二進制模式打開的文件對象
+        tracks: 音軌
+        **options: 傳給 encode_smf 的速度、拍號與每拍 tick 數
+
+    Returns:
+        int: 寫入的字節數
+    """
+    data = encode_smf(tracks, **options)
+    if hasattr(output, "write"):
+        output.write(data)
+    else:
+        with open(output, "wb") as f:
+            f.write(data)
+    return len(data)
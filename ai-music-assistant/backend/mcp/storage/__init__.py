@@ -11,8 +11,13 @@ from .persistence import (
 )
 from .json_storage import JSONStorage
 from .sqlite_storage import SQLiteStorage
+from .connection_pool import SQLiteConnectionPool, WriteBatcher
 from .command_storage import CommandStorage
 from .cache_service import CacheService
+from .memory_cache import MemoryCache
+from .disk_cache import PickleDiskCache
+from .cache_keys import KeyLocks, content_hash
+from .progress_bus import ProgressBus, ProgressSubscription
 
 __all__ = [
     "PersistenceStorage",
@@ -21,6 +26,14 @@ __all__ = [
     "generate_id",
     "JSONStorage",
     "SQLiteStorage",
+    "SQLiteConnectionPool",
+    "WriteBatcher",
     "CommandStorage",
-    "CacheService"
+    "CacheService",
+    "MemoryCache",
+    "PickleDiskCache",
+    "KeyLocks",
+    "content_hash",
+    "ProgressBus",
+    "ProgressSubscription"
 ] 
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""緩存鍵模組
+
+按內容緩存的共用工具：以文件內容哈希作為緩存鍵，以及按鍵分配的互斥鎖表，
+讓同一內容的並發請求只計算一次。
+"""
+
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+# 計算內容哈希時的讀取塊大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(file_path: str) -> str:
+    """計算文件內容的 SHA-256 哈希"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class KeyLocks:
+    """按鍵分配的互斥鎖表
+
+    每把鎖記錄持有與等待它的線程數，最後一個線程離開後才從表中移除；
+    等待者因此總是拿到同一把鎖，同一個鍵不會被兩個線程同時計算。
+    """
+
+    def __init__(self):
+        """初始化鎖表"""
+        self._lock = threading.Lock()
+        # 鍵 -> [鎖, 引用數]
+        self._locks: Dict[str, List[Any]] = {}
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[None]:
+        """持有指定鍵的鎖
+
+        Args:
+            key: 緩存鍵
+        """
+        with self._lock:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._locks)
@@ -12,6 +12,7 @@ from datetime import datetime, timedelta
 import asyncio
 
 from .persistence import PersistenceStorage, StorageResult, StorageFactory
+from .memory_cache import MemoryCache, remaining_ttl
 
 T = TypeVar('T')
 
@@ -24,6 +25,9 @@ class CacheService:
         storage_type: str = "sqlite", 
         namespace: str = "cache",
         default_ttl: int = 3600,  # 默認過期時間（秒）
+        memory_max_entries: int = 1024,
+        memory_max_bytes: int = 64 * 1024 * 1024,
+        memory_ttl: Optional[int] = None,
         **storage_kwargs
     ):
         """初始化緩存服務
@@ -32,6 +36,10 @@ class CacheService:
             storage_type: 存儲類型 ("sqlite" 或 "json")
             namespace: 緩存命名空間
             default_ttl: 默認過期時間（秒）
+            memory_max_entries: 記憶體層最大條目數，為0時停用記憶體層
+            memory_max_bytes: 記憶體層最大估算字節數
+            memory_ttl: 記憶體層條目的最長存活時間（秒），多進程部署時用於限制
+                其他進程寫入後本進程讀到舊數據的時間；為None時與緩存過期時間相同
             **storage_kwargs: 存儲參數
         """
         # 設置默認參數
@@ -47,6 +55,14 @@ class CacheService:
         self.storage = StorageFactory.create_storage(storage_type, **storage_kwargs)
         self.namespace = namespace
         self.default_ttl = default_ttl
+        
+        # 進程內記憶體層（讀穿透/寫穿透到持久化存儲）
+        self.memory_ttl = memory_ttl
+        # 持久化層每次讀取都返回新解碼的對象，記憶體層也返回副本以保持相同的語義
+        self.memory = (
+            MemoryCache(memory_max_entries, memory_max_bytes, copy_values=True)
+            if memory_max_entries > 0 else None
+        )
     
     def _generate_cache_key(self, key_components: Union[str, Dict[str, Any], List[Any]]) -> str:
         """生成緩存鍵
@@ -78,6 +94,12 @@ class CacheService:
         """
         cache_key = self._generate_cache_key(key)
         
+        # 先查記憶體層
+        if self.memory is not None:
+            hit, data = self.memory.get(cache_key)
+            if hit:
+                return StorageResult.ok("緩存命中", data)
+        
         # 獲取數據
         result = await self.storage.get(cache_key)
         if not result.success:
@@ -86,16 +108,18 @@ class CacheService:
         cache_data = result.data
         
         # 檢查是否過期
+        ttl_left = self.default_ttl
         if "expires_at" in cache_data:
-            expires_at = cache_data["expires_at"]
-            if isinstance(expires_at, str):
-                expires_at = datetime.fromisoformat(expires_at)
+            ttl_left = remaining_ttl(cache_data["expires_at"])
             
-            if expires_at < datetime.now():
+            if ttl_left < 0:
                 # 異步刪除過期數據
                 asyncio.create_task(self.storage.delete(cache_key))
                 return StorageResult.error("緩存已過期")
         
+        # 回填記憶體層
+        self._memory_set(cache_key, cache_data["data"], ttl_left)
+        
         # 返回實際數據
         return StorageResult.ok("緩存命中", cache_data["data"])
     
@@ -130,7 +154,42 @@ class CacheService:
         }
         
         # 存儲數據
-        return await self.storage.save(cache_key, cache_data)
+        result = await self.storage.save(cache_key, cache_data)
+        if result.success:
+            self._memory_set(cache_key, data, ttl)
+        elif self.memory is not None:
+            self.memory.delete(cache_key)
+        
+        return result
+    
+    def _memory_set(self, cache_key: str, data: Any, ttl: float):
+        """寫入記憶體層
+        
+        Args:
+            cache_key: 完整緩存鍵
+            data: 緩存數據
+            ttl: 剩餘過期時間（秒）
+        """
+        if self.memory is None:
+            return
+        if self.memory_ttl is not None:
+            ttl = min(ttl, self.memory_ttl)
+        self.memory.set(cache_key, data, ttl)
+    
+    def stats(self) -> Dict[str, Any]:
+        """獲取記憶體層統計
+        
+        Returns:
+            命中/未命中/淘汰計數與容量信息
+        """
+        if self.memory is None:
+            return {"namespace": self.namespace, "memory_enabled": False}
+        return {"namespace": self.namespace, "memory_enabled": True, **self.memory.stats()}
+    
+    async def close(self):
+        """提交待寫入數據並釋放存儲連接"""
+        if hasattr(self.storage, "close"):
+            await self.storage.close()
     
     async def delete(self, key: Union[str, Dict[str, Any], List[Any]]) -> StorageResult:
         """刪除緩存數據
@@ -142,6 +201,8 @@ class CacheService:
             存儲操作結果
         """
         cache_key = self._generate_cache_key(key)
+        if self.memory is not None:
+            self.memory.delete(cache_key)
         return await self.storage.delete(cache_key)
     
     async def exists(self, key: Union[str, Dict[str, Any], List[Any]]) -> bool:
@@ -197,6 +258,9 @@ class CacheService:
         Returns:
             存儲操作結果
         """
+        if self.memory is not None:
+            self.memory.clear(f"{self.namespace}:")
+        
         # 獲取所有鍵
         list_result = await self.storage.list(f"{self.namespace}:*")
         if not list_result.success:
@@ -240,6 +304,8 @@ class CacheService:
                     expires_at = datetime.fromisoformat(expires_at)
                 
                 if expires_at < now:
+                    if self.memory is not None:
+                        self.memory.delete(key)
                     delete_result = await self.storage.delete(key)
                     if delete_result.success:
                         deleted_count += 1
@@ -5,12 +5,29 @@
 
 import os
 import json
-from typing import Dict, Any, List, Optional, Union
-from datetime import datetime
+import base64
+from typing import Dict, Any, List, Optional, Tuple, Union
+from datetime import datetime, timedelta
 import asyncio
 
 from ..mcp_schema import MCPCommand, MCPResponse, CommandStatus
 from .persistence import PersistenceStorage, StorageResult, StorageFactory
+from .migrations import backfill_indexed_columns, count_missing
+
+# 從指令數據中提取到獨立列的字段（列名 -> 候選字段名）
+COMMAND_INDEXED_FIELDS = {
+    "status": "status",
+    "command_type": ("type", "command_type"),
+    "created_at": "created_at",
+    "updated_at": "updated_at"
+}
+
+# 指令表的複合索引，key 用於在相同時間戳下穩定排序
+COMMAND_INDEXES = [
+    ("created_at", "key"),
+    ("status", "created_at", "key"),
+    ("command_type", "created_at", "key")
+]
 
 
 class CommandStorage:
@@ -25,9 +42,14 @@ class CommandStorage:
         """
         # 設置默認參數
         if storage_type == "sqlite":
-            default_kwargs = {"db_path": "data/commands.db", "table_name": "commands"}
+            default_kwargs = {
+                "db_path": "data/commands.db",
+                "table_name": "commands",
+                "indexed_fields": COMMAND_INDEXED_FIELDS,
+                "indexes": COMMAND_INDEXES
+            }
         else:  # json
-            default_kwargs = {"base_dir": "data/commands"}
+            default_kwargs = {"base_dir": "data/commands", "indexed_fields": COMMAND_INDEXED_FIELDS}
         
         # 合併默認參數和提供的參數
         storage_kwargs = {**default_kwargs, **storage_kwargs}
@@ -35,6 +57,94 @@ class CommandStorage:
         # 創建存儲實例
         self.storage = StorageFactory.create_storage(storage_type, **storage_kwargs)
     
+    async def close(self):
+        """釋放存儲連接"""
+        if hasattr(self.storage, "close"):
+            await self.storage.close()
+    
+    async def backfill_indexed_columns(self, chunk_size: int = 1000) -> StorageResult:
+        """回填舊記錄的索引列
+        
+        在線程中分塊執行，不會長時間鎖住數據庫。
+        
+        Args:
+            chunk_size: 每個事務處理的行數
+            
+        Returns:
+            存儲操作結果
+        """
+        if not hasattr(self.storage, "query"):
+            return StorageResult.ok("非SQLite存儲，無需回填", 0)
+        
+        try:
+            missing = await asyncio.to_thread(
+                count_missing, self.storage.db_path, self.storage.table_name, self.storage.extra_columns
+            )
+            if not missing:
+                return StorageResult.ok("索引列已是最新", 0)
+            
+            processed = await asyncio.to_thread(
+                backfill_indexed_columns,
+                self.storage.db_path,
+                self.storage.table_name,
+                COMMAND_INDEXED_FIELDS,
+                chunk_size
+            )
+            return StorageResult.ok(f"已回填 {processed} 條指令記錄", processed)
+        except Exception as e:
+            return StorageResult.error(f"回填索引列失敗: {str(e)}", e)
+    
+    @staticmethod
+    def encode_cursor(created_at: str, key: str) -> str:
+        """編碼分頁游標
+        
+        Args:
+            created_at: 最後一條記錄的創建時間
+            key: 最後一條記錄的鍵
+            
+        Returns:
+            URL安全的游標字符串
+        """
+        raw = json.dumps([created_at, key], ensure_ascii=False).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, str]:
+        """解碼分頁游標
+        
+        Args:
+            cursor: 游標字符串
+            
+        Returns:
+            (created_at, key)
+            
+        Raises:
+            ValueError: 如果游標格式錯誤
+        """
+        try:
+            created_at, key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return str(created_at), str(key)
+        except Exception as e:
+            raise ValueError(f"無效的分頁游標: {cursor}") from e
+    
+    @staticmethod
+    def _status_values(status: Union[CommandStatus, str, List[Union[CommandStatus, str]]]) -> List[str]:
+        """將狀態過濾條件轉為字符串列表"""
+        statuses = status if isinstance(status, list) else [status]
+        return [s.value if isinstance(s, CommandStatus) else s for s in statuses]
+    
+    def _status_clause(self, status) -> Tuple[str, List[Any]]:
+        """構建基於 status 列的過濾條件
+        
+        Returns:
+            (WHERE 子句片段, 參數)
+        """
+        if not status:
+            return "", []
+        values = self._status_values(status)
+        placeholders = ", ".join("?" for _ in values)
+        return f"status IN ({placeholders})", values
+    
     async def save_command(self, command: Union[MCPCommand, Dict[str, Any]]) -> StorageResult:
         """保存指令
         
@@ -157,26 +267,15 @@ class CommandStorage:
         Returns:
             包含指令列表的存儲操作結果
         """
-        # 對於SQLite存儲，可以使用自定義查詢
+        # 對於SQLite存儲，使用索引列查詢
         if hasattr(self.storage, "query"):
-            # 構建SQL查詢
-            sql = "SELECT key, data FROM commands"
-            params = []
-            
-            # 添加狀態過濾
-            if status:
-                if isinstance(status, list):
-                    placeholders = ", ".join(["?" for _ in status])
-                    status_values = [s.value if isinstance(s, CommandStatus) else s for s in status]
-                    sql += f" WHERE json_extract(data, '$.status') IN ({placeholders})"
-                    params.extend(status_values)
-                else:
-                    status_value = status.value if isinstance(status, CommandStatus) else status
-                    sql += " WHERE json_extract(data, '$.status') = ?"
-                    params.append(status_value)
+            where, params = self._status_clause(status)
+            sql = f"SELECT key, data FROM {self.storage.table_name}"
+            if where:
+                sql += f" WHERE {where}"
             
             # 添加分頁
-            sql += " ORDER BY json_extract(data, '$.created_at') DESC LIMIT ? OFFSET ?"
+            sql += " ORDER BY created_at DESC, key DESC LIMIT ? OFFSET ?"
             params.extend([limit, offset])
             
             # 執行查詢
@@ -184,14 +283,27 @@ class CommandStorage:
             if not result.success:
                 return result
             
-            # 解析數據
+            commands = self._decode_rows(result.data)
+            return StorageResult.ok(f"已獲取 {len(commands)} 條指令記錄", commands)
+        
+        # 對於帶清單的JSON存儲，只讀取清單過濾分頁，再讀取當頁的數據文件
+        elif hasattr(self.storage, "query_index"):
+            filters = {"status": self._status_values(status)} if status else None
+            index_result = await self.storage.query_index(
+                filters=filters,
+                order_by="created_at",
+                descending=True,
+                limit=limit,
+                offset=offset
+            )
+            if not index_result.success:
+                return index_result
+            
             commands = []
-            for _, data_json in result.data:
-                try:
-                    command_data = json.loads(data_json)
-                    commands.append(command_data)
-                except json.JSONDecodeError:
-                    continue
+            for entry in index_result.data:
+                get_result = await self.storage.get(entry["key"])
+                if get_result.success:
+                    commands.append(get_result.data)
             
             return StorageResult.ok(f"已獲取 {len(commands)} 條指令記錄", commands)
         
@@ -229,6 +341,80 @@ class CommandStorage:
             
             return StorageResult.ok(f"已獲取 {len(paginated_commands)} 條指令記錄", paginated_commands)
     
+    async def get_command_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        status: Optional[Union[CommandStatus, List[CommandStatus]]] = None
+    ) -> StorageResult:
+        """以游標（keyset）分頁獲取指令歷史
+        
+        按 (created_at, key) 降序翻頁，每頁的開銷與頁碼無關。
+        
+        Args:
+            limit: 每頁數量
+            cursor: 上一頁返回的 next_cursor，為None時從最新記錄開始
+            status: 過濾狀態
+            
+        Returns:
+            存儲操作結果，data 為 {"commands": [...], "next_cursor": str 或 None}
+        """
+        if not hasattr(self.storage, "query"):
+            # 其他存儲以偏移量模擬游標
+            try:
+                offset = int(cursor) if cursor else 0
+                if offset < 0:
+                    raise ValueError(f"游標不能為負數: {cursor}")
+            except ValueError as e:
+                return StorageResult.error(f"無效的分頁游標: {cursor}", e)
+            result = await self.get_command_history(limit=limit, offset=offset, status=status)
+            if not result.success:
+                return result
+            next_cursor = str(offset + limit) if len(result.data) == limit else None
+            return StorageResult.ok(result.message, {"commands": result.data, "next_cursor": next_cursor})
+        
+        try:
+            conditions = []
+            where, params = self._status_clause(status)
+            if where:
+                conditions.append(where)
+            if cursor:
+                created_at, key = self.decode_cursor(cursor)
+                conditions.append("(created_at, key) < (?, ?)")
+                params.extend([created_at, key])
+        except ValueError as e:
+            return StorageResult.error(str(e), e)
+        
+        sql = f"SELECT key, data, created_at FROM {self.storage.table_name}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY created_at DESC, key DESC LIMIT ?"
+        params.append(limit)
+        
+        result = await self.storage.query(sql, tuple(params))
+        if not result.success:
+            return result
+        
+        rows = result.data
+        commands = self._decode_rows(rows)
+        next_cursor = self.encode_cursor(rows[-1][2], rows[-1][0]) if len(rows) == limit else None
+        
+        return StorageResult.ok(
+            f"已獲取 {len(commands)} 條指令記錄",
+            {"commands": commands, "next_cursor": next_cursor}
+        )
+    
+    @staticmethod
+    def _decode_rows(rows: List[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+        """解析查詢結果中的指令數據（第二列）"""
+        commands = []
+        for row in rows:
+            try:
+                commands.append(json.loads(row[1]))
+            except json.JSONDecodeError:
+                continue
+        return commands
+    
     async def count_commands(self, status: Optional[Union[CommandStatus, List[CommandStatus]]] = None) -> int:
         """計算指令數量
         
@@ -238,23 +424,12 @@ class CommandStorage:
         Returns:
             指令數量
         """
-        # 對於SQLite存儲，使用自定義查詢
+        # 對於SQLite存儲，使用 status 列索引計數
         if hasattr(self.storage, "query"):
-            # 構建SQL查詢
-            sql = "SELECT COUNT(*) FROM commands"
-            params = []
-            
-            # 添加狀態過濾
-            if status:
-                if isinstance(status, list):
-                    placeholders = ", ".join(["?" for _ in status])
-                    status_values = [s.value if isinstance(s, CommandStatus) else s for s in status]
-                    sql += f" WHERE json_extract(data, '$.status') IN ({placeholders})"
-                    params.extend(status_values)
-                else:
-                    status_value = status.value if isinstance(status, CommandStatus) else status
-                    sql += " WHERE json_extract(data, '$.status') = ?"
-                    params.append(status_value)
+            where, params = self._status_clause(status)
+            sql = f"SELECT COUNT(*) FROM {self.storage.table_name}"
+            if where:
+                sql += f" WHERE {where}"
             
             # 執行查詢
             result = await self.storage.query(sql, tuple(params))
@@ -262,6 +437,11 @@ class CommandStorage:
                 return result.data[0][0]
             return 0
         
+        # 對於帶清單的JSON存儲，直接在清單中計數
+        elif hasattr(self.storage, "count_index"):
+            filters = {"status": self._status_values(status)} if status else None
+            return await self.storage.count_index(filters)
+        
         # 對於其他類型的存儲，獲取所有鍵然後計算
         else:
             # 獲取指令歷史，不限制數量
@@ -281,12 +461,12 @@ class CommandStorage:
         """
         # 計算截止日期
         cutoff_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        cutoff_date = cutoff_date.replace(day=cutoff_date.day - days)
+        cutoff_date = cutoff_date - timedelta(days=days)
         
-        # 對於SQLite存儲，使用自定義查詢
+        # 對於SQLite存儲，使用 created_at 列索引查詢
         if hasattr(self.storage, "query"):
             # 獲取要刪除的指令ID
-            sql = "SELECT key FROM commands WHERE json_extract(data, '$.created_at') < ?"
+            sql = f"SELECT key FROM {self.storage.table_name} WHERE created_at < ?"
             result = await self.storage.query(sql, (cutoff_date.isoformat(),))
             
             if not result.success:
@@ -301,6 +481,23 @@ class CommandStorage:
             
             return StorageResult.ok(f"已清理 {deleted_count} 條舊指令")
         
+        # 對於帶清單的JSON存儲，按清單中的創建時間篩選
+        elif hasattr(self.storage, "query_index"):
+            index_result = await self.storage.query_index()
+            if not index_result.success:
+                return index_result
+            
+            cutoff = cutoff_date.isoformat()
+            deleted_count = 0
+            for entry in index_result.data:
+                created_at = entry.get("created_at")
+                if created_at and created_at < cutoff:
+                    delete_result = await self.storage.delete(entry["key"])
+                    if delete_result.success:
+                        deleted_count += 1
+            
+            return StorageResult.ok(f"已清理 {deleted_count} 條舊指令")
+        
         # 對於其他類型的存儲，獲取所有指令然後過濾刪除
         else:
             # 獲取所有指令
@@ -0,0 +1,336 @@
+"""SQLite連接池模組
+
+提供長期存活的 aiosqlite 連接池與寫入批次器
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+# 每個連接建立後執行的PRAGMA
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+# 批次提交失敗後重試的間隔（秒），至少為批次間隔
+FLUSH_RETRY_SECONDS = 0.5
+
+
+class SQLiteConnectionPool:
+    """SQLite連接池類
+
+    連接在首次使用時建立並一直保留，避免每次操作都重新連接數據庫。
+    """
+
+    def __init__(self, db_path: str, pool_size: int = 4):
+        """初始化連接池
+
+        Args:
+            db_path: 數據庫文件路徑
+            pool_size: 最大連接數
+        """
+        self.db_path = db_path
+        self.pool_size = max(1, pool_size)
+
+        self._connections: List[aiosqlite.Connection] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._create_lock: Optional[asyncio.Lock] = None
+        self._closed = False
+
+    def _bind_loop(self):
+        """將內部同步原語綁定到當前事件循環
+
+        asyncio 的 Queue/Lock 只能在單一事件循環中使用，
+        若事件循環改變（例如測試中多次 asyncio.run），則重建空閒隊列。
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+
+        self._loop = loop
+        self._create_lock = asyncio.Lock()
+        self._idle = asyncio.Queue()
+        for conn in self._connections:
+            self._idle.put_nowait(conn)
+
+    async def _create_connection(self) -> aiosqlite.Connection:
+        """建立新連接並設置PRAGMA
+
+        Returns:
+            新的數據庫連接
+        """
+        conn = await aiosqlite.connect(self.db_path)
+        for pragma in CONNECTION_PRAGMAS:
+            await conn.execute(pragma)
+        return conn
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        """從連接池借出一個連接
+
+        Yields:
+            數據庫連接
+        """
+        if self._closed:
+            raise RuntimeError(f"連接池已關閉: {self.db_path}")
+
+        self._bind_loop()
+
+        conn = None
+        if self._idle.empty() and len(self._connections) < self.pool_size:
+            async with self._create_lock:
+                if len(self._connections) < self.pool_size:
+                    conn = await self._create_connection()
+                    self._connections.append(conn)
+
+        if conn is None:
+            conn = await self._idle.get()
+
+        try:
+            yield conn
+        except Exception:
+            # 回滾未完成的事務，避免把髒連接放回池中
+            if conn.in_transaction:
+                await conn.rollback()
+            raise
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        """關閉所有連接"""
+        self._closed = True
+        connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                await conn.close()
+            except Exception as e:
+                logger.warning(f"關閉SQLite連接失敗: {str(e)}")
+        self._idle = None
+        self._loop = None
+
+    @property
+    def size(self) -> int:
+        """當前已建立的連接數"""
+        return len(self._connections)
+
+
+class WriteBatcher:
+    """寫入批次器
+
+    將短時間內的寫入合併到同一個事務中提交（write-behind）。
+    同一個鍵的多次寫入只保留最後一次，適合高頻率的進度更新。
+    """
+
+    # 待刪除標記
+    DELETE = object()
+
+    def __init__(
+        self,
+        pool: SQLiteConnectionPool,
+        table_name: str,
+        flush_interval_ms: float = 5.0,
+        max_batch_size: int = 500,
+        upsert_statement: Optional[str] = None
+    ):
+        """初始化寫入批次器
+
+        Args:
+            pool: 連接池
+            table_name: 表名
+            flush_interval_ms: 批次提交間隔（毫秒）
+            max_batch_size: 單個批次的最大寫入數，超過時立即提交
+            upsert_statement: upsert 語句，默認為 upsert_sql(table_name)
+        """
+        self.pool = pool
+        self.table_name = table_name
+        self.upsert_statement = upsert_statement or upsert_sql(table_name)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        # key -> upsert 參數行 或 DELETE
+        self._pending: Dict[str, Any] = {}
+        # 正在提交的批次，提交完成前仍可讀到
+        self._inflight: Dict[str, Any] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # 達到批次上限時觸發的提交
+        self._size_flush_task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.flushed_batches = 0
+        self.flushed_writes = 0
+
+    def _bind_loop(self):
+        """將鎖綁定到當前事件循環"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._flush_lock = asyncio.Lock()
+            self._flush_task = None
+            self._size_flush_task = None
+
+    def get_pending(self, key: str) -> Tuple[bool, Any]:
+        """查詢尚未提交的寫入
+
+        包括排隊中的寫入和正在提交的批次，讀取時不會錯過尚未提交完成的數據。
+
+        Args:
+            key: 數據鍵
+
+        Returns:
+            (是否有待提交寫入, 序列化數據或DELETE標記)
+        """
+        for source in (self._pending, self._inflight):
+            if key in source:
+                value = source[key]
+                return True, value if value is self.DELETE else value[1]
+        return False, None
+
+    @property
+    def pending_count(self) -> int:
+        """待提交的寫入數"""
+        return len(self._pending)
+
+    def upsert(self, key: str, row: Tuple[Any, ...]):
+        """排入一個寫入
+
+        Args:
+            key: 數據鍵
+            row: upsert 語句的參數行，第二個元素為序列化後的數據
+        """
+        self._pending[key] = row
+        self._schedule()
+
+    def delete(self, key: str):
+        """排入一個刪除
+
+        Args:
+            key: 數據鍵
+        """
+        self._pending[key] = self.DELETE
+        self._schedule()
+
+    def _schedule(self):
+        """安排下一次批次提交"""
+        self._bind_loop()
+
+        if len(self._pending) >= self.max_batch_size:
+            if self._size_flush_task is None or self._size_flush_task.done():
+                self._size_flush_task = asyncio.ensure_future(self.flush())
+                self._size_flush_task.add_done_callback(self._size_flush_done)
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._delayed_flush())
+
+    def _size_flush_done(self, task: asyncio.Task):
+        """記錄達到上限觸發的提交的錯誤，失敗時安排重試"""
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error(f"批次寫入失敗: {str(error)}", exc_info=error)
+            self._retry_later()
+
+    def _retry_later(self):
+        """提交失敗後安排重試，失敗的寫入已放回隊列"""
+        if not self._pending:
+            return
+        current = asyncio.current_task()
+        if self._flush_task is None or self._flush_task.done() or self._flush_task is current:
+            self._flush_task = asyncio.ensure_future(
+                self._delayed_flush(max(self.flush_interval, FLUSH_RETRY_SECONDS))
+            )
+
+    async def _delayed_flush(self, delay: Optional[float] = None):
+        """等待批次間隔後提交
+
+        Args:
+            delay: 等待秒數，默認為批次間隔
+        """
+        await asyncio.sleep(self.flush_interval if delay is None else delay)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"批次寫入失敗: {str(e)}", exc_info=True)
+            self._retry_later()
+
+    async def flush(self) -> int:
+        """立即提交所有待寫入的數據
+
+        Returns:
+            本次提交的寫入數
+        """
+        self._bind_loop()
+
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, {}
+            self._inflight = batch
+            upserts = []
+            deletes = []
+            for key, value in batch.items():
+                if value is self.DELETE:
+                    deletes.append((key,))
+                else:
+                    upserts.append(value)
+
+            try:
+                async with self.pool.acquire() as db:
+                    if upserts:
+                        await db.executemany(self.upsert_statement, upserts)
+                    if deletes:
+                        await db.executemany(
+                            f"DELETE FROM {self.table_name} WHERE key = ?", deletes
+                        )
+                    await db.commit()
+            except Exception:
+                # 提交失敗時把未被新寫入覆蓋的數據放回隊列
+                for key, value in batch.items():
+                    self._pending.setdefault(key, value)
+                raise
+            finally:
+                self._inflight = {}
+
+            self.flushed_batches += 1
+            self.flushed_writes += len(batch)
+            return len(batch)
+
+    async def close(self):
+        """提交剩餘寫入並停止計時任務"""
+        if self._size_flush_task is not None and not self._size_flush_task.done():
+            # 等待進行中的提交；失敗的寫入已放回隊列，由下面的提交處理
+            await asyncio.gather(self._size_flush_task, return_exceptions=True)
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        if self._pending:
+            await self.flush()
+
+
+def upsert_sql(table_name: str, extra_columns: Sequence[str] = ()) -> str:
+    """生成單語句 upsert SQL
+
+    Args:
+        table_name: 表名
+        extra_columns: key/data/created_at/updated_at 之外的索引列
+
+    Returns:
+        INSERT ... ON CONFLICT DO UPDATE 語句，參數順序為
+        (key, data, created_at, updated_at, *extra_columns)
+    """
+    columns = ["key", "data", "created_at", "updated_at", *extra_columns]
+    placeholders = ", ".join("?" for _ in columns)
+    updates = ", ".join(f"{col} = excluded.{col}" for col in columns[1:] if col != "created_at")
+    return (
+        f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders}) "
+        f"ON CONFLICT(key) DO UPDATE SET {updates}"
+    )
@@ -0,0 +1,173 @@
+"""磁盤緩存模組
+
+以 pickle 文件保存條目的磁盤緩存層，有容量上限並按最後訪問時間淘汰，作為進程內
+分析緩存（音頻分析、樂譜解析）的後端。
+
+pickle 文件讀取時會執行其中的代碼，因此緩存目錄必須屬於應用自己（權限 0700），
+文件權限為 0600，不屬於當前進程用戶的文件一律不讀取。
+"""
+
+import os
+import stat
+import pickle
+import logging
+import threading
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# 緩存文件的擴展名
+CACHE_FILE_SUFFIX = ".pkl"
+
+
+def owned_by_process(st: os.stat_result) -> bool:
+    """文件是否屬於當前進程的用戶（沒有 getuid 的平台上不檢查）"""
+    getuid = getattr(os, "getuid", None)
+    return getuid is None or st.st_uid == getuid()
+
+
+def prepare_private_dir(path: str) -> bool:
+    """建立只有當前用戶可訪問的緩存目錄
+
+    Args:
+        path: 目錄路徑
+
+    Returns:
+        bool: 目錄可安全使用時返回True；目錄屬於其他用戶或不是目錄時返回False
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or not owned_by_process(st):
+        return False
+    if stat.S_IMODE(st.st_mode) & 0o077:
+        os.chmod(path, 0o700)
+    return True
+
+
+class PickleDiskCache:
+    """pickle 磁盤緩存類
+
+    寫入先寫到以進程號與線程號命名的臨時文件再原子替換，執行池中多個進程
+    同時寫入同一個鍵時不會互相覆蓋或刪除對方的臨時文件。
+    """
+
+    def __init__(self, cache_dir: Optional[str], max_bytes: int, version: int, name: str = "緩存"):
+        """初始化磁盤緩存
+
+        Args:
+            cache_dir: 緩存目錄，為None或空字符串時停用
+            max_bytes: 最大字節數
+            version: 條目格式版本，寫入文件名中，格式變化時不會讀到舊文件
+            name: 日誌中使用的緩存名稱
+        """
+        self.cache_dir = cache_dir or None
+        self.max_bytes = max_bytes
+        self.version = version
+        self.name = name
+        if self.cache_dir and not prepare_private_dir(self.cache_dir):
+            logger.warning(f"{name}目錄 {self.cache_dir} 不屬於當前用戶，停用磁盤層")
+            self.cache_dir = None
+
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        """是否啟用"""
+        return self.cache_dir is not None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.v{self.version}{CACHE_FILE_SUFFIX}")
+
+    def load(self, key: str) -> Optional[Any]:
+        """讀取條目並更新其訪問時間
+
+        Args:
+            key: 緩存鍵
+
+        Returns:
+            Optional[Any]: 條目，未命中、文件不屬於當前用戶或無法讀取時返回None
+        """
+        if not self.enabled:
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                if not owned_by_process(os.fstat(f.fileno())):
+                    logger.warning(f"拒絕讀取不屬於當前用戶的{self.name}文件: {path}")
+                    return None
+                value = pickle.load(f)
+            # 更新訪問時間，供淘汰使用
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"讀取{self.name}失敗: {str(e)}")
+            self._remove_file(path)
+            return None
+        return value
+
+    def store(self, key: str, value: Any) -> bool:
+        """寫入（或更新）條目，之後淘汰超出容量的條目
+
+        Args:
+            key: 緩存鍵
+            value: 可 pickle 的對象
+
+        Returns:
+            bool: 寫入成功時返回True
+        """
+        if not self.enabled:
+            return False
+
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.warning(f"寫入{self.name}失敗: {str(e)}")
+            self._remove_file(temp_path)
+            return False
+
+        self._evict()
+        return True
+
+    def _evict(self):
+        """按最後訪問時間淘汰條目直到滿足容量限制"""
+        try:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and entry.name.endswith(CACHE_FILE_SUFFIX):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+        except OSError as e:
+            logger.warning(f"掃描{self.name}目錄失敗: {str(e)}")
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self._remove_file(path):
+                total -= size
+                self.evictions += 1
+
+    @staticmethod
+    def _remove_file(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def clear(self):
+        """刪除所有條目"""
+        if not self.enabled:
+            return
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(CACHE_FILE_SUFFIX):
+                self._remove_file(entry.path)
@@ -1,32 +1,81 @@
 """JSON文件存儲實現
 
-基於JSON文件的持久化存儲
+基於JSON文件的持久化存儲。
+
+目錄中維護一個追加寫入的清單文件（manifest），記錄每個鍵的文件名和索引字段，
+列出、過濾和分頁只需讀取清單，不必掃描目錄或逐個讀取數據文件。
+清單損壞或與目錄不一致時可用 rebuild_index 重建。
+
+追加記錄持有清單鎖文件的共享鎖，壓縮與重建持有獨佔鎖，並在鎖內先讀入其他進程
+追加的記錄再替換清單，多個進程共用同一目錄時不會丟失記錄（需要 fcntl，
+在沒有 fcntl 的平台上只保證單進程安全）。清單的讀寫、加鎖與重建都在線程池中
+執行，不阻塞事件循環。
 """
 
 import os
 import json
 import glob
+import uuid
 import asyncio
-from typing import Any, Dict, List, Optional, Union, TypeVar
+import fnmatch
+import threading
+from contextlib import contextmanager
+from enum import Enum
+from typing import Any, Dict, List, Optional, Sequence, Union, TypeVar
 from datetime import datetime
 import aiofiles
 from aiofiles.os import makedirs
 
-from .persistence import PersistenceStorage, StorageResult
+from .persistence import PersistenceStorage, StorageResult, extract_index_value, normalize_index_fields
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 清單文件名（不以 .json 結尾，不會被當成數據文件）
+MANIFEST_FILENAME = ".manifest.jsonl"
+MANIFEST_LOCK_FILENAME = ".manifest.lock"
+
+
+def _temp_path(path: str) -> str:
+    """同一目標文件的臨時文件名，在進程與線程之間都不重複"""
+    return f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
 
 
 class JSONStorage(PersistenceStorage):
     """JSON文件存儲類"""
     
-    def __init__(self, base_dir: str = "data", indent: int = 2):
+    def __init__(
+        self,
+        base_dir: str = "data",
+        indent: int = 2,
+        indexed_fields: Optional[Dict[str, Union[str, Sequence[str]]]] = None,
+        compact_ratio: float = 2.0
+    ):
         """初始化JSON存儲
         
         Args:
             base_dir: 基礎目錄
             indent: JSON縮進
+            indexed_fields: 記錄到清單中的頂層字段，索引名 -> 字段名（或候選字段名序列）
+            compact_ratio: 清單日誌行數超過條目數的倍數時壓縮清單
         """
         self.base_dir = base_dir
         self.indent = indent
+        self.indexed_fields = normalize_index_fields(indexed_fields)
+        self.compact_ratio = compact_ratio
+        
+        # 清單狀態：內存索引、已讀取的文件位置與inode、日誌行數
+        self.manifest_path = os.path.join(self.base_dir, MANIFEST_FILENAME)
+        self.lock_path = os.path.join(self.base_dir, MANIFEST_LOCK_FILENAME)
+        self._lock_state = threading.local()
+        # 保護內存索引，清單操作在線程池中並發執行
+        self._index_lock = threading.RLock()
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._manifest_inode: Optional[int] = None
+        self._manifest_offset = 0
+        self._journal_lines = 0
         
         # 確保目錄存在
         os.makedirs(self.base_dir, exist_ok=True)
@@ -60,13 +109,16 @@ class JSONStorage(PersistenceStorage):
             await makedirs(self.base_dir, exist_ok=True)
             
             file_path = self._get_file_path(key)
+            temp_path = _temp_path(file_path)
             
             # 轉換日期時間對象為ISO格式字符串
             serializable_data = self._prepare_data_for_serialization(data)
             
-            async with aiofiles.open(file_path, mode='w', encoding='utf-8') as f:
+            # 先寫臨時文件再替換，讀者不會看到寫了一半的文件
+            async with aiofiles.open(temp_path, mode='w', encoding='utf-8') as f:
                 json_str = json.dumps(serializable_data, ensure_ascii=False, indent=self.indent)
                 await f.write(json_str)
+            await asyncio.to_thread(self._replace_and_index, temp_path, file_path, key, serializable_data)
             
             return StorageResult.ok(f"數據已保存到 {file_path}", key)
         except Exception as e:
@@ -129,7 +181,7 @@ class JSONStorage(PersistenceStorage):
             if not os.path.exists(file_path):
                 return StorageResult.error(f"找不到要刪除的數據: {key}")
             
-            os.remove(file_path)
+            await asyncio.to_thread(self._remove_and_index, file_path, key)
             return StorageResult.ok(f"數據已刪除: {key}")
         except Exception as e:
             return StorageResult.error(f"刪除數據失敗: {str(e)}", e)
@@ -144,19 +196,74 @@ class JSONStorage(PersistenceStorage):
             包含鍵列表的存儲操作結果
         """
         try:
-            # 將模式轉換為文件模式
-            file_pattern = os.path.join(self.base_dir, f"{pattern}.json")
-            
-            # 獲取所有匹配的文件
-            file_paths = glob.glob(file_pattern)
-            
-            # 提取鍵名
-            keys = [os.path.splitext(os.path.basename(path))[0] for path in file_paths]
+            keys = await asyncio.to_thread(self._list_keys, pattern)
             
             return StorageResult.ok(f"找到 {len(keys)} 個匹配鍵", keys)
         except Exception as e:
             return StorageResult.error(f"列出鍵失敗: {str(e)}", e)
     
+    async def query_index(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> StorageResult:
+        """只讀取清單來過濾、排序和分頁
+        
+        Args:
+            filters: 索引名 -> 值或值列表
+            order_by: 排序的索引名，相同值按鍵排序
+            descending: 是否降序
+            limit: 返回數量限制
+            offset: 起始偏移
+            
+        Returns:
+            存儲操作結果，data 為清單條目列表（每項包含 key、path 與索引字段）
+        """
+        try:
+            entries = await asyncio.to_thread(self._filter_index, filters)
+            
+            if order_by:
+                # 缺少排序字段的條目排在最舊的一端
+                present = [e for e in entries if e.get(order_by) is not None]
+                missing = [e for e in entries if e.get(order_by) is None]
+                present.sort(key=lambda e: (e[order_by], e["key"]), reverse=descending)
+                missing.sort(key=lambda e: e["key"], reverse=descending)
+                entries = present + missing if descending else missing + present
+            
+            end = None if limit is None else offset + limit
+            return StorageResult.ok(f"找到 {len(entries)} 個匹配條目", entries[offset:end])
+        except Exception as e:
+            return StorageResult.error(f"查詢清單失敗: {str(e)}", e)
+    
+    async def count_index(self, filters: Optional[Dict[str, Any]] = None) -> int:
+        """計算清單中滿足條件的條目數
+        
+        Args:
+            filters: 索引名 -> 值或值列表
+            
+        Returns:
+            條目數
+        """
+        try:
+            return len(await asyncio.to_thread(self._filter_index, filters))
+        except Exception:
+            return 0
+    
+    async def rebuild_index(self) -> StorageResult:
+        """掃描目錄中的所有數據文件並重建清單
+        
+        Returns:
+            存儲操作結果，data 為條目數
+        """
+        try:
+            count = await asyncio.to_thread(self._rebuild_index)
+            return StorageResult.ok(f"清單已重建，共 {count} 個條目", count)
+        except Exception as e:
+            return StorageResult.error(f"重建清單失敗: {str(e)}", e)
+    
     async def exists(self, key: str) -> bool:
         """檢查JSON文件是否存在
         
@@ -169,6 +276,196 @@ class JSONStorage(PersistenceStorage):
         file_path = self._get_file_path(key)
         return os.path.exists(file_path)
     
+    def _replace_and_index(self, temp_path: str, file_path: str, key: str, prepared_data: Any):
+        """以寫好的臨時文件替換數據文件並記錄到清單"""
+        os.replace(temp_path, file_path)
+        self._index_put(key, prepared_data)
+    
+    def _remove_and_index(self, file_path: str, key: str):
+        """刪除數據文件並記錄到清單"""
+        os.remove(file_path)
+        self._index_delete(key)
+    
+    def _list_keys(self, pattern: str) -> List[str]:
+        """清單中匹配模式的鍵"""
+        with self._index_lock:
+            return [key for key in self._ensure_index() if fnmatch.fnmatchcase(key, pattern)]
+    
+    def _filter_index(self, filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """按索引字段過濾清單條目"""
+        with self._index_lock:
+            entries = [{"key": key, **entry} for key, entry in self._ensure_index().items()]
+        
+        for name, expected in (filters or {}).items():
+            if isinstance(expected, (list, tuple, set)):
+                allowed = set(expected)
+                entries = [e for e in entries if e.get(name) in allowed]
+            else:
+                entries = [e for e in entries if e.get(name) == expected]
+        
+        return entries
+    
+    def _make_entry(self, key: str, prepared_data: Any) -> Dict[str, Any]:
+        """構建清單條目"""
+        entry = {"path": os.path.basename(self._get_file_path(key))}
+        for name, fields in self.indexed_fields.items():
+            entry[name] = extract_index_value(prepared_data, fields)
+        return entry
+    
+    def _ensure_index(self) -> Dict[str, Dict[str, Any]]:
+        """載入清單，並追上其他進程追加的記錄（調用方需持有 _index_lock）
+        
+        Returns:
+            鍵 -> 清單條目
+        """
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            # 首次使用或清單丟失：從數據文件重建
+            self._rebuild_index()
+            return self._index
+        
+        # 清單被壓縮或替換後重新從頭讀取
+        if (self._index is None or stat.st_ino != self._manifest_inode
+                or stat.st_size < self._manifest_offset):
+            self._index = {}
+            self._manifest_inode = stat.st_ino
+            self._manifest_offset = 0
+            self._journal_lines = 0
+        
+        if stat.st_size > self._manifest_offset:
+            self._replay_manifest()
+        
+        return self._index
+    
+    def _replay_manifest(self):
+        """從上次讀取的位置回放清單日誌"""
+        with open(self.manifest_path, "rb") as f:
+            f.seek(self._manifest_offset)
+            chunk = f.read()
+        
+        # 只處理完整的行，寫了一半的行留到下次
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            
+            if record.get("op") == "put":
+                self._index[record["key"]] = record["entry"]
+            elif record.get("op") == "del":
+                self._index.pop(record["key"], None)
+            self._journal_lines += 1
+        
+        self._manifest_offset += end
+    
+    @contextmanager
+    def _manifest_lock(self, exclusive: bool):
+        """持有清單鎖
+        
+        同一線程內重入時不再加鎖（flock 對同一進程的不同文件描述符也會互斥）。
+        
+        Args:
+            exclusive: 為True時持有獨佔鎖（壓縮、重建），否則持有共享鎖（追加）
+        """
+        depth = getattr(self._lock_state, "depth", 0)
+        if fcntl is None or depth:
+            self._lock_state.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._lock_state.depth = depth
+            return
+        
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._lock_state.depth = 1
+            try:
+                yield
+            finally:
+                self._lock_state.depth = 0
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _append_manifest(self, record: Dict[str, Any]):
+        """追加一條清單記錄
+        
+        單行追加寫入，多個進程同時寫入時記錄不會交錯；壓縮進行中時等待其完成。
+        """
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._manifest_lock(exclusive=False):
+            with open(self.manifest_path, "ab") as f:
+                f.write(line)
+    
+    def _index_put(self, key: str, prepared_data: Any):
+        """在清單中記錄保存"""
+        with self._index_lock:
+            self._ensure_index()
+            self._append_manifest({"op": "put", "key": key, "entry": self._make_entry(key, prepared_data)})
+            self._ensure_index()
+            self._maybe_compact()
+    
+    def _index_delete(self, key: str):
+        """在清單中記錄刪除"""
+        with self._index_lock:
+            self._ensure_index()
+            self._append_manifest({"op": "del", "key": key})
+            self._ensure_index()
+            self._maybe_compact()
+    
+    def _maybe_compact(self):
+        """日誌過長時壓縮清單"""
+        if self._journal_lines > max(1000, self.compact_ratio * len(self._index)):
+            with self._manifest_lock(exclusive=True):
+                # 先讀入其他進程在此之前追加的記錄，再以完整的索引替換清單
+                self._ensure_index()
+                self._write_manifest(self._index)
+    
+    def _write_manifest(self, index: Dict[str, Dict[str, Any]]):
+        """原子地寫入完整清單（調用方需持有獨佔的清單鎖）
+        
+        Args:
+            index: 鍵 -> 清單條目
+        """
+        temp_path = _temp_path(self.manifest_path)
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for key, entry in index.items():
+                f.write(json.dumps({"op": "put", "key": key, "entry": entry}, ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.manifest_path)
+        
+        stat = os.stat(self.manifest_path)
+        self._index = dict(index)
+        self._manifest_inode = stat.st_ino
+        self._manifest_offset = stat.st_size
+        self._journal_lines = len(index)
+    
+    def _rebuild_index(self) -> int:
+        """掃描數據文件重建清單
+        
+        Returns:
+            條目數
+        """
+        with self._index_lock, self._manifest_lock(exclusive=True):
+            # 文件名中的鍵經過轉換，盡量沿用舊清單中記錄的原始鍵
+            known_keys = {entry.get("path"): key for key, entry in (self._index or {}).items()}
+            
+            index = {}
+            for file_path in glob.glob(os.path.join(self.base_dir, "*.json")):
+                try:
+                    with open(file_path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    continue
+                
+                file_name = os.path.basename(file_path)
+                key = known_keys.get(file_name, os.path.splitext(file_name)[0])
+                index[key] = self._make_entry(key, data)
+            
+            self._write_manifest(index)
+        return len(index)
+    
     def _prepare_data_for_serialization(self, data: Any) -> Any:
         """準備數據以進行序列化
         
@@ -187,6 +484,8 @@ class JSONStorage(PersistenceStorage):
             return [self._prepare_data_for_serialization(item) for item in data]
         elif isinstance(data, datetime):
             return {"__datetime__": data.isoformat()}
+        elif isinstance(data, Enum):
+            return data.value
         elif hasattr(data, "to_dict") and callable(getattr(data, "to_dict")):
             return data.to_dict()
         elif hasattr(data, "__dict__"):
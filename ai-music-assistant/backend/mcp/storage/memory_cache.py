@@ -0,0 +1,187 @@
+"""記憶體緩存模組
+
+提供帶TTL與容量上限的進程內LRU緩存，作為持久化緩存的前端
+"""
+
+import sys
+import copy
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+
+def estimate_size(value: Any) -> int:
+    """粗略估算對象佔用的字節數
+
+    Args:
+        value: 任意對象
+
+    Returns:
+        估算的字節數
+    """
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if hasattr(value, "__dict__") and not isinstance(value, type):
+        return sys.getsizeof(value) + estimate_size(vars(value))
+    return sys.getsizeof(value)
+
+
+class MemoryCache:
+    """記憶體LRU緩存類
+
+    同時以條目數和估算字節數限制容量，超出時從最久未使用的條目開始淘汰。
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, copy_values: bool = False):
+        """初始化記憶體緩存
+
+        Args:
+            max_entries: 最大條目數
+            max_bytes: 最大估算字節數
+            copy_values: 為True時存入與取出字典、列表等可變容器都深拷貝，
+                調用方修改取得的數據不會影響緩存中的條目
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.copy_values = copy_values
+
+        # key -> (value, expires_at(monotonic), size)
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self.current_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """獲取緩存數據
+
+        Args:
+            key: 緩存鍵
+
+        Returns:
+            (是否命中, 數據)
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return False, None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, self._copy(value)
+
+    def set(self, key: str, value: Any, ttl: float, size: Optional[int] = None):
+        """設置緩存數據
+
+        Args:
+            key: 緩存鍵
+            value: 緩存數據
+            ttl: 過期時間（秒）
+            size: 數據的字節數，為None時自動估算（結構複雜或有循環引用的對象應自行提供）
+        """
+        if size is None:
+            size = estimate_size(value)
+        if ttl <= 0 or size > self.max_bytes:
+            # 單個條目比整個緩存還大時不放入記憶體層
+            self.delete(key)
+            return
+
+        self._remove(key)
+        self._entries[key] = (self._copy(value), time.monotonic() + ttl, size)
+        self.current_bytes += size
+        self._evict()
+
+    def delete(self, key: str) -> bool:
+        """刪除緩存數據
+
+        Args:
+            key: 緩存鍵
+
+        Returns:
+            是否刪除了條目
+        """
+        return self._remove(key)
+
+    def clear(self, prefix: str = ""):
+        """清除以指定前綴開頭的條目
+
+        Args:
+            prefix: 鍵前綴，為空時清除所有條目
+        """
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            self._remove(key)
+
+    def _copy(self, value: Any) -> Any:
+        """按 copy_values 設置複製可變容器"""
+        if self.copy_values and isinstance(value, (dict, list, set)):
+            return copy.deepcopy(value)
+        return value
+
+    def _remove(self, key: str) -> bool:
+        """移除條目並更新容量統計"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.current_bytes -= entry[2]
+        return True
+
+    def _evict(self):
+        """淘汰最久未使用的條目直到滿足容量限制"""
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes
+        ):
+            key, (_, _, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """獲取緩存統計
+
+        Returns:
+            命中、未命中、淘汰次數與容量信息
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+def remaining_ttl(expires_at: Any, now: Optional[datetime] = None) -> float:
+    """計算距過期時間的剩餘秒數
+
+    Args:
+        expires_at: 過期時間（datetime 或 ISO 字符串）
+        now: 當前時間
+
+    Returns:
+        剩餘秒數，已過期時為負數
+    """
+    if isinstance(expires_at, str):
+        expires_at = datetime.fromisoformat(expires_at)
+    now = now or datetime.now()
+    return (expires_at - now).total_seconds()
@@ -0,0 +1,177 @@
+"""存儲遷移工具
+
+- sqlite-backfill: 將JSON數據中的字段回填到SQLite索引列。按 rowid 分塊更新，
+  每塊使用獨立的短事務，並在塊之間短暫讓出寫鎖，因此可以在服務運行時執行。
+- json-rebuild-index: 掃描JSON存儲目錄，重建清單文件。
+
+用法:
+
+    python -m backend.mcp.storage.migrations sqlite-backfill --db data/commands.db --table commands
+    python -m backend.mcp.storage.migrations json-rebuild-index --dir data/commands
+"""
+
+import time
+import asyncio
+import sqlite3
+import logging
+import argparse
+from typing import Callable, Dict, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+
+def _column_expression(column: str, fields: Sequence[str]) -> str:
+    """生成從 data 列提取字段值的SQL表達式
+
+    Args:
+        column: 目標列名
+        fields: 候選字段名
+
+    Returns:
+        SQL表達式；日期時間優先取 {"__datetime__": ...} 中的ISO字符串
+    """
+    candidates = []
+    for field in fields:
+        candidates.append(f"json_extract(data, '$.{field}.__datetime__')")
+        candidates.append(f"json_extract(data, '$.{field}')")
+    # 無法從數據中取得值時保留原值
+    candidates.append(column)
+    return f"CASE WHEN json_valid(data) THEN COALESCE({', '.join(candidates)}) ELSE {column} END"
+
+
+def backfill_indexed_columns(
+    db_path: str,
+    table_name: str,
+    indexed_fields: Dict[str, Union[str, Sequence[str]]],
+    chunk_size: int = 1000,
+    pause_seconds: float = 0.01,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> int:
+    """分塊回填索引列
+
+    Args:
+        db_path: 數據庫文件路徑
+        table_name: 表名
+        indexed_fields: 列名 -> 字段名（或候選字段名序列）
+        chunk_size: 每個事務處理的行數
+        pause_seconds: 塊之間的暫停時間，讓其他寫入者取得鎖
+        progress_callback: 進度回調 (已處理行數, 總行數)
+
+    Returns:
+        已處理的行數
+    """
+    assignments = ", ".join(
+        f"{column} = {_column_expression(column, (fields,) if isinstance(fields, str) else fields)}"
+        for column, fields in indexed_fields.items()
+    )
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        total = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+
+        processed = 0
+        last_rowid = 0
+        while True:
+            row = conn.execute(
+                f"SELECT MAX(rowid), COUNT(*) FROM "
+                f"(SELECT rowid FROM {table_name} WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+                (last_rowid, chunk_size)
+            ).fetchone()
+            chunk_end, chunk_count = row
+            if not chunk_count:
+                break
+
+            with conn:
+                conn.execute(
+                    f"UPDATE {table_name} SET {assignments} WHERE rowid > ? AND rowid <= ?",
+                    (last_rowid, chunk_end)
+                )
+
+            processed += chunk_count
+            last_rowid = chunk_end
+            if progress_callback:
+                progress_callback(processed, total)
+            if pause_seconds:
+                time.sleep(pause_seconds)
+
+        logger.info(f"已回填 {table_name} 的 {processed} 行索引列")
+        return processed
+    finally:
+        conn.close()
+
+
+def count_missing(db_path: str, table_name: str, columns: Sequence[str]) -> int:
+    """計算索引列仍為NULL的行數
+
+    Args:
+        db_path: 數據庫文件路徑
+        table_name: 表名
+        columns: 要檢查的列
+
+    Returns:
+        需要回填的行數
+    """
+    if not columns:
+        return 0
+
+    condition = " OR ".join(f"{column} IS NULL" for column in columns)
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table_name} WHERE {condition}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def main():
+    """命令行入口"""
+    from .command_storage import COMMAND_INDEXED_FIELDS, COMMAND_INDEXES
+    from .sqlite_storage import SQLiteStorage
+    from .json_storage import JSONStorage
+
+    parser = argparse.ArgumentParser(description="存儲遷移工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill_parser = subparsers.add_parser("sqlite-backfill", help="回填SQLite指令表的索引列")
+    backfill_parser.add_argument("--db", default="data/commands.db", help="數據庫文件路徑")
+    backfill_parser.add_argument("--table", default="commands", help="表名")
+    backfill_parser.add_argument("--chunk-size", type=int, default=1000, help="每個事務處理的行數")
+    backfill_parser.add_argument("--pause", type=float, default=0.01, help="塊之間的暫停秒數")
+
+    rebuild_parser = subparsers.add_parser("json-rebuild-index", help="重建JSON指令存儲的清單")
+    rebuild_parser.add_argument("--dir", default="data/commands", help="JSON存儲目錄")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "json-rebuild-index":
+        storage = JSONStorage(base_dir=args.dir, indexed_fields=COMMAND_INDEXED_FIELDS)
+        result = asyncio.run(storage.rebuild_index())
+        print(f"{result.message}: {storage.manifest_path}")
+        return
+
+    # 先確保列和索引存在
+    SQLiteStorage(
+        db_path=args.db,
+        table_name=args.table,
+        indexed_fields=COMMAND_INDEXED_FIELDS,
+        indexes=COMMAND_INDEXES
+    )
+
+    def report(processed: int, total: int):
+        print(f"\r已處理 {processed}/{total} 行", end="", flush=True)
+
+    backfill_indexed_columns(
+        args.db,
+        args.table,
+        COMMAND_INDEXED_FIELDS,
+        chunk_size=args.chunk_size,
+        pause_seconds=args.pause,
+        progress_callback=report
+    )
+    print()
+
+
+if __name__ == "__main__":
+    main()
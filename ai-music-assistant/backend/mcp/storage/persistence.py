@@ -4,7 +4,8 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional, Union, TypeVar, Generic
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union, TypeVar, Generic
 from datetime import datetime
 from uuid import uuid4
 
@@ -162,9 +163,12 @@ class StorageFactory:
         from .json_storage import JSONStorage
         from .sqlite_storage import SQLiteStorage
         
+        # 調用方可同時提供兩種存儲的路徑參數，只傳遞所選存儲使用的一個
         if storage_type.lower() == "json":
+            kwargs.pop("db_path", None)
             return JSONStorage(**kwargs)
         elif storage_type.lower() == "sqlite":
+            kwargs.pop("base_dir", None)
             return SQLiteStorage(**kwargs)
         else:
             raise ValueError(f"不支持的存儲類型: {storage_type}")
@@ -176,4 +180,47 @@ def generate_id() -> str:
     Returns:
         唯一ID字符串
     """
-    return str(uuid4()) 
\ No newline at end of file
+    return str(uuid4()) 
+
+
+def normalize_index_fields(
+    indexed_fields: Optional[Dict[str, Union[str, Sequence[str]]]]
+) -> Dict[str, Tuple[str, ...]]:
+    """規範化索引字段定義
+    
+    Args:
+        indexed_fields: 列名 -> 字段名（或候選字段名序列）
+        
+    Returns:
+        列名 -> 候選字段名元組
+    """
+    return {
+        column: (fields,) if isinstance(fields, str) else tuple(fields)
+        for column, fields in (indexed_fields or {}).items()
+    }
+
+
+def extract_index_value(prepared_data: Any, fields: Tuple[str, ...]) -> Any:
+    """從已序列化準備的數據中提取索引值
+    
+    Args:
+        prepared_data: 已準備好序列化的數據
+        fields: 候選字段名，取第一個有值的字段
+        
+    Returns:
+        索引值，日期時間轉為ISO字符串，複合值轉為JSON字符串
+    """
+    if not isinstance(prepared_data, dict):
+        return None
+    
+    for field in fields:
+        value = prepared_data.get(field)
+        if value is None:
+            continue
+        if isinstance(value, dict) and "__datetime__" in value:
+            return value["__datetime__"]
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False)
+        return str(value) if not isinstance(value, (int, float)) else value
+    
+    return None
@@ -0,0 +1,152 @@
+"""進度推送模組
+
+進程內的發布/訂閱總線：任務進度更新時發布到以命令ID為主題的訂閱者，
+客戶端保持一個連接接收推送，不需要輪詢進度緩存。
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# 終結狀態，推送到此狀態後訂閱結束
+TERMINAL_STATUSES = {"COMPLETED", "FAILED", "CANCELLED"}
+
+
+def is_terminal(event: Dict[str, Any]) -> bool:
+    """判斷進度事件是否為終結狀態"""
+    return str(event.get("status", "")).upper() in TERMINAL_STATUSES
+
+
+class ProgressSubscription:
+    """單個訂閱者
+
+    緩衝區有上限。進度事件是完整的狀態快照，後一個事件總是覆蓋前一個，
+    因此消費過慢時丟棄最舊的事件：記憶體佔用有界，且最新（包括終結）狀態不會丟失。
+    """
+
+    def __init__(self, bus: 'ProgressBus', topic: str, max_buffer: int):
+        """初始化
+
+        Args:
+            bus: 所屬的總線
+            topic: 訂閱的主題（命令ID）
+            max_buffer: 緩衝區最大事件數
+        """
+        self.bus = bus
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffer)
+        self.dropped = 0
+        self.closed = False
+
+    def offer(self, event: Dict[str, Any]):
+        """放入事件，緩衝區已滿時丟棄最舊的事件"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.bus.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """等待下一個事件
+
+        Args:
+            timeout: 等待秒數，為None時一直等待
+
+        Returns:
+            Optional[Dict[str, Any]]: 進度事件，超時返回None
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        """取消訂閱"""
+        if not self.closed:
+            self.closed = True
+            self.bus._unsubscribe(self)
+
+    async def __aenter__(self) -> 'ProgressSubscription':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ProgressBus:
+    """進度發布/訂閱總線類
+
+    只能在事件循環線程中使用；工作線程中的進度應先轉交到事件循環再發布。
+    """
+
+    def __init__(self, max_buffer: int = 16):
+        """初始化
+
+        Args:
+            max_buffer: 每個訂閱者的默認緩衝區大小
+        """
+        self.max_buffer = max_buffer
+        self._subscribers: Dict[str, Set[ProgressSubscription]] = {}
+
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, topic: str, max_buffer: Optional[int] = None) -> ProgressSubscription:
+        """訂閱主題
+
+        Args:
+            topic: 主題（命令ID）
+            max_buffer: 緩衝區大小，為None時使用默認值
+
+        Returns:
+            ProgressSubscription: 訂閱，用完後應調用 close（或用 async with）
+        """
+        subscription = ProgressSubscription(self, topic, max_buffer or self.max_buffer)
+        self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: ProgressSubscription):
+        subscribers = self._subscribers.get(subscription.topic)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.topic]
+
+    def publish(self, topic: str, event: Dict[str, Any]) -> int:
+        """發布事件，不會因訂閱者消費過慢而阻塞
+
+        Args:
+            topic: 主題（命令ID）
+            event: 進度事件
+
+        Returns:
+            int: 收到事件的訂閱者數
+        """
+        self.published += 1
+        subscribers = self._subscribers.get(topic)
+        if not subscribers:
+            return 0
+        for subscription in subscribers:
+            subscription.offer(event)
+        self.delivered += len(subscribers)
+        return len(subscribers)
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        """獲取訂閱者數，topic 為None時返回所有主題的總數"""
+        if topic is not None:
+            return len(self._subscribers.get(topic, ()))
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """獲取總線統計"""
+        return {
+            "topics": len(self._subscribers),
+            "subscribers": self.subscriber_count(),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped
+        }
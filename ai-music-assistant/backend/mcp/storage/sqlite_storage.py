@@ -7,37 +7,77 @@ import os
 import json
 import sqlite3
 import asyncio
-from typing import Any, Dict, List, Optional, Union, TypeVar
+from enum import Enum
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union, TypeVar
 from datetime import datetime
-import aiosqlite
 
-from .persistence import PersistenceStorage, StorageResult
+from .persistence import PersistenceStorage, StorageResult, extract_index_value, normalize_index_fields
+from .connection_pool import SQLiteConnectionPool, WriteBatcher, upsert_sql
 
 
 class SQLiteStorage(PersistenceStorage):
     """SQLite存儲類"""
     
-    def __init__(self, db_path: str = "data/storage.db", table_name: str = "data"):
+    def __init__(
+        self,
+        db_path: str = "data/storage.db",
+        table_name: str = "data",
+        pool_size: int = 4,
+        batch_writes: bool = False,
+        batch_interval_ms: float = 5.0,
+        indexed_fields: Optional[Dict[str, Union[str, Sequence[str]]]] = None,
+        indexes: Optional[List[Sequence[str]]] = None
+    ):
         """初始化SQLite存儲
         
         Args:
             db_path: 數據庫文件路徑
             table_name: 表名
+            pool_size: 連接池大小
+            batch_writes: 是否啟用寫入批次（write-behind），啟用後 save/delete 會在
+                batch_interval_ms 內合併為一個事務提交
+            batch_interval_ms: 批次提交間隔（毫秒）
+            indexed_fields: 從數據中提取到獨立列的頂層字段，列名 -> 字段名（或候選字段名
+                序列）。created_at/updated_at 對應已有的時間戳列，其他列會自動添加
+            indexes: 需要建立的（複合）索引，每項為列名序列
         """
         self.db_path = db_path
         self.table_name = table_name
+        self.indexed_fields = normalize_index_fields(indexed_fields)
+        self.extra_columns = [
+            column for column in self.indexed_fields if column not in ("created_at", "updated_at")
+        ]
+        self.indexes = [tuple(columns) for columns in (indexes or [])]
+        self.upsert_statement = upsert_sql(self.table_name, self.extra_columns)
         
         # 確保目錄存在
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
         
         # 初始化數據庫
         self._init_db()
+        
+        # 長期存活的連接池
+        self.pool = SQLiteConnectionPool(self.db_path, pool_size=pool_size)
+        
+        # 可選的寫入批次器
+        self.batcher = (
+            WriteBatcher(
+                self.pool,
+                self.table_name,
+                flush_interval_ms=batch_interval_ms,
+                upsert_statement=self.upsert_statement
+            )
+            if batch_writes else None
+        )
     
     def _init_db(self):
         """初始化數據庫"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        # WAL模式會保存在數據庫文件中，讀寫可以並行
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
         # 創建表
         cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS {self.table_name} (
@@ -51,9 +91,43 @@ class SQLiteStorage(PersistenceStorage):
         # 創建索引
         cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{self.table_name}_key ON {self.table_name} (key)')
         
+        # 遷移：添加缺少的索引列（ADD COLUMN 不會重寫表，舊行的值為NULL，需另行回填）
+        cursor.execute(f"PRAGMA table_info({self.table_name})")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        for column in self.extra_columns:
+            if column not in existing_columns:
+                cursor.execute(f"ALTER TABLE {self.table_name} ADD COLUMN {column} TEXT")
+        
+        for columns in self.indexes:
+            index_name = f"idx_{self.table_name}_{'_'.join(columns)}"
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {index_name} ON {self.table_name} ({', '.join(columns)})"
+            )
+        
         conn.commit()
         conn.close()
     
+    async def close(self):
+        """提交待寫入數據並關閉連接池"""
+        if self.batcher is not None:
+            await self.batcher.close()
+        await self.pool.close()
+    
+    async def flush(self) -> StorageResult:
+        """立即提交批次器中待寫入的數據
+        
+        Returns:
+            存儲操作結果
+        """
+        if self.batcher is None:
+            return StorageResult.ok("未啟用寫入批次", 0)
+        
+        try:
+            count = await self.batcher.flush()
+            return StorageResult.ok(f"已提交 {count} 個寫入", count)
+        except Exception as e:
+            return StorageResult.error(f"提交批次寫入失敗: {str(e)}", e)
+    
     async def save(self, key: str, data: Any) -> StorageResult:
         """保存數據到SQLite
         
@@ -66,28 +140,14 @@ class SQLiteStorage(PersistenceStorage):
         """
         try:
             # 序列化數據
-            serialized_data = json.dumps(self._prepare_data_for_serialization(data), ensure_ascii=False)
-            now = datetime.now().isoformat()
-            
-            async with aiosqlite.connect(self.db_path) as db:
-                # 檢查是否已存在
-                cursor = await db.execute(f"SELECT key FROM {self.table_name} WHERE key = ?", (key,))
-                exists = await cursor.fetchone()
-                
-                if exists:
-                    # 更新現有記錄
-                    await db.execute(
-                        f"UPDATE {self.table_name} SET data = ?, updated_at = ? WHERE key = ?",
-                        (serialized_data, now, key)
-                    )
-                else:
-                    # 插入新記錄
-                    await db.execute(
-                        f"INSERT INTO {self.table_name} (key, data, created_at, updated_at) VALUES (?, ?, ?, ?)",
-                        (key, serialized_data, now, now)
-                    )
-                
-                await db.commit()
+            row = self._build_row(key, self._prepare_data_for_serialization(data))
+            
+            if self.batcher is not None:
+                self.batcher.upsert(key, row)
+            else:
+                async with self.pool.acquire() as db:
+                    await db.execute(self.upsert_statement, row)
+                    await db.commit()
             
             return StorageResult.ok(f"數據已保存: {key}", key)
         except Exception as e:
@@ -103,9 +163,14 @@ class SQLiteStorage(PersistenceStorage):
             包含數據的存儲操作結果
         """
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                cursor = await db.execute(f"SELECT data FROM {self.table_name} WHERE key = ?", (key,))
-                row = await cursor.fetchone()
+            pending, value = self._get_pending(key)
+            if pending:
+                # 讀取尚未提交的寫入，保證讀到自己的寫入
+                row = None if value is WriteBatcher.DELETE else (value,)
+            else:
+                async with self.pool.acquire() as db:
+                    cursor = await db.execute(f"SELECT data FROM {self.table_name} WHERE key = ?", (key,))
+                    row = await cursor.fetchone()
             
             if not row:
                 return StorageResult.error(f"找不到數據: {key}")
@@ -129,21 +194,28 @@ class SQLiteStorage(PersistenceStorage):
             存儲操作結果
         """
         try:
-            # 檢查記錄是否存在
-            if not await self.exists(key):
-                return StorageResult.error(f"找不到要更新的數據: {key}")
-            
             # 序列化數據
-            serialized_data = json.dumps(self._prepare_data_for_serialization(data), ensure_ascii=False)
-            now = datetime.now().isoformat()
+            row = self._build_row(key, self._prepare_data_for_serialization(data))
+            
+            if self.batcher is not None:
+                if not await self.exists(key):
+                    return StorageResult.error(f"找不到要更新的數據: {key}")
+                self.batcher.upsert(key, row)
+                return StorageResult.ok(f"數據已更新: {key}", key)
             
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(
-                    f"UPDATE {self.table_name} SET data = ?, updated_at = ? WHERE key = ?",
-                    (serialized_data, now, key)
+            # 與 upsert 參數行對應，created_at 不隨更新改變
+            assignments = ", ".join(f"{column} = ?" for column in ["data", "updated_at", *self.extra_columns])
+            async with self.pool.acquire() as db:
+                cursor = await db.execute(
+                    f"UPDATE {self.table_name} SET {assignments} WHERE key = ?",
+                    (row[1], *row[3:], key)
                 )
                 await db.commit()
             
+            # 以受影響行數判斷記錄是否存在，省去一次查詢
+            if cursor.rowcount == 0:
+                return StorageResult.error(f"找不到要更新的數據: {key}")
+            
             return StorageResult.ok(f"數據已更新: {key}", key)
         except Exception as e:
             return StorageResult.error(f"更新數據失敗: {str(e)}", e)
@@ -158,14 +230,19 @@ class SQLiteStorage(PersistenceStorage):
             存儲操作結果
         """
         try:
-            # 檢查記錄是否存在
-            if not await self.exists(key):
-                return StorageResult.error(f"找不到要刪除的數據: {key}")
+            if self.batcher is not None:
+                if not await self.exists(key):
+                    return StorageResult.error(f"找不到要刪除的數據: {key}")
+                self.batcher.delete(key)
+                return StorageResult.ok(f"數據已刪除: {key}")
             
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(f"DELETE FROM {self.table_name} WHERE key = ?", (key,))
+            async with self.pool.acquire() as db:
+                cursor = await db.execute(f"DELETE FROM {self.table_name} WHERE key = ?", (key,))
                 await db.commit()
             
+            if cursor.rowcount == 0:
+                return StorageResult.error(f"找不到要刪除的數據: {key}")
+            
             return StorageResult.ok(f"數據已刪除: {key}")
         except Exception as e:
             return StorageResult.error(f"刪除數據失敗: {str(e)}", e)
@@ -183,7 +260,10 @@ class SQLiteStorage(PersistenceStorage):
             # 將*轉換為SQL LIKE模式
             sql_pattern = pattern.replace("*", "%")
             
-            async with aiosqlite.connect(self.db_path) as db:
+            # 範圍查詢前先提交待寫入數據
+            await self._flush_pending()
+            
+            async with self.pool.acquire() as db:
                 cursor = await db.execute(
                     f"SELECT key FROM {self.table_name} WHERE key LIKE ?",
                     (sql_pattern,)
@@ -207,7 +287,11 @@ class SQLiteStorage(PersistenceStorage):
             數據是否存在
         """
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            pending, value = self._get_pending(key)
+            if pending:
+                return value is not WriteBatcher.DELETE
+            
+            async with self.pool.acquire() as db:
                 cursor = await db.execute(f"SELECT 1 FROM {self.table_name} WHERE key = ?", (key,))
                 row = await cursor.fetchone()
             
@@ -226,7 +310,9 @@ class SQLiteStorage(PersistenceStorage):
             查詢結果
         """
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            await self._flush_pending()
+            
+            async with self.pool.acquire() as db:
                 cursor = await db.execute(sql, params)
                 rows = await cursor.fetchall()
             
@@ -234,6 +320,48 @@ class SQLiteStorage(PersistenceStorage):
         except Exception as e:
             return StorageResult.error(f"執行查詢失敗: {str(e)}", e)
     
+    def _build_row(self, key: str, prepared_data: Any) -> Tuple[Any, ...]:
+        """構建 upsert 參數行
+        
+        Args:
+            key: 數據鍵
+            prepared_data: 已準備好序列化的數據
+            
+        Returns:
+            (key, data, created_at, updated_at, *extra_columns)
+        """
+        now = datetime.now().isoformat()
+        values = {
+            column: extract_index_value(prepared_data, fields)
+            for column, fields in self.indexed_fields.items()
+        }
+        
+        return (
+            key,
+            json.dumps(prepared_data, ensure_ascii=False),
+            values.get("created_at") or now,
+            values.get("updated_at") or now,
+            *(values[column] for column in self.extra_columns)
+        )
+    
+    def _get_pending(self, key: str):
+        """查詢批次器中尚未提交的寫入
+        
+        Args:
+            key: 數據鍵
+            
+        Returns:
+            (是否有待提交寫入, 序列化數據或刪除標記)
+        """
+        if self.batcher is None:
+            return False, None
+        return self.batcher.get_pending(key)
+    
+    async def _flush_pending(self):
+        """在範圍查詢前提交待寫入數據"""
+        if self.batcher is not None and self.batcher.pending_count:
+            await self.batcher.flush()
+    
     def _prepare_data_for_serialization(self, data: Any) -> Any:
         """準備數據以進行序列化
         
@@ -252,6 +380,8 @@ class SQLiteStorage(PersistenceStorage):
             return [self._prepare_data_for_serialization(item) for item in data]
         elif isinstance(data, datetime):
             return {"__datetime__": data.isoformat()}
+        elif isinstance(data, Enum):
+            return data.value
         elif hasattr(data, "to_dict") and callable(getattr(data, "to_dict")):
             return data.to_dict()
         elif hasattr(data, "__dict__"):
@@ -1,6 +1,7 @@
 """音樂生成模組
 
-包含各種音樂生成服務和工具
+包含各種音樂生成服務和工具。各服務在首次訪問時才導入（Magenta 相關服務會載入
+TensorFlow），導入本套件本身不會載入任何重型依賴。
 """
 
 import os
@@ -8,87 +9,114 @@ import importlib
 import logging
 from typing import Dict, Any, List, Optional, Tuple, Union
 
+try:
+    from ..mcp.lazy_import import modules_available
+except ImportError:
+    # 以 backend 為根目錄導入時
+    from mcp.lazy_import import modules_available
+
 logger = logging.getLogger(__name__)
 
 # 環境變量設置
 USE_MOCK = os.environ.get("USE_MOCK_MAGENTA", "true").lower() == "true"
 
-# 檢查 Magenta 是否可用
-MAGENTA_AVAILABLE = False
-try:
-    import magenta
-    MAGENTA_AVAILABLE = True
-    logger.info("成功導入 Magenta 模組")
-except ImportError:
-    logger.warning("無法導入 Magenta 模組，將使用模擬服務")
-
-# 根據環境條件選擇適當的服務
-if USE_MOCK or not MAGENTA_AVAILABLE:
-    try:
-        from .mock_magenta_service import MagentaService
-        logger.info("使用模擬 Magenta 服務")
-    except ImportError as e:
-        try:
-            from .magenta_service import MagentaService
-            logger.warning("使用真實 Magenta 服務（因模擬服務不可用），但部分功能可能受限")
-        except ImportError:
-            logger.error("無法導入任何 Magenta 服務，音樂生成功能將不可用")
-            
-            # 創建一個最小化的服務以避免程序崩潰
-            class MagentaService:
-                def __init__(self, *args, **kwargs):
-                    logger.error("使用最小服務，大多數功能將返回空結果")
-                
-                def generate_melody(self, *args, **kwargs):
-                    return []
-                
-                def generate_accompaniment(self, *args, **kwargs):
-                    return {"chords": [], "bass": []}
-                
-                def generate_drum_pattern(self, *args, **kwargs):
-                    return []
-                
-                def melody_to_midi(self, *args, **kwargs):
-                    return ""
-                
-                def generate_full_arrangement(self, *args, **kwargs):
-                    return {"melody": [], "chords": [], "bass": [], "drums": []}
-else:
-    try:
-        from .magenta_service import MagentaService
-        logger.info("使用真實 Magenta 服務")
-    except ImportError:
-        logger.warning("無法導入真實 Magenta 服務，將回退使用模擬服務")
+# 檢查 Magenta 是否可用（只查找模組，不導入）
+MAGENTA_AVAILABLE = modules_available("magenta")
+if not MAGENTA_AVAILABLE:
+    logger.warning("無法找到 Magenta 模組，將使用模擬服務")
+
+# 版本
+__version__ = '0.1.0'
+
+# 延遲導出：名稱 -> (模組, 屬性)
+_LAZY_EXPORTS = {
+    'MockMagentaService': ('.mock_magenta_service', 'MagentaService'),
+    'PerformanceRNNService': ('.performance_rnn_service', 'PerformanceRNNService'),
+    'MusicVAEService': ('.music_vae_service', 'MusicVAEService'),
+    'MagentaModelManager': ('.magenta_model_manager', 'MagentaModelManager'),
+    'ModelType': ('.magenta_model_manager', 'ModelType'),
+    'ModelConfiguration': ('.magenta_model_manager', 'ModelConfiguration'),
+    'EvaluationMetrics': ('.magenta_model_manager', 'EvaluationMetrics'),
+    'TimbreEngine': ('.timbre_engine', 'TimbreEngine'),
+    'TimbreInstrument': ('.timbre_engine', 'TimbreInstrument'),
+    'TimbrePreset': ('.timbre_engine', 'TimbrePreset'),
+    'HarmonyOptimizer': ('.harmony_optimizer', 'HarmonyOptimizer'),
+    'Scale': ('.harmony_optimizer', 'Scale'),
+    'ChordType': ('.harmony_optimizer', 'ChordType'),
+    'Chord': ('.harmony_optimizer', 'Chord'),
+    'KeySignature': ('.harmony_optimizer', 'KeySignature'),
+    'LLMMusicGenerator': ('.llm_music_generator', 'LLMMusicGenerator'),
+    'LLMProviderType': ('.llm_music_generator', 'LLMProviderType'),
+    'LLMGenerationConfig': ('.llm_music_generator', 'LLMGenerationConfig'),
+    'ChordGenerator': ('.accompaniment_generator', 'ChordGenerator'),
+    'AccompanimentGenerator': ('.accompaniment_generator', 'AccompanimentGenerator'),
+}
+
+
+class _MinimalMagentaService:
+    """無法導入任何 Magenta 服務時使用的最小化服務，避免程序崩潰"""
+
+    def __init__(self, *args, **kwargs):
+        logger.error("使用最小服務，大多數功能將返回空結果")
+
+    def generate_melody(self, *args, **kwargs):
+        return []
+
+    def generate_accompaniment(self, *args, **kwargs):
+        return {"chords": [], "bass": []}
+
+    def generate_drum_pattern(self, *args, **kwargs):
+        return []
+
+    def melody_to_midi(self, *args, **kwargs):
+        return ""
+
+    def generate_full_arrangement(self, *args, **kwargs):
+        return {"melody": [], "chords": [], "bass": [], "drums": []}
+
+
+def _load_magenta_service():
+    """根據環境條件選擇適當的 Magenta 服務"""
+    if USE_MOCK or not MAGENTA_AVAILABLE:
+        candidates = [('.mock_magenta_service', "使用模擬 Magenta 服務"),
+                      ('.magenta_service', "使用真實 Magenta 服務（因模擬服務不可用），但部分功能可能受限")]
+    else:
+        candidates = [('.magenta_service', "使用真實 Magenta 服務"),
+                      ('.mock_magenta_service', "回退使用模擬 Magenta 服務")]
+
+    for module_name, message in candidates:
         try:
-            from .mock_magenta_service import MagentaService
-            logger.info("回退使用模擬 Magenta 服務")
-        except ImportError:
-            logger.error("無法導入任何 Magenta 服務，音樂生成功能將不可用")
-            
-            # 創建一個最小化的服務以避免程序崩潰
-            class MagentaService:
-                def __init__(self, *args, **kwargs):
-                    logger.error("使用最小服務，大多數功能將返回空結果")
-                
-                def generate_melody(self, *args, **kwargs):
-                    return []
-                
-                def generate_accompaniment(self, *args, **kwargs):
-                    return {"chords": [], "bass": []}
-                
-                def generate_drum_pattern(self, *args, **kwargs):
-                    return []
-                
-                def melody_to_midi(self, *args, **kwargs):
-                    return ""
-                
-                def generate_full_arrangement(self, *args, **kwargs):
-                    return {"melody": [], "chords": [], "bass": [], "drums": []}
+            service = importlib.import_module(module_name, __name__).MagentaService
+            logger.info(message)
+            return service
+        except ImportError as e:
+            logger.warning(f"無法導入 {module_name[1:]}: {str(e)}")
+
+    logger.error("無法導入任何 Magenta 服務，音樂生成功能將不可用")
+    return _MinimalMagentaService
+
+
+def __getattr__(name: str) -> Any:
+    """首次訪問時導入導出的類並緩存到模組命名空間"""
+    if name == 'MagentaService':
+        value = _load_magenta_service()
+    elif name in _LAZY_EXPORTS:
+        module_name, attribute = _LAZY_EXPORTS[name]
+        value = getattr(importlib.import_module(module_name, __name__), attribute)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
+
 
 # 添加輔助函數
 def get_service_status():
     """獲取服務狀態信息
-    
+
     Returns:
         dict: 包含服務狀態的字典
     """
@@ -98,147 +126,29 @@ def get_service_status():
         "service_type": "模擬" if (USE_MOCK or not MAGENTA_AVAILABLE) else "真實"
     }
 
-# 導出主要類
-try:
-    from .magenta_service import MagentaService
-except ImportError as e:
-    logging.warning(f"無法導入 MagentaService: {str(e)}")
-
-# 導出自動編曲模組
-try:
-    from .accompaniment_generator import ChordGenerator, AccompanimentGenerator
-except ImportError as e:
-    logging.warning(f"無法導入自動編曲模組: {str(e)}")
-
-# 版本
-__version__ = '0.1.0'
-
-# 匯出 MagentaService
-from .magenta_service import MagentaService
-from .mock_magenta_service import MagentaService as MockMagentaService
-
-# 匯出 Performance RNN 服務
-from .performance_rnn_service import PerformanceRNNService
-
-# 匯出 Music VAE 服務
-from .music_vae_service import MusicVAEService
-
-# 匯出新的模組
-from .magenta_model_manager import (
-    MagentaModelManager, 
-    ModelType, 
-    ModelConfiguration,
-    EvaluationMetrics
-)
-
-from .timbre_engine import (
-    TimbreEngine,
-    TimbreInstrument,
-    TimbrePreset
-)
-
-from .harmony_optimizer import (
-    HarmonyOptimizer,
-    Scale,
-    ChordType,
-    Chord,
-    KeySignature
-)
 
-try:
-    from .llm_music_generator import LLMMusicGenerator, LLMProviderType, LLMGenerationConfig
-
-    # 導出所有類
-    __all__ = [
-        'MagentaService',
-        'MockMagentaService',
-        'MusicVAEService',
-        'PerformanceRNNService',
-        'HarmonyOptimizer',
-        'Scale',
-        'ChordType',
-        'TimbreEngine',
-        'SoundFont',
-        'MagentaModelManager',
-        'ModelType',
-        'ModelConfiguration',
-        'EvaluationMetrics',
-        'LLMMusicGenerator',
-        'LLMProviderType',
-        'LLMGenerationConfig'
-    ]
-    
-    logger.info("已成功加載音樂生成模組")
-    
-except ImportError as e:
-    logger.warning(f"加載音樂生成模組時發生錯誤: {str(e)}")
-    
-    # 定義假的類以避免導入錯誤
-    class MagentaService:
-        pass
-    
-    class MockMagentaService:
-        pass
-    
-    class MusicVAEService:
-        pass
-    
-    class PerformanceRNNService:
-        pass
-    
-    class HarmonyOptimizer:
-        pass
-    
-    class Scale:
-        MAJOR = "major"
-        MINOR = "minor"
-    
-    class ChordType:
-        MAJOR = "major"
-        MINOR = "minor"
-    
-    class TimbreEngine:
-        pass
-    
-    class SoundFont:
-        pass
-    
-    class MagentaModelManager:
-        pass
-    
-    class ModelType:
-        pass
-    
-    class ModelConfiguration:
-        pass
-    
-    class EvaluationMetrics:
-        pass
-    
-    class LLMMusicGenerator:
-        pass
-    
-    class LLMProviderType:
-        pass
-    
-    class LLMGenerationConfig:
-        pass
-    
-    __all__ = [
-        'MagentaService',
-        'MockMagentaService',
-        'MusicVAEService',
-        'PerformanceRNNService',
-        'HarmonyOptimizer',
-        'Scale',
-        'ChordType',
-        'TimbreEngine',
-        'SoundFont',
-        'MagentaModelManager',
-        'ModelType',
-        'ModelConfiguration',
-        'EvaluationMetrics',
-        'LLMMusicGenerator',
-        'LLMProviderType',
-        'LLMGenerationConfig'
-    ] 
\ No newline at end of file
+# 導出所有類
+__all__ = [
+    'MagentaService',
+    'MockMagentaService',
+    'MusicVAEService',
+    'PerformanceRNNService',
+    'HarmonyOptimizer',
+    'Scale',
+    'ChordType',
+    'Chord',
+    'KeySignature',
+    'TimbreEngine',
+    'TimbreInstrument',
+    'TimbrePreset',
+    'MagentaModelManager',
+    'ModelType',
+    'ModelConfiguration',
+    'EvaluationMetrics',
+    'LLMMusicGenerator',
+    'LLMProviderType',
+    'LLMGenerationConfig',
+    'ChordGenerator',
+    'AccompanimentGenerator',
+    'get_service_status'
+]
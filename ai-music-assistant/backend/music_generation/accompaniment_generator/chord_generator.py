@@ -8,7 +8,7 @@ import numpy as np
 import os
 import sys
 from typing import List, Dict, Any, Optional, Tuple
-from music21 import chord, note, stream, key, pitch
+from music21 import chord, key, pitch
 
 # 添加項目根目錄到 Python 路徑
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,6 +17,7 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from backend.mcp.mcp_schema import Note as MCPNote, MelodyInput
+from backend.music_theory.key_detection import detect_key
 
 logger = logging.getLogger(__name__)
 
@@ -77,20 +78,8 @@ class ChordGenerator:
             檢測到的調性，例如 "C" 或 "Am"
         """
         try:
-            # 轉換為 music21 音符
-            notes_stream = stream.Stream()
-            for note_obj in melody_notes:
-                p = pitch.Pitch()
-                p.midi = note_obj.pitch
-                notes_stream.append(note.Note(p))
-            
-            # 檢測調性
-            detected_key = notes_stream.analyze('key')
-            
-            # 格式化調性名稱
-            key_name = detected_key.tonicPitchNameWithCase
-            
-            return key_name
+            # 檢測調性，返回 music21 的調名寫法（小調為小寫）
+            return detect_key(melody_notes).music21_name
         
         except Exception as e:
             logger.warning(f"調性檢測失敗，使用默認調性 C: {str(e)}")
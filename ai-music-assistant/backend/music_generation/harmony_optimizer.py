@@ -5,15 +5,20 @@
 
 import logging
 import numpy as np
-from typing import Dict, List, Tuple, Optional, Any, Set
+from typing import Dict, List, Tuple, Optional, Any, Set, Union
 from enum import Enum
 from dataclasses import dataclass
 import random
 
-from ...mcp.mcp_schema import MusicParameters, Note
+from ..mcp.mcp_schema import MusicParameters, Note
+from ..mcp.note_array import NoteArray
+from ..music_theory.key_detection import detect_key, MAJOR
 
 logger = logging.getLogger(__name__)
 
+# 檢測到的主音音級 (0-11) 放到第 4 八度，與 set_key_signature 的 MIDI 音高約定一致
+MIDDLE_C = 60
+
 
 class ChordType(Enum):
     """和弦類型"""
@@ -112,12 +117,20 @@ class KeySignature:
         
         # 計算調號中的和弦級數
         self.chords = self._calculate_chords()
+        
+        # 按音級（0-11）查表：是否調內、到最接近調內音的半音偏移（可跨八度，距離相同時向下），
+        # 供整個音高數組一次計算
+        self._in_key_table = np.isin(np.arange(12), self.scale_notes)
+        self._nearest_offset = np.array([
+            min((abs(offset), offset) for offset in range(-6, 7) if (note_class + offset) % 12 in self.scale_notes)[1]
+            for note_class in range(12)
+        ])
     
     def _calculate_scale_notes(self) -> List[int]:
         """計算調號中的音符
         
         Returns:
-            List[int]: 調號中的音符 (音程)
+            List[int]: 調號中的音級 (0-11)
         """
         scale_intervals = {
             Scale.MAJOR: [0, 2, 4, 5, 7, 9, 11],  # 全全半全全全半
@@ -134,7 +147,7 @@ class KeySignature:
             Scale.BLUES: [0, 3, 5, 6, 7, 10]  # 藍調音階
         }
         
-        return [(self.root % 12) + interval for interval in scale_intervals[self.scale]]
+        return sorted((self.root + interval) % 12 for interval in scale_intervals[self.scale])
     
     def _calculate_chords(self) -> Dict[int, Chord]:
         """計算調號中的和弦級數
@@ -197,17 +210,31 @@ class KeySignature:
         Returns:
             int: 最接近的調內音符
         """
-        note_class = note % 12
-        octave = note // 12
-        
-        if note_class in self.scale_notes:
-            return note
+        # 調內音的偏移為 0
+        return note + int(self._nearest_offset[note % 12])
+    
+    def in_key_mask(self, pitches: np.ndarray) -> np.ndarray:
+        """批量檢查音符是否在調內
         
-        # 尋找最接近的調內音
-        distances = [(abs(note_class - sn), sn) for sn in self.scale_notes]
-        distances.sort()
+        Args:
+            pitches: MIDI 音高數組
+            
+        Returns:
+            np.ndarray: 布爾數組
+        """
+        return self._in_key_table[np.asarray(pitches) % 12]
+    
+    def nearest_scale_notes(self, pitches: np.ndarray) -> np.ndarray:
+        """批量獲取最接近的調內音符，調內音保持不變
         
-        return (octave * 12) + distances[0][1]
+        Args:
+            pitches: MIDI 音高數組
+            
+        Returns:
+            np.ndarray: 調整後的音高數組
+        """
+        pitches = np.asarray(pitches, dtype=np.int64)
+        return pitches + self._nearest_offset[pitches % 12]
 
 
 class HarmonyOptimizer:
@@ -232,45 +259,41 @@ class HarmonyOptimizer:
         self.key_signature = KeySignature(root, scale)
         logger.info(f"設置調號: 根音={root}, 音階={scale.value}")
     
-    def analyze_melody(self, notes: List[Note]) -> Dict[str, Any]:
+    def analyze_melody(self, notes: Union[List[Note], NoteArray]) -> Dict[str, Any]:
         """分析旋律
         
         Args:
-            notes: 旋律音符
+            notes: 旋律音符（列表或音符數組）
             
         Returns:
             Dict[str, Any]: 分析結果
         """
-        if not notes:
+        if not len(notes):
             return {"error": "空旋律"}
         
         logger.info(f"分析旋律，音符數量: {len(notes)}")
+        array = NoteArray.from_notes(notes)
         
         # 如果尚未設置調號，嘗試檢測調號
         if self.key_signature is None:
-            detected_key = self._detect_key(notes)
+            detected_key = self._detect_key(array)
             self.set_key_signature(detected_key["root"], detected_key["scale"])
         
-        # 分析音符分佈
-        pitches = [note.pitch for note in notes]
-        
         # 計算調內和調外音符
-        in_key_notes = [p for p in pitches if self.key_signature.is_in_key(p)]
-        out_of_key_notes = [p for p in pitches if not self.key_signature.is_in_key(p)]
+        in_key_count = int(self.key_signature.in_key_mask(array.pitch).sum())
         
         # 計算音域
-        range_min = min(pitches) if pitches else 0
-        range_max = max(pitches) if pitches else 0
+        range_min = int(array.pitch.min())
+        range_max = int(array.pitch.max())
         
         # 節奏分析
-        durations = [note.duration for note in notes]
-        mean_duration = sum(durations) / len(durations) if durations else 0
+        mean_duration = float(array.duration.mean())
         
         return {
-            "total_notes": len(notes),
-            "in_key_notes": len(in_key_notes),
-            "out_of_key_notes": len(out_of_key_notes),
-            "key_adherence": len(in_key_notes) / len(notes) if notes else 0,
+            "total_notes": len(array),
+            "in_key_notes": in_key_count,
+            "out_of_key_notes": len(array) - in_key_count,
+            "key_adherence": in_key_count / len(array),
             "pitch_range": (range_min, range_max),
             "pitch_range_span": range_max - range_min,
             "mean_duration": mean_duration,
@@ -280,41 +303,24 @@ class HarmonyOptimizer:
             }
         }
     
-    def _detect_key(self, notes: List[Note]) -> Dict[str, Any]:
+    def _detect_key(self, notes: Union[List[Note], NoteArray]) -> Dict[str, Any]:
         """檢測旋律的可能調號
         
         Args:
-            notes: 旋律音符
+            notes: 旋律音符（列表或音符數組）
             
         Returns:
-            Dict[str, Any]: 檢測到的調號
+            Dict[str, Any]: 檢測到的調號，root 與 set_key_signature 一致為 MIDI 音高（第 4 八度），
+                tonic 為主音音級 (0-11)
         """
         logger.info("檢測旋律的調號")
         
-        # 簡單的檢測方法：統計音符出現頻率，匹配大調或小調模式
-        pitch_classes = [note.pitch % 12 for note in notes]
-        pitch_counts = {i: pitch_classes.count(i) for i in range(12)}
-        
-        # 檢查與各個大調和小調的匹配度
-        best_score = -1
-        best_key = {"root": 0, "scale": Scale.MAJOR}
-        
-        for root in range(12):
-            # 檢查大調
-            major_key = KeySignature(root, Scale.MAJOR)
-            major_score = sum(pitch_counts.get(pc, 0) for pc in major_key.scale_notes)
-            
-            # 檢查小調
-            minor_key = KeySignature(root, Scale.MINOR)
-            minor_score = sum(pitch_counts.get(pc, 0) for pc in minor_key.scale_notes)
-            
-            if major_score > best_score:
-                best_score = major_score
-                best_key = {"root": root, "scale": Scale.MAJOR}
-            
-            if minor_score > best_score:
-                best_score = minor_score
-                best_key = {"root": root, "scale": Scale.MINOR}
+        estimate = detect_key(notes)
+        best_key = {
+            "root": MIDDLE_C + estimate.tonic,
+            "tonic": estimate.tonic,
+            "scale": Scale.MAJOR if estimate.mode == MAJOR else Scale.MINOR
+        }
         
         logger.info(f"檢測到的調號: 根音={best_key['root']}, 音階={best_key['scale'].value}")
         return best_key
@@ -373,27 +379,28 @@ class HarmonyOptimizer:
         return chords
     
     def harmonize_melody(self, 
-                        notes: List[Note], 
+                        notes: Union[List[Note], NoteArray], 
                         style: str = "basic") -> List[Chord]:
         """為旋律創建和聲
         
         Args:
-            notes: 旋律音符
+            notes: 旋律音符（列表或音符數組）
             style: 和聲風格
             
         Returns:
             List[Chord]: 和弦列表
         """
-        if not notes:
+        if not len(notes):
             return []
         
         logger.info(f"為旋律創建和聲，音符數量: {len(notes)}, 風格: {style}")
+        array = NoteArray.from_notes(notes)
         
         # 分析旋律
-        analysis = self.analyze_melody(notes)
+        analysis = self.analyze_melody(array)
         
         # 確定和弦變化點 (簡單策略：每小節一個和弦)
-        max_time = max([n.start_time + n.duration for n in notes])
+        max_time = array.total_duration
         measures = int(max_time / 4) + 1  # 假設4/4拍
         
         # 生成和弦進行
@@ -409,46 +416,47 @@ class HarmonyOptimizer:
         return aligned_chords
     
     def optimize_melody(self, 
-                      notes: List[Note], 
-                      strictness: float = 0.5) -> List[Note]:
+                      notes: Union[List[Note], NoteArray], 
+                      strictness: float = 0.5) -> Union[List[Note], NoteArray]:
         """優化旋律以更好地符合和聲
         
         Args:
-            notes: 旋律音符
+            notes: 旋律音符（列表或音符數組）
             strictness: 嚴格程度 (0.0-1.0)，越高越嚴格遵循調內音
             
         Returns:
-            List[Note]: 優化後的旋律
+            優化後的旋律，類型與輸入相同
         """
-        if not notes or self.key_signature is None:
+        if not len(notes) or self.key_signature is None:
             return notes
         
         logger.info(f"優化旋律，音符數量: {len(notes)}, 嚴格度: {strictness}")
-        
-        optimized_notes = []
-        
-        for note in notes:
-            # 檢查是否需要修正
-            if not self.key_signature.is_in_key(note.pitch):
-                # 計算修正的機率
-                if random.random() < strictness:
-                    # 獲取最近的調內音
-                    new_pitch = self.key_signature.get_nearest_scale_note(note.pitch)
-                    
-                    # 創建新音符
-                    new_note = Note(
-                        pitch=new_pitch,
-                        start_time=note.start_time,
-                        duration=note.duration,
-                        velocity=note.velocity
-                    )
-                    optimized_notes.append(new_note)
-                else:
-                    # 保持原樣
-                    optimized_notes.append(note)
-            else:
-                # 在調內，保持原樣
-                optimized_notes.append(note)
+        array = NoteArray.from_notes(notes)
+        
+        # 找出調外音，並按順序逐個決定是否修正
+        out_of_key = np.flatnonzero(~self.key_signature.in_key_mask(array.pitch))
+        corrected = np.array(
+            [index for index in out_of_key.tolist() if random.random() < strictness],
+            dtype=np.int64
+        )
+        
+        # 修正為最近的調內音
+        new_pitch = array.pitch.copy()
+        new_pitch[corrected] = self.key_signature.nearest_scale_notes(array.pitch[corrected])
+        
+        if isinstance(notes, NoteArray):
+            return NoteArray(new_pitch, array.start, array.duration, array.velocity)
+        
+        # 列表輸入：未修正的音符保持原對象
+        optimized_notes = list(notes)
+        for index in corrected.tolist():
+            note = notes[index]
+            optimized_notes[index] = Note(
+                pitch=int(new_pitch[index]),
+                start_time=note.start_time,
+                duration=note.duration,
+                velocity=note.velocity
+            )
         
         return optimized_notes
     
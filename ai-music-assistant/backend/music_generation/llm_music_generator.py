@@ -6,7 +6,6 @@
 import os
 import logging
 import json
-import requests
 import base64
 import tempfile
 from typing import Dict, Any, List, Optional, Tuple, Union
@@ -15,6 +14,15 @@ from dataclasses import dataclass
 
 import numpy as np
 
+try:
+    from ..mcp.lazy_import import lazy_import
+except ImportError:
+    # 以 backend 為根目錄導入時
+    from mcp.lazy_import import lazy_import
+
+# requests 只在調用 LLM API 時使用
+requests = lazy_import("requests")
+
 # 嘗試導入 MCP 相關模組
 try:
     from mcp.mcp_schema import MusicParameters, Note, MelodyInput, Genre
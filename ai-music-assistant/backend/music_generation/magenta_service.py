@@ -57,6 +57,15 @@ except ImportError:
                         for key, value in kwargs.items():
                             setattr(self, key, value)
 
+# MIDI 文件寫入
+try:
+    from ..mcp.note_array import NoteArray
+    from ..mcp.smf_writer import SMFTrack, write_smf
+except ImportError:
+    from mcp.note_array import NoteArray
+    from mcp.smf_writer import SMFTrack, write_smf
+
+
 class MagentaService:
     """Magenta 音樂生成服務(模擬版)
 
@@ -309,9 +318,9 @@ class MagentaService:
             temp_dir = tempfile.gettempdir()
             output_path = os.path.join(temp_dir, f"melody_{int(random.random() * 1000)}.mid")
         
-        # 寫入一個空的文件
-        with open(output_path, 'wb') as f:
-            f.write(b'MThd' + b'\x00\x00\x00\x06' + b'\x00\x01' + b'\x00\x01' + b'\x01\x80')
+        # 音符時間以秒為單位，轉換為拍
+        notes = NoteArray.from_notes(melody).scale_time(tempo / 60)
+        write_smf(output_path, [SMFTrack(notes, program=0, name="Melody")], tempo=tempo)
         
         return output_path
 
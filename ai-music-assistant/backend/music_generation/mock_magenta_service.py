@@ -57,6 +57,15 @@ except ImportError:
                         for key, value in kwargs.items():
                             setattr(self, key, value)
 
+# MIDI 文件寫入
+try:
+    from ..mcp.note_array import NoteArray
+    from ..mcp.smf_writer import DRUM_CHANNEL, SMFTrack, write_smf
+except ImportError:
+    from mcp.note_array import NoteArray
+    from mcp.smf_writer import DRUM_CHANNEL, SMFTrack, write_smf
+
+
 class MagentaService:
     """Magenta 音樂生成服務(模擬版)
 
@@ -691,68 +700,13 @@ class MagentaService:
             output_path = os.path.join(temp_dir, f"melody_{int(random.random() * 1000)}.mid")
         
         try:
-            # 嘗試使用midiutil創建MIDI文件
-            from midiutil import MIDIFile
-            
-            # 創建一個單軌道的MIDI文件
-            midi = MIDIFile(1)
-            
-            # 添加軌道名稱和tempo
-            track = 0
-            time = 0
-            midi.addTrackName(track, time, "AI Generated Melody")
-            midi.addTempo(track, time, tempo)
-            
-            # 將音符添加到MIDI文件
-            for note in melody:
-                pitch = int(note.pitch)
-                # 確保音高在MIDI範圍內 (0-127)
-                if pitch < 0:
-                    pitch = 0
-                elif pitch > 127:
-                    pitch = 127
-                    
-                # 計算音符的開始時間(以拍為單位)
-                start_beat = note.start_time * (tempo / 60)
-                
-                # 計算音符的持續時間(以拍為單位)
-                duration_beat = note.duration * (tempo / 60)
-                
-                # 確保力度在合理範圍內
-                velocity = max(1, min(127, note.velocity))
-                
-                # 添加音符
-                midi.addNote(
-                    track=track,
-                    channel=0,  # 使用MIDI通道0
-                    pitch=pitch,
-                    time=start_beat,
-                    duration=duration_beat,
-                    volume=velocity
-                )
-            
-            # 寫入MIDI文件
-            with open(output_path, 'wb') as output_file:
-                midi.writeFile(output_file)
+            # 音符時間以秒為單位，轉換為拍；音高與力度由寫入器限制在 MIDI 範圍內
+            notes = NoteArray.from_notes(melody).scale_time(tempo / 60)
+            write_smf(output_path, [SMFTrack(notes, name="AI Generated Melody")], tempo=tempo)
                 
             logger.info(f"已成功創建MIDI文件: {output_path}，包含 {len(melody)} 個音符")
             return output_path
             
-        except ImportError:
-            logger.warning("無法使用midiutil庫，將創建基本MIDI文件")
-            # 寫入一個基本的MIDI文件頭部
-            with open(output_path, 'wb') as f:
-                # 標準MIDI文件頭部
-                f.write(b'MThd' + b'\x00\x00\x00\x06' + b'\x00\x01' + b'\x00\x01' + b'\x01\x80')
-                
-                # 寫入軌道頭
-                f.write(b'MTrk')
-                
-                # 占位 - 實際應用中應該計算軌道長度並填寫
-                f.write(b'\x00\x00\x00\x00')
-            
-            logger.warning(f"創建的是空MIDI文件: {output_path}，請安裝midiutil庫以生成有音符的文件")
-            return output_path
         except Exception as e:
             logger.error(f"創建MIDI文件時發生錯誤: {str(e)}")
             # 寫入一個空的文件
@@ -871,131 +825,47 @@ class MagentaService:
         midi_path = os.path.join(temp_dir, f"{style}_arrangement_{int(random.random() * 1000)}.mid")
         
         try:
-            # 嘗試使用midiutil創建多軌MIDI文件
-            from midiutil import MIDIFile
-            
-            # 創建一個四軌道的MIDI文件 (旋律、和弦、低音、鼓)
-            midi = MIDIFile(4)
-            
-            # 添加速度
-            for track in range(4):
-                midi.addTempo(track, 0, tempo)
-            
-            # 添加軌道名稱
-            midi.addTrackName(0, 0, "Melody")
-            midi.addTrackName(1, 0, "Chords")
-            midi.addTrackName(2, 0, "Bass")
-            midi.addTrackName(3, 0, "Drums")
-            
-            # 根據風格設置樂器音色
+            # 音符時間以秒為單位，轉換為拍
+            beats_per_second = tempo / 60
+            
+            def part(notes: List[Note], velocity_mod: float = 1.0, pitch_mods: Optional[List[int]] = None) -> NoteArray:
+                """按風格調整力度與音高後的聲部音符（音高與力度由寫入器限制在 MIDI 範圍內）"""
+                array = NoteArray.from_notes(notes).scale_time(beats_per_second)
+                pitch = array.pitch + pitch_mods if pitch_mods else array.pitch
+                return NoteArray(pitch, array.start, array.duration, (array.velocity * velocity_mod).astype(int))
+            
+            # 根據風格調整旋律的力度：搖滾樂旋律更強，古典樂旋律更柔和
+            melody_mod = {'rock': 1.2, 'classical': 0.9}.get(style, 1.0)
+            # 爵士樂和弦更輕柔，搖滾樂和弦更強勁
+            chords_mod = {'jazz': 0.8, 'rock': 1.1}.get(style, 1.0)
+            # 搖滾樂貝斯更強勁
+            bass_mod = 1.2 if style == 'rock' else 1.0
+            # 爵士樂通常有更活躍的貝斯線，30% 機率添加走音
+            bass_pitch_mods = None
+            if style == 'jazz':
+                bass_pitch_mods = [random.choice([-2, 2]) if random.random() < 0.3 else 0
+                                   for _ in accompaniment["bass"]]
+            # 古典樂通常沒有鼓點
+            drum_notes = drums
+            if style == 'classical':
+                drum_notes = [note for note in drums if random.random() >= 0.7]
+            # 搖滾樂的鼓點更強
+            drums_mod = 1.1 if style == 'rock' else 1.0
+            
+            # 根據風格設置樂器音色，四個音軌：旋律、和弦、低音、鼓
             instruments = current_style['instrument_map']
-            for track, (role, program) in enumerate([
-                ('melody', instruments['melody']), 
-                ('chords', instruments['chords']), 
-                ('bass', instruments['bass']), 
-                ('drums', instruments['drums'])
-            ]):
-                midi.addProgramChange(track, 0, 0, program)
-            
-            # 添加旋律軌道的音符
-            for note in melody:
-                # 轉換時間單位從秒到拍
-                start_beat = note.start_time * (tempo / 60)
-                duration_beat = note.duration * (tempo / 60)
-                
-                # 根據風格調整旋律的力度
-                velocity_mod = 1.0
-                if style == 'rock':
-                    velocity_mod = 1.2  # 搖滾樂旋律更強
-                elif style == 'classical':
-                    velocity_mod = 0.9  # 古典樂旋律更柔和
-                    
-                midi.addNote(
-                    track=0,
-                    channel=0,
-                    pitch=max(0, min(127, note.pitch)),
-                    time=start_beat,
-                    duration=duration_beat,
-                    volume=max(1, min(127, int(note.velocity * velocity_mod)))
-                )
-            
-            # 添加和弦軌道的音符
-            for note in accompaniment["chords"]:
-                start_beat = note.start_time * (tempo / 60)
-                duration_beat = note.duration * (tempo / 60)
-                
-                # 根據風格調整和弦的力度
-                velocity_mod = 1.0
-                if style == 'jazz':
-                    velocity_mod = 0.8  # 爵士樂和弦更輕柔
-                elif style == 'rock':
-                    velocity_mod = 1.1  # 搖滾樂和弦更強勁
-                    
-                midi.addNote(
-                    track=1,
-                    channel=0,
-                    pitch=max(0, min(127, note.pitch)),
-                    time=start_beat,
-                    duration=duration_beat,
-                    volume=max(1, min(127, int(note.velocity * velocity_mod)))
-                )
-            
-            # 添加低音軌道的音符
-            for note in accompaniment["bass"]:
-                start_beat = note.start_time * (tempo / 60)
-                duration_beat = note.duration * (tempo / 60)
-                
-                # 根據風格調整貝斯的力度和音高
-                velocity_mod = 1.0
-                pitch_mod = 0
-                
-                if style == 'rock':
-                    velocity_mod = 1.2  # 搖滾樂貝斯更強勁
-                elif style == 'jazz':
-                    # 爵士樂通常有更活躍的貝斯線
-                    if random.random() < 0.3:  # 30% 機率添加走音
-                        pitch_mod = random.choice([-2, 2])
-                    
-                midi.addNote(
-                    track=2,
-                    channel=0,
-                    pitch=max(0, min(127, note.pitch + pitch_mod)),
-                    time=start_beat,
-                    duration_beat=duration_beat,
-                    volume=max(1, min(127, int(note.velocity * velocity_mod)))
-                )
-            
-            # 添加鼓點軌道的音符
-            for note in drums:
-                start_beat = note.start_time * (tempo / 60)
-                duration_beat = note.duration * (tempo / 60)
-                
-                # 古典樂通常沒有鼓點
-                if style == 'classical' and random.random() < 0.7:
-                    continue
-                    
-                # 搖滾樂的鼓點更強
-                velocity_mod = 1.1 if style == 'rock' else 1.0
-                    
-                midi.addNote(
-                    track=3,
-                    channel=9,  # MIDI通道10（索引9）是標準鼓點通道
-                    pitch=max(0, min(127, note.pitch)),
-                    time=start_beat,
-                    duration=duration_beat,
-                    volume=max(1, min(127, int(note.velocity * velocity_mod)))
-                )
-            
-            # 寫入MIDI文件
-            with open(midi_path, 'wb') as output_file:
-                midi.writeFile(output_file)
+            tracks = [
+                SMFTrack(part(melody, melody_mod), program=instruments['melody'], name="Melody"),
+                SMFTrack(part(accompaniment["chords"], chords_mod), program=instruments['chords'], name="Chords"),
+                SMFTrack(part(accompaniment["bass"], bass_mod, bass_pitch_mods),
+                         program=instruments['bass'], name="Bass"),
+                # MIDI通道10（索引9）是標準鼓點通道
+                SMFTrack(part(drum_notes, drums_mod), channel=DRUM_CHANNEL, program=instruments['drums'], name="Drums")
+            ]
+            write_smf(midi_path, tracks, tempo=tempo)
                 
             logger.info(f"已成功創建 {style} 風格的完整編曲MIDI文件: {midi_path}")
         
-        except ImportError:
-            logger.warning("無法使用midiutil庫，將創建簡化版MIDI文件")
-            # 僅生成旋律部分的MIDI
-            self.melody_to_midi(melody, midi_path, tempo)
         except Exception as e:
             logger.error(f"創建MIDI文件時發生錯誤: {str(e)}")
             # 僅生成旋律部分的MIDI作為備選
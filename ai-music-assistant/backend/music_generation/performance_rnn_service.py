@@ -23,6 +23,7 @@ from magenta.music.protobuf import music_pb2
 from magenta.music import performance_lib
 
 from ...mcp.mcp_schema import MusicParameters, Note
+from ..mcp.note_array import NoteArray
 
 logger = logging.getLogger(__name__)
 
@@ -301,11 +302,11 @@ class PerformanceRNNService:
         
         return notes
 
-    def performance_to_midi(self, notes: List[Note], output_path: str, tempo: int = 120) -> str:
+    def performance_to_midi(self, notes: Union[List[Note], NoteArray], output_path: str, tempo: int = 120) -> str:
         """將演奏音符轉換為 MIDI 文件
 
         Args:
-            notes: 演奏音符列表
+            notes: 演奏音符列表或音符數組
             output_path: 輸出 MIDI 文件路徑
             tempo: 速度 (BPM)
 
@@ -318,19 +319,19 @@ class PerformanceRNNService:
             sequence.tempos.add().qpm = tempo
             sequence.ticks_per_quarter = constants.STANDARD_PPQ
             
-            for note in notes:
+            array = NoteArray.from_notes(notes)
+            for pitch, start, end, velocity in zip(
+                array.pitch.tolist(), array.start.tolist(), array.end.tolist(), array.velocity.tolist()
+            ):
                 sequence_note = sequence.notes.add()
-                sequence_note.pitch = note.pitch
-                sequence_note.start_time = note.start_time
-                sequence_note.end_time = note.start_time + note.duration
-                sequence_note.velocity = note.velocity
+                sequence_note.pitch = pitch
+                sequence_note.start_time = start
+                sequence_note.end_time = end
+                sequence_note.velocity = velocity
                 sequence_note.instrument = 0
                 sequence_note.program = 0
             
-            if notes:
-                sequence.total_time = max(note.start_time + note.duration for note in notes)
-            else:
-                sequence.total_time = 0
+            sequence.total_time = array.total_duration
             
             # 量化序列以確保正確的 MIDI 時序
             quantized_sequence = sequences_lib.quantize_note_sequence(
@@ -27,6 +27,8 @@ import librosa
 import sounddevice as sd
 
 from ...mcp.mcp_schema import MusicParameters, Note
+from ..rendering.reverb import FreeverbReverb
+from ..rendering.synth import BatchSynthesizer
 
 logger = logging.getLogger(__name__)
 
@@ -135,6 +137,9 @@ class TimbreEngine:
         if not self.ddsp_available:
             logger.warning("DDSP 不可用，將使用基本音色合成")
         
+        # 基本合成器（波表與包絡緩存在多次合成間共用）
+        self.synthesizer = BatchSynthesizer()
+        
         logger.info("音色引擎初始化完成")
     
     def register_instrument(self, instrument: TimbreInstrument):
@@ -275,13 +280,15 @@ class TimbreEngine:
     def _synthesize_basic(self, 
                          notes: List[Note], 
                          preset: TimbrePreset, 
-                         output_path: Optional[str] = None) -> Optional[np.ndarray]:
+                         output_path: Optional[str] = None,
+                         out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
         """使用基本合成器合成音符
         
         Args:
             notes: 音符序列
             preset: 音色預設
             output_path: 輸出文件路徑 (可選)
+            out: 預先分配的 float32 緩衝區 (可選)，音符會疊加到其中
             
         Returns:
             Optional[np.ndarray]: 音訊數據，如果失敗則為 None
@@ -289,102 +296,22 @@ class TimbreEngine:
         logger.info(f"使用基本合成器合成音符序列，預設: {preset.name}")
         
         try:
-            # 基本的波表合成
-            instrument_type = preset.instrument.instrument_type
-            sample_rate = preset.instrument.sample_rate
-            
-            # 找出音頻總長度
-            max_time = max([n.start_time + n.duration for n in notes])
-            audio_length = int(max_time * sample_rate)
-            
-            # 創建音頻緩衝區
-            audio = np.zeros(audio_length)
-            
-            # 根據樂器類型選擇不同的波形
-            waveform_fn = None
-            
-            if instrument_type == 'string':
-                # 弦樂使用帶有衰減的正弦波+三角波混合
-                def waveform_fn(t, freq):
-                    return 0.7 * np.sin(2 * np.pi * freq * t) + 0.3 * np.abs(2 * (t * freq - np.floor(t * freq + 0.5)))
-            
-            elif instrument_type == 'wind':
-                # 管樂使用帶有噪聲的正弦波
-                def waveform_fn(t, freq):
-                    noise = np.random.normal(0, 0.05, len(t))
-                    return np.sin(2 * np.pi * freq * t) + 0.1 * noise
-            
-            elif instrument_type == 'percussion':
-                # 打擊樂使用帶有快速衰減的噪聲
-                def waveform_fn(t, freq):
-                    noise = np.random.normal(0, 1.0, len(t))
-                    return noise * np.exp(-5 * t)
-            
-            else:
-                # 默認使用純正弦波
-                def waveform_fn(t, freq):
-                    return np.sin(2 * np.pi * freq * t)
-            
-            # 合成每個音符
-            for note in notes:
-                freq = 440 * (2 ** ((note.pitch - 69) / 12))  # A4 = 69 = 440Hz
-                start_sample = int(note.start_time * sample_rate)
-                end_sample = int((note.start_time + note.duration) * sample_rate)
-                
-                # 確保索引有效
-                if start_sample >= audio_length:
-                    continue
-                
-                end_sample = min(end_sample, audio_length)
-                t = np.arange(end_sample - start_sample) / sample_rate
-                
-                # 生成基本波形
-                volume = note.velocity / 127.0
-                signal = volume * waveform_fn(t, freq)
-                
-                # 應用簡單的 ADSR 包絡線
-                envelope = np.ones_like(signal)
-                
-                # 設定 ADSR 參數 (基於音符長度調整)
-                note_length = len(signal) / sample_rate
-                attack_time = min(0.1, note_length * 0.2)
-                decay_time = min(0.2, note_length * 0.2)
-                sustain_level = 0.7
-                release_time = min(0.3, note_length * 0.3)
-                
-                attack = int(attack_time * sample_rate)
-                decay = int(decay_time * sample_rate)
-                release = int(release_time * sample_rate)
-                sustain_end = len(envelope) - release
-                
-                # Attack
-                if attack > 0 and attack < len(envelope):
-                    envelope[:attack] = np.linspace(0, 1, attack)
-                
-                # Decay
-                if decay > 0 and attack + decay < len(envelope):
-                    envelope[attack:attack + decay] = np.linspace(1, sustain_level, decay)
-                
-                # Sustain
-                if attack + decay < sustain_end:
-                    envelope[attack + decay:sustain_end] = sustain_level
-                
-                # Release
-                if release > 0 and sustain_end < len(envelope):
-                    envelope[sustain_end:] = np.linspace(sustain_level, 0, len(envelope) - sustain_end)
-                
-                signal = signal * envelope
-                
-                # 添加到音頻緩衝區
-                audio[start_sample:start_sample + len(signal)] += signal
+            # 基本的波表合成，相同音高和時長的音符共用同一段波形
+            audio = self.synthesizer.render(
+                notes,
+                sample_rate=preset.instrument.sample_rate,
+                instrument_type=preset.instrument.instrument_type,
+                out=out
+            )
             
             # 正規化音訊
-            if np.max(np.abs(audio)) > 0:
-                audio = audio / np.max(np.abs(audio)) * 0.9
+            peak = np.max(np.abs(audio)) if len(audio) else 0
+            if peak > 0:
+                audio *= 0.9 / peak
             
             # 如果指定了輸出路徑，保存音訊文件
             if output_path:
-                sf.write(output_path, audio, sample_rate)
+                sf.write(output_path, audio, preset.instrument.sample_rate)
                 logger.info(f"音訊已保存至: {output_path}")
             
             return audio
@@ -445,31 +372,18 @@ class TimbreEngine:
         damping = params.get('damping', 0.5)  # 0.0 - 1.0
         wet_level = params.get('wet_level', 0.3)  # 0.0 - 1.0
         dry_level = params.get('dry_level', 0.7)  # 0.0 - 1.0
-        
-        # 簡單的混響實現
-        delay_samples = int(room_size * sample_rate * 0.3)  # 最大延遲 300ms
-        decay = 1.0 - damping * 0.9  # 衰減因子
-        
-        # 創建衰減的延遲緩衝區
-        delay_buffer = np.zeros(len(audio) + delay_samples)
-        output = np.zeros_like(delay_buffer)
-        
-        # 混合原始信號和延遲信號
-        delay_buffer[:len(audio)] = audio
-        output[:len(audio)] = audio * dry_level
-        
-        # 應用多個延遲以創建擴散效果
-        for i in range(4):  # 使用 4 個延遲線
-            current_delay = delay_samples // (i + 1)
-            current_decay = decay ** (i + 1)
-            
-            for j in range(len(audio)):
-                idx = j + current_delay
-                if idx < len(output):
-                    output[idx] += delay_buffer[j] * wet_level * current_decay
-        
-        # 截取有效部分
-        result = output[:len(audio)]
+        width = params.get('width', 1.0)  # 0.0 - 1.0，僅對立體聲有效
+        
+        # Freeverb 結構的梳狀/全通濾波器網絡，按塊向量化處理
+        reverb = FreeverbReverb(
+            sample_rate=sample_rate,
+            room_size=room_size,
+            damping=damping,
+            wet_level=wet_level,
+            dry_level=dry_level,
+            width=width
+        )
+        result = reverb.process(audio)
         
         # 正規化
         if np.max(np.abs(result)) > 1.0:
@@ -0,0 +1,318 @@
+"""和弦識別模組
+
+將每個時間段（拍或小節）內發聲的音級歸約為 12 位音級遮罩，再通過預先計算的
+4096 項查找表得到根音、和弦性質與轉位。查找表對每個遮罩給出與各和弦模板最吻合
+的結果；只有吻合度並列且無法由低音決定的遮罩才交給調用方（如 music21）判斷根音。
+"""
+
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+try:
+    from ..mcp.note_array import NoteArray
+except ImportError:
+    # 以 backend 為根目錄導入時
+    from mcp.note_array import NoteArray
+
+logger = logging.getLogger(__name__)
+
+# 和弦性質：(符號後綴, 相對根音的音程)，音程按轉位順序排列
+CHORD_QUALITIES = (
+    ("", (0, 4, 7)),
+    ("m", (0, 3, 7)),
+    ("dim", (0, 3, 6)),
+    ("aug", (0, 4, 8)),
+    ("sus4", (0, 5, 7)),
+    ("sus2", (0, 2, 7)),
+    ("7", (0, 4, 7, 10)),
+    ("maj7", (0, 4, 7, 11)),
+    ("m7", (0, 3, 7, 10)),
+    ("m7b5", (0, 3, 6, 10)),
+    ("dim7", (0, 3, 6, 9)),
+    ("6", (0, 4, 7, 9)),
+    ("m6", (0, 3, 7, 9)),
+    ("add9", (0, 4, 7, 2)),
+    ("5", (0, 7)),
+)
+
+ROOT_NAMES = ("C", "C#", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B")
+
+NO_CHORD = "N.C."
+
+# 模板外音符的扣分（缺少的模板音扣 1 分，吻合的加 1 分）
+EXTRA_NOTE_PENALTY = 0.5
+
+# 計算時間段遮罩時每次處理的段數，限制重疊矩陣的大小
+SEGMENT_CHUNK = 256
+
+# 調用方判斷根音的回調：接收和弦音的 MIDI 音高（低音在前），返回根音音級
+RootResolver = Callable[[List[int]], Optional[int]]
+
+
+@dataclass(frozen=True)
+class ChordTable:
+    """音級遮罩查找表"""
+    # 每個遮罩唯一的根音與和弦性質索引，沒有結果或結果並列時為 -1
+    roots: np.ndarray
+    qualities: np.ndarray
+    # 結果並列的遮罩 -> 並列的 (根音, 和弦性質索引)
+    candidates: Dict[int, Tuple[Tuple[int, int], ...]]
+
+
+@dataclass(frozen=True)
+class ChordLabel:
+    """一個時間段的和弦"""
+    start: float
+    end: float
+    mask: int
+    # 最低音的音級，沒有音符時為 -1
+    bass: int
+    root: int = -1
+    quality: Optional[str] = None
+    # 0 為原位，1 為第一轉位……低音不是和弦音時為None
+    inversion: Optional[int] = None
+    # "table"：查找表直接給出；"fallback"：由回調判斷根音
+    source: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def symbol(self) -> str:
+        """和弦符號，例如 "C"、"F#m7"，沒有和弦時為 "N.C." """
+        if self.root < 0 or self.quality is None:
+            return NO_CHORD
+        return f"{ROOT_NAMES[self.root]}{self.quality}"
+
+    @property
+    def slash_symbol(self) -> str:
+        """帶轉位低音的和弦符號，例如 "C/E" """
+        if self.inversion:
+            return f"{self.symbol}/{ROOT_NAMES[self.bass]}"
+        return self.symbol
+
+
+def mask_from_pitches(pitches: Iterable[int]) -> int:
+    """將音高集合轉換為 12 位音級遮罩"""
+    mask = 0
+    for pitch in pitches:
+        mask |= 1 << (int(pitch) % 12)
+    return mask
+
+
+def mask_pitch_classes(mask: int) -> List[int]:
+    """遮罩中的音級（由低到高）"""
+    return [pitch_class for pitch_class in range(12) if mask >> pitch_class & 1]
+
+
+def _template_rows() -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+    """所有根音與和弦性質的 0/1 模板，行順序即並列時的優先順序"""
+    rows, labels = [], []
+    for quality_index, (_, intervals) in enumerate(CHORD_QUALITIES):
+        for root in range(12):
+            row = np.zeros(12)
+            row[[(root + interval) % 12 for interval in intervals]] = 1
+            rows.append(row)
+            labels.append((root, quality_index))
+    return np.array(rows), labels
+
+
+@lru_cache(maxsize=None)
+def chord_table() -> ChordTable:
+    """建立 4096 個音級遮罩的查找表
+
+    每個遮罩與全部模板一次矩陣乘法求出吻合分數（吻合音數 - 缺少音數 - 0.5 × 模板外音數），
+    取分數最高者。最高分不大於 0 的遮罩（單音、空遮罩或音簇）沒有和弦。
+
+    Returns:
+        ChordTable: 只讀查找表
+    """
+    templates, labels = _template_rows()
+    masks = np.arange(4096)
+    bits = ((masks[:, None] >> np.arange(12)) & 1).astype(np.float64)
+
+    matched = bits @ templates.T
+    missing = templates.sum(axis=1)[None, :] - matched
+    extra = bits.sum(axis=1, keepdims=True) - matched
+    scores = matched - missing - EXTRA_NOTE_PENALTY * extra
+
+    best = scores.max(axis=1)
+    roots = np.full(4096, -1, dtype=np.int8)
+    qualities = np.full(4096, -1, dtype=np.int8)
+    candidates = {}
+    for mask in np.flatnonzero(best > 0).tolist():
+        tied = np.flatnonzero(scores[mask] == best[mask]).tolist()
+        if len(tied) == 1:
+            roots[mask], qualities[mask] = labels[tied[0]]
+        else:
+            candidates[mask] = tuple(labels[index] for index in tied)
+
+    roots.flags.writeable = False
+    qualities.flags.writeable = False
+    return ChordTable(roots, qualities, candidates)
+
+
+def _inversion(root: int, quality_index: int, bass: int) -> Optional[int]:
+    """低音在和弦音中的位置"""
+    if bass < 0:
+        return None
+    intervals = CHORD_QUALITIES[quality_index][1]
+    interval = (bass - root) % 12
+    return intervals.index(interval) if interval in intervals else None
+
+
+def _voicing(mask: int, bass: int) -> List[int]:
+    """以低音開頭，其餘音級排在其上方一個八度內的 MIDI 音高"""
+    base = 48 + (bass if bass >= 0 else 0)
+    upper = sorted(base + (pitch_class - base) % 12 for pitch_class in mask_pitch_classes(mask))
+    return [base] + [pitch for pitch in upper if pitch != base]
+
+
+def label_mask(mask: int,
+               bass: int = -1,
+               start: float = 0.0,
+               end: float = 0.0,
+               resolve_root: Optional[RootResolver] = None) -> ChordLabel:
+    """識別單個音級遮罩
+
+    結果並列時依次以低音、回調給出的根音決定；都無法決定時取優先順序最高的模板。
+
+    Args:
+        mask: 12 位音級遮罩
+        bass: 最低音的音級，未知時為 -1
+        start: 時間段開始
+        end: 時間段結束
+        resolve_root: 結果並列時判斷根音的回調
+
+    Returns:
+        ChordLabel: 識別結果
+    """
+    table = chord_table()
+    root, quality_index = int(table.roots[mask]), int(table.qualities[mask])
+    source = "table"
+
+    if root < 0:
+        tied = table.candidates.get(mask)
+        if not tied:
+            return ChordLabel(start, end, mask, bass)
+
+        choice = [candidate for candidate in tied if candidate[0] == bass]
+        if len(choice) != 1 and resolve_root is not None:
+            source = "fallback"
+            try:
+                resolved = resolve_root(_voicing(mask, bass))
+            except Exception as e:
+                logger.debug(f"根音判斷失敗：{str(e)}")
+                resolved = None
+            choice = [candidate for candidate in tied if candidate[0] == resolved]
+        root, quality_index = (choice or tied)[0]
+
+    return ChordLabel(
+        start, end, mask, bass,
+        root=root,
+        quality=CHORD_QUALITIES[quality_index][0],
+        inversion=_inversion(root, quality_index, bass),
+        source=source
+    )
+
+
+def segment_masks(notes: Union[NoteArray, Iterable[Any]],
+                  segment_length: float,
+                  min_fraction: float = 0.2) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """將音符按固定長度的時間段歸約為音級遮罩
+
+    音級在時間段內發聲的總時長達到 min_fraction × 段長才計入遮罩，以忽略經過音。
+
+    Args:
+        notes: 音符數組或音符序列
+        segment_length: 時間段長度（一拍或一小節，與音符時間單位相同）
+        min_fraction: 計入遮罩所需的最小發聲比例
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: 各段的開始時間、遮罩與最低音音級（沒有音符時為 -1）
+    """
+    if segment_length <= 0:
+        raise ValueError("時間段長度必須為正數")
+
+    array = NoteArray.from_notes(notes)
+    if not len(array):
+        return np.empty(0), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    starts, ends = array.start, array.end
+    pitch = array.pitch.astype(np.int64)
+    segment_starts = np.arange(0.0, array.total_duration, segment_length)
+    segment_ends = segment_starts + segment_length
+    pitch_classes = np.eye(12)[array.pitch_class]
+    weights = 1 << np.arange(12, dtype=np.int64)
+
+    masks = np.empty(len(segment_starts), dtype=np.int64)
+    basses = np.empty(len(segment_starts), dtype=np.int64)
+    for offset in range(0, len(segment_starts), SEGMENT_CHUNK):
+        chunk = slice(offset, offset + SEGMENT_CHUNK)
+        overlap = np.clip(np.minimum(ends[None, :], segment_ends[chunk, None])
+                          - np.maximum(starts[None, :], segment_starts[chunk, None]), 0.0, None)
+        present = (overlap @ pitch_classes) >= min_fraction * segment_length
+        masks[chunk] = present.astype(np.int64) @ weights
+
+        lowest = np.where(overlap > 0, pitch[None, :], 128).min(axis=1)
+        basses[chunk] = np.where(lowest < 128, lowest % 12, -1)
+
+    return segment_starts, masks, basses
+
+
+def recognize_chords(notes: Union[NoteArray, Iterable[Any]],
+                     segment_length: float = 4.0,
+                     min_fraction: float = 0.2,
+                     resolve_root: Optional[RootResolver] = None) -> List[ChordLabel]:
+    """逐段識別和弦
+
+    相同的（遮罩, 低音）組合只識別一次。
+
+    Args:
+        notes: 音符數組或音符序列
+        segment_length: 時間段長度，默認為 4/4 拍的一小節
+        min_fraction: 計入遮罩所需的最小發聲比例
+        resolve_root: 結果並列時判斷根音的回調
+
+    Returns:
+        List[ChordLabel]: 每個時間段一個結果，按時間排列
+    """
+    segment_starts, masks, basses = segment_masks(notes, segment_length, min_fraction)
+
+    keys = masks * 16 + (basses + 1)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    labels = [label_mask(int(key // 16), int(key % 16) - 1, resolve_root=resolve_root)
+              for key in unique_keys.tolist()]
+
+    return [
+        ChordLabel(start, start + segment_length, label.mask, label.bass, label.root,
+                   label.quality, label.inversion, label.source)
+        for start, label in zip(segment_starts.tolist(), (labels[index] for index in inverse.reshape(-1).tolist()))
+    ]
+
+
+def merge_chords(labels: Sequence[ChordLabel], slash: bool = False) -> List[Tuple[str, float]]:
+    """合併相同的連續和弦
+
+    沒有和弦的時間段（休止或單音）延續前一個和弦；開頭沒有和弦時記為 "N.C."。
+
+    Args:
+        labels: 按時間排列的識別結果
+        slash: 是否區分轉位（使用帶低音的符號）
+
+    Returns:
+        List[Tuple[str, float]]: (和弦符號, 持續時間) 列表
+    """
+    merged: List[List[Any]] = []
+    for label in labels:
+        symbol = label.slash_symbol if slash else label.symbol
+        if merged and (symbol == NO_CHORD or symbol == merged[-1][0]):
+            merged[-1][1] += label.duration
+        else:
+            merged.append([symbol, label.duration])
+    return [(symbol, duration) for symbol, duration in merged]
@@ -0,0 +1,246 @@
+"""調性檢測模組
+
+各分析器共用的調性檢測：以 NumPy 計算按時值加權的音級分佈，再與 24 個調性的
+音級輪廓（Krumhansl-Kessler 或 Temperley）做一次矩陣乘法求出全部相關係數。
+支持整首樂曲、按時間窗口的局部調性，以及一次對多段旋律批量檢測。
+"""
+
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+try:
+    from ..mcp.note_array import NoteArray
+except ImportError:
+    # 以 backend 為根目錄導入時
+    from mcp.note_array import NoteArray
+
+logger = logging.getLogger(__name__)
+
+# 音級輪廓，從主音開始（大調, 小調）
+KEY_PROFILES = {
+    "krumhansl": (
+        (6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88),
+        (6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17),
+    ),
+    "temperley": (
+        (0.748, 0.060, 0.488, 0.082, 0.670, 0.460, 0.096, 0.715, 0.104, 0.366, 0.057, 0.400),
+        (0.712, 0.084, 0.474, 0.618, 0.049, 0.460, 0.105, 0.747, 0.404, 0.067, 0.133, 0.330),
+    ),
+    # 自然大小調音階的 0/1 模板
+    "diatonic": (
+        (1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 0, 1),
+        (1, 0, 1, 1, 0, 1, 0, 1, 1, 0, 1, 0),
+    ),
+}
+
+DEFAULT_PROFILE = "krumhansl"
+
+MAJOR = "major"
+MINOR = "minor"
+
+# 各主音的調名，拼法與 MusicKey 的取值一致
+MAJOR_KEY_NAMES = ("C", "Db", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B")
+MINOR_KEY_NAMES = ("Cm", "C#m", "Dm", "Ebm", "Em", "Fm", "F#m", "Gm", "G#m", "Am", "Bbm", "Bm")
+
+# 計算局部調性時每次處理的窗口數，限制重疊矩陣的大小
+WINDOW_CHUNK = 256
+
+
+@dataclass(frozen=True)
+class KeyEstimate:
+    """調性檢測結果"""
+    tonic: int
+    mode: str
+    # 與調性輪廓的相關係數（-1 到 1）
+    score: float
+
+    @property
+    def name(self) -> str:
+        """調名，例如 "C"、"F#m"，與 MusicKey 的取值相同"""
+        names = MAJOR_KEY_NAMES if self.mode == MAJOR else MINOR_KEY_NAMES
+        return names[self.tonic]
+
+    @property
+    def music21_name(self) -> str:
+        """music21 的調名寫法（降號為 "-"，小調為小寫），例如 "E-"、"c#" """
+        tonic = self.name[:-1] if self.mode == MINOR else self.name
+        if len(tonic) == 2 and tonic[1] == "b":
+            tonic = tonic[0] + "-"
+        return tonic.lower() if self.mode == MINOR else tonic
+
+    @property
+    def long_name(self) -> str:
+        """完整調名，例如 "C major" """
+        tonic = self.name[:-1] if self.mode == MINOR else self.name
+        return f"{tonic} {self.mode}"
+
+
+@dataclass(frozen=True)
+class LocalKey:
+    """時間窗口內的局部調性"""
+    start: float
+    end: float
+    # 窗口內沒有音符時為None
+    estimate: Optional[KeyEstimate]
+
+
+@lru_cache(maxsize=None)
+def key_profile_matrix(profile: str = DEFAULT_PROFILE) -> np.ndarray:
+    """建立 24 個調性的標準化輪廓矩陣
+
+    第 0-11 行為 C 到 B 的大調，第 12-23 行為 C 到 B 的小調。每行已去均值並歸一化，
+    與同樣處理過的音級分佈做點積即為 Pearson 相關係數。
+
+    Args:
+        profile: 輪廓名稱，見 KEY_PROFILES
+
+    Returns:
+        np.ndarray: 形狀為 (24, 12) 的只讀矩陣
+    """
+    if profile not in KEY_PROFILES:
+        raise ValueError(f"未知的調性輪廓: {profile}")
+
+    major, minor = (np.asarray(values, dtype=np.float64) for values in KEY_PROFILES[profile])
+    rows = [np.roll(major, tonic) for tonic in range(12)] + [np.roll(minor, tonic) for tonic in range(12)]
+    matrix = np.array(rows)
+    matrix -= matrix.mean(axis=1, keepdims=True)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix.flags.writeable = False
+    return matrix
+
+
+def pitch_class_histogram(notes: Union[NoteArray, Iterable[Any]], weighted: bool = True) -> np.ndarray:
+    """計算音級分佈
+
+    Args:
+        notes: 音符數組或任何 NoteArray.from_notes 支持的音符序列
+        weighted: 是否按時值加權
+
+    Returns:
+        np.ndarray: 長度為 12 的數組
+    """
+    return NoteArray.from_notes(notes).pitch_class_histogram(weighted)
+
+
+def key_scores(histograms: np.ndarray, profile: str = DEFAULT_PROFILE) -> np.ndarray:
+    """計算音級分佈與 24 個調性的相關係數
+
+    Args:
+        histograms: 形狀為 (12,) 或 (n, 12) 的音級分佈
+        profile: 調性輪廓名稱
+
+    Returns:
+        np.ndarray: 形狀為 (24,) 或 (n, 24) 的相關係數；分佈為常數（如沒有音符）的行全為 0
+    """
+    histograms = np.asarray(histograms, dtype=np.float64)
+    single = histograms.ndim == 1
+    rows = np.atleast_2d(histograms)
+
+    centered = rows - rows.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(centered, axis=1, keepdims=True)
+    normalized = np.divide(centered, norms, out=np.zeros_like(centered), where=norms > 0)
+
+    scores = normalized @ key_profile_matrix(profile).T
+    return scores[0] if single else scores
+
+
+def _estimates_from_scores(scores: np.ndarray) -> List[KeyEstimate]:
+    """取每行相關係數最高的調性（相同時取主音較低、大調優先）"""
+    best = np.argmax(scores, axis=1)
+    return [
+        KeyEstimate(int(index % 12), MAJOR if index < 12 else MINOR, float(row[index]))
+        for index, row in zip(best.tolist(), scores)
+    ]
+
+
+def detect_key(notes: Union[NoteArray, Iterable[Any]], profile: str = DEFAULT_PROFILE) -> KeyEstimate:
+    """檢測整段音符的調性
+
+    Args:
+        notes: 音符數組或音符序列
+        profile: 調性輪廓名稱
+
+    Returns:
+        KeyEstimate: 相關係數最高的調性
+    """
+    return detect_key_from_histogram(pitch_class_histogram(notes), profile)
+
+
+def detect_key_from_histogram(histogram: np.ndarray, profile: str = DEFAULT_PROFILE) -> KeyEstimate:
+    """由音級分佈（如音頻的色度特徵總和）檢測調性
+
+    Args:
+        histogram: 長度為 12 的音級分佈，從 C 開始
+        profile: 調性輪廓名稱
+
+    Returns:
+        KeyEstimate: 相關係數最高的調性
+    """
+    scores = key_scores(histogram, profile)
+    return _estimates_from_scores(scores[None, :])[0]
+
+
+def detect_keys(melodies: Sequence[Union[NoteArray, Iterable[Any]]],
+                profile: str = DEFAULT_PROFILE) -> List[KeyEstimate]:
+    """批量檢測多段旋律的調性（所有旋律的分佈一次相乘）
+
+    Args:
+        melodies: 旋律列表
+        profile: 調性輪廓名稱
+
+    Returns:
+        List[KeyEstimate]: 與輸入順序相同的檢測結果
+    """
+    if not melodies:
+        return []
+    histograms = np.stack([pitch_class_histogram(melody) for melody in melodies])
+    return _estimates_from_scores(key_scores(histograms, profile))
+
+
+def local_keys(notes: Union[NoteArray, Iterable[Any]],
+               window: float = 8.0,
+               hop: Optional[float] = None,
+               profile: str = DEFAULT_PROFILE) -> List[LocalKey]:
+    """按時間窗口檢測局部調性
+
+    每個窗口的音級分佈按音符與窗口重疊的時長加權。
+
+    Args:
+        notes: 音符數組或音符序列
+        window: 窗口長度（與音符時間單位相同）
+        hop: 窗口間距，默認等於窗口長度（不重疊）
+        profile: 調性輪廓名稱
+
+    Returns:
+        List[LocalKey]: 按時間排列的局部調性
+    """
+    if window <= 0:
+        raise ValueError("窗口長度必須為正數")
+    hop = hop or window
+
+    array = NoteArray.from_notes(notes)
+    if not len(array):
+        return []
+
+    starts, ends = array.start, array.end
+    window_starts = np.arange(0.0, array.total_duration, hop)
+    window_ends = window_starts + window
+    pitch_classes = np.eye(12)[array.pitch_class]
+
+    histograms = np.empty((len(window_starts), 12))
+    for offset in range(0, len(window_starts), WINDOW_CHUNK):
+        chunk = slice(offset, offset + WINDOW_CHUNK)
+        overlap = (np.minimum(ends[None, :], window_ends[chunk, None])
+                   - np.maximum(starts[None, :], window_starts[chunk, None]))
+        histograms[chunk] = np.clip(overlap, 0.0, None) @ pitch_classes
+
+    estimates = _estimates_from_scores(key_scores(histograms, profile))
+    has_notes = histograms.sum(axis=1) > 0
+    return [
+        LocalKey(float(start), float(end), estimate if present else None)
+        for start, end, estimate, present in zip(window_starts, window_ends, estimates, has_notes)
+    ]
@@ -8,17 +8,35 @@ import logging
 import tempfile
 from typing import Dict, Any, List, Optional, Tuple, Union
 
-import music21
-from music21 import converter, note, chord, key, meter, stream, midi
-from music21.analysis import discrete
-
-from ...mcp.mcp_schema import (
-    MusicTheoryAnalysis,
-    MusicKey,
-    TimeSignature,
-    ChordProgression,
-    Note as MCPNote
-)
+from ..mcp.lazy_import import lazy_import
+
+# music21 導入耗時，延遲到首次分析時才導入
+music21 = lazy_import("music21")
+converter = lazy_import("music21.converter")
+note = lazy_import("music21.note")
+meter = lazy_import("music21.meter")
+stream = lazy_import("music21.stream")
+
+try:
+    from ...mcp.mcp_schema import (
+        MusicTheoryAnalysis,
+        MusicKey,
+        TimeSignature,
+        ChordProgression,
+        Note as MCPNote
+    )
+except ImportError:
+    # backend 為頂層包時，理論分析模型來自專案根目錄的 mcp 包
+    from mcp.mcp_schema import (
+        MusicTheoryAnalysis,
+        MusicKey,
+        TimeSignature,
+        ChordProgression,
+        Note as MCPNote
+    )
+from .key_detection import detect_key
+from .chord_recognition import NO_CHORD, merge_chords, recognize_chords
+from .score_cache import ParsedScore, ScoreCache, get_score_cache
 
 logger = logging.getLogger(__name__)
 
@@ -29,8 +47,13 @@ class Music21Service:
     使用 Music21 開源庫進行音樂理論分析
     """
 
-    def __init__(self):
-        """初始化 Music21 服務"""
+    def __init__(self, score_cache: Optional[ScoreCache] = None):
+        """初始化 Music21 服務
+
+        Args:
+            score_cache: 樂譜解析緩存，如未指定則使用進程內共享的緩存
+        """
+        self.score_cache = score_cache or get_score_cache()
         logger.info("初始化 Music21 服務")
 
     def analyze_midi_file(self, midi_file_path: str) -> MusicTheoryAnalysis:
@@ -45,29 +68,32 @@ class Music21Service:
         try:
             logger.info(f"開始分析 MIDI 文件：{midi_file_path}")
 
-            # 載入 MIDI 文件
-            midi_score = converter.parse(midi_file_path)
+            # 載入 MIDI 文件（同一內容只解析一次，各項分析結果也隨樂譜緩存）
+            parsed = self.score_cache.get_or_parse(midi_file_path, converter.parse)
 
             # 分析調性
-            detected_key = self._analyze_key(midi_score)
+            detected_key = parsed.memo("key", lambda: self._analyze_key(parsed))
 
             # 分析時間拍號
-            detected_time_signature = self._analyze_time_signature(midi_score)
+            detected_time_signature = parsed.memo("time_signature", lambda: self._analyze_time_signature(parsed))
 
             # 分析速度
-            detected_tempo = self._analyze_tempo(midi_score)
+            detected_tempo = parsed.memo("tempo", lambda: self._analyze_tempo(parsed))
 
             # 分析和弦進行
-            chord_progression = self._analyze_chords(midi_score)
+            chord_progression = parsed.memo("chords", lambda: self._analyze_chords(parsed))
 
             # 分析結構
-            structure = self._analyze_structure(midi_score)
+            structure = parsed.memo("structure", lambda: self._analyze_structure(parsed))
 
             # 分析和聲問題
-            harmony_issues = self._analyze_harmonic_issues(midi_score, detected_key)
+            harmony_issues = parsed.memo("harmony_issues", lambda: self._analyze_harmonic_issues(parsed, detected_key))
 
             # 生成建議
-            suggestions = self._generate_suggestions(midi_score, detected_key, harmony_issues)
+            suggestions = parsed.memo(
+                "suggestions", lambda: self._generate_suggestions(parsed, detected_key, harmony_issues)
+            )
+            self.score_cache.save_results(parsed)
 
             # 創建分析結果
             analysis = MusicTheoryAnalysis(
@@ -111,7 +137,7 @@ class Music21Service:
                 melody_stream.append(n)
 
             # 分析調性
-            detected_key = self._analyze_key(melody_stream)
+            detected_key = self._analyze_key(ParsedScore(None, melody_stream))
 
             # 假設 4/4 拍
             detected_time_signature = TimeSignature.FOUR_FOUR
@@ -143,87 +169,37 @@ class Music21Service:
             logger.error(f"分析旋律時出錯：{str(e)}", exc_info=True)
             raise
 
-    def _analyze_key(self, score: music21.stream.Stream) -> MusicKey:
+    def _analyze_key(self, parsed: ParsedScore) -> MusicKey:
         """分析調性
 
         Args:
-            score: Music21 樂譜
+            parsed: 解析後的樂譜
 
         Returns:
             MusicKey: 檢測到的調性
         """
         try:
-            # 使用 Music21 的 key.Analyzer
-            key_analysis = score.analyze('key')
-            key_str = str(key_analysis)
-
-            # 將 Music21 的調性表示轉換為 MCP 調性枚舉
-            if 'minor' in key_str.lower():
-                # 小調
-                root = key_str.split(' ')[0]
-                if root == 'a':
-                    return MusicKey.A_MINOR
-                elif root == 'e':
-                    return MusicKey.E_MINOR
-                elif root == 'b':
-                    return MusicKey.B_MINOR
-                elif root == 'f#' or root == 'f-sharp':
-                    return MusicKey.F_SHARP_MINOR
-                elif root == 'c#' or root == 'c-sharp':
-                    return MusicKey.C_SHARP_MINOR
-                elif root == 'd':
-                    return MusicKey.D_MINOR
-                elif root == 'g':
-                    return MusicKey.G_MINOR
-                elif root == 'c':
-                    return MusicKey.C_MINOR
-                elif root == 'f':
-                    return MusicKey.F_MINOR
-                else:
-                    # 默認返回 A 小調
-                    return MusicKey.A_MINOR
-            else:
-                # 大調
-                root = key_str.split(' ')[0]
-                if root == 'C':
-                    return MusicKey.C_MAJOR
-                elif root == 'G':
-                    return MusicKey.G_MAJOR
-                elif root == 'D':
-                    return MusicKey.D_MAJOR
-                elif root == 'A':
-                    return MusicKey.A_MAJOR
-                elif root == 'E':
-                    return MusicKey.E_MAJOR
-                elif root == 'B':
-                    return MusicKey.B_MAJOR
-                elif root == 'F':
-                    return MusicKey.F_MAJOR
-                elif root == 'B-' or root == 'Bb':
-                    return MusicKey.B_FLAT_MAJOR
-                elif root == 'E-' or root == 'Eb':
-                    return MusicKey.E_FLAT_MAJOR
-                else:
-                    # 默認返回 C 大調
-                    return MusicKey.C_MAJOR
+            # 按時值加權檢測調性
+            estimate = detect_key(parsed.notes)
+            return MusicKey(estimate.name)
 
         except Exception:
             # 如果分析失敗，返回默認值
             logger.warning("調性分析失敗，使用默認調性 C 大調")
             return MusicKey.C_MAJOR
 
-    def _analyze_time_signature(self, score: music21.stream.Stream) -> TimeSignature:
+    def _analyze_time_signature(self, parsed: ParsedScore) -> TimeSignature:
         """分析時間拍號
 
         Args:
-            score: Music21 樂譜
+            parsed: 解析後的樂譜
 
         Returns:
             TimeSignature: 檢測到的時間拍號
         """
         try:
             # 嘗試從樂譜中獲取時間拍號
-            time_sigs = score.getTimeSignatures()
+            time_sigs = parsed.score.getTimeSignatures()
             if time_sigs:
                 time_sig_str = str(time_sigs[0])
                 
@@ -253,18 +229,18 @@ class Music21Service:
             logger.warning("時間拍號分析失敗，使用默認拍號 4/4")
             return TimeSignature.FOUR_FOUR
 
-    def _analyze_tempo(self, score: music21.stream.Stream) -> int:
+    def _analyze_tempo(self, parsed: ParsedScore) -> int:
         """分析速度
 
         Args:
-            score: Music21 樂譜
+            parsed: 解析後的樂譜
 
         Returns:
             int: 檢測到的速度 (BPM)
         """
         try:
             # 嘗試從樂譜中獲取速度標記
-            mm = score.flat.getElementsByClass(music21.tempo.MetronomeMark)
+            mm = parsed.flat.getElementsByClass(music21.tempo.MetronomeMark)
             if mm:
                 return int(mm[0].number)
             else:
@@ -276,107 +252,42 @@ class Music21Service:
             logger.warning("速度分析失敗，使用默認速度 120 BPM")
             return 120
 
-    def _analyze_chords(self, score: music21.stream.Stream) -> ChordProgression:
+    def _analyze_chords(self, parsed: ParsedScore) -> ChordProgression:
         """分析和弦進行
 
+        每小節歸約為音級遮罩後查表識別，只有結果並列的遮罩才由 music21 判斷根音。
+
         Args:
-            score: Music21 樂譜
+            parsed: 解析後的樂譜
 
         Returns:
-            ChordProgression: 和弦進行
+            ChordProgression: 和弦進行，持續時間以小節為單位
         """
         try:
-            # 使用更強大的和弦識別算法
             logger.info("開始進行和弦識別和分析")
-            
-            # 將樂譜分割成小節
-            measures = list(score.measures(0, None))
-            
-            # 準備和弦和持續時間列表
-            chord_symbols = []
-            durations = []
-            
-            # 設置和弦識別參數
-            min_chord_duration = 0.5  # 最小和弦持續時間(秒)
-            
-            # 獲取調性
-            key_analysis = score.analyze('key')
-            
-            # 按小節分析和弦
-            for measure in measures:
-                # 使用和弦識別器
-                chord_analyzer = music21.analysis.discrete.BellmanBudge()
-                chords = chord_analyzer.getSolution(measure)
-                
-                if chords:
-                    for chord_tuple in chords:
-                        offset, chord_obj = chord_tuple
-                        
-                        # 獲取和弦名稱
-                        if isinstance(chord_obj, music21.chord.Chord):
-                            chord_symbol = self._get_chord_symbol(chord_obj, key_analysis)
-                            
-                            # 計算和弦持續時間
-                            if measure.duration.quarterLength > 0:
-                                duration = (chord_obj.duration.quarterLength / measure.duration.quarterLength) * 4
-                            else:
-                                duration = min_chord_duration
-                            
-                            chord_symbols.append(chord_symbol)
-                            durations.append(duration)
-                else:
-                    # 如果識別器無法識別和弦，使用簡單的方法
-                    # 收集該小節中的所有音符
-                    notes_in_measure = measure.flatten().notes.stream()
-                    
-                    if notes_in_measure:
-                        # 創建一個包含小節所有音符的和弦
-                        combined_chord = music21.chord.Chord([n.pitch for n in notes_in_measure if hasattr(n, 'pitch')])
-                        chord_symbol = self._get_chord_symbol(combined_chord, key_analysis)
-                        
-                        # 默認持續時間為一小節
-                        duration = 1.0
-                        
-                        chord_symbols.append(chord_symbol)
-                        durations.append(duration)
-            
-            # 如果沒有成功識別和弦，嘗試全曲分析
-            if not chord_symbols:
-                # 從樂譜中提取和弦
-                chords_in_score = score.flat.getElementsByClass(music21.chord.Chord)
-                
-                if chords_in_score:
-                    for c in chords_in_score:
-                        chord_symbol = self._get_chord_symbol(c, key_analysis)
-                        duration = float(c.quarterLength) / 4.0
-                        
-                        chord_symbols.append(chord_symbol)
-                        durations.append(duration)
-            
-            # 如果分析出的和弦太多，合併相同的連續和弦
-            if len(chord_symbols) > 1:
-                i = 0
-                while i < len(chord_symbols) - 1:
-                    if chord_symbols[i] == chord_symbols[i + 1]:
-                        durations[i] += durations[i + 1]
-                        chord_symbols.pop(i + 1)
-                        durations.pop(i + 1)
-                    else:
-                        i += 1
-            
-            # 如果分析出的和弦太多，只保留一部分
-            if len(chord_symbols) > 16:
-                chord_symbols = chord_symbols[:16]
-                durations = durations[:16]
-                
+
+            # 小節長度（四分音符數）
+            time_sigs = parsed.score.getTimeSignatures()
+            measure_length = float(time_sigs[0].barDuration.quarterLength) if time_sigs else 4.0
+
+            labels = recognize_chords(
+                parsed.notes,
+                segment_length=measure_length,
+                resolve_root=self._resolve_chord_root
+            )
+            progression = [(symbol, duration / measure_length) for symbol, duration in merge_chords(labels)]
+
             # 如果分析出的和弦為空，使用默認和弦進行
-            if not chord_symbols:
-                chord_symbols = ["C", "Am", "F", "G"]
-                durations = [1.0, 1.0, 1.0, 1.0]
-                
-            logger.info(f"和弦識別完成，識別出 {len(chord_symbols)} 個和弦")
-            return ChordProgression(chords=chord_symbols, durations=durations)
-            
+            if not progression or all(symbol == NO_CHORD for symbol, _ in progression):
+                progression = [("C", 1.0), ("Am", 1.0), ("F", 1.0), ("G", 1.0)]
+
+            fallbacks = sum(1 for label in labels if label.source == "fallback")
+            logger.info(f"和弦識別完成，識別出 {len(progression)} 個和弦（{fallbacks} 個時間段由 music21 判斷根音）")
+            return ChordProgression(
+                chords=[symbol for symbol, _ in progression],
+                durations=[duration for _, duration in progression]
+            )
+
         except Exception as e:
             # 如果分析失敗，返回默認和弦進行
             logger.warning(f"和弦進行分析失敗：{str(e)}，使用默認和弦進行")
@@ -385,82 +296,23 @@ class Music21Service:
                 durations=[1.0, 1.0, 1.0, 1.0]
             )
 
-    def _get_chord_symbol(self, chord_obj: music21.chord.Chord, key_analysis: music21.key.Key) -> str:
-        """從和弦對象獲取和弦符號
-        
+    def _resolve_chord_root(self, pitches: List[int]) -> Optional[int]:
+        """由 music21 判斷並列和弦的根音
+
         Args:
-            chord_obj: Music21 和弦對象
-            key_analysis: 樂曲調性
-            
+            pitches: 和弦音的 MIDI 音高（低音在前）
+
         Returns:
-            str: 和弦符號
+            Optional[int]: 根音音級
         """
-        try:
-            # 嘗試直接獲取和弦標籤
-            chord_symbol = chord_obj.commonName
-            if chord_symbol and chord_symbol != 'unknown':
-                return chord_symbol
-            
-            # 如果直接獲取失敗，嘗試分析和弦結構
-            chord_root = chord_obj.root()
-            if not chord_root:
-                return "N.C."  # 無和弦
-            
-            root_name = chord_root.name
-            
-            # 分析和弦類型
-            chord_type = ""
-            
-            # 獲取和弦音符與根音的音程
-            chord_intervals = []
-            for p in chord_obj.pitches:
-                # 計算與根音的音程
-                interval = music21.interval.Interval(chord_root, p)
-                chord_intervals.append(interval.semitones)
-            
-            # 根據音程確定和弦類型
-            if 3 in chord_intervals and 7 in chord_intervals:
-                chord_type = ""  # 大三和弦
-            elif 3 in chord_intervals and 6 in chord_intervals:
-                chord_type = "m"  # 小三和弦
-            elif 3 in chord_intervals and 6 in chord_intervals and 10 in chord_intervals:
-                chord_type = "m7"  # 小七和弦
-            elif 3 in chord_intervals and 7 in chord_intervals and 10 in chord_intervals:
-                chord_type = "7"  # 屬七和弦
-            elif 3 in chord_intervals and 7 in chord_intervals and 11 in chord_intervals:
-                chord_type = "maj7"  # 大七和弦
-            elif 3 in chord_intervals and 6 in chord_intervals and 9 in chord_intervals:
-                chord_type = "dim"  # 減三和弦
-            elif 4 in chord_intervals and 8 in chord_intervals:
-                chord_type = "aug"  # 增三和弦
-            elif 4 in chord_intervals and 7 in chord_intervals:
-                chord_type = "sus4"  # 掛四和弦
-            elif 2 in chord_intervals and 7 in chord_intervals:
-                chord_type = "sus2"  # 掛二和弦
-            else:
-                # 嘗試獲取音樂理論分析的和弦名稱
-                try:
-                    chord_obj.lyric = chord_obj.figure
-                    chord_type = chord_obj.lyric
-                    if chord_type == "":
-                        chord_type = ""  # 默認為大三和弦
-                except:
-                    chord_type = ""
-            
-            # 組合和弦符號
-            return f"{root_name}{chord_type}"
-            
-        except Exception as e:
-            logger.warning(f"和弦符號提取失敗: {str(e)}")
-            if chord_obj.root():
-                return chord_obj.root().name
-            return "C"  # 默認為C和弦
+        chord_root = music21.chord.Chord(pitches).root()
+        return chord_root.pitchClass if chord_root is not None else None
 
-    def _analyze_structure(self, score: music21.stream.Stream) -> Dict[str, List[int]]:
+    def _analyze_structure(self, parsed: ParsedScore) -> Dict[str, List[int]]:
         """分析音樂結構
 
         Args:
-            score: Music21 樂譜
+            parsed: 解析後的樂譜
 
         Returns:
             Dict[str, List[int]]: 結構分析，如 {"verse": [1, 5], "chorus": [9, 13]}
@@ -470,7 +322,7 @@ class Music21Service:
             # 在實際應用中，可能需要更復雜的算法
             
             # 獲取小節數
-            measures = list(score.measures(0, None))
+            measures = list(parsed.score.measures(0, None))
             measure_count = len(measures)
             
             # 簡單劃分：假設前1/3是引入，中間1/3是主體，最後1/3是結尾
@@ -495,11 +347,11 @@ class Music21Service:
                 "chorus": [13, 16]
             }
 
-    def _analyze_harmonic_issues(self, score: music21.stream.Stream, detected_key: MusicKey) -> List[str]:
+    def _analyze_harmonic_issues(self, parsed: ParsedScore, detected_key: MusicKey) -> List[str]:
         """分析和聲問題
 
         Args:
-            score: Music21 樂譜
+            parsed: 解析後的樂譜
             detected_key: 檢測到的調性
 
         Returns:
@@ -509,7 +361,7 @@ class Music21Service:
             issues = []
             
             # 獲取所有和弦
-            chords = score.flat.getElementsByClass(music21.chord.Chord)
+            chords = parsed.flat.getElementsByClass(music21.chord.Chord)
             
             # 獲取調性對象
             key_obj = None
@@ -549,7 +401,7 @@ class Music21Service:
             logger.warning("和聲問題分析失敗")
             return []
 
-    def _has_parallel_fifths(self, chord1: music21.chord.Chord, chord2: music21.chord.Chord) -> bool:
+    def _has_parallel_fifths(self, chord1: 'music21.chord.Chord', chord2: 'music21.chord.Chord') -> bool:
         """檢查是否有平行五度
 
         Args:
@@ -562,7 +414,7 @@ class Music21Service:
         # 簡化實現
         return False
 
-    def _is_natural_progression(self, chord1: music21.chord.Chord, chord2: music21.chord.Chord, key_obj: music21.key.Key) -> bool:
+    def _is_natural_progression(self, chord1: 'music21.chord.Chord', chord2: 'music21.chord.Chord', key_obj: 'music21.key.Key') -> bool:
         """檢查和弦進行是否自然
 
         Args:
@@ -576,11 +428,11 @@ class Music21Service:
         # 簡化實現
         return True
 
-    def _generate_suggestions(self, score: music21.stream.Stream, detected_key: MusicKey, harmony_issues: List[str]) -> List[str]:
+    def _generate_suggestions(self, parsed: ParsedScore, detected_key: MusicKey, harmony_issues: List[str]) -> List[str]:
         """生成音樂改進建議
 
         Args:
-            score: Music21 樂譜
+            parsed: 解析後的樂譜
             detected_key: 檢測到的調性
             harmony_issues: 和聲問題清單
 
@@ -594,8 +446,8 @@ class Music21Service:
             suggestions.append("考慮修正識別出的和聲問題，可能會使音樂更加和諧")
         
         # 分析音符密度
-        note_count = len(score.flat.notes)
-        duration = score.duration.quarterLength
+        note_count = len(parsed.flat.notes)
+        duration = parsed.score.duration.quarterLength
         note_density = note_count / (duration / 4.0) if duration > 0 else 0
         
         if note_density > 8:
@@ -604,7 +456,7 @@ class Music21Service:
             suggestions.append("音符密度較低，考慮增加音符豐富音樂織體")
         
         # 分析音域
-        pitches = [n.pitch.midi for n in score.flat.notes if hasattr(n, 'pitch')]
+        pitches = [n.pitch.midi for n in parsed.flat.notes if hasattr(n, 'pitch')]
         if pitches:
             pitch_range = max(pitches) - min(pitches)
             if pitch_range < 12:
@@ -622,7 +474,7 @@ class Music21Service:
             
         return suggestions
 
-    def _suggest_chords_for_melody(self, melody_stream: music21.stream.Stream, detected_key: MusicKey) -> ChordProgression:
+    def _suggest_chords_for_melody(self, melody_stream: 'music21.stream.Stream', detected_key: MusicKey) -> ChordProgression:
         """為旋律生成和弦建議
         
         Args:
@@ -738,7 +590,7 @@ class Music21Service:
                 durations=[1.0, 1.0, 1.0, 1.0]
             )
         
-    def _get_diatonic_chords(self, key_obj: music21.key.Key) -> List[music21.chord.Chord]:
+    def _get_diatonic_chords(self, key_obj: 'music21.key.Key') -> 'List[music21.chord.Chord]':
         """獲取調內和弦
         
         Args:
@@ -774,7 +626,7 @@ class Music21Service:
             logger.warning(f"獲取調內和弦時出錯: {str(e)}")
             return []
         
-    def _calculate_chord_match_score(self, chord: music21.chord.Chord, melody_pitches: List[music21.pitch.Pitch]) -> float:
+    def _calculate_chord_match_score(self, chord: 'music21.chord.Chord', melody_pitches: 'List[music21.pitch.Pitch]') -> float:
         """計算和弦與旋律的匹配分數
         
         Args:
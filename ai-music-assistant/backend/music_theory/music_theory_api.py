@@ -16,7 +16,8 @@ from pathlib import Path
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from fastapi.responses import JSONResponse
 
-from music21_service import Music21Service
+from .music21_service import Music21Service
+from ..mcp.lazy_import import LazyService
 from ..theory_validator import TheoryValidator, load_notes_from_json, Note
 
 # 設置日誌
@@ -33,8 +34,8 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-# 初始化服務
-theory_service = Music21Service()
+# 初始化服務（Music21 服務在首次請求時才建立）
+theory_service = LazyService(Music21Service, "Music21 樂理分析服務")
 theory_validator = TheoryValidator()
 
 # 嘗試導入pydantic，如果不可用則使用簡單替代模型
@@ -0,0 +1,249 @@
+"""樂譜解析緩存模組
+
+以 MIDI 內容哈希為鍵，緩存 music21 解析出的樂譜、展平後的流與音符數組，以及各項
+分析的結果。同一個生成的 MIDI 在分析流程、建議生成與導出之間多次分析時只解析一次，
+各分析器共用同一份展平結果。緩存分為按估算內存限制容量的 LRU 層與可選的 pickle
+磁盤層，磁盤層按最後訪問時間淘汰。
+"""
+
+import os
+import logging
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from ..mcp.lazy_import import lazy_import
+from ..mcp.note_array import NoteArray
+from ..mcp.storage.cache_keys import KeyLocks, content_hash
+from ..mcp.storage.disk_cache import PickleDiskCache
+from ..mcp.storage.memory_cache import MemoryCache
+
+logger = logging.getLogger(__name__)
+
+# 分析過的樂譜帶有弱引用，不能直接 pickle，需經 music21 的凍結/解凍處理
+freeze_thaw = lazy_import("music21.freezeThaw")
+
+# 緩存格式版本，格式或分析算法變化時遞增以避免讀到舊的磁盤緩存
+SCORE_CACHE_VERSION = 1
+
+# 解析後每個音符或和弦元素佔用的估算內存（music21 對象及其音高、時值、位置信息）
+BYTES_PER_ELEMENT = 10 * 1024
+
+
+class ParsedScore:
+    """一個樂譜的解析結果與分析結果"""
+
+    def __init__(self, key: Optional[str], score: Any):
+        """初始化
+
+        Args:
+            key: 緩存鍵，不經緩存的樂譜為None
+            score: music21 樂譜
+        """
+        self.key = key
+        self.score = score
+        self.results: Dict[str, Any] = {}
+        # 有尚未寫入磁盤的分析結果
+        self.dirty = False
+        self._flat = None
+        self._notes: Optional[NoteArray] = None
+        # 同一份樂譜由多個請求共用，展平與分析在鎖內進行，各只計算一次；
+        # 分析函數可能再取用展平結果或其他分析，因此使用可重入鎖
+        self._lock = threading.RLock()
+
+    @property
+    def flat(self) -> Any:
+        """展平後的流（只展平一次）"""
+        with self._lock:
+            if self._flat is None:
+                self._flat = self.score.flatten()
+            return self._flat
+
+    @property
+    def notes(self) -> NoteArray:
+        """全部音符的數組，和弦展開為各個音，時間單位為四分音符"""
+        with self._lock:
+            if self._notes is None:
+                pitches, starts, durations = [], [], []
+                for element in self.flat.notes:
+                    element_pitches = element.pitches if element.isChord else [element.pitch]
+                    for element_pitch in element_pitches:
+                        pitches.append(element_pitch.midi)
+                        starts.append(float(element.offset))
+                        durations.append(float(element.quarterLength))
+                self._notes = NoteArray(pitches, starts, durations)
+            return self._notes
+
+    def memo(self, name: str, compute: Callable[[], Any]) -> Any:
+        """取得分析結果，未計算過時計算並保存
+
+        Args:
+            name: 分析名稱
+            compute: 計算分析結果的函數
+
+        Returns:
+            Any: 分析結果
+        """
+        with self._lock:
+            if name not in self.results:
+                self.results[name] = compute()
+                self.dirty = True
+            return self.results[name]
+
+    def estimated_size(self) -> int:
+        """估算佔用的內存字節數"""
+        return max(len(self.flat.notes), 1) * BYTES_PER_ELEMENT
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # 凍結的是樂譜副本，不影響記憶體層中的對象；展平的流可以重建，不寫入磁盤
+        with self._lock:
+            frozen = freeze_thaw.StreamFreezer(self.score, fastButUnsafe=False).writeStr(fmt='pickle')
+            return {"key": self.key, "score": frozen, "results": dict(self.results), "notes": self._notes}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        thawer = freeze_thaw.StreamThawer()
+        thawer.openStr(state["score"])
+        self.__init__(state["key"], thawer.stream)
+        self.results = state["results"]
+        self._notes = state["notes"]
+
+
+class ScoreCache:
+    """樂譜解析緩存類"""
+
+    def __init__(self,
+                 cache_dir: Optional[str] = "",
+                 memory_max_entries: int = 16,
+                 memory_max_bytes: int = 256 * 1024 * 1024,
+                 disk_max_bytes: int = 512 * 1024 * 1024,
+                 ttl: int = 24 * 3600):
+        """初始化樂譜緩存
+
+        Args:
+            cache_dir: 磁盤緩存目錄，為空字符串時停用磁盤層（默認），為None時使用系統臨時目錄
+            memory_max_entries: 記憶體層最大條目數
+            memory_max_bytes: 記憶體層最大估算字節數
+            disk_max_bytes: 磁盤層最大字節數
+            ttl: 記憶體層條目的存活時間（秒）
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(tempfile.gettempdir(), "music21_scores")
+        self.memory = MemoryCache(memory_max_entries, memory_max_bytes)
+        self.disk = PickleDiskCache(cache_dir, disk_max_bytes, SCORE_CACHE_VERSION, "樂譜緩存")
+        self.ttl = ttl
+
+        # 保護記憶體層
+        self._lock = threading.Lock()
+        # 每個鍵一把鎖，同一 MIDI 的並發請求只解析一次
+        self._key_locks = KeyLocks()
+
+        self.disk_hits = 0
+        self.parses = 0
+
+    @property
+    def disk_evictions(self) -> int:
+        """磁盤層淘汰的條目數"""
+        return self.disk.evictions
+
+    def get(self, key: str) -> Optional[ParsedScore]:
+        """獲取解析結果
+
+        Args:
+            key: 緩存鍵（MIDI 內容哈希）
+
+        Returns:
+            Optional[ParsedScore]: 解析結果，未命中時返回None
+        """
+        with self._lock:
+            hit, parsed = self.memory.get(key)
+        if hit:
+            return parsed
+
+        parsed = self.disk.load(key)
+        if parsed is None:
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self.memory.set(key, parsed, self.ttl, size=parsed.estimated_size())
+        return parsed
+
+    def put(self, parsed: ParsedScore):
+        """寫入（或更新）解析結果，磁盤層同時保存已計算的分析結果
+
+        Args:
+            parsed: 解析結果
+        """
+        with self._lock:
+            self.memory.set(parsed.key, parsed, self.ttl, size=parsed.estimated_size())
+        parsed.dirty = False
+        self.disk.store(parsed.key, parsed)
+
+    def save_results(self, parsed: ParsedScore):
+        """新解析的樂譜或有新的分析結果時寫入磁盤層（記憶體層中的對象已包含結果）
+
+        Args:
+            parsed: 解析結果
+        """
+        if parsed.key is not None and parsed.dirty:
+            self.put(parsed)
+
+    def get_or_parse(self, midi_file_path: str, parse: Callable[[str], Any]) -> ParsedScore:
+        """獲取 MIDI 文件的解析結果，未命中時解析並緩存
+
+        Args:
+            midi_file_path: MIDI 文件路徑
+            parse: 將文件解析為 music21 樂譜的函數
+
+        Returns:
+            ParsedScore: 解析結果
+        """
+        key = content_hash(midi_file_path)
+        parsed = self.get(key)
+        if parsed is not None:
+            return parsed
+
+        with self._key_locks.hold(key):
+            # 等待期間其他線程可能已完成解析
+            parsed = self.get(key)
+            if parsed is None:
+                self.parses += 1
+                parsed = ParsedScore(key, parse(midi_file_path))
+                # 先只放入記憶體層，分析完成後由 save_results 連同結果一起寫入磁盤
+                parsed.dirty = True
+                with self._lock:
+                    self.memory.set(key, parsed, self.ttl, size=parsed.estimated_size())
+            return parsed
+
+    def clear(self):
+        """清除所有緩存條目"""
+        with self._lock:
+            self.memory.clear()
+        self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """獲取緩存統計"""
+        return {
+            "memory": self.memory.stats(),
+            "disk_enabled": self.disk.enabled,
+            "disk_hits": self.disk_hits,
+            "disk_evictions": self.disk_evictions,
+            "parses": self.parses
+        }
+
+
+# 進程內共享的樂譜緩存
+_score_cache: Optional[ScoreCache] = None
+_score_cache_lock = threading.Lock()
+
+
+def get_score_cache() -> ScoreCache:
+    """獲取共享的樂譜緩存，首次調用時建立
+
+    設置環境變量 MUSIC21_SCORE_CACHE_DIR 時啟用該目錄下的磁盤層。
+    """
+    global _score_cache
+    with _score_cache_lock:
+        if _score_cache is None:
+            _score_cache = ScoreCache(cache_dir=os.environ.get("MUSIC21_SCORE_CACHE_DIR", ""))
+        return _score_cache
@@ -0,0 +1,391 @@
+"""MIDI渲染模組
+
+在沒有 FluidSynth 時使用的後備渲染路徑：用 mido 解析 MIDI 事件得到帶時間的音符，
+再用批次波表合成器渲染，最後一次性寫出 16 位 PCM WAV。也可以按固定長度的塊
+逐塊渲染並串流輸出 WAV，內存只與塊長和最長音符有關，與樂曲長度無關。
+"""
+
+import struct
+import logging
+from io import BytesIO
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import mido
+import numpy as np
+
+from .synth import BatchSynthesizer
+
+logger = logging.getLogger(__name__)
+
+# General MIDI 的打擊樂通道（從0開始）
+DRUM_CHANNEL = 9
+
+# 未設置速度時的默認速度（每拍微秒數，120 BPM）
+DEFAULT_TEMPO = 500000
+
+# 串流渲染的默認塊長（秒）
+DEFAULT_BLOCK_SECONDS = 0.5
+
+# 打擊樂以高斯噪聲合成，峰值約為力度比例的數倍
+DRUM_CREST_FACTOR = 4.0
+
+
+@dataclass
+class MidiNote:
+    """已解析的MIDI音符"""
+    pitch: int
+    start_time: float
+    duration: float
+    velocity: int
+    channel: int = 0
+
+
+class TempoMap:
+    """MIDI文件的 tick 到秒換算表
+
+    速度變化可出現在任一音軌，對所有音軌生效（與 mido 合併音軌後的換算相同）。
+    """
+
+    def __init__(self, midi_file: mido.MidiFile):
+        """初始化
+
+        Args:
+            midi_file: 已載入的MIDI文件
+        """
+        changes = []
+        for track in midi_file.tracks:
+            tick = 0
+            for message in track:
+                tick += message.time
+                if message.type == 'set_tempo':
+                    changes.append((tick, message.tempo))
+        changes.sort(key=lambda change: change[0])
+
+        ticks, tempos = [0], [DEFAULT_TEMPO]
+        for tick, tempo in changes:
+            if tick == ticks[-1]:
+                tempos[-1] = tempo
+            else:
+                ticks.append(tick)
+                tempos.append(tempo)
+
+        self.ticks = np.array(ticks, dtype=np.int64)
+        self.seconds_per_tick = np.array(tempos, dtype=np.float64) * 1e-6 / midi_file.ticks_per_beat
+        self.seconds = np.concatenate(([0.0], np.cumsum(np.diff(self.ticks) * self.seconds_per_tick[:-1])))
+
+    def to_seconds(self, ticks: np.ndarray) -> np.ndarray:
+        """將絕對 tick 換算為秒"""
+        ticks = np.asarray(ticks, dtype=np.int64)
+        index = np.searchsorted(self.ticks, ticks, side='right') - 1
+        return self.seconds[index] + (ticks - self.ticks[index]) * self.seconds_per_tick[index]
+
+
+def midi_length(midi_file: mido.MidiFile, tempo_map: Optional[TempoMap] = None) -> float:
+    """MIDI文件最後一個事件的時間（秒），與 mido.MidiFile.length 相同但不合併音軌"""
+    tempo_map = tempo_map or TempoMap(midi_file)
+    last_tick = max((sum(message.time for message in track) for track in midi_file.tracks), default=0)
+    return float(tempo_map.to_seconds(last_tick))
+
+
+def parse_midi_notes(midi_data: bytes) -> List[MidiNote]:
+    """解析MIDI數據中的音符
+
+    按 note_on / note_off 配對（力度為0的 note_on 視為 note_off），
+    時間已按文件中的速度變化換算為秒。文件結束時仍未釋放的音符在結尾截止。
+    各音軌的事件按 tick 穩定排序後配對，順序與 mido 合併音軌相同，
+    但只對音符事件配對，時間最後一次性換算。
+
+    Args:
+        midi_data: 標準MIDI文件數據
+
+    Returns:
+        List[MidiNote]: 按開始時間排序的音符
+    """
+    midi_file = mido.MidiFile(file=BytesIO(midi_data))
+
+    events = []
+    last_tick = 0
+    for track in midi_file.tracks:
+        tick = 0
+        for message in track:
+            tick += message.time
+            if message.type == 'note_on' or message.type == 'note_off':
+                events.append((tick, message.type == 'note_on' and message.velocity > 0,
+                               message.channel, message.note, message.velocity))
+        last_tick = max(last_tick, tick)
+    events.sort(key=lambda event: event[0])
+
+    # (開始tick, 結束tick, 音高, 力度, 通道)
+    paired: List[Tuple[int, int, int, int, int]] = []
+    # (通道, 音高) -> 尚未結束的 (開始tick, 力度)
+    active: Dict[Tuple[int, int], Deque[Tuple[int, int]]] = defaultdict(deque)
+
+    for tick, is_on, channel, pitch, velocity in events:
+        if is_on:
+            active[(channel, pitch)].append((tick, velocity))
+        else:
+            pending = active.get((channel, pitch))
+            if pending:
+                start, start_velocity = pending.popleft()
+                if tick > start:
+                    paired.append((start, tick, pitch, start_velocity, channel))
+
+    for (channel, pitch), pending in active.items():
+        for start, velocity in pending:
+            if last_tick > start:
+                paired.append((start, last_tick, pitch, velocity, channel))
+
+    if not paired:
+        return []
+
+    tempo_map = TempoMap(midi_file)
+    starts = tempo_map.to_seconds([note[0] for note in paired]).tolist()
+    ends = tempo_map.to_seconds([note[1] for note in paired]).tolist()
+    notes = [
+        MidiNote(pitch, start, end - start, velocity, channel)
+        for (_, _, pitch, velocity, channel), start, end in zip(paired, starts, ends)
+    ]
+    notes.sort(key=lambda note: note.start_time)
+    return notes
+
+
+def render_notes(notes: List[MidiNote],
+                 sample_rate: int = 44100,
+                 synthesizer: Optional[BatchSynthesizer] = None,
+                 peak: float = 0.9) -> np.ndarray:
+    """將音符渲染為單聲道音頻
+
+    Args:
+        notes: 音符
+        sample_rate: 採樣率
+        synthesizer: 合成器，默認建立新的實例
+        peak: 正規化後的峰值
+
+    Returns:
+        np.ndarray: float32 音頻
+    """
+    synthesizer = synthesizer or BatchSynthesizer()
+    end_time = max((note.start_time + note.duration for note in notes), default=0.0)
+    audio = np.zeros(int(end_time * sample_rate), dtype=np.float32)
+    _render_into(notes, sample_rate, synthesizer, audio)
+
+    max_value = np.max(np.abs(audio)) if len(audio) else 0
+    if max_value > 0:
+        audio *= peak / max_value
+    return audio
+
+
+def _render_into(notes: List[MidiNote], sample_rate: int, synthesizer: BatchSynthesizer,
+                 out: np.ndarray, offset: int = 0):
+    """將旋律音符與打擊樂音符分別疊加到緩衝區"""
+    melodic = [note for note in notes if note.channel != DRUM_CHANNEL]
+    drums = [note for note in notes if note.channel == DRUM_CHANNEL]
+    if melodic:
+        synthesizer.render(melodic, sample_rate, instrument_type='default', out=out, offset=offset)
+    if drums:
+        synthesizer.render(drums, sample_rate, instrument_type='percussion', out=out, offset=offset)
+
+
+def peak_level(notes: List[MidiNote]) -> float:
+    """同時發聲音符的力度總和（以 0-1 振幅計）的最大值
+
+    串流渲染無法先渲染整首再按峰值正規化，改用此值估計增益：
+    旋律音符的振幅不超過力度比例，疊加後的峰值不超過同時發聲的力度總和。
+    打擊樂音符按 DRUM_CREST_FACTOR 倍計入。
+
+    Args:
+        notes: 音符
+
+    Returns:
+        float: 最大的同時力度總和
+    """
+    if not notes:
+        return 0.0
+    starts = np.array([note.start_time for note in notes])
+    ends = starts + np.array([note.duration for note in notes])
+    levels = np.array([note.velocity for note in notes], dtype=np.float64) / 127.0
+    levels[np.array([note.channel == DRUM_CHANNEL for note in notes])] *= DRUM_CREST_FACTOR
+
+    times = np.concatenate((starts, ends))
+    changes = np.concatenate((levels, -levels))
+    # 時間相同時先結束再開始
+    order = np.lexsort((changes, times))
+    return float(np.cumsum(changes[order]).max())
+
+
+def render_note_blocks(notes: List[MidiNote],
+                       sample_rate: int = 44100,
+                       synthesizer: Optional[BatchSynthesizer] = None,
+                       block_seconds: float = DEFAULT_BLOCK_SECONDS,
+                       gain: Optional[float] = None,
+                       peak: float = 0.9) -> Iterator[np.ndarray]:
+    """按塊將音符渲染為單聲道音頻
+
+    每個塊只渲染在塊內開始的音符，延續到塊之後的部分保留到下一塊疊加，
+    因此拼接所有塊的結果與一次性渲染相同（除增益外）。
+
+    Args:
+        notes: 按開始時間排序的音符
+        sample_rate: 採樣率
+        synthesizer: 合成器，默認建立新的實例
+        block_seconds: 塊長（秒）
+        gain: 輸出增益，為None時按 peak_level 估計，使峰值不超過 peak
+        peak: 估計增益時的目標峰值
+
+    Yields:
+        np.ndarray: float32 音頻塊，除最後一塊外長度相同
+    """
+    synthesizer = synthesizer or BatchSynthesizer()
+    if gain is None:
+        gain = peak / max(peak_level(notes), 1.0)
+
+    total = int(max((note.start_time + note.duration for note in notes), default=0.0) * sample_rate)
+    block = max(1, int(block_seconds * sample_rate))
+    carry = np.zeros(0, dtype=np.float32)
+    index = 0
+
+    for position in range(0, total, block):
+        block_end = min(position + block, total)
+
+        batch = []
+        while index < len(notes) and int(notes[index].start_time * sample_rate) < block_end:
+            batch.append(notes[index])
+            index += 1
+
+        # 緩衝區覆蓋本塊、上一塊遺留的尾部和本塊音符的完整長度
+        length = max(block_end, position + len(carry),
+                     max((int((note.start_time + note.duration) * sample_rate) for note in batch), default=0))
+        buffer = np.zeros(min(length, total) - position, dtype=np.float32)
+        buffer[:len(carry)] = carry
+        _render_into(batch, sample_rate, synthesizer, buffer, offset=position)
+
+        size = block_end - position
+        carry = buffer[size:]
+        yield buffer[:size] * gain
+
+
+def wav_header(num_samples: int, sample_rate: int, channels: int = 1) -> bytes:
+    """生成16位PCM WAV文件頭
+
+    Args:
+        num_samples: 每個聲道的樣本數；串流時可傳入上限值
+        sample_rate: 採樣率
+        channels: 聲道數
+
+    Returns:
+        bytes: 44 字節的文件頭
+    """
+    data_size = num_samples * channels * 2
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, sample_rate * channels * 2, channels * 2, 16,
+        b'data', data_size
+    )
+
+
+def to_pcm16(audio: np.ndarray) -> np.ndarray:
+    """將 [-1, 1] 範圍的浮點音頻轉換為小端16位整數"""
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2')
+
+
+def encode_wav(audio: np.ndarray, sample_rate: int) -> bytes:
+    """將浮點音頻編碼為16位PCM WAV
+
+    Args:
+        audio: 單聲道 (樣本數,) 或多聲道 (樣本數, 聲道數) 音頻，範圍 [-1, 1]
+        sample_rate: 採樣率
+
+    Returns:
+        bytes: WAV 文件數據
+    """
+    channels = 1 if audio.ndim == 1 else audio.shape[1]
+    return wav_header(len(audio), sample_rate, channels) + to_pcm16(audio).tobytes()
+
+
+def render_midi_to_wav(midi_data: bytes,
+                       sample_rate: int = 44100,
+                       synthesizer: Optional[BatchSynthesizer] = None) -> bytes:
+    """解析並渲染MIDI數據為WAV
+
+    Args:
+        midi_data: 標準MIDI文件數據
+        sample_rate: 採樣率
+        synthesizer: 合成器
+
+    Returns:
+        bytes: WAV 文件數據
+
+    Raises:
+        ValueError: MIDI數據中沒有音符
+    """
+    notes = parse_midi_notes(midi_data)
+    if not notes:
+        raise ValueError("MIDI數據中沒有音符")
+    return encode_wav(render_notes(notes, sample_rate, synthesizer), sample_rate)
+
+
+def iter_wav(blocks: Iterable[np.ndarray], num_samples: int, sample_rate: int, channels: int = 1) -> Iterator[bytes]:
+    """將音頻塊串流編碼為16位PCM WAV
+
+    先輸出按 num_samples 填寫的文件頭，再逐塊輸出 PCM 數據。
+    超出 num_samples 的樣本被截斷，不足時以靜音補齊，使數據長度與文件頭一致。
+    結束或被提前關閉時一併關閉 blocks，讓它釋放持有的資源（如借出的合成器）。
+
+    Args:
+        blocks: 範圍 [-1, 1] 的浮點音頻塊，形狀與 encode_wav 的輸入相同
+        num_samples: 每個聲道的總樣本數
+        sample_rate: 採樣率
+        channels: 聲道數
+
+    Yields:
+        bytes: 文件頭與各塊的 PCM 數據
+    """
+    try:
+        yield wav_header(num_samples, sample_rate, channels)
+
+        written = 0
+        for block in blocks:
+            block = block[:num_samples - written]
+            if len(block):
+                written += len(block)
+                yield to_pcm16(block).tobytes()
+            if written >= num_samples:
+                break
+    finally:
+        close = getattr(blocks, "close", None)
+        if close is not None:
+            close()
+
+    if written < num_samples:
+        yield bytes((num_samples - written) * channels * 2)
+
+
+def stream_midi_to_wav(midi_data: bytes,
+                       sample_rate: int = 44100,
+                       synthesizer: Optional[BatchSynthesizer] = None,
+                       block_seconds: float = DEFAULT_BLOCK_SECONDS) -> Iterator[bytes]:
+    """解析MIDI數據並返回逐塊渲染的WAV串流
+
+    解析與檢查在調用時立即完成，渲染在迭代時逐塊進行。
+
+    Args:
+        midi_data: 標準MIDI文件數據
+        sample_rate: 採樣率
+        synthesizer: 合成器
+        block_seconds: 塊長（秒）
+
+    Returns:
+        Iterator[bytes]: WAV 文件頭與 PCM 數據塊
+
+    Raises:
+        ValueError: MIDI數據中沒有音符
+    """
+    notes = parse_midi_notes(midi_data)
+    if not notes:
+        raise ValueError("MIDI數據中沒有音符")
+    num_samples = int(max(note.start_time + note.duration for note in notes) * sample_rate)
+    blocks = render_note_blocks(notes, sample_rate, synthesizer, block_seconds)
+    return iter_wav(blocks, num_samples, sample_rate)
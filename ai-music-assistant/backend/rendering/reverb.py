@@ -0,0 +1,190 @@
+"""混響模組
+
+Freeverb 風格的混響（Schroeder 結構）：8 條並聯的帶阻尼反饋梳狀濾波器，
+後接 4 個串聯的全通濾波器，左右聲道使用略微錯開的延遲長度以產生立體聲寬度。
+
+所有濾波器都按塊處理：反饋延遲為 N 個樣本時，一個長度不超過 N 的塊只依賴
+上一個塊的輸出，因此塊內可以完全向量化，總成本與音頻長度成線性關係。
+"""
+
+import logging
+from typing import Sequence, Tuple
+
+import numpy as np
+from scipy.signal import lfilter
+
+logger = logging.getLogger(__name__)
+
+# Freeverb 的延遲長度（以 44.1kHz 為基準的樣本數）
+COMB_TUNINGS = (1116, 1188, 1277, 1356, 1422, 1491, 1557, 1617)
+ALLPASS_TUNINGS = (556, 441, 341, 225)
+STEREO_SPREAD = 23
+TUNING_SAMPLE_RATE = 44100
+
+# Freeverb 的增益常數
+FIXED_GAIN = 0.015
+SCALE_WET = 3.0
+SCALE_DAMPING = 0.4
+SCALE_ROOM = 0.28
+OFFSET_ROOM = 0.7
+ALLPASS_FEEDBACK = 0.5
+
+
+def comb_filter(signal: np.ndarray, delay: int, feedback: float, damping: float) -> np.ndarray:
+    """帶一階低通阻尼的反饋梳狀濾波器
+
+    out[n] = buf[n - delay]
+    lp[n]  = (1 - damping) * out[n] + damping * lp[n - 1]
+    buf[n] = signal[n] + feedback * lp[n]
+
+    Args:
+        signal: 單聲道輸入
+        delay: 延遲樣本數
+        feedback: 反饋增益
+        damping: 阻尼係數 (0.0 - 1.0)
+
+    Returns:
+        np.ndarray: 濾波後的信號
+    """
+    length = len(signal)
+    output = np.zeros(length, dtype=np.float64)
+    previous = np.zeros(delay, dtype=np.float64)
+    lowpass_b = [1.0 - damping]
+    lowpass_a = [1.0, -damping]
+    state = np.zeros(1)
+
+    for start in range(0, length, delay):
+        end = min(start + delay, length)
+        delayed = previous[:end - start]
+        output[start:end] = delayed
+        lowpassed, state = lfilter(lowpass_b, lowpass_a, delayed, zi=state)
+        previous = signal[start:end] + feedback * lowpassed
+
+    return output
+
+
+def allpass_filter(signal: np.ndarray, delay: int, feedback: float = ALLPASS_FEEDBACK) -> np.ndarray:
+    """Schroeder 全通濾波器
+
+    out[n] = buf[n - delay] - signal[n]
+    buf[n] = signal[n] + feedback * buf[n - delay]
+
+    Args:
+        signal: 單聲道輸入
+        delay: 延遲樣本數
+        feedback: 反饋增益
+
+    Returns:
+        np.ndarray: 濾波後的信號
+    """
+    length = len(signal)
+    output = np.empty(length, dtype=np.float64)
+    previous = np.zeros(delay, dtype=np.float64)
+
+    for start in range(0, length, delay):
+        end = min(start + delay, length)
+        delayed = previous[:end - start]
+        block = signal[start:end]
+        output[start:end] = delayed - block
+        previous = block + feedback * delayed
+
+    return output
+
+
+class FreeverbReverb:
+    """Freeverb 混響引擎類"""
+
+    def __init__(self,
+                 sample_rate: int = 44100,
+                 room_size: float = 0.5,
+                 damping: float = 0.5,
+                 wet_level: float = 0.3,
+                 dry_level: float = 0.7,
+                 width: float = 1.0):
+        """初始化混響
+
+        Args:
+            sample_rate: 採樣率
+            room_size: 房間大小 (0.0 - 1.0)，決定梳狀濾波器的反饋
+            damping: 高頻阻尼 (0.0 - 1.0)
+            wet_level: 混響信號電平 (0.0 - 1.0)
+            dry_level: 原始信號電平 (0.0 - 1.0)
+            width: 立體聲寬度 (0.0 - 1.0)
+        """
+        self.sample_rate = sample_rate
+        self.room_size = float(np.clip(room_size, 0.0, 1.0))
+        self.damping = float(np.clip(damping, 0.0, 1.0))
+        self.wet_level = wet_level
+        self.dry_level = dry_level
+        self.width = float(np.clip(width, 0.0, 1.0))
+
+        scale = sample_rate / TUNING_SAMPLE_RATE
+        self.comb_delays = self._scale_tunings(COMB_TUNINGS, scale)
+        self.allpass_delays = self._scale_tunings(ALLPASS_TUNINGS, scale)
+        self.stereo_spread = max(1, int(round(STEREO_SPREAD * scale)))
+
+    @staticmethod
+    def _scale_tunings(tunings: Sequence[int], scale: float) -> Tuple[int, ...]:
+        """按採樣率縮放延遲長度"""
+        return tuple(max(1, int(round(tuning * scale))) for tuning in tunings)
+
+    @property
+    def feedback(self) -> float:
+        """梳狀濾波器的反饋增益"""
+        return self.room_size * SCALE_ROOM + OFFSET_ROOM
+
+    def _process_channel(self, signal: np.ndarray, spread: int) -> np.ndarray:
+        """處理單個聲道的混響信號
+
+        Args:
+            signal: 已乘以輸入增益的單聲道信號
+            spread: 附加到每個延遲長度的樣本數
+
+        Returns:
+            np.ndarray: 混響（濕）信號
+        """
+        damping = self.damping * SCALE_DAMPING
+        wet = np.zeros(len(signal), dtype=np.float64)
+        for delay in self.comb_delays:
+            wet += comb_filter(signal, delay + spread, self.feedback, damping)
+        for delay in self.allpass_delays:
+            wet = allpass_filter(wet, delay + spread)
+        return wet
+
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """對音頻應用混響
+
+        Args:
+            audio: 單聲道 (樣本數,) 或多聲道 (樣本數, 聲道數) 音頻
+
+        Returns:
+            np.ndarray: 與輸入形狀相同的處理後音頻
+        """
+        audio = np.asarray(audio, dtype=np.float64)
+        if audio.ndim == 1:
+            source = audio[:, np.newaxis]
+        elif audio.ndim == 2:
+            source = audio
+        else:
+            raise ValueError(f"不支持的音頻形狀: {audio.shape}")
+
+        if len(source) == 0:
+            return audio.copy()
+
+        # Freeverb 的兩個聲道都由輸入的平均值驅動
+        mono_input = source.mean(axis=1) * FIXED_GAIN
+        wet_left = self._process_channel(mono_input, 0)
+        wet_right = self._process_channel(mono_input, self.stereo_spread)
+
+        wet = self.wet_level * SCALE_WET
+        wet1 = wet * (self.width / 2 + 0.5)
+        wet2 = wet * ((1 - self.width) / 2)
+
+        if audio.ndim == 1:
+            return audio * self.dry_level + (wet_left + wet_right) * (wet1 + wet2) / 2
+
+        output = source * self.dry_level
+        output[:, 0] += wet_left * wet1 + wet_right * wet2
+        if source.shape[1] > 1:
+            output[:, 1] += wet_right * wet1 + wet_left * wet2
+        return output
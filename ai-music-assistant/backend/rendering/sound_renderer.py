@@ -9,17 +9,20 @@ from typing import Dict, List, Optional, Union
 import numpy as np
 from pathlib import Path
 import fluidsynth as fs
-import mido
-from mido import MidiFile, MidiTrack, Message
+from mido import Message
 import asyncio
 import queue
 import threading
-import tempfile
 import soundfile as sf
 import subprocess
 import shutil
 import json
 
+from .synth_pool import get_synth_pool
+from .midi_renderer import encode_wav
+from ..mcp.note_array import NoteArray
+from ..mcp.smf_writer import DRUM_CHANNEL, SMFTrack, encode_smf
+
 logger = logging.getLogger(__name__)
 
 class SoundRenderer:
@@ -29,6 +32,7 @@ class SoundRenderer:
         """初始化音色渲染器"""
         self.fluidsynth = None
         self.soundfont_path = None
+        self.synth_pool = None
         self.realtime_queue = queue.Queue()
         self.is_realtime_running = False
         self.dexed_enabled = self._check_dexed_available()
@@ -156,6 +160,9 @@ class SoundRenderer:
             if self.fluidsynth.sfpreset_select(sfid, 0, 0) == -1:
                 raise RuntimeError("無法選擇音色預設")
                 
+            # 離線渲染使用共享的合成器池，避免每次渲染重新載入音色庫
+            self.synth_pool = get_synth_pool(self.soundfont_path, sample_rate=44100)
+            
             logger.info(f"FluidSynth初始化成功，使用音色庫: {self.soundfont_path}")
         
         except Exception as e:
@@ -213,9 +220,10 @@ class SoundRenderer:
         """
         try:
             # 創建MIDI文件
-            midi_file = self._create_midi_file(midi_data)
+            midi_bytes = self._create_midi_file(midi_data)
             temp_midi_path = "temp_render.mid"
-            midi_file.save(temp_midi_path)
+            with open(temp_midi_path, 'wb') as f:
+                f.write(midi_bytes)
             
             # 根據選擇的合成器渲染音頻
             if synth_type == "dexed" and self.dexed_enabled:
@@ -239,55 +247,38 @@ class SoundRenderer:
             logger.error(f"MIDI渲染失敗: {str(e)}")
             raise
     
-    def _create_midi_file(self, midi_data: Dict) -> MidiFile:
+    def _create_midi_file(self, midi_data: Dict) -> bytes:
         """創建MIDI文件
         
+        每個樂器一個音軌，音符按順序首尾相接，時值為 duration 個 tick（每拍480）。
+        
         Args:
             midi_data: MIDI數據
             
         Returns:
-            MidiFile: MIDI文件對象
+            bytes: MIDI文件內容
         """
         try:
-            # 創建MIDI文件
-            midi = MidiFile()
-            track = MidiTrack()
-            midi.tracks.append(track)
-            
-            # 設置速度
-            tempo = mido.bpm2tempo(midi_data.get("tempo", 120))
-            track.append(mido.MetaMessage('set_tempo', tempo=tempo))
-            
-            # 設置拍號
-            time_signature = midi_data.get("time_signature", "4/4")
-            numerator, denominator = map(int, time_signature.split("/"))
-            track.append(mido.MetaMessage(
-                'time_signature',
-                numerator=numerator,
-                denominator=denominator
-            ))
-            
-            # 添加音符
-            for instrument, notes in midi_data.get("instruments", {}).items():
-                # 設置樂器
-                program = self._get_instrument_program(instrument)
-                track.append(Message('program_change', program=program))
-                
-                # 添加音符
-                for note in notes.get("notes", []):
-                    track.append(Message(
-                        'note_on',
-                        note=self._note_to_midi(note),
-                        velocity=64
-                    ))
-                    track.append(Message(
-                        'note_off',
-                        note=self._note_to_midi(note),
-                        velocity=64,
-                        time=notes.get("duration", 480)
-                    ))
-            
-            return midi
+            tracks = []
+            channels = [channel for channel in range(16) if channel != DRUM_CHANNEL]
+            for index, (instrument, notes) in enumerate(midi_data.get("instruments", {}).items()):
+                pitches = [self._note_to_midi(note) for note in notes.get("notes", [])]
+                beats = notes.get("duration", 480) / 480
+                durations = [beats] * len(pitches)
+                starts = [beats * position for position in range(len(pitches))]
+                tracks.append(SMFTrack(
+                    NoteArray(pitches, starts, durations),
+                    channel=channels[index % len(channels)],
+                    program=self._get_instrument_program(instrument),
+                    name=instrument
+                ))
+            
+            return encode_smf(
+                tracks,
+                tempo=midi_data.get("tempo", 120),
+                time_signature=midi_data.get("time_signature", "4/4"),
+                ticks_per_beat=480
+            )
         
         except Exception as e:
             logger.error(f"創建MIDI文件失敗: {str(e)}")
@@ -303,27 +294,9 @@ class SoundRenderer:
             np.ndarray: 音頻數據
         """
         try:
-            # 使用FluidSynth渲染
-            synth = fs.Synth(gain=0.5, samplerate=44100)
-            synth.start()
-            sfid = synth.sfload(self.soundfont_path)
-            synth.program_select(0, sfid, 0, 0)
-            
-            # 創建臨時WAV文件
-            temp_wav_path = midi_path.replace('.mid', '.wav')
-            
-            # 渲染MIDI到WAV
-            synth.midi_to_audio(midi_path, temp_wav_path)
-            
-            # 讀取音頻數據
-            audio_data, _ = sf.read(temp_wav_path)
-            
-            # 清理
-            synth.delete()
-            if os.path.exists(temp_wav_path):
-                os.remove(temp_wav_path)
-            
-            return audio_data
+            # 從合成器池借出已載入音色庫的合成器渲染
+            with open(midi_path, 'rb') as f:
+                return self.synth_pool.render(f.read())
             
         except Exception as e:
             logger.error(f"FluidSynth渲染失敗: {str(e)}")
@@ -556,37 +529,9 @@ class SoundRenderer:
             bytes: 音頻文件數據
         """
         try:
-            # 創建臨時MIDI文件
-            with tempfile.NamedTemporaryFile(suffix='.mid', delete=False) as midi_file:
-                midi_file.write(midi_data)
-                midi_path = midi_file.name
-            
-            # 創建臨時WAV文件
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as wav_file:
-                wav_path = wav_file.name
-            
-            # 使用FluidSynth渲染音頻
-            fs = fs.Synth()
-            fs.start()
-            
-            # 加載音色庫
-            soundfont_path = os.path.join(os.path.dirname(__file__), 'soundfonts', 'FluidR3_GM.sf2')
-            sfid = fs.sfload(soundfont_path)
-            fs.program_select(0, sfid, 0, 0)
-            
-            # 渲染MIDI到WAV
-            fs.midi_to_audio(midi_path, wav_path)
-            fs.delete()
-            
-            # 讀取WAV文件
-            with open(wav_path, 'rb') as wav_file:
-                audio_data = wav_file.read()
-            
-            # 清理臨時文件
-            os.unlink(midi_path)
-            os.unlink(wav_path)
-            
-            return audio_data
+            # 從合成器池借出合成器直接渲染，無需臨時文件
+            audio = self.synth_pool.render(midi_data)
+            return encode_wav(audio, self.synth_pool.sample_rate)
             
         except Exception as e:
             logger.error(f"渲染音頻時發生錯誤: {str(e)}")
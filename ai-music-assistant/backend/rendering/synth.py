@@ -0,0 +1,265 @@
+"""批次合成模組
+
+基於波表的加法合成器。每種樂器類型的單週期波形只計算一次，ADSR 包絡按
+(attack, decay, release, length) 緩存；音高與時長相同的音符共用同一段
+已套用包絡的波形，只需按力度縮放後疊加到輸出緩衝區。不含噪聲的波形跨渲染調用
+緩存，按塊串流渲染時各塊可以重用之前塊已生成的波形；含噪聲的樂器類型每個音符
+各自生成噪聲。
+"""
+
+import logging
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 波表長度（單週期樣本數）
+WAVETABLE_SIZE = 4096
+
+# ADSR 的延音電平
+SUSTAIN_LEVEL = 0.7
+
+# 含隨機噪聲、不能跨音符重用的樂器類型
+NOISY_INSTRUMENTS = frozenset({'percussion', 'wind'})
+
+
+def midi_to_frequency(pitch: int) -> float:
+    """MIDI音高轉頻率（A4 = 69 = 440Hz）"""
+    return 440.0 * (2.0 ** ((pitch - 69) / 12.0))
+
+
+def _build_wavetable(instrument_type: str) -> np.ndarray:
+    """建立樂器類型的單週期波表
+
+    Args:
+        instrument_type: 樂器類型
+
+    Returns:
+        np.ndarray: 長度為 WAVETABLE_SIZE + 1 的波表（最後一個樣本等於第一個，便於插值）
+    """
+    phase = np.arange(WAVETABLE_SIZE + 1, dtype=np.float64) / WAVETABLE_SIZE
+    sine = np.sin(2 * np.pi * phase)
+    if instrument_type == 'string':
+        # 弦樂使用正弦波與三角波的混合
+        table = 0.7 * sine + 0.3 * np.abs(2 * (phase - np.floor(phase + 0.5)))
+    else:
+        table = sine
+    table[-1] = table[0]
+    return table.astype(np.float32)
+
+
+def adsr_lengths(length: int, sample_rate: int) -> Tuple[int, int, int]:
+    """按音符長度計算 ADSR 各段的樣本數
+
+    Args:
+        length: 音符樣本數
+        sample_rate: 採樣率
+
+    Returns:
+        (attack, decay, release) 樣本數
+    """
+    note_length = length / sample_rate
+    attack = int(min(0.1, note_length * 0.2) * sample_rate)
+    decay = int(min(0.2, note_length * 0.2) * sample_rate)
+    release = int(min(0.3, note_length * 0.3) * sample_rate)
+    return attack, decay, release
+
+
+class BatchSynthesizer:
+    """批次波表合成器類"""
+
+    def __init__(self,
+                 max_cached_envelopes: int = 512,
+                 seed: Optional[int] = None,
+                 max_template_samples: int = 1 << 22):
+        """初始化合成器
+
+        Args:
+            max_cached_envelopes: 緩存的包絡數量上限
+            seed: 噪聲生成器的隨機種子
+            max_template_samples: 緩存的已套用包絡波形的總樣本數上限，0 表示不緩存
+        """
+        self.max_cached_envelopes = max_cached_envelopes
+        self.max_template_samples = max_template_samples
+        self._wavetables: Dict[str, np.ndarray] = {}
+        self._envelopes: "OrderedDict[Tuple[int, int, int, int], np.ndarray]" = OrderedDict()
+        self._templates: "OrderedDict[Tuple[str, int, int, int], np.ndarray]" = OrderedDict()
+        self._template_samples = 0
+        self._rng = np.random.default_rng(seed)
+
+        self.envelope_hits = 0
+        self.envelope_misses = 0
+        self.template_hits = 0
+
+    def wavetable(self, instrument_type: str) -> np.ndarray:
+        """獲取（必要時建立）樂器類型的波表"""
+        table = self._wavetables.get(instrument_type)
+        if table is None:
+            table = _build_wavetable(instrument_type)
+            self._wavetables[instrument_type] = table
+        return table
+
+    def envelope(self, attack: int, decay: int, release: int, length: int) -> np.ndarray:
+        """獲取緩存的 ADSR 包絡
+
+        Args:
+            attack: 起音樣本數
+            decay: 衰減樣本數
+            release: 釋音樣本數
+            length: 包絡總長度
+
+        Returns:
+            np.ndarray: float32 包絡（只讀，不可原地修改）
+        """
+        key = (attack, decay, release, length)
+        envelope = self._envelopes.get(key)
+        if envelope is not None:
+            try:
+                self._envelopes.move_to_end(key)
+            except KeyError:
+                # 其他線程剛好淘汰了該條目
+                pass
+            self.envelope_hits += 1
+            return envelope
+
+        self.envelope_misses += 1
+        envelope = np.ones(length, dtype=np.float32)
+        sustain_end = length - release
+
+        if 0 < attack < length:
+            envelope[:attack] = np.linspace(0, 1, attack)
+        if decay > 0 and attack + decay < length:
+            envelope[attack:attack + decay] = np.linspace(1, SUSTAIN_LEVEL, decay)
+        if attack + decay < sustain_end:
+            envelope[attack + decay:sustain_end] = SUSTAIN_LEVEL
+        if release > 0 and sustain_end < length:
+            envelope[sustain_end:] = np.linspace(SUSTAIN_LEVEL, 0, length - sustain_end)
+
+        envelope.flags.writeable = False
+        self._envelopes[key] = envelope
+        if len(self._envelopes) > self.max_cached_envelopes:
+            self._envelopes.popitem(last=False)
+        return envelope
+
+    def _waveform(self, instrument_type: str, pitch: int, length: int, sample_rate: int) -> np.ndarray:
+        """生成一個音符的原始波形（未套用包絡與力度）"""
+        t = np.arange(length, dtype=np.float64) / sample_rate
+
+        if instrument_type == 'percussion':
+            # 打擊樂使用快速衰減的噪聲，與音高無關
+            noise = self._rng.normal(0, 1.0, length)
+            return (noise * np.exp(-5 * t)).astype(np.float32)
+
+        phase = (t * midi_to_frequency(pitch)) % 1.0
+        table = self.wavetable(instrument_type)
+        waveform = np.interp(phase * WAVETABLE_SIZE, np.arange(WAVETABLE_SIZE + 1), table).astype(np.float32)
+
+        if instrument_type == 'wind':
+            # 管樂附加少量噪聲
+            waveform += 0.1 * self._rng.normal(0, 0.05, length).astype(np.float32)
+        return waveform
+
+    def template(self, instrument_type: str, pitch: int, length: int, sample_rate: int) -> np.ndarray:
+        """獲取已套用包絡的音符波形（未套用力度）
+
+        不含噪聲的樂器類型按 (樂器類型, 音高, 樣本數, 採樣率) 緩存，
+        超出 max_template_samples 時淘汰最久未使用的波形。
+
+        Returns:
+            np.ndarray: float32 波形（緩存的波形只讀）
+        """
+        key = (instrument_type, pitch, length, sample_rate)
+        template = self._templates.get(key)
+        if template is not None:
+            try:
+                self._templates.move_to_end(key)
+            except KeyError:
+                pass
+            self.template_hits += 1
+            return template
+
+        template = self._waveform(instrument_type, pitch, length, sample_rate)
+        template *= self.envelope(*adsr_lengths(length, sample_rate), length)
+        if instrument_type in NOISY_INSTRUMENTS or length > self.max_template_samples:
+            return template
+
+        template.flags.writeable = False
+        self._templates[key] = template
+        self._template_samples += length
+        while self._template_samples > self.max_template_samples and self._templates:
+            _, evicted = self._templates.popitem(last=False)
+            self._template_samples -= len(evicted)
+        return template
+
+    def render(self,
+               notes: Iterable[Any],
+               sample_rate: int,
+               instrument_type: str = 'default',
+               out: Optional[np.ndarray] = None,
+               offset: int = 0) -> np.ndarray:
+        """將音符渲染到緩衝區
+
+        Args:
+            notes: 具有 pitch/start_time/duration/velocity 屬性的音符
+            sample_rate: 採樣率
+            instrument_type: 樂器類型（string/wind/percussion/其他）
+            out: 預先分配的 float32 緩衝區；音符會疊加到其中，超出長度的部分被截斷
+            offset: 緩衝區第一個樣本對應的絕對樣本位置（按塊渲染時使用）
+
+        Returns:
+            np.ndarray: 輸出緩衝區（未正規化）
+        """
+        notes = list(notes)
+        if out is None:
+            max_time = max((n.start_time + n.duration for n in notes), default=0.0)
+            out = np.zeros(int(max_time * sample_rate), dtype=np.float32)
+        elif out.dtype != np.float32:
+            raise ValueError(f"輸出緩衝區必須是 float32，實際為 {out.dtype}")
+
+        buffer_length = len(out)
+
+        # (音高, 樣本數) -> [(起始樣本, 音量), ...]
+        groups: Dict[Tuple[int, int], List[Tuple[int, float]]] = defaultdict(list)
+        for note in notes:
+            start = int(note.start_time * sample_rate) - offset
+            if start < 0 or start >= buffer_length:
+                continue
+            end = min(int((note.start_time + note.duration) * sample_rate) - offset, buffer_length)
+            if end <= start:
+                continue
+            groups[(note.pitch, end - start)].append((start, note.velocity / 127.0))
+
+        scratch = np.empty(max((length for _, length in groups), default=0), dtype=np.float32)
+
+        noisy = instrument_type in NOISY_INSTRUMENTS
+
+        for (pitch, length), placements in groups.items():
+            if noisy:
+                # 噪聲不能共用，否則同組的音符聽起來完全相同
+                for start, volume in placements:
+                    waveform = self.template(instrument_type, pitch, length, sample_rate)
+                    waveform *= volume
+                    out[start:start + length] += waveform
+                continue
+
+            template = self.template(instrument_type, pitch, length, sample_rate)
+
+            scaled = scratch[:length]
+            for start, volume in placements:
+                np.multiply(template, volume, out=scaled)
+                out[start:start + length] += scaled
+
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        """獲取緩存統計"""
+        return {
+            "wavetables": len(self._wavetables),
+            "envelopes": len(self._envelopes),
+            "envelope_hits": self.envelope_hits,
+            "envelope_misses": self.envelope_misses,
+            "templates": len(self._templates),
+            "template_hits": self.template_hits
+        }
@@ -0,0 +1,341 @@
+"""FluidSynth 合成器池模組
+
+SoundFont 載入是短渲染中最耗時的部分。此模組預先建立若干個已載入 SoundFont 的
+合成器實例，渲染時借出、用完重置後歸還，多個渲染可以在不同線程中並行進行
+（FluidSynth 的 C 調用會釋放 GIL）。
+"""
+
+import os
+import queue
+import logging
+import threading
+from io import BytesIO
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import mido
+import numpy as np
+
+from .midi_renderer import midi_length
+
+try:
+    import fluidsynth
+except ImportError:
+    fluidsynth = None
+
+logger = logging.getLogger(__name__)
+
+# General MIDI 的打擊樂通道與音色庫
+DRUM_CHANNEL = 9
+DRUM_BANK = 128
+MIDI_CHANNELS = 16
+
+
+class SynthPoolBusyError(RuntimeError):
+    """等待空閒合成器超時"""
+
+
+class PooledSynth:
+    """池中的合成器實例"""
+
+    def __init__(self, synth: Any, sfid: int):
+        """初始化
+
+        Args:
+            synth: fluidsynth.Synth 實例
+            sfid: 已載入的 SoundFont ID
+        """
+        self.synth = synth
+        self.sfid = sfid
+        self.renders = 0
+
+    def reset(self):
+        """重置合成器狀態（停止所有聲音並恢復默認音色）"""
+        self.synth.system_reset()
+        for channel in range(MIDI_CHANNELS):
+            bank = DRUM_BANK if channel == DRUM_CHANNEL else 0
+            self.synth.program_select(channel, self.sfid, bank, 0)
+
+
+class FluidSynthPool:
+    """FluidSynth 合成器池類"""
+
+    def __init__(self,
+                 soundfont_path: str,
+                 size: Optional[int] = None,
+                 sample_rate: int = 44100,
+                 gain: float = 0.5,
+                 synth_factory: Optional[Callable[..., Any]] = None):
+        """初始化合成器池
+
+        Args:
+            soundfont_path: SoundFont 文件路徑
+            size: 合成器數量，默認為CPU核心數
+            sample_rate: 採樣率
+            gain: 合成器增益
+            synth_factory: 建立合成器的函數，默認為 fluidsynth.Synth
+        """
+        self.soundfont_path = soundfont_path
+        self.size = max(1, size or os.cpu_count() or 1)
+        self.sample_rate = sample_rate
+        self.gain = gain
+
+        if synth_factory is None:
+            if fluidsynth is None:
+                raise ImportError("無法導入 fluidsynth，請安裝 pyfluidsynth 與 FluidSynth 庫")
+            synth_factory = fluidsynth.Synth
+        self.synth_factory = synth_factory
+
+        self._idle: "queue.Queue[PooledSynth]" = queue.Queue()
+        self._instances: List[PooledSynth] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.renders = 0
+        self.wait_count = 0
+
+    def _create(self) -> PooledSynth:
+        """建立新的合成器並載入 SoundFont"""
+        synth = self.synth_factory(gain=self.gain, samplerate=self.sample_rate)
+        sfid = synth.sfload(self.soundfont_path)
+        if sfid == -1:
+            synth.delete()
+            raise RuntimeError(f"無法加載音色庫文件: {self.soundfont_path}")
+
+        entry = PooledSynth(synth, sfid)
+        entry.reset()
+        return entry
+
+    def warm_up(self) -> int:
+        """預先建立所有合成器
+
+        Returns:
+            已建立的合成器數
+        """
+        while True:
+            with self._lock:
+                if len(self._instances) >= self.size:
+                    return len(self._instances)
+                entry = self._create()
+                self._instances.append(entry)
+            self._idle.put(entry)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[PooledSynth]:
+        """借出一個合成器，歸還前自動重置
+
+        Args:
+            timeout: 等待空閒合成器的最長秒數，默認一直等待
+
+        Yields:
+            PooledSynth: 合成器
+
+        Raises:
+            SynthPoolBusyError: 超過 timeout 仍沒有空閒的合成器
+        """
+        if self._closed:
+            raise RuntimeError("合成器池已關閉")
+
+        entry = None
+        try:
+            entry = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if len(self._instances) < self.size:
+                    entry = self._create()
+                    self._instances.append(entry)
+            if entry is None:
+                self.wait_count += 1
+                try:
+                    entry = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    raise SynthPoolBusyError(f"{timeout} 秒內沒有空閒的合成器") from None
+
+        try:
+            yield entry
+        except Exception:
+            # 出錯的合成器可能處於未知狀態，丟棄後由之後的請求重建
+            self._discard(entry)
+            raise
+
+        try:
+            entry.reset()
+        except Exception as e:
+            logger.warning(f"重置合成器失敗: {str(e)}")
+            self._discard(entry)
+            return
+        self._idle.put(entry)
+
+    def _discard(self, entry: PooledSynth):
+        """從池中移除並釋放合成器"""
+        with self._lock:
+            if entry in self._instances:
+                self._instances.remove(entry)
+        try:
+            entry.synth.delete()
+        except Exception:
+            pass
+
+    def render(self, midi_data: bytes, tail_seconds: float = 1.0) -> np.ndarray:
+        """渲染MIDI數據
+
+        Args:
+            midi_data: 標準MIDI文件數據
+            tail_seconds: 最後一個事件後繼續渲染的秒數（釋音尾巴）
+
+        Returns:
+            np.ndarray: float32 立體聲音頻，形狀為 (樣本數, 2)
+        """
+        blocks = list(self.render_blocks(midi_data, tail_seconds=tail_seconds))
+        if not blocks:
+            return np.zeros((0, 2), dtype=np.float32)
+        return np.concatenate(blocks)
+
+    def render_length(self, midi_data: bytes, tail_seconds: float = 1.0) -> int:
+        """render / render_blocks 輸出的總樣本數（每個聲道）"""
+        midi_file = mido.MidiFile(file=BytesIO(midi_data))
+        return int(midi_length(midi_file) * self.sample_rate) + int(tail_seconds * self.sample_rate)
+
+    def render_blocks(self,
+                      midi_data: bytes,
+                      block_seconds: float = 0.5,
+                      tail_seconds: float = 1.0,
+                      timeout: Optional[float] = None) -> Iterator[np.ndarray]:
+        """按塊渲染MIDI數據
+
+        調用時即解析MIDI並借出合成器，池滿時在返回迭代器前就能得知；合成器在整個
+        迭代期間保持借出，迭代結束或提前關閉迭代器（例如客戶端斷開）時重置並歸還。
+
+        Args:
+            midi_data: 標準MIDI文件數據
+            block_seconds: 塊長（秒）
+            tail_seconds: 最後一個事件後繼續渲染的秒數（釋音尾巴）
+            timeout: 等待空閒合成器的最長秒數，默認一直等待
+
+        Returns:
+            Iterator[np.ndarray]: float32 立體聲音頻塊，形狀為 (樣本數, 2)，除最後一塊外長度相同
+
+        Raises:
+            SynthPoolBusyError: 超過 timeout 仍沒有空閒的合成器
+        """
+        midi_file = mido.MidiFile(file=BytesIO(midi_data))
+        block = max(1, int(block_seconds * self.sample_rate))
+        blocks = self._render_blocks(midi_file, block, tail_seconds, timeout)
+        # 運行到借出合成器為止
+        next(blocks)
+        return blocks
+
+    def _render_blocks(self,
+                       midi_file: mido.MidiFile,
+                       block: int,
+                       tail_seconds: float,
+                       timeout: Optional[float]) -> Iterator[Optional[np.ndarray]]:
+        """render_blocks 的生成器，借出合成器後先產生一個 None"""
+        with self.acquire(timeout) as entry:
+            synth = entry.synth
+            chunks: List[np.ndarray] = []
+            buffered = 0
+            rendered = 0
+
+            try:
+                yield None
+
+                for target, message in self._timeline(midi_file, tail_seconds):
+                    while rendered < target:
+                        count = min(block - buffered, target - rendered)
+                        chunks.append(synth.get_samples(count))
+                        buffered += count
+                        rendered += count
+                        if buffered == block:
+                            yield self._to_float(chunks)
+                            chunks, buffered = [], 0
+                    if message is not None:
+                        self._dispatch(synth, message)
+
+                if chunks:
+                    yield self._to_float(chunks)
+            except GeneratorExit:
+                # 正常離開 with 區塊，讓合成器重置後歸還
+                return
+
+            entry.renders += 1
+
+        self.renders += 1
+
+    def _timeline(self, midi_file: mido.MidiFile, tail_seconds: float) -> Iterator[Tuple[int, Optional[mido.Message]]]:
+        """按時間順序產生 (消息的樣本位置, 消息)，最後是釋音尾巴的結束位置"""
+        now = 0.0
+        target = 0
+        for message in midi_file:
+            now += message.time
+            target = int(now * self.sample_rate)
+            yield target, message
+        yield target + int(tail_seconds * self.sample_rate), None
+
+    @staticmethod
+    def _to_float(chunks: List[np.ndarray]) -> np.ndarray:
+        """將合成器輸出的交錯16位樣本轉換為 (樣本數, 2) 的浮點數組"""
+        return np.concatenate(chunks).reshape(-1, 2).astype(np.float32) / 32768.0
+
+    @staticmethod
+    def _dispatch(synth: Any, message: mido.Message):
+        """將MIDI消息發送到合成器"""
+        if message.type == 'note_on':
+            if message.velocity > 0:
+                synth.noteon(message.channel, message.note, message.velocity)
+            else:
+                synth.noteoff(message.channel, message.note)
+        elif message.type == 'note_off':
+            synth.noteoff(message.channel, message.note)
+        elif message.type == 'program_change':
+            synth.program_change(message.channel, message.program)
+        elif message.type == 'control_change':
+            synth.cc(message.channel, message.control, message.value)
+        elif message.type == 'pitchwheel':
+            synth.pitch_bend(message.channel, message.pitch)
+
+    def stats(self) -> Dict[str, Any]:
+        """獲取池統計"""
+        return {
+            "size": self.size,
+            "created": len(self._instances),
+            "idle": self._idle.qsize(),
+            "renders": self.renders,
+            "waits": self.wait_count
+        }
+
+    def close(self):
+        """釋放所有合成器"""
+        self._closed = True
+        with self._lock:
+            instances, self._instances = self._instances, []
+        for entry in instances:
+            try:
+                entry.synth.delete()
+            except Exception as e:
+                logger.warning(f"釋放合成器失敗: {str(e)}")
+
+
+# 進程內共享的合成器池，按 (SoundFont 路徑, 採樣率) 區分
+_pools: Dict[Tuple[str, int], FluidSynthPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_synth_pool(soundfont_path: str, sample_rate: int = 44100, size: Optional[int] = None) -> FluidSynthPool:
+    """獲取共享的合成器池，首次調用時建立
+
+    Args:
+        soundfont_path: SoundFont 文件路徑
+        sample_rate: 採樣率
+        size: 合成器數量（僅在建立時使用）
+
+    Returns:
+        FluidSynthPool: 合成器池
+    """
+    key = (os.path.abspath(soundfont_path), sample_rate)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = FluidSynthPool(key[0], size=size, sample_rate=sample_rate)
+            _pools[key] = pool
+        return pool
@@ -0,0 +1,154 @@
+"""測試音頻分析緩存"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.audio_processing.analysis_cache import AnalysisCache, AudioAnalysis
+from backend.mcp.storage.cache_keys import KeyLocks
+
+
+class TestAnalysisCache(unittest.TestCase):
+    """測試內容哈希鍵、記憶體/磁盤兩層與單次計算"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, "cache")
+        self.calls = 0
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_audio(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def compute(self, key: str) -> AudioAnalysis:
+        self.calls += 1
+        return AudioAnalysis(key, {"note": np.ones((100, 88), dtype=np.float32)}, None, [(0.0, 0.5, 60, 0.8)])
+
+    def test_key_depends_on_content_and_params(self):
+        """測試相同內容不同文件名共用鍵，參數不同時鍵不同"""
+        a = self.write_audio("a.wav", b"same audio")
+        b = self.write_audio("b.wav", b"same audio")
+        c = self.write_audio("c.wav", b"other audio")
+
+        self.assertEqual(AnalysisCache.make_key(a), AnalysisCache.make_key(b))
+        self.assertNotEqual(AnalysisCache.make_key(a), AnalysisCache.make_key(c))
+        self.assertNotEqual(AnalysisCache.make_key(a, {"minimum_frequency": 50.0}),
+                            AnalysisCache.make_key(a, {"minimum_frequency": 80.0}))
+
+    def test_computes_once_and_persists(self):
+        """測試命中記憶體層，以及新實例從磁盤層讀取"""
+        key = AnalysisCache.make_key(self.write_audio("a.wav", b"audio"))
+        cache = AnalysisCache(self.cache_dir)
+
+        first = cache.get_or_compute(key, self.compute)
+        second = cache.get_or_compute(key, self.compute)
+        self.assertIs(first, second)
+
+        first.f0 = np.array([440.0, np.nan])
+        cache.put(first)
+
+        restored = AnalysisCache(self.cache_dir).get_or_compute(key, self.compute)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(restored.note_events, first.note_events)
+        self.assertTrue(restored.has_f0)
+        np.testing.assert_array_equal(restored.model_output["note"], first.model_output["note"])
+
+    def test_concurrent_requests_compute_once(self):
+        """測試同一音頻的並發請求只計算一次"""
+        cache = AnalysisCache("")
+
+        def slow_compute(key):
+            threading.Event().wait(0.05)
+            return self.compute(key)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", slow_compute)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_key_lock_outlives_holder_while_waited_on(self):
+        """測試持有者釋放時仍有等待者，鍵鎖保留在表中，後到的線程不會與等待者並行"""
+        locks = KeyLocks()
+        waiter_entered = threading.Event()
+        release_waiter = threading.Event()
+        late_entered = threading.Event()
+
+        def waiter():
+            with locks.hold("k"):
+                waiter_entered.set()
+                release_waiter.wait()
+
+        def late():
+            with locks.hold("k"):
+                late_entered.set()
+
+        waiter_thread = threading.Thread(target=waiter)
+        with locks.hold("k"):
+            waiter_thread.start()
+            while locks._locks["k"][1] < 2:
+                threading.Event().wait(0.001)
+
+        self.assertTrue(waiter_entered.wait(1))
+        self.assertEqual(len(locks), 1)
+        late_thread = threading.Thread(target=late)
+        late_thread.start()
+        self.assertFalse(late_entered.wait(0.05))
+
+        release_waiter.set()
+        waiter_thread.join()
+        late_thread.join()
+        self.assertTrue(late_entered.is_set())
+        self.assertEqual(len(locks), 0)
+
+    def test_disk_tier_is_private(self):
+        """測試磁盤層默認停用、目錄權限為 0700，且不讀取其他用戶的文件"""
+        self.assertFalse(AnalysisCache().stats()["disk_enabled"])
+
+        os.makedirs(self.cache_dir, mode=0o755)
+        cache = AnalysisCache(self.cache_dir)
+        self.assertEqual(os.stat(self.cache_dir).st_mode & 0o777, 0o700)
+
+        cache.get_or_compute("a", self.compute)
+        other_user = AnalysisCache(self.cache_dir)
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            self.assertIsNone(other_user.get("a"))
+        self.assertEqual(other_user.disk_hits, 0)
+
+    def test_disk_eviction(self):
+        """測試磁盤層超出容量時淘汰最久未訪問的條目"""
+        cache = AnalysisCache(self.cache_dir, memory_max_entries=1, disk_max_bytes=1)
+        cache.get_or_compute("a", self.compute)
+        cache.get_or_compute("b", self.compute)
+
+        files = os.listdir(self.cache_dir)
+        self.assertEqual(len(files), 0)
+        self.assertEqual(cache.disk_evictions, 2)
+
+        cache = AnalysisCache(self.cache_dir, disk_max_bytes=10 * 1024 * 1024)
+        cache.get_or_compute("a", self.compute)
+        cache.get_or_compute("b", self.compute)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
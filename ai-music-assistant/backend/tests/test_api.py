@@ -0,0 +1,533 @@
+"""測試 API 層的指令執行"""
+
+import os
+import sys
+import json
+import base64
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from fastapi.testclient import TestClient
+from starlette.requests import ClientDisconnect
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.mcp_schema import MCPCommand, MusicParameters, Genre, CommandStatus, MAX_BATCH_COMMANDS
+from backend.mcp.note_array import NoteArray
+from backend.mcp.smf_writer import SMFTrack, encode_smf
+from backend.mcp.storage import StorageResult
+from backend.mcp.model_coordinator import GenerationCache, WorkflowExecutor
+from backend.mcp.model_coordinator import coordinator as coordinator_module
+from backend.mcp.model_coordinator.exceptions import CommandProcessingError, TaskCancelledError
+from backend.rendering.midi_renderer import encode_wav
+from backend.rendering.synth_pool import SynthPoolBusyError
+
+main = None
+_temp_dir = None
+_previous_cwd = None
+
+
+def setUpModule():
+    """在臨時目錄中導入應用，模組級的存儲文件不寫入工作目錄"""
+    global main, _temp_dir, _previous_cwd
+    _temp_dir = tempfile.TemporaryDirectory()
+    _previous_cwd = os.getcwd()
+    os.chdir(_temp_dir.name)
+    import backend.main as main_module
+    main = main_module
+
+
+def tearDownModule():
+    """恢復工作目錄並清理"""
+    os.chdir(_previous_cwd)
+    _temp_dir.cleanup()
+
+
+def make_command(text: str = "輕快的鋼琴曲") -> MCPCommand:
+    return MCPCommand(type="text_to_music", text_input=text, parameters=MusicParameters(genre=Genre.POP))
+
+
+def make_midi_result() -> dict:
+    """帶有一小段可渲染MIDI的工作流程結果"""
+    notes = NoteArray([60, 64, 67], [0.0, 0.5, 1.0], [0.5, 0.5, 1.0], [100, 100, 100])
+    midi_data = encode_smf([SMFTrack(notes)])
+    return {"music_data": {"midi_data": base64.b64encode(midi_data).decode()}}
+
+
+class StubCoordinator:
+    """按預設結果處理指令的協調器"""
+
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = []
+        self.executor = WorkflowExecutor()
+
+    async def process_command(self, command, command_id=None):
+        self.calls.append(command_id)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class MemoryCache:
+    """記錄寫入的內存緩存"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, ttl=None):
+        self.data[key] = value
+        return StorageResult.ok("已緩存", key)
+
+    async def get(self, key):
+        if key in self.data:
+            return StorageResult.ok("命中", self.data[key])
+        return StorageResult.error("未命中")
+
+    async def cleanup_expired(self):
+        return 0
+
+    def stats(self):
+        return {"entries": len(self.data)}
+
+
+class RecordingStorage:
+    """記錄狀態更新的指令存儲"""
+
+    def __init__(self):
+        self.updates = []
+        self.commands = {}
+
+    async def save_command(self, command):
+        self.commands[command.command_id] = {"command_id": command.command_id, "status": command.status.value}
+        return StorageResult.ok("已保存", command.command_id)
+
+    async def get_command(self, command_id):
+        if command_id in self.commands:
+            return StorageResult.ok("已讀取", self.commands[command_id])
+        return StorageResult.error("找不到命令")
+
+    async def update_command_status(self, command_id, status, result=None, error=None):
+        self.updates.append((command_id, status, result, error))
+        if command_id in self.commands:
+            self.commands[command_id]["status"] = status.value
+        return StorageResult.ok("已更新", command_id)
+
+    async def cleanup_old_commands(self):
+        return 0
+
+
+class TestExecuteCommand(unittest.TestCase):
+    """測試 execute_command 對協調器結果的處理"""
+
+    def run_command(self, coordinator):
+        result_cache = MemoryCache()
+        storage = RecordingStorage()
+        background_tasks = main.BackgroundTasks()
+        with mock.patch.object(main, "get_coordinator", return_value=coordinator), \
+                mock.patch.object(main, "result_cache", result_cache), \
+                mock.patch.object(main, "progress_cache", MemoryCache()), \
+                mock.patch.object(main, "command_storage", storage):
+            status, data = asyncio.run(main.execute_command("cmd-1", make_command(), background_tasks))
+        main.active_tasks.pop("cmd-1", None)
+        return status, data, result_cache.data, storage.updates
+
+    def test_completed_result_is_cached(self):
+        """測試協調器返回的結果原樣寫入結果緩存與指令存儲"""
+        result = {"midi_data": "TVRoZA==", "music_data": {"tempo": 120}}
+        coordinator = StubCoordinator(result=result)
+
+        status, data, cached, updates = self.run_command(coordinator)
+
+        self.assertEqual(coordinator.calls, ["cmd-1"])
+        self.assertEqual(status, CommandStatus.COMPLETED)
+        self.assertEqual(data, result)
+        self.assertEqual(cached, {"cmd-1": result})
+        self.assertEqual(updates, [("cmd-1", CommandStatus.COMPLETED, result, None)])
+
+    def test_cancelled_command_is_not_cached_as_failure(self):
+        """測試取消的指令保留 CANCELLED 狀態且不寫入失敗結果"""
+        coordinator = StubCoordinator(error=TaskCancelledError("cmd-1"))
+
+        status, data, cached, updates = self.run_command(coordinator)
+
+        self.assertEqual(status, CommandStatus.CANCELLED)
+        self.assertEqual(data["status"], "CANCELLED")
+        self.assertEqual(cached, {})
+        self.assertEqual([update[1] for update in updates], [CommandStatus.CANCELLED])
+
+    def test_failure_is_cached(self):
+        """測試處理失敗時緩存錯誤結果"""
+        coordinator = StubCoordinator(error=CommandProcessingError("cmd-1", "模型不可用"))
+
+        status, data, cached, updates = self.run_command(coordinator)
+
+        self.assertEqual(status, CommandStatus.FAILED)
+        self.assertEqual(cached["cmd-1"]["status"], "FAILED")
+        self.assertEqual([update[1] for update in updates], [CommandStatus.FAILED])
+
+
+class TestProgressUpdates(unittest.TestCase):
+    """測試進度更新與最終狀態的順序"""
+
+    def test_late_progress_does_not_overwrite_final_status(self):
+        """測試工作線程晚到的進度回調不會覆蓋已寫入的最終狀態"""
+        progress_cache = MemoryCache()
+
+        async def run():
+            report = main.make_progress_reporter("cmd-late")
+            await main.update_task_progress("cmd-late", "PROCESSING", 30, "處理中")
+            await main.update_task_progress("cmd-late", "COMPLETED", 100, "處理完成")
+            await asyncio.to_thread(report, 0.5, "晚到的進度")
+            # 讓回調排入的協程執行完
+            for _ in range(5):
+                await asyncio.sleep(0)
+
+        with mock.patch.object(main, "progress_cache", progress_cache), \
+                mock.patch.dict(main.active_tasks, clear=True):
+            asyncio.run(run())
+            final = main.active_tasks["cmd-late"]
+
+        self.assertEqual((final["status"], final["progress"]), ("COMPLETED", 100))
+        self.assertEqual(progress_cache.data["cmd-late"]["status"], "COMPLETED")
+
+
+class TestLifecycle(unittest.TestCase):
+    """測試啟動與關閉事件對協調器與進程池的處理"""
+
+    def test_track_generation_follows_config(self):
+        """測試並行音軌生成的設置從配置傳入協調器與執行池工作進程的初始化函數"""
+        values = {"generation.parallel_tracks": True, "generation.track_workers": 3}
+        coordinator = mock.Mock()
+        with mock.patch.object(main.config, "get", side_effect=lambda key, default=None: values.get(key, default)), \
+                mock.patch.object(main, "get_coordinator", return_value=coordinator) as get_coordinator:
+            asyncio.run(main.warm_up_coordinator())
+
+        executor, = get_coordinator.call_args.args
+        self.assertIs(executor.initializer, main.init_worker)
+        self.assertEqual(executor.initargs, (True, 3))
+        coordinator.warm_up.assert_called_once_with(None)
+
+    def test_warm_up_can_be_disabled(self):
+        """測試關閉 executor.start_workers 時啟動事件不預熱執行池"""
+        values = {"executor.start_workers": False}
+        coordinator = mock.Mock()
+        with mock.patch.object(main.config, "get", side_effect=lambda key, default=None: values.get(key, default)), \
+                mock.patch.object(main, "get_coordinator", return_value=coordinator):
+            asyncio.run(main.warm_up_coordinator())
+
+        coordinator.warm_up.assert_not_called()
+
+    def test_backfill_job_is_kept_and_cancelled_on_shutdown(self):
+        """測試索引列回填任務保留引用，關閉事件取消仍在運行的回填"""
+        async def run():
+            running = asyncio.Event()
+            storage = mock.AsyncMock()
+
+            async def slow_backfill():
+                running.set()
+                await asyncio.sleep(10)
+            storage.backfill_indexed_columns.side_effect = slow_backfill
+
+            with mock.patch.object(main, "command_storage", storage):
+                await main.migrate_command_storage()
+                job, = main.background_jobs
+                await running.wait()
+                await main.cancel_background_jobs()
+            return job
+
+        job = asyncio.run(run())
+        self.assertTrue(job.cancelled())
+        self.assertEqual(main.background_jobs, set())
+
+    def test_failed_background_job_is_logged(self):
+        """測試背景任務失敗時記錄錯誤並移除引用"""
+        async def fail():
+            raise RuntimeError("回填失敗")
+
+        async def run():
+            task = main.start_background_job(fail(), "failing-job")
+            await asyncio.gather(task, return_exceptions=True)
+            await asyncio.sleep(0)
+
+        with mock.patch.object(main.logger, "error") as log_error:
+            asyncio.run(run())
+
+        self.assertEqual(main.background_jobs, set())
+        self.assertIn("failing-job", log_error.call_args.args[0])
+
+    def patch_storages(self):
+        storages = [mock.patch.object(main, name, mock.AsyncMock())
+                    for name in ("progress_cache", "result_cache", "command_storage")]
+        storages.append(mock.patch.object(main, "generation_cache", mock.Mock(cache=mock.AsyncMock())))
+        for patch in storages:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_shutdown_closes_track_pool(self):
+        """測試關閉事件在關閉執行池後關閉音軌生成進程池"""
+        calls = []
+        coordinator = mock.Mock()
+        coordinator.shutdown.side_effect = lambda: calls.append("executor")
+        self.patch_storages()
+        with mock.patch.object(coordinator_module, "_coordinator", coordinator), \
+                mock.patch.object(main, "shutdown_track_pool", side_effect=lambda: calls.append("tracks")):
+            asyncio.run(main.close_storage())
+            self.assertIsNone(coordinator_module._coordinator)
+
+        self.assertEqual(calls, ["executor", "tracks"])
+
+    def test_shutdown_without_coordinator(self):
+        """測試預熱失敗、沒有協調器時關閉事件不新建協調器"""
+        self.patch_storages()
+        with mock.patch.object(coordinator_module, "_coordinator", None), \
+                mock.patch.object(coordinator_module, "ModelCoordinator") as model_coordinator, \
+                mock.patch.object(main, "shutdown_track_pool"):
+            asyncio.run(main.close_storage())
+
+        model_coordinator.assert_not_called()
+
+
+class TestCommandEndpoints(unittest.TestCase):
+    """以替身服務測試指令相關端點"""
+
+    def setUp(self):
+        self.coordinator = StubCoordinator(result=make_midi_result())
+        self.result_cache = MemoryCache()
+        self.progress_cache = MemoryCache()
+        self.storage = RecordingStorage()
+
+        async def no_expiry(command_id, delay_seconds=600):
+            return None
+
+        patches = [
+            mock.patch.object(main, "get_coordinator", return_value=self.coordinator),
+            mock.patch.object(main, "result_cache", self.result_cache),
+            mock.patch.object(main, "progress_cache", self.progress_cache),
+            mock.patch.object(main, "command_storage", self.storage),
+            mock.patch.object(main, "generation_cache", GenerationCache(MemoryCache())),
+            mock.patch.object(main, "expire_active_task", no_expiry)
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(main.active_tasks.clear)
+
+        # 不進入上下文，避免運行啟動事件（預熱、回填）；背景任務在響應後同步執行
+        self.client = TestClient(main.app)
+
+    def command_json(self, text="輕快的鋼琴曲", seed=7):
+        command = MCPCommand(type="text_to_music", text_input=text,
+                             parameters=MusicParameters(genre=Genre.POP), seed=seed)
+        return json.loads(command.model_dump_json(exclude={"command_id"}))
+
+    def test_batch_deduplicates_identical_commands(self):
+        """測試批次中相同的指令只執行一次並共用結果"""
+        response = self.client.post("/api/commands/batch", json={"commands": [
+            self.command_json(seed=None),
+            self.command_json(seed=None),
+            self.command_json("抒情的吉他曲", seed=None)
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        batch = response.json()
+        self.assertEqual((batch["total"], batch["unique"]), (3, 2))
+        first, duplicate, other = batch["commands"]
+        self.assertEqual(duplicate["shared_with"], first["command_id"])
+        self.assertTrue(duplicate["deduplicated"])
+        self.assertFalse(other["deduplicated"])
+
+        self.assertEqual(sorted(self.coordinator.calls), sorted([first["command_id"], other["command_id"]]))
+        self.assertEqual(self.result_cache.data[duplicate["command_id"]], self.result_cache.data[first["command_id"]])
+        self.assertEqual(self.storage.commands[duplicate["command_id"]]["status"], CommandStatus.COMPLETED.value)
+
+        progress = self.client.get(f"/api/commands/batch/{batch['batch_id']}").json()["progress"]
+        self.assertEqual((progress["status"], progress["progress"]), ("COMPLETED", 100.0))
+
+    def test_batch_size_is_limited(self):
+        """測試批次命令數超出上限時返回422"""
+        commands = [self.command_json(seed=None)] * (MAX_BATCH_COMMANDS + 1)
+        response = self.client.post("/api/commands/batch", json={"commands": commands})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.coordinator.calls, [])
+
+    def test_generation_cache_reuses_result(self):
+        """測試內容相同的可重用指令命中生成結果緩存"""
+        first = self.client.post("/api/command", json=self.command_json()).json()["command_id"]
+        second = self.client.post("/api/command", json=self.command_json(" 輕快的鋼琴曲 ")).json()["command_id"]
+
+        self.assertEqual(self.coordinator.calls, [first])
+        self.assertEqual(self.result_cache.data[second], self.result_cache.data[first])
+        self.assertEqual(self.client.get(f"/api/command/{second}/progress").json()["status"], "COMPLETED")
+
+    def test_progress_over_sse_and_websocket(self):
+        """測試 SSE 與 WebSocket 推送已完成指令的最終進度後結束"""
+        command_id = self.client.post("/api/command", json=self.command_json()).json()["command_id"]
+
+        response = self.client.get(f"/api/command/{command_id}/progress/stream")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = [block for block in response.text.split("\n\n") if block.startswith("event: progress")]
+        self.assertEqual(len(events), 1)
+        self.assertEqual(json.loads(events[0].split("data: ", 1)[1])["status"], "COMPLETED")
+
+        with self.client.websocket_connect(f"/ws/command/{command_id}/progress") as websocket:
+            message = websocket.receive_json()
+        self.assertEqual((message["type"], message["data"]["status"]), ("progress", "COMPLETED"))
+
+        self.assertEqual(self.client.get("/api/command/missing/progress/stream").status_code, 404)
+
+    def test_audio_stream(self):
+        """測試以WAV串流返回指令生成的音樂"""
+        command_id = self.client.post("/api/command", json=self.command_json()).json()["command_id"]
+
+        response = self.client.get(f"/api/command/{command_id}/audio/stream",
+                                   params={"sample_rate": 8000, "block_seconds": 0.25})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "audio/wav")
+        body = response.content
+        self.assertEqual(body[:4], b"RIFF")
+        samples = np.frombuffer(body[44:], dtype=np.int16)
+        self.assertGreaterEqual(len(samples), 8000)
+        self.assertTrue(np.any(samples))
+
+    def test_audio_stream_for_text_to_music_result(self):
+        """測試文本到音樂工作流程的結果（頂層 midi_data）也可以串流"""
+        from backend.mcp.model_coordinator import workflow
+
+        midi_data = base64.b64decode(make_midi_result()["music_data"]["midi_data"])
+        with mock.patch.object(workflow.music_generator, "generate_music", return_value={"midi_data": midi_data}):
+            self.coordinator.result = workflow.process_text_to_music(make_command())
+        self.assertNotIn("music_data", self.coordinator.result)
+        command_id = self.client.post("/api/command", json=self.command_json()).json()["command_id"]
+
+        response = self.client.get(f"/api/command/{command_id}/audio/stream",
+                                   params={"sample_rate": 8000, "block_seconds": 0.25})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content[:4], b"RIFF")
+        self.assertTrue(np.any(np.frombuffer(response.content[44:], dtype=np.int16)))
+
+    def test_audio_stream_busy_synth_pool(self):
+        """測試沒有空閒合成器時在開始響應前返回503"""
+        command_id = self.client.post("/api/command", json=self.command_json()).json()["command_id"]
+
+        with mock.patch.object(main, "open_audio_stream", side_effect=SynthPoolBusyError("busy")):
+            response = self.client.get(f"/api/command/{command_id}/audio/stream")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["retry-after"], "5")
+
+    def test_audio_stream_closed_on_disconnect(self):
+        """測試客戶端中途斷開時關閉渲染迭代器"""
+        closed = []
+
+        def chunks():
+            try:
+                while True:
+                    yield b"\0" * 16
+            finally:
+                closed.append(True)
+
+        sent = []
+
+        async def receive():
+            await asyncio.sleep(10)
+
+        async def send(message):
+            sent.append(message)
+            if len(sent) > 2:
+                raise OSError("連接已斷開")
+
+        response = main.ClosingStreamingResponse(chunks(), media_type="audio/wav")
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+
+        async def run():
+            # Starlette 0.38 起把發送時的 OSError 包裝為 ClientDisconnect，
+            # 之前的版本從任務組中以 ExceptionGroup 拋出原始的 OSError
+            with self.assertRaises(Exception) as raised:
+                await response(scope, receive, send)
+            error = raised.exception
+            while not isinstance(error, (ClientDisconnect, OSError)) and getattr(error, "exceptions", None):
+                error = error.exceptions[0]
+            self.assertIsInstance(error, (ClientDisconnect, OSError))
+            # 在事件循環結束、異步生成器被回收之前就已關閉
+            self.assertEqual(closed, [True])
+
+        asyncio.run(run())
+
+
+class LoopRecordingAudioService:
+    """記錄每個方法是否在事件循環中被調用的音頻服務替身"""
+
+    def __init__(self):
+        # 方法名 -> 調用時所在線程是否有運行中的事件循環
+        self.on_loop = {}
+
+    async def ready(self):
+        return True
+
+    def _record(self, name):
+        try:
+            asyncio.get_running_loop()
+            self.on_loop[name] = True
+        except RuntimeError:
+            self.on_loop[name] = False
+
+    def correct_pitch(self, audio_file_path, output_path, y=None, sr=None):
+        self._record("correct_pitch")
+        with open(output_path, "wb") as f:
+            f.write(encode_wav(np.zeros(160, dtype=np.float32), 8000))
+        return output_path
+
+    def audio_to_midi(self, audio_file_path, output_midi_path):
+        self._record("audio_to_midi")
+        with open(output_midi_path, "wb") as f:
+            f.write(base64.b64decode(make_midi_result()["music_data"]["midi_data"]))
+        return output_midi_path
+
+    def analyze_audio(self, audio_data, sample_rate):
+        self._record("analyze_audio")
+        return {"rhythm": {"tempo": 120, "pattern": {"complexity": 0.5}}}
+
+    def detect_key(self, y=None, sr=None):
+        self._record("detect_key")
+        return "C major"
+
+
+class TestAudioEndpoints(unittest.TestCase):
+    """測試音頻端點不在事件循環中執行分析與轉錄"""
+
+    def setUp(self):
+        self.service = LoopRecordingAudioService()
+        for name in ("basic_pitch_service", "audio_processor"):
+            patch = mock.patch.object(main, name, self.service)
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.client = TestClient(main.app)
+        self.wav = encode_wav(np.zeros(800, dtype=np.float32), 8000)
+
+    def post(self, path):
+        return self.client.post(path, files={"audio": ("a.wav", self.wav, "audio/wav")})
+
+    def test_work_runs_off_the_event_loop(self):
+        """測試音高校正、音頻分析與非串流轉MIDI都在工作線程中執行"""
+        self.assertEqual(self.post("/api/audio/correct-pitch").status_code, 200)
+        self.assertEqual(self.post("/api/audio/analyze").json()["analysis"]["key"], "C major")
+        self.assertEqual(self.post("/api/audio/to-midi").status_code, 200)
+
+        self.assertEqual(self.service.on_loop, {
+            "correct_pitch": False, "analyze_audio": False, "detect_key": False, "audio_to_midi": False
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
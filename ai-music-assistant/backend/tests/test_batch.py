@@ -0,0 +1,56 @@
+"""測試批次命令規劃"""
+
+import sys
+import unittest
+from pathlib import Path
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.mcp_schema import MCPCommand, MusicParameters, Genre, CommandStatus
+from backend.mcp.model_coordinator.batch import command_fingerprint, plan_batch
+
+
+def make_command(text: str, genre: Genre = Genre.POP, **kwargs) -> MCPCommand:
+    return MCPCommand(
+        type="text_to_music",
+        text_input=text,
+        parameters=MusicParameters(genre=genre),
+        **kwargs
+    )
+
+
+class TestBatchPlanning(unittest.TestCase):
+    """測試命令規範化與去重分組"""
+
+    def test_fingerprint_ignores_volatile_fields(self):
+        """測試ID、狀態與空白差異不影響指紋"""
+        a = make_command("輕快的  鋼琴曲", command_id="a")
+        b = make_command(" 輕快的 鋼琴曲 ", command_id="b", status=CommandStatus.FAILED)
+        c = make_command("輕快的 鋼琴曲", genre=Genre.JAZZ)
+
+        self.assertEqual(command_fingerprint(a), command_fingerprint(b))
+        self.assertNotEqual(command_fingerprint(a), command_fingerprint(c))
+
+    def test_plan_groups_identical_commands(self):
+        """測試相同命令合併到首次出現的命令，並保持順序"""
+        commands = [
+            make_command("夜晚"),
+            make_command("夜晚", genre=Genre.JAZZ),
+            make_command("夜晚 "),
+            make_command("夜晚", genre=Genre.JAZZ),
+            make_command("清晨"),
+        ]
+        groups = plan_batch(commands, ["c0", "c1", "c2", "c3", "c4"])
+
+        self.assertEqual([group.leader_id for group in groups], ["c0", "c1", "c4"])
+        self.assertEqual(groups[0].members, [(0, "c0"), (2, "c2")])
+        self.assertEqual(groups[1].follower_ids, ["c3"])
+        self.assertEqual(groups[2].follower_ids, [])
+
+        with self.assertRaises(ValueError):
+            plan_batch(commands, ["only-one"])
+
+
+if __name__ == "__main__":
+    unittest.main()
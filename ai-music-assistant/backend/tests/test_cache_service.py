@@ -0,0 +1,119 @@
+"""測試兩層緩存服務"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.storage.cache_service import CacheService
+from backend.mcp.storage.memory_cache import MemoryCache
+
+
+class TestMemoryCache(unittest.TestCase):
+    """測試記憶體LRU緩存"""
+    
+    def test_lru_eviction_by_entries(self):
+        """測試超過條目上限時淘汰最久未使用的條目"""
+        cache = MemoryCache(max_entries=2)
+        cache.set("a", 1, ttl=60)
+        cache.set("b", 2, ttl=60)
+        cache.get("a")
+        cache.set("c", 3, ttl=60)
+        
+        self.assertEqual(cache.get("a"), (True, 1))
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.stats()["evictions"], 1)
+    
+    def test_eviction_by_bytes(self):
+        """測試超過字節上限時淘汰條目"""
+        cache = MemoryCache(max_entries=100, max_bytes=3000)
+        for i in range(10):
+            cache.set(f"k{i}", "x" * 1000, ttl=60)
+        
+        self.assertLessEqual(cache.current_bytes, 3000)
+        self.assertTrue(cache.get("k9")[0])
+        self.assertFalse(cache.get("k0")[0])
+    
+    def test_ttl_expiry(self):
+        """測試過期條目不會命中"""
+        cache = MemoryCache()
+        cache.set("a", 1, ttl=0.01)
+        time.sleep(0.02)
+        
+        self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+
+class TestCacheService(unittest.TestCase):
+    """測試緩存服務的記憶體層與持久化層"""
+    
+    def setUp(self):
+        """設置測試環境"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "cache.db")
+    
+    def tearDown(self):
+        """清理測試環境"""
+        self.temp_dir.cleanup()
+    
+    def test_read_through_and_write_through(self):
+        """測試寫穿透到持久化層，新實例讀穿透後回填記憶體層"""
+        async def run():
+            writer = CacheService(namespace="progress", db_path=self.db_path)
+            await writer.set("cmd-1", {"progress": 50})
+            first = await writer.get("cmd-1")
+            await writer.close()
+            
+            reader = CacheService(namespace="progress", db_path=self.db_path)
+            cold = await reader.get("cmd-1")
+            warm = await reader.get("cmd-1")
+            stats = reader.stats()
+            await reader.close()
+            return first.data, cold.data, warm.data, stats
+        
+        first, cold, warm, stats = asyncio.run(run())
+        self.assertEqual(first, {"progress": 50})
+        self.assertEqual(cold, {"progress": 50})
+        self.assertEqual(warm, {"progress": 50})
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+    
+    def test_returned_data_is_a_copy(self):
+        """測試修改寫入或讀出的數據不會影響緩存中的條目"""
+        async def run():
+            cache = CacheService(namespace="results", db_path=self.db_path)
+            data = {"status": "COMPLETED", "tracks": [1, 2]}
+            await cache.set("cmd-1", data)
+            data["tracks"].append(3)
+            
+            first = await cache.get("cmd-1")
+            first.data["status"] = "FAILED"
+            second = await cache.get("cmd-1")
+            await cache.close()
+            return second.data, cache.stats()["hits"]
+        
+        data, hits = asyncio.run(run())
+        self.assertEqual(data, {"status": "COMPLETED", "tracks": [1, 2]})
+        self.assertEqual(hits, 2)
+    
+    def test_delete_removes_both_tiers(self):
+        """測試刪除同時清除兩層緩存"""
+        async def run():
+            cache = CacheService(namespace="results", db_path=self.db_path)
+            await cache.set("cmd-1", {"status": "COMPLETED"})
+            await cache.delete("cmd-1")
+            result = await cache.get("cmd-1")
+            await cache.close()
+            return result
+        
+        self.assertFalse(asyncio.run(run()).success)
+
+
+if __name__ == "__main__":
+    unittest.main()
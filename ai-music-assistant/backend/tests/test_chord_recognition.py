@@ -0,0 +1,112 @@
+"""測試和弦識別"""
+
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.note_array import NoteArray
+from backend.music_theory.chord_recognition import (
+    NO_CHORD,
+    chord_table,
+    label_mask,
+    mask_from_pitches,
+    merge_chords,
+    recognize_chords,
+    segment_masks
+)
+
+
+def block_chords(voicings, length: float = 4.0) -> NoteArray:
+    """每個和弦持續一個時間段的柱式和弦"""
+    pitches, starts = [], []
+    for index, voicing in enumerate(voicings):
+        pitches.extend(voicing)
+        starts.extend([index * length] * len(voicing))
+    return NoteArray(pitches, starts, np.full(len(pitches), length))
+
+
+class TestChordRecognition(unittest.TestCase):
+    """測試查找表、逐段識別與合併"""
+
+    def test_table_resolves_common_chords(self):
+        """測試常見和弦的根音、性質與轉位"""
+        cases = [
+            ([60, 64, 67], "C", 0),
+            ([57, 60, 64], "Am", 0),
+            ([62, 66, 69, 72], "D7", 0),
+            ([59, 62, 65], "Bdim", 0),
+            ([64, 67, 72], "C", 1),
+            ([67, 72, 76], "C", 2),
+            ([65, 69, 72, 76], "Fmaj7", 0),
+            ([66, 69, 72, 76], "F#m7b5", 0),
+            ([60, 65, 67], "Csus4", 0),
+        ]
+        for pitches, symbol, inversion in cases:
+            with self.subTest(pitches=pitches):
+                label = label_mask(mask_from_pitches(pitches), pitches[0] % 12)
+                self.assertEqual((label.symbol, label.inversion, label.source), (symbol, inversion, "table"))
+
+        self.assertEqual(label_mask(mask_from_pitches([64, 67, 72]), 4).slash_symbol, "C/E")
+        self.assertEqual(label_mask(0).symbol, NO_CHORD)
+        self.assertEqual(label_mask(mask_from_pitches([60])).symbol, NO_CHORD)
+        self.assertEqual(len(chord_table().roots), 4096)
+
+    def test_ambiguous_masks_use_bass_then_fallback(self):
+        """測試並列的遮罩先由低音決定，仍無法決定時才調用回調"""
+        mask = mask_from_pitches([60, 64, 67, 69])
+        self.assertIn(mask, chord_table().candidates)
+        self.assertEqual(label_mask(mask, bass=0).symbol, "C6")
+        self.assertEqual(label_mask(mask, bass=9).symbol, "Am7")
+
+        calls = []
+
+        def resolve_root(pitches):
+            calls.append(pitches)
+            return 9
+
+        label = label_mask(mask, bass=7, resolve_root=resolve_root)
+        self.assertEqual((label.symbol, label.source), ("Am7", "fallback"))
+        self.assertEqual(calls, [[55, 57, 60, 64]])
+
+        calls.clear()
+        label_mask(mask_from_pitches([60, 64, 67]), bass=0, resolve_root=resolve_root)
+        self.assertEqual(calls, [])
+
+    def test_segments_ignore_passing_notes(self):
+        """測試時間段遮罩忽略短暫的經過音，低音取最低的發聲音符"""
+        notes = NoteArray.concatenate([
+            block_chords([[48, 64, 67], [53, 69, 72]]),
+            NoteArray([62], [1.0], [0.5])
+        ])
+        starts, masks, basses = segment_masks(notes, 4.0)
+
+        np.testing.assert_array_equal(starts, [0.0, 4.0])
+        self.assertEqual(masks.tolist(), [mask_from_pitches([60, 64, 67]), mask_from_pitches([65, 69, 72])])
+        self.assertEqual(basses.tolist(), [0, 5])
+
+    def test_full_progression_is_returned(self):
+        """測試返回完整和弦進行（不截斷），相同的連續和弦合併"""
+        cycle = [[60, 64, 67], [57, 60, 64], [53, 57, 60], [55, 59, 62]]
+        notes = block_chords(cycle * 6 + [[55, 59, 62]])
+        labels = recognize_chords(notes, segment_length=4.0)
+
+        self.assertEqual(len(labels), 25)
+        merged = merge_chords(labels)
+        self.assertEqual([symbol for symbol, _ in merged], ["C", "Am", "F", "G"] * 6)
+        self.assertEqual(merged[-1], ("G", 8.0))
+
+    def test_empty_segments_extend_previous_chord(self):
+        """測試休止的時間段延續前一個和弦"""
+        notes = NoteArray.concatenate([block_chords([[60, 64, 67]]), block_chords([[57, 60, 64]]).shift(8.0)])
+        merged = merge_chords(recognize_chords(notes, segment_length=4.0))
+        self.assertEqual(merged, [("C", 8.0), ("Am", 4.0)])
+        self.assertEqual(recognize_chords(NoteArray.empty()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""測試指令存儲的索引列與游標分頁"""
+
+import os
+import sys
+import json
+import asyncio
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.mcp_schema import CommandStatus, MCPCommand
+from backend.mcp.storage.command_storage import CommandStorage
+
+
+class TestCommandStorage(unittest.TestCase):
+    """測試SQLite指令存儲"""
+    
+    def setUp(self):
+        """設置測試環境"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "commands.db")
+    
+    def tearDown(self):
+        """清理測試環境"""
+        self.temp_dir.cleanup()
+    
+    def _make_commands(self, count):
+        base = datetime(2024, 1, 1)
+        return [
+            MCPCommand(
+                command_id=f"cmd-{i:03d}",
+                type="text_to_music",
+                text_input=f"prompt {i}",
+                status=CommandStatus.COMPLETED if i % 2 else CommandStatus.PENDING,
+                created_at=base + timedelta(minutes=i)
+            )
+            for i in range(count)
+        ]
+    
+    def test_indexed_columns_populated(self):
+        """測試保存指令時填寫索引列"""
+        async def run():
+            storage = CommandStorage(db_path=self.db_path)
+            await storage.save_command(self._make_commands(1)[0])
+            await storage.update_command_status("cmd-000", CommandStatus.FAILED, error="boom")
+            result = await storage.storage.query(
+                "SELECT status, command_type, created_at FROM commands WHERE key = ?", ("cmd-000",)
+            )
+            await storage.close()
+            return result.data[0]
+        
+        status, command_type, created_at = asyncio.run(run())
+        self.assertEqual(status, "failed")
+        self.assertEqual(command_type, "text_to_music")
+        self.assertEqual(created_at, "2024-01-01T00:00:00")
+    
+    def test_cursor_pagination_walks_all_rows(self):
+        """測試游標分頁按時間降序遍歷所有記錄且不重複"""
+        async def run():
+            storage = CommandStorage(db_path=self.db_path)
+            for command in self._make_commands(25):
+                await storage.save_command(command)
+            
+            seen = []
+            cursor = None
+            while True:
+                page = await storage.get_command_page(limit=10, cursor=cursor, status=CommandStatus.COMPLETED)
+                seen.extend(command["command_id"] for command in page.data["commands"])
+                cursor = page.data["next_cursor"]
+                if not cursor:
+                    break
+            
+            count = await storage.count_commands(status="completed")
+            await storage.close()
+            return seen, count
+        
+        seen, count = asyncio.run(run())
+        expected = [f"cmd-{i:03d}" for i in range(24, -1, -1) if i % 2]
+        self.assertEqual(seen, expected)
+        self.assertEqual(count, len(expected))
+    
+    def test_invalid_cursor_is_rejected(self):
+        """測試格式錯誤的游標在兩種存儲上都返回 ValueError 錯誤結果"""
+        async def run():
+            results = []
+            for storage in (CommandStorage(db_path=self.db_path),
+                            CommandStorage("json", base_dir=os.path.join(self.temp_dir.name, "commands"))):
+                for cursor in ("not-a-cursor", "-10"):
+                    results.append(await storage.get_command_page(limit=10, cursor=cursor))
+                await storage.close()
+            return results
+        
+        for result in asyncio.run(run()):
+            self.assertFalse(result.success)
+            self.assertIsInstance(result.error, ValueError)
+    
+    def test_backfill_legacy_rows(self):
+        """測試回填遷移前寫入的舊記錄"""
+        # 模擬舊版表結構
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "CREATE TABLE commands (key TEXT PRIMARY KEY, data TEXT NOT NULL, "
+            "created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+        )
+        for i in range(30):
+            data = {
+                "command_id": f"old-{i}",
+                "type": "analysis",
+                "status": "completed",
+                "created_at": {"__datetime__": f"2023-05-01T00:00:{i:02d}"}
+            }
+            conn.execute(
+                "INSERT INTO commands VALUES (?, ?, ?, ?)",
+                (f"old-{i}", json.dumps(data), "2099-01-01", "2099-01-01")
+            )
+        conn.commit()
+        conn.close()
+        
+        async def run():
+            storage = CommandStorage(db_path=self.db_path)
+            backfill = await storage.backfill_indexed_columns(chunk_size=7)
+            count = await storage.count_commands(status="completed")
+            history = await storage.get_command_history(limit=1)
+            await storage.close()
+            return backfill.data, count, history.data[0]["command_id"]
+        
+        processed, count, newest = asyncio.run(run())
+        self.assertEqual(processed, 30)
+        self.assertEqual(count, 30)
+        self.assertEqual(newest, "old-29")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""測試共享的模型協調器"""
+
+import sys
+import asyncio
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.mcp_schema import MCPCommand, CommandStatus
+from backend.mcp.model_coordinator import workflow
+from backend.mcp.model_coordinator.executor import WorkflowExecutor
+from backend.mcp.model_coordinator.coordinator import (
+    ModelCoordinator,
+    get_coordinator,
+    reset_coordinator
+)
+
+
+class TestModelCoordinator(unittest.TestCase):
+    """測試協調器的生命週期與取消"""
+
+    def tearDown(self):
+        reset_coordinator()
+
+    def test_get_coordinator_is_shared(self):
+        """測試多次獲取返回同一個實例"""
+        coordinator = get_coordinator()
+        self.assertIs(get_coordinator(), coordinator)
+        self.assertGreater(coordinator.metrics()["construction_time_ms"], 0)
+
+        reset_coordinator()
+        self.assertIsNot(get_coordinator(), coordinator)
+
+    def test_init_worker_loads_warm_up_modules(self):
+        """測試工作進程的初始化函數載入延遲導入的模組"""
+        with mock.patch.object(workflow.importlib, "import_module") as import_module:
+            workflow.init_worker()
+
+        self.assertEqual([call.args[0] for call in import_module.call_args_list], list(workflow.WARM_UP_MODULES))
+
+    def test_init_worker_configures_track_generation(self):
+        """測試工作進程按傳入的配置建立音樂生成器，並在退出時關閉音軌進程池"""
+        self.addCleanup(setattr, workflow, "music_generator", workflow.music_generator)
+        with mock.patch.object(workflow.importlib, "import_module"), \
+                mock.patch.object(workflow.atexit, "register") as register, \
+                mock.patch.object(workflow.atexit, "unregister"):
+            workflow.init_worker(True, 2)
+
+        generator = workflow.music_generator
+        self.assertEqual((generator.parallel_tracks, generator.max_workers), (True, 2))
+        register.assert_called_once_with(workflow.shutdown_track_pool)
+
+    def test_warm_up_starts_workflow_workers(self):
+        """測試預熱啟動工作流程執行池的工作進程，記錄耗時並略過未知名稱"""
+        executor = WorkflowExecutor()
+        coordinator = ModelCoordinator(executor)
+        with mock.patch.object(executor, "start_workers") as start_workers:
+            timings = coordinator.warm_up(["text_to_music", "unknown"])
+
+        start_workers.assert_called_once_with(["text_to_music"])
+        self.assertEqual(list(timings), ["text_to_music"])
+        self.assertIn("text_to_music", coordinator.metrics()["warm_up_time_ms"])
+
+    def test_warm_up_defaults_to_all_workflows(self):
+        """測試未指定工作流程時預熱全部工作流程的執行池"""
+        executor = WorkflowExecutor()
+        coordinator = ModelCoordinator(executor)
+        with mock.patch.object(executor, "start_workers") as start_workers:
+            coordinator.warm_up()
+
+        self.assertEqual([call.args[0] for call in start_workers.call_args_list],
+                         [[name] for name in workflow.WORKFLOW_HANDLERS])
+
+    def test_cancel_command(self):
+        """測試取消處理中的任務"""
+        coordinator = ModelCoordinator()
+
+        async def run():
+            async def slow_command():
+                coordinator.active_commands["cmd"] = asyncio.current_task()
+                await asyncio.sleep(10)
+
+            task = asyncio.ensure_future(slow_command())
+            await asyncio.sleep(0)
+            self.assertTrue(coordinator.cancel_command("cmd"))
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            self.assertFalse(coordinator.cancel_command("missing"))
+
+        asyncio.run(run())
+
+    def test_process_command_returns_result(self):
+        """測試處理命令返回工作流程的結果"""
+        class InlineExecutor:
+            async def run(self, command_id, command_type, func, *args):
+                return {"command_id": command_id, "type": command_type}
+
+        coordinator = ModelCoordinator(InlineExecutor())
+        command = MCPCommand(type="text_to_music", text_input="輕快的鋼琴曲")
+
+        result = asyncio.run(coordinator.process_command(command, "cmd"))
+
+        self.assertEqual(result, {"command_id": "cmd", "type": "text_to_music"})
+        self.assertEqual(command.result, result)
+        self.assertEqual(command.status, CommandStatus.COMPLETED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""測試 pickle 磁盤緩存"""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.storage.disk_cache import PickleDiskCache
+
+
+class TestPickleDiskCache(unittest.TestCase):
+    """測試讀寫、臨時文件命名、權限與淘汰"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, "cache")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_store_and_load(self):
+        """測試寫入的條目可以讀回，文件權限為 0600 且不留下臨時文件"""
+        cache = PickleDiskCache(self.cache_dir, 1024 * 1024, version=1)
+        self.assertTrue(cache.store("a", {"tempo": 96}))
+
+        self.assertEqual(PickleDiskCache(self.cache_dir, 1024 * 1024, version=1).load("a"), {"tempo": 96})
+        self.assertIsNone(PickleDiskCache(self.cache_dir, 1024 * 1024, version=2).load("a"))
+        files = os.listdir(self.cache_dir)
+        self.assertEqual(files, ["a.v1.pkl"])
+        self.assertEqual(os.stat(os.path.join(self.cache_dir, files[0])).st_mode & 0o777, 0o600)
+
+    def test_temp_files_differ_across_processes(self):
+        """測試線程號相同的不同進程使用不同的臨時文件"""
+        cache = PickleDiskCache(self.cache_dir, 1024 * 1024, version=1)
+        temp_paths = []
+        replace = os.replace
+
+        def record(src, dst):
+            temp_paths.append(src)
+            replace(src, dst)
+
+        with mock.patch("os.replace", side_effect=record):
+            for pid in (100, 200):
+                with mock.patch("os.getpid", return_value=pid):
+                    cache.store("a", pid)
+
+        self.assertEqual(len(set(temp_paths)), 2)
+        self.assertEqual(cache.load("a"), 200)
+
+    def test_disabled_and_foreign_files(self):
+        """測試停用時不讀寫，不讀取其他用戶的文件"""
+        disabled = PickleDiskCache("", 1024, version=1)
+        self.assertFalse(disabled.enabled)
+        self.assertFalse(disabled.store("a", 1))
+        self.assertIsNone(disabled.load("a"))
+
+        cache = PickleDiskCache(self.cache_dir, 1024 * 1024, version=1)
+        cache.store("a", 1)
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            self.assertIsNone(cache.load("a"))
+
+    def test_eviction_and_clear(self):
+        """測試超出容量時淘汰條目，清除時刪除所有條目"""
+        cache = PickleDiskCache(self.cache_dir, 1, version=1)
+        cache.store("a", b"x" * 100)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+        cache.max_bytes = 1024 * 1024
+        cache.store("a", 1)
+        cache.store("b", 2)
+        cache.clear()
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
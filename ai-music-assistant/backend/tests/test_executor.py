@@ -0,0 +1,129 @@
+"""測試工作流程執行器"""
+
+import os
+import sys
+import time
+import tempfile
+import asyncio
+import threading
+import unittest
+from pathlib import Path
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.model_coordinator.executor import WorkflowExecutor, ExecutorPoolConfig
+from backend.mcp.model_coordinator.exceptions import (
+    ExecutorSaturatedError,
+    TaskTimeoutError,
+    TaskCancelledError
+)
+
+
+def thread_executor(**kwargs) -> WorkflowExecutor:
+    """建立只使用線程池的執行器"""
+    return WorkflowExecutor(pool_configs={"test": ExecutorPoolConfig(kind="thread", **kwargs)})
+
+
+class TestWorkflowExecutor(unittest.TestCase):
+    """測試名額、超時與取消"""
+
+    def test_run_does_not_block_event_loop(self):
+        """測試執行期間事件循環仍能處理其他協程"""
+        executor = thread_executor(max_workers=1, max_queue=0)
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            tick_task = asyncio.ensure_future(ticker())
+            result = await executor.run("cmd", "test", lambda: (time.sleep(0.2), 42)[1])
+            tick_task.cancel()
+            return result, ticks
+
+        result, ticks = asyncio.run(run())
+        executor.shutdown(wait=True)
+
+        self.assertEqual(result, 42)
+        self.assertGreater(ticks, 5)
+        self.assertEqual(executor.stats()["pools"]["test"]["in_use"], 0)
+
+    def test_reserve_rejects_when_saturated(self):
+        """測試名額用盡時拒絕，釋放後可再次預留"""
+        executor = thread_executor(max_workers=1, max_queue=1)
+        executor.reserve("a", "test")
+        executor.reserve("b", "test")
+
+        with self.assertRaises(ExecutorSaturatedError):
+            executor.reserve("c", "test")
+        self.assertEqual(executor.stats()["rejected"], 1)
+
+        executor.release("a")
+        executor.reserve("c", "test")
+
+    def test_timeout(self):
+        """測試超時後拋出異常，名額在任務結束時釋放"""
+        executor = thread_executor(max_workers=1, max_queue=0, timeout=0.05)
+        release = threading.Event()
+
+        async def run():
+            with self.assertRaises(TaskTimeoutError):
+                await executor.run("slow", "test", release.wait, 5)
+
+        asyncio.run(run())
+        self.assertEqual(executor.stats()["pools"]["test"]["in_use"], 1)
+
+        release.set()
+        executor.shutdown(wait=True)
+        self.assertEqual(executor.stats()["pools"]["test"]["in_use"], 0)
+        self.assertEqual(executor.stats()["timeouts"], 1)
+
+    def test_cancel_before_submit(self):
+        """測試已預留但尚未提交的命令被取消"""
+        executor = thread_executor()
+        executor.reserve("cmd", "test")
+        self.assertTrue(executor.cancel("cmd"))
+        self.assertFalse(executor.cancel("missing"))
+
+        async def run():
+            with self.assertRaises(TaskCancelledError):
+                await executor.run("cmd", "test", int)
+
+        asyncio.run(run())
+        self.assertEqual(executor.stats()["pools"]["test"]["in_use"], 0)
+
+    def test_process_pool(self):
+        """測試在進程池中執行"""
+        executor = WorkflowExecutor(pool_configs={"test": {"kind": "process", "max_workers": 1}})
+        try:
+            result = asyncio.run(executor.run("cmd", "test", pow, 2, 10))
+        finally:
+            executor.shutdown(wait=True)
+        self.assertEqual(result, 1024)
+
+    def test_start_workers_runs_initializer(self):
+        """測試預先啟動的工作進程都已執行初始化函數"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            marker = os.path.join(temp_dir, "initialized")
+            executor = WorkflowExecutor(
+                pool_configs={"test": {"kind": "process", "max_workers": 2}, "light": {"kind": "thread"}},
+                initializer=os.makedirs,
+                initargs=(marker, 0o777, True)
+            )
+            try:
+                started = executor.start_workers(["test", "light"])
+                initialized = os.path.isdir(marker)
+            finally:
+                executor.shutdown(wait=True)
+
+        self.assertEqual(started, {"test": 2})
+        self.assertTrue(initialized)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+"""測試生成結果緩存"""
+
+import os
+import sys
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.mcp_schema import MCPCommand, MusicParameters, Genre, CommandStatus
+from backend.mcp.storage import CacheService
+from backend.mcp.model_coordinator.workflow import run_workflow
+from backend.mcp.model_coordinator.generation_cache import (
+    GenerationCache,
+    ReusePolicy,
+    REUSE_ALWAYS,
+    SOURCE_CACHE,
+    SOURCE_COALESCED,
+    SOURCE_EXECUTED
+)
+
+
+def make_command(text: str = "輕快的鋼琴曲", seed=7, **kwargs) -> MCPCommand:
+    return MCPCommand(
+        type="text_to_music",
+        text_input=text,
+        parameters=MusicParameters(genre=Genre.POP),
+        seed=seed,
+        **kwargs
+    )
+
+
+class TestGenerationCache(unittest.TestCase):
+    """測試按內容重用結果與合併進行中的請求"""
+
+    def setUp(self):
+        """設置測試環境"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "cache.db")
+
+    def tearDown(self):
+        """清理測試環境"""
+        self.temp_dir.cleanup()
+
+    def run_with_cache(self, scenario, policy=None):
+        async def run():
+            cache = GenerationCache(CacheService(namespace="generations", db_path=self.db_path), policy)
+            try:
+                return await scenario(cache)
+            finally:
+                await cache.cache.close()
+        return asyncio.run(run())
+
+    def test_concurrent_identical_requests_execute_once(self):
+        """測試同時到達的相同請求只執行一次，之後的請求命中緩存"""
+        calls = []
+
+        async def scenario(cache):
+            async def execute(command_id):
+                calls.append(command_id)
+                await asyncio.sleep(0.05)
+                return CommandStatus.COMPLETED, {"midi": f"{command_id}.mid"}
+
+            concurrent = await asyncio.gather(*(
+                cache.run(command_id, make_command(), lambda command_id=command_id: execute(command_id))
+                for command_id in ("a", "b", "c")
+            ))
+            later = await cache.run("d", make_command(" 輕快的鋼琴曲 "), lambda: execute("d"))
+            return concurrent, later, cache.stats()
+
+        concurrent, later, stats = self.run_with_cache(scenario)
+
+        self.assertEqual(calls, ["a"])
+        self.assertEqual([outcome.source for outcome in concurrent],
+                         [SOURCE_EXECUTED, SOURCE_COALESCED, SOURCE_COALESCED])
+        self.assertTrue(all(outcome.data == {"midi": "a.mid"} for outcome in concurrent))
+        self.assertEqual(later.source, SOURCE_CACHE)
+        self.assertEqual(later.origin_id, "a")
+        self.assertEqual((stats["misses"], stats["coalesced"], stats["hits"]), (1, 2, 1))
+        self.assertEqual(stats["hit_rate"], 0.75)
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_policy_controls_reuse(self):
+        """測試未指定種子的生成請求默認不重用，策略可改為總是重用"""
+        self.assertFalse(ReusePolicy().is_reusable(make_command(seed=None)))
+        self.assertTrue(ReusePolicy().is_reusable(make_command(seed=1)))
+        self.assertTrue(ReusePolicy({"text_to_music": REUSE_ALWAYS}).is_reusable(make_command(seed=None)))
+        self.assertFalse(ReusePolicy().is_reusable(MCPCommand(type="unknown", seed=1)))
+        with self.assertRaises(ValueError):
+            ReusePolicy({"text_to_music": "sometimes"})
+
+        async def scenario(cache):
+            count = 0
+
+            async def execute():
+                nonlocal count
+                count += 1
+                return CommandStatus.COMPLETED, {"n": count}
+
+            first = await cache.run("a", make_command(seed=None), execute)
+            second = await cache.run("b", make_command(seed=None), execute)
+            other_seed = await cache.run("c", make_command(seed=8), execute)
+            return first, second, other_seed, cache.stats()
+
+        first, second, other_seed, stats = self.run_with_cache(scenario)
+        self.assertEqual((first.data, second.data, other_seed.data), ({"n": 1}, {"n": 2}, {"n": 3}))
+        self.assertEqual(stats["bypassed"], 2)
+
+    def test_failures_are_shared_but_not_cached(self):
+        """測試失敗結果只共用給進行中的請求，不寫入緩存"""
+        async def scenario(cache):
+            async def fail():
+                await asyncio.sleep(0.02)
+                return CommandStatus.FAILED, {"status": "FAILED"}
+
+            async def succeed():
+                return CommandStatus.COMPLETED, {"status": "COMPLETED"}
+
+            failed = await asyncio.gather(
+                cache.run("a", make_command(), fail),
+                cache.run("b", make_command(), fail)
+            )
+            retried = await cache.run("c", make_command(), succeed)
+            return failed, retried
+
+        failed, retried = self.run_with_cache(scenario)
+        self.assertEqual([outcome.status for outcome in failed], [CommandStatus.FAILED] * 2)
+        self.assertEqual(failed[1].source, SOURCE_COALESCED)
+        self.assertEqual(retried.source, SOURCE_EXECUTED)
+        self.assertEqual(retried.status, CommandStatus.COMPLETED)
+
+    def test_cancelled_leader_lets_waiters_execute(self):
+        """測試執行者被取消時等待者各自重新執行，不共用取消狀態"""
+        calls = []
+
+        async def scenario(cache):
+            async def execute(command_id):
+                calls.append(command_id)
+                await asyncio.sleep(0.02)
+                if command_id == "a":
+                    return CommandStatus.CANCELLED, {"command_id": "a", "status": "CANCELLED"}
+                return CommandStatus.COMPLETED, {"midi": f"{command_id}.mid"}
+
+            return await asyncio.gather(*(
+                cache.run(command_id, make_command(), lambda command_id=command_id: execute(command_id))
+                for command_id in ("a", "b")
+            ))
+
+        cancelled, waiter = self.run_with_cache(scenario)
+        self.assertEqual(calls, ["a", "b"])
+        self.assertEqual(cancelled.status, CommandStatus.CANCELLED)
+        self.assertEqual(waiter.status, CommandStatus.COMPLETED)
+        self.assertEqual(waiter.source, SOURCE_EXECUTED)
+
+
+class TestSeededGeneration(unittest.TestCase):
+    """測試按種子重用的結果確實可重現"""
+
+    def test_same_seed_generates_identical_midi(self):
+        """測試相同種子的命令經工作流程生成的MIDI逐字節相同"""
+        first = run_workflow("text_to_music", make_command(seed=7))
+        second = run_workflow("text_to_music", make_command(seed=7))
+        other = run_workflow("text_to_music", make_command(seed=8))
+
+        self.assertEqual(first["midi_data"], second["midi_data"])
+        self.assertNotEqual(first["midi_data"], other["midi_data"])
+        self.assertEqual(first["analysis"]["seed"], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""測試和聲優化器"""
+
+import sys
+import random
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.mcp_schema import Note
+from backend.mcp.note_array import NoteArray
+from backend.music_generation.harmony_optimizer import HarmonyOptimizer, KeySignature, Scale
+
+# C 大調中夾雜調外音 C#、F#、Bb
+MELODY = [60, 61, 64, 66, 67, 70, 72]
+
+
+def note_list(pitches):
+    return [Note(pitch=pitch, start_time=float(i), duration=1.0, velocity=90) for i, pitch in enumerate(pitches)]
+
+
+class TestKeySignature(unittest.TestCase):
+    """測試調號的批量查表"""
+
+    def test_in_key_mask(self):
+        """測試批量調內檢查與逐個檢查一致，跨八度有效"""
+        key = KeySignature(60, Scale.MAJOR)
+        pitches = np.arange(36, 96)
+
+        mask = key.in_key_mask(pitches)
+        self.assertEqual(mask.dtype, bool)
+        self.assertEqual(mask.tolist(), [key.is_in_key(int(pitch)) for pitch in pitches])
+        self.assertEqual(key.in_key_mask(MELODY).tolist(), [True, False, True, False, True, False, True])
+
+    def test_nearest_scale_notes(self):
+        """測試批量取最近調內音與逐個計算一致，調內音保持不變"""
+        for root, scale in [(60, Scale.MAJOR), (57, Scale.MINOR), (62, Scale.DORIAN), (67, Scale.BLUES)]:
+            with self.subTest(root=root, scale=scale):
+                key = KeySignature(root, scale)
+                pitches = np.arange(36, 96)
+
+                nearest = key.nearest_scale_notes(pitches)
+                self.assertEqual(nearest.tolist(), [key.get_nearest_scale_note(int(pitch)) for pitch in pitches])
+                self.assertTrue(key.in_key_mask(nearest).all())
+                in_key = key.in_key_mask(pitches)
+                np.testing.assert_array_equal(nearest[in_key], pitches[in_key])
+                self.assertLessEqual(np.abs(nearest - pitches).max(), 2)
+
+
+class TestDetectKey(unittest.TestCase):
+    """測試調號檢測的根音約定"""
+
+    def test_root_is_midi_pitch(self):
+        """測試檢測到的根音與 set_key_signature 一樣為 MIDI 音高，主音音級另行返回"""
+        # A 小調：主音與屬音反覆出現，含和聲小調的升 G
+        a_minor = note_list([57, 60, 64, 57, 62, 65, 64, 68, 69, 72, 69, 64, 57])
+        optimizer = HarmonyOptimizer()
+
+        detected = optimizer._detect_key(a_minor)
+        self.assertEqual((detected["root"], detected["tonic"], detected["scale"]), (69, 9, Scale.MINOR))
+
+        analysis = optimizer.analyze_melody(a_minor)
+        self.assertEqual(analysis["key_signature"], {"root": 69, "scale": Scale.MINOR.value})
+        expected = KeySignature(69, Scale.MINOR)
+        self.assertEqual(optimizer.key_signature.scale_notes, expected.scale_notes)
+        self.assertEqual(optimizer.key_signature.chords[1].root, 69)
+
+    def test_c_major_matches_default_key(self):
+        """測試 C 大調旋律檢測結果與默認調號 set_key_signature(60, MAJOR) 相同"""
+        detected = HarmonyOptimizer()._detect_key(note_list([60, 62, 64, 65, 67, 65, 64, 62, 60, 67, 60]))
+        self.assertEqual((detected["root"], detected["tonic"], detected["scale"]), (60, 0, Scale.MAJOR))
+
+
+class TestOptimizeMelody(unittest.TestCase):
+    """測試旋律優化"""
+
+    def setUp(self):
+        self.optimizer = HarmonyOptimizer()
+        self.optimizer.set_key_signature(60, Scale.MAJOR)
+
+    def test_list_input(self):
+        """測試列表輸入：完全嚴格時修正全部調外音，未修正的音符保持原對象"""
+        notes = note_list(MELODY)
+        optimized = self.optimizer.optimize_melody(notes, strictness=1.0)
+
+        self.assertIsInstance(optimized, list)
+        self.assertEqual([note.pitch for note in optimized], [60, 60, 64, 65, 67, 69, 72])
+        for original, result in zip(notes, optimized):
+            if original.pitch in (60, 64, 67, 72):
+                self.assertIs(result, original)
+            self.assertEqual((result.start_time, result.duration, result.velocity),
+                             (original.start_time, original.duration, original.velocity))
+        self.assertEqual([note.pitch for note in notes], MELODY)
+
+    def test_note_array_input(self):
+        """測試音符數組輸入返回新的音符數組，結果與列表輸入一致"""
+        array = NoteArray.from_notes(note_list(MELODY))
+        optimized = self.optimizer.optimize_melody(array, strictness=1.0)
+
+        self.assertIsInstance(optimized, NoteArray)
+        self.assertEqual(optimized.pitch.tolist(), [60, 60, 64, 65, 67, 69, 72])
+        np.testing.assert_array_equal(optimized.start, array.start)
+        np.testing.assert_array_equal(optimized.velocity, array.velocity)
+        self.assertEqual(array.pitch.tolist(), MELODY)
+
+        random.seed(3)
+        from_list = [note.pitch for note in self.optimizer.optimize_melody(note_list(MELODY), strictness=0.5)]
+        random.seed(3)
+        from_array = self.optimizer.optimize_melody(array, strictness=0.5).pitch.tolist()
+        self.assertEqual(from_list, from_array)
+
+    def test_zero_strictness_and_unset_key(self):
+        """測試嚴格度為 0 或未設置調號時旋律不變"""
+        array = NoteArray.from_notes(note_list(MELODY))
+        self.assertEqual(self.optimizer.optimize_melody(array, strictness=0.0).pitch.tolist(), MELODY)
+
+        notes = note_list(MELODY)
+        self.assertIs(HarmonyOptimizer().optimize_melody(notes), notes)
+
+
+if __name__ == "__main__":
+    unittest.main()
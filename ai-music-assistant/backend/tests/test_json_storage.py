@@ -0,0 +1,174 @@
+"""測試JSON存儲的清單索引"""
+
+import os
+import sys
+import asyncio
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.storage.json_storage import JSONStorage, MANIFEST_FILENAME
+from backend.mcp.storage.command_storage import CommandStorage, COMMAND_INDEXED_FIELDS
+
+
+class TestJSONStorageManifest(unittest.TestCase):
+    """測試JSON存儲清單"""
+    
+    def setUp(self):
+        """設置測試環境"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base_dir = self.temp_dir.name
+    
+    def tearDown(self):
+        """清理測試環境"""
+        self.temp_dir.cleanup()
+    
+    def _command(self, i, status):
+        return {
+            "command_id": f"cmd-{i:02d}",
+            "type": "text_to_music",
+            "status": status,
+            "created_at": datetime(2024, 1, 1) + timedelta(minutes=i)
+        }
+    
+    def test_history_reads_only_manifest(self):
+        """測試過濾與分頁使用清單並按創建時間降序"""
+        async def run():
+            storage = CommandStorage(storage_type="json", base_dir=self.base_dir)
+            for i in range(12):
+                await storage.save_command(self._command(i, "completed" if i % 3 else "failed"))
+            await storage.delete_command("cmd-11")
+            
+            history = await storage.get_command_history(limit=3, offset=1, status="completed")
+            count = await storage.count_commands(status="completed")
+            return [c["command_id"] for c in history.data], count
+        
+        ids, count = asyncio.run(run())
+        self.assertEqual(ids, ["cmd-08", "cmd-07", "cmd-05"])
+        self.assertEqual(count, 7)
+    
+    def test_second_instance_sees_appended_records(self):
+        """測試另一個實例能追上清單中新追加的記錄"""
+        async def run():
+            writer = JSONStorage(base_dir=self.base_dir)
+            reader = JSONStorage(base_dir=self.base_dir)
+            await writer.save("a", {"x": 1})
+            first = await reader.list()
+            await writer.save("b", {"x": 2})
+            await writer.delete("a")
+            second = await reader.list()
+            return sorted(first.data), sorted(second.data)
+        
+        first, second = asyncio.run(run())
+        self.assertEqual(first, ["a"])
+        self.assertEqual(second, ["b"])
+    
+    def test_rebuild_index_recovers_lost_manifest(self):
+        """測試清單丟失後可從數據文件重建"""
+        async def run():
+            storage = JSONStorage(base_dir=self.base_dir, indexed_fields=COMMAND_INDEXED_FIELDS)
+            for i in range(5):
+                await storage.save(f"cmd-{i:02d}", self._command(i, "completed"))
+            os.remove(os.path.join(self.base_dir, MANIFEST_FILENAME))
+            
+            fresh = JSONStorage(base_dir=self.base_dir, indexed_fields=COMMAND_INDEXED_FIELDS)
+            result = await fresh.query_index(filters={"status": "completed"}, order_by="created_at")
+            rebuilt = await fresh.rebuild_index()
+            return [e["key"] for e in result.data], rebuilt.data
+        
+        keys, count = asyncio.run(run())
+        self.assertEqual(keys, [f"cmd-{i:02d}" for i in range(5)])
+        self.assertEqual(count, 5)
+    
+    def test_manifest_compaction(self):
+        """測試反覆覆寫同一鍵時清單會被壓縮"""
+        async def run():
+            storage = JSONStorage(base_dir=self.base_dir)
+            for i in range(1100):
+                await storage.save("hot", {"i": i})
+            reader = JSONStorage(base_dir=self.base_dir)
+            keys = await reader.list()
+            return storage._journal_lines, keys.data
+        
+        journal_lines, keys = asyncio.run(run())
+        self.assertLess(journal_lines, 1000)
+        self.assertEqual(keys, ["hot"])
+    
+    def test_compaction_keeps_records_from_other_instances(self):
+        """測試壓縮期間其他實例追加的記錄不會被覆蓋"""
+        writer_a = JSONStorage(base_dir=self.base_dir)
+        writer_b = JSONStorage(base_dir=self.base_dir)
+        
+        # 另一個實例恰好在壓縮讀完清單之後、替換之前追加記錄
+        original_write = writer_a._write_manifest
+        other_writer = []
+        
+        def write_manifest(index):
+            thread = threading.Thread(target=lambda: asyncio.run(writer_b.save("k2", {"value": 2})))
+            thread.start()
+            thread.join(0.2)
+            other_writer.append(thread)
+            original_write(index)
+        
+        writer_a._write_manifest = write_manifest
+        
+        async def fill_until_compacted():
+            for i in range(1100):
+                await writer_a.save("hot", {"i": i})
+                if other_writer:
+                    break
+        
+        asyncio.run(fill_until_compacted())
+        other_writer[0].join(5)
+        
+        reader = JSONStorage(base_dir=self.base_dir)
+        keys = asyncio.run(reader.list())
+        self.assertLess(writer_a._journal_lines, 1000)
+        self.assertEqual(sorted(keys.data), ["hot", "k2"])
+    
+    def test_concurrent_saves_of_same_key(self):
+        """測試同一進程內併發保存同一鍵時臨時文件不衝突"""
+        async def run():
+            storage = JSONStorage(base_dir=self.base_dir)
+            results = await asyncio.gather(*(storage.save("same", {"i": i}) for i in range(20)))
+            return results, await storage.get("same")
+        
+        results, loaded = asyncio.run(run())
+        self.assertTrue(all(result.success for result in results))
+        self.assertTrue(loaded.success)
+        self.assertEqual(os.listdir(self.base_dir).count("same.json"), 1)
+        self.assertFalse([name for name in os.listdir(self.base_dir) if name.endswith(".tmp")])
+
+    
+    def test_manifest_work_runs_off_event_loop(self):
+        """測試清單的讀取、追加與重建不在事件循環線程中執行"""
+        storage = JSONStorage(base_dir=self.base_dir)
+        threads = []
+        ensure_index = storage._ensure_index
+        
+        def recording_ensure_index():
+            threads.append(threading.get_ident())
+            return ensure_index()
+        
+        storage._ensure_index = recording_ensure_index
+        
+        async def run():
+            await storage.save("a", {"x": 1})
+            await storage.list()
+            await storage.query_index()
+            await storage.count_index()
+            await storage.delete("a")
+            return threading.get_ident()
+        
+        loop_thread = asyncio.run(run())
+        self.assertTrue(threads)
+        self.assertNotIn(loop_thread, threads)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""測試調性檢測"""
+
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.mcp_schema import Note, MusicKey
+from backend.mcp.note_array import NoteArray
+from backend.music_theory.key_detection import (
+    KEY_PROFILES,
+    detect_key,
+    detect_keys,
+    key_profile_matrix,
+    key_scores,
+    local_keys
+)
+
+
+def scale_melody(pitches, start: float = 0.0) -> NoteArray:
+    count = len(pitches)
+    return NoteArray(pitches, start + np.arange(count, dtype=float), np.ones(count))
+
+
+C_MAJOR_SCALE = [60, 62, 64, 65, 67, 69, 71, 72, 67, 64, 60]
+A_MINOR_MELODY = [57, 60, 64, 69, 68, 69, 71, 72, 64, 57, 57]
+
+
+class TestKeyDetection(unittest.TestCase):
+    """測試整段、批量與局部調性檢測"""
+
+    def test_detects_major_minor_and_transpositions(self):
+        """測試各輪廓都能識別大調、小調及其移調"""
+        for profile in KEY_PROFILES:
+            with self.subTest(profile=profile):
+                self.assertEqual(detect_key(scale_melody(C_MAJOR_SCALE), profile).name, "C")
+                for semitones, expected in [(2, "D"), (3, "Eb"), (6, "F#"), (10, "Bb")]:
+                    transposed = scale_melody(C_MAJOR_SCALE).transpose(semitones)
+                    self.assertEqual(detect_key(transposed, profile).name, expected)
+
+        minor = detect_key(scale_melody(A_MINOR_MELODY))
+        self.assertEqual((minor.name, minor.music21_name, minor.long_name), ("Am", "a", "A minor"))
+        self.assertEqual(detect_key(scale_melody(C_MAJOR_SCALE).transpose(3)).music21_name, "E-")
+
+    def test_names_are_valid_music_keys(self):
+        """測試所有調名都是 MusicKey 的取值"""
+        for tonic in range(12):
+            for pitches in (C_MAJOR_SCALE, A_MINOR_MELODY):
+                estimate = detect_key(scale_melody(pitches).transpose(tonic))
+                MusicKey(estimate.name)
+
+    def test_scores_are_correlations(self):
+        """測試矩陣乘法的結果與逐個計算的相關係數一致"""
+        histogram = scale_melody(A_MINOR_MELODY).pitch_class_histogram()
+        scores = key_scores(histogram)
+        major, minor = KEY_PROFILES["krumhansl"]
+        expected = [np.corrcoef(histogram, np.roll(major, tonic))[0, 1] for tonic in range(12)]
+        expected += [np.corrcoef(histogram, np.roll(minor, tonic))[0, 1] for tonic in range(12)]
+
+        np.testing.assert_allclose(scores, expected)
+        self.assertEqual(key_profile_matrix().shape, (24, 12))
+        np.testing.assert_array_equal(key_scores(np.zeros(12)), np.zeros(24))
+
+    def test_batch_matches_single(self):
+        """測試批量檢測與逐段檢測結果相同，並接受 Note 對象列表"""
+        melodies = [scale_melody(C_MAJOR_SCALE).transpose(semitones) for semitones in range(12)]
+        melodies.append(scale_melody(A_MINOR_MELODY))
+        melodies.append([Note(pitch=pitch, start_time=float(i), duration=1.0) for i, pitch in enumerate(C_MAJOR_SCALE)])
+
+        batch = detect_keys(melodies)
+        single = [detect_key(melody) for melody in melodies]
+        self.assertEqual([estimate.name for estimate in batch], [estimate.name for estimate in single])
+        np.testing.assert_allclose([estimate.score for estimate in batch], [estimate.score for estimate in single])
+        self.assertEqual(detect_keys([]), [])
+
+    def test_local_keys_follow_modulation(self):
+        """測試局部調性能跟隨轉調，空白窗口沒有結果"""
+        piece = NoteArray.concatenate([
+            scale_melody(C_MAJOR_SCALE),
+            scale_melody(C_MAJOR_SCALE, start=11.0).transpose(7),
+            scale_melody(C_MAJOR_SCALE, start=33.0).transpose(5)
+        ])
+        windows = local_keys(piece, window=11.0)
+
+        self.assertEqual([window.start for window in windows], [0.0, 11.0, 22.0, 33.0])
+        names = [window.estimate.name if window.estimate else None for window in windows]
+        self.assertEqual(names, ["C", "G", None, "F"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+"""測試延遲導入"""
+
+import sys
+import asyncio
+import tempfile
+import subprocess
+import unittest
+from pathlib import Path
+
+# 添加專案根目錄到Python路徑
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.mcp.lazy_import import (
+    LazyModule,
+    LazyService,
+    lazy_import,
+    lazy_import_stats,
+    modules_available,
+    parse_importtime,
+    profile_imports
+)
+
+# 導入時不應載入的重型套件
+HEAVY_PACKAGES = {"tensorflow", "music21", "librosa", "basic_pitch", "magenta"}
+
+
+class TestLazyModule(unittest.TestCase):
+    """測試模組代理"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        Path(self.directory.name, "lazy_probe_module.py").write_text("VALUE = 42\n")
+        sys.path.insert(0, self.directory.name)
+
+    def tearDown(self):
+        sys.path.remove(self.directory.name)
+        sys.modules.pop("lazy_probe_module", None)
+        self.directory.cleanup()
+
+    def test_import_is_deferred_until_attribute_access(self):
+        """測試首次訪問屬性時才導入，之後返回實際模組"""
+        proxy = lazy_import("lazy_probe_module")
+        self.assertIsInstance(proxy, LazyModule)
+        self.assertNotIn("lazy_probe_module", sys.modules)
+        self.assertIn("lazy_probe_module", lazy_import_stats()["deferred"])
+
+        self.assertEqual(proxy.VALUE, 42)
+        self.assertTrue(proxy.loaded)
+        self.assertIn("lazy_probe_module", sys.modules)
+        self.assertIn("lazy_probe_module", lazy_import_stats()["loaded_ms"])
+        self.assertIs(lazy_import("lazy_probe_module"), sys.modules["lazy_probe_module"])
+
+    def test_missing_module_fails_on_first_use(self):
+        """測試不存在的模組在使用時才拋出 ImportError"""
+        proxy = lazy_import("lazy_probe_missing_module")
+        with self.assertRaises(ImportError):
+            proxy.anything
+        self.assertFalse(modules_available("lazy_probe_missing_module"))
+        self.assertFalse(modules_available("lazy_probe_missing_module.child"))
+        self.assertTrue(modules_available("json", "lazy_probe_module"))
+        self.assertNotIn("lazy_probe_module", sys.modules)
+
+
+class TestLazyService(unittest.TestCase):
+    """測試服務代理"""
+
+    def test_service_is_created_once(self):
+        """測試服務在首次使用時建立一次，屬性訪問轉發到實例"""
+        created = []
+
+        def factory():
+            created.append(1)
+            return "service"
+
+        service = LazyService(factory, "測試服務")
+        self.assertEqual(service.status(), "deferred")
+        self.assertTrue(asyncio.run(service.ready()))
+        self.assertTrue(service)
+        self.assertEqual(service.upper(), "SERVICE")
+        self.assertEqual((service.status(), len(created)), ("ready", 1))
+
+    def test_failed_service_is_falsy(self):
+        """測試建立失敗的服務為假值，且不會重試"""
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            raise ImportError("No module named 'basic_pitch'")
+
+        service = LazyService(factory, "測試服務")
+        self.assertFalse(service)
+        self.assertFalse(asyncio.run(service.ready()))
+        self.assertEqual((service.status(), len(attempts)), ("failed", 1))
+        with self.assertRaises(RuntimeError):
+            service.anything
+
+
+class TestImportProfile(unittest.TestCase):
+    """測試導入耗時分析與啟動回歸檢查"""
+
+    def test_parse_importtime(self):
+        """測試解析 -X importtime 的輸出"""
+        output = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |     numpy.core",
+            "import time:       300 |        420 |   numpy",
+            "import time:        10 |        430 | app",
+            "Traceback (most recent call last):"
+        ])
+        costs = parse_importtime(output)
+        self.assertEqual([cost.module for cost in costs], ["numpy.core", "numpy", "app"])
+        self.assertEqual([cost.depth for cost in costs], [2, 1, 0])
+        self.assertAlmostEqual(costs[1].cumulative_seconds, 0.00042)
+
+    def test_packages_do_not_import_heavy_dependencies(self):
+        """測試導入 MCP 與音樂生成套件時不會載入重型依賴"""
+        for module in ("backend.mcp", "backend.music_generation", "backend.audio_processing.basic_pitch_service"):
+            with self.subTest(module=module):
+                profile = profile_imports(module, cwd=str(PROJECT_ROOT))
+                self.assertTrue(profile.ok, profile.error)
+                imported = {cost.module.split(".")[0] for cost in profile.costs}
+                self.assertEqual(imported & HEAVY_PACKAGES, set())
+
+    def test_api_entry_does_not_import_music21(self):
+        """測試導入 API 入口模組後 music21 仍未載入（樂理服務在首次請求時才建立）"""
+        completed = subprocess.run(
+            [sys.executable, "-c", "import sys, backend.main; print(sorted(m for m in sys.modules if m.split('.')[0] == 'music21'))"],
+            cwd=str(PROJECT_ROOT), capture_output=True, text=True, timeout=300
+        )
+        self.assertEqual(completed.returncode, 0, completed.stderr[-2000:])
+        self.assertEqual(completed.stdout.strip().splitlines()[-1], "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
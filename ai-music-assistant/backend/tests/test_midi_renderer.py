@@ -0,0 +1,141 @@
+"""測試MIDI後備渲染器"""
+
+import sys
+import wave
+import unittest
+from io import BytesIO
+from pathlib import Path
+
+import mido
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.rendering.midi_renderer import (
+    MidiNote,
+    parse_midi_notes,
+    render_note_blocks,
+    render_midi_to_wav,
+    stream_midi_to_wav,
+    iter_wav,
+    peak_level,
+    encode_wav,
+    DRUM_CHANNEL
+)
+from backend.rendering.synth import BatchSynthesizer
+
+
+def build_midi() -> bytes:
+    """建立包含速度變化、重疊音符和打擊樂的MIDI文件"""
+    midi_file = mido.MidiFile(ticks_per_beat=480)
+    track = mido.MidiTrack()
+    midi_file.tracks.append(track)
+
+    track.append(mido.MetaMessage('set_tempo', tempo=500000, time=0))  # 120 BPM
+    track.append(mido.Message('note_on', note=60, velocity=100, time=0))
+    track.append(mido.Message('note_on', note=64, velocity=90, time=240))
+    track.append(mido.Message('note_off', note=60, velocity=0, time=240))
+    track.append(mido.MetaMessage('set_tempo', tempo=1000000, time=0))  # 60 BPM
+    track.append(mido.Message('note_on', note=64, velocity=0, time=480))
+    track.append(mido.Message('note_on', channel=DRUM_CHANNEL, note=36, velocity=127, time=0))
+    track.append(mido.Message('note_off', channel=DRUM_CHANNEL, note=36, velocity=0, time=240))
+
+    buffer = BytesIO()
+    midi_file.save(file=buffer)
+    return buffer.getvalue()
+
+
+class TestMidiRenderer(unittest.TestCase):
+    """測試MIDI解析與WAV輸出"""
+
+    def test_parse_notes_with_tempo_changes(self):
+        """測試音符配對與速度變化後的時間換算"""
+        notes = parse_midi_notes(build_midi())
+
+        self.assertEqual([(n.pitch, n.channel) for n in notes], [(60, 0), (64, 0), (36, DRUM_CHANNEL)])
+        self.assertAlmostEqual(notes[0].start_time, 0.0)
+        self.assertAlmostEqual(notes[0].duration, 0.5)
+        self.assertAlmostEqual(notes[1].start_time, 0.25)
+        self.assertAlmostEqual(notes[1].duration, 1.25)
+        self.assertAlmostEqual(notes[2].duration, 0.5)
+        self.assertEqual(notes[1].velocity, 90)
+
+    def test_render_wav(self):
+        """測試輸出可被 wave 模組讀取的WAV"""
+        wav_data = render_midi_to_wav(build_midi(), sample_rate=8000)
+
+        with wave.open(BytesIO(wav_data)) as reader:
+            self.assertEqual(reader.getframerate(), 8000)
+            self.assertEqual(reader.getsampwidth(), 2)
+            self.assertEqual(reader.getnframes(), 8000 * 2)
+            samples = np.frombuffer(reader.readframes(reader.getnframes()), dtype='<i2')
+        self.assertGreater(np.abs(samples).max(), 20000)
+
+    def test_encode_stereo(self):
+        """測試立體聲編碼"""
+        audio = np.zeros((100, 2), dtype=np.float32)
+        audio[:, 1] = 1.0
+        with wave.open(BytesIO(encode_wav(audio, 8000))) as reader:
+            self.assertEqual(reader.getnchannels(), 2)
+            frames = np.frombuffer(reader.readframes(100), dtype='<i2').reshape(-1, 2)
+        self.assertTrue(np.all(frames[:, 1] == 32767))
+
+    def test_blocks_match_full_render(self):
+        """測試逐塊渲染拼接後與一次性渲染相同，跨塊的長音符不被截斷"""
+        notes = [MidiNote(60, 0.0, 2.3, 100), MidiNote(64, 0.37, 0.2, 80),
+                 MidiNote(67, 1.05, 0.9, 90), MidiNote(72, 2.0, 0.5, 70)]
+        expected = BatchSynthesizer().render(notes, 8000)
+
+        blocks = list(render_note_blocks(notes, 8000, block_seconds=0.25, gain=1.0))
+        self.assertEqual([len(block) for block in blocks[:-1]], [2000] * (len(blocks) - 1))
+        np.testing.assert_allclose(np.concatenate(blocks), expected, atol=1e-5)
+
+    def test_stream_wav(self):
+        """測試串流輸出的WAV文件頭與數據長度一致，且估計的增益不會削波"""
+        chunks = list(stream_midi_to_wav(build_midi(), sample_rate=8000, block_seconds=0.1))
+        self.assertEqual(len(chunks[0]), 44)
+        self.assertEqual(len(chunks), 1 + 20)
+
+        with wave.open(BytesIO(b"".join(chunks))) as reader:
+            self.assertEqual(reader.getnframes(), 8000 * 2)
+            samples = np.frombuffer(reader.readframes(reader.getnframes()), dtype='<i2').astype(np.int32)
+        self.assertLess(np.abs(samples).max(), 32767)
+        self.assertGreater(np.abs(samples).max(), 3000)
+
+        notes = parse_midi_notes(build_midi())
+        # 音高64在打擊樂開始的同一時刻結束，不計入同時發聲
+        self.assertAlmostEqual(peak_level(notes), 4.0)
+        self.assertAlmostEqual(peak_level(notes[:2]), (100 + 90) / 127)
+        with self.assertRaises(ValueError):
+            stream_midi_to_wav(mido_empty_file())
+
+    def test_iter_wav_closes_blocks(self):
+        """測試WAV串流被提前關閉時一併關閉音頻塊來源"""
+        closed = []
+
+        def blocks():
+            try:
+                while True:
+                    yield np.zeros(100, dtype=np.float32)
+            finally:
+                closed.append(True)
+
+        stream = iter_wav(blocks(), 1000, 8000)
+        next(stream)
+        next(stream)
+        stream.close()
+        self.assertEqual(closed, [True])
+
+
+def mido_empty_file() -> bytes:
+    """建立沒有音符的MIDI文件"""
+    midi_file = mido.MidiFile()
+    midi_file.tracks.append(mido.MidiTrack())
+    buffer = BytesIO()
+    midi_file.save(file=buffer)
+    return buffer.getvalue()
+
+
+if __name__ == "__main__":
+    unittest.main()
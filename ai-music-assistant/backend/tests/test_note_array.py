@@ -0,0 +1,99 @@
+"""測試音符數組"""
+
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.mcp_schema import Note
+from backend.mcp.note_array import NoteArray
+from backend import theory_validator
+
+
+def make_array() -> NoteArray:
+    return NoteArray(
+        pitch=[60, 64, 67, 72],
+        start=[0.0, 0.5, 1.0, 2.0],
+        duration=[1.0, 0.5, 1.0, 0.5],
+        velocity=[80, 70, 60, 90]
+    )
+
+
+class TestNoteArray(unittest.TestCase):
+    """測試建立、轉換與變換"""
+
+    def test_round_trip_with_existing_types(self):
+        """測試與 Note 對象、音符字典及音符事件互相轉換"""
+        array = make_array()
+        notes = array.to_notes()
+
+        self.assertIsInstance(notes[0], Note)
+        self.assertEqual(NoteArray.from_notes(notes), array)
+        self.assertEqual(NoteArray.from_notes(array.to_dicts()), array)
+        self.assertEqual(array[1].pitch, 64)
+        self.assertEqual(array[-1].start_time, 2.0)
+        with self.assertRaises(IndexError):
+            array[4]
+
+        events = NoteArray.from_events([(0.0, 0.5, 60, 1.0)])
+        self.assertEqual(events.to_events(), [(0.0, 0.5, 60, 1.0)])
+
+    def test_notes_without_start_time_are_sequential(self):
+        """測試沒有開始時間的音符首尾相接排列"""
+        notes = [theory_validator.Note(60, 1.0), theory_validator.Note(62, 0.5), theory_validator.Note(64, 2.0)]
+        array = NoteArray.from_notes(notes)
+        np.testing.assert_allclose(array.start, [0.0, 1.0, 1.5])
+        self.assertEqual(array.total_duration, 3.5)
+
+    def test_transforms_return_new_arrays(self):
+        """測試切片、移調、平移與時間窗口"""
+        array = make_array()
+
+        self.assertEqual(len(array[1:3]), 2)
+        self.assertEqual(array[array.pitch > 64].pitch.tolist(), [67, 72])
+        self.assertEqual(array.transpose(60).pitch.tolist(), [120, 124, 127, 127])
+        self.assertEqual(array.pitch.tolist(), [60, 64, 67, 72])
+        np.testing.assert_allclose(array.shift(1.0).start, [1.0, 1.5, 2.0, 3.0])
+
+        window = array.window(0.75, 1.5)
+        self.assertEqual(window.pitch.tolist(), [60, 64, 67])
+        clipped = array.window(0.75, 1.5, clip=True)
+        np.testing.assert_allclose(clipped.start, [0.75, 0.75, 1.0])
+        np.testing.assert_allclose(clipped.end, [1.0, 1.0, 1.5])
+
+        shuffled = array[[3, 1, 0, 2]]
+        self.assertEqual(shuffled.sorted(), array)
+        self.assertEqual(NoteArray.concatenate([array[:2], array[2:]]), array)
+
+    def test_histogram_and_validation(self):
+        """測試音級分佈與範圍檢查"""
+        array = make_array()
+        histogram = array.pitch_class_histogram()
+        self.assertEqual(histogram[0], 1.5)
+        self.assertEqual(array.pitch_class_histogram(weighted=False)[0], 2)
+
+        array.validate()
+        with self.assertRaises(ValueError):
+            NoteArray([60], [0.0], [0.0]).validate()
+
+    def test_theory_validator_accepts_note_array(self):
+        """測試理論驗證器對音符列表與音符數組給出相同結果"""
+        validator = theory_validator.TheoryValidator()
+        notes = [theory_validator.Note(pitch, duration)
+                 for pitch, duration in [(60, 1.0), (64, 1.0), (67, 2.0), (65, 0.5), (62, 1.5), (59, 1.0), (60, 2.0)]]
+
+        from_list = validator.validate(notes)
+        from_array = validator.validate(NoteArray.from_notes(notes))
+
+        self.assertEqual(from_list["key"], from_array["key"])
+        self.assertEqual(from_list["chords"], from_array["chords"])
+        self.assertEqual(from_list["melody_analysis"], from_array["melody_analysis"])
+        self.assertEqual(from_list["key"], "C Major")
+
+
+if __name__ == "__main__":
+    unittest.main()
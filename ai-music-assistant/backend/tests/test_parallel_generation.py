@@ -0,0 +1,88 @@
+"""測試按和聲骨架並行生成音軌"""
+
+import sys
+import unittest
+from pathlib import Path
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.model_coordinator.music_generator import MusicGenerator, shutdown_track_pool
+
+CLASSICAL_INSTRUMENTS = [
+    'violin', 'viola', 'cello', 'double_bass', 'flute', 'oboe',
+    'clarinet', 'bassoon', 'french_horn', 'trumpet', 'timpani', 'percussion'
+]
+
+
+def parameters(seed: int, **overrides) -> dict:
+    params = {
+        "tempo": 120,
+        "key": "C",
+        "genre": "classical",
+        "complexity": 5,
+        "instruments": list(CLASSICAL_INSTRUMENTS),
+        "duration": 180,
+        "seed": seed
+    }
+    params.update(overrides)
+    return params
+
+
+class TestParallelGeneration(unittest.TestCase):
+    """測試骨架規劃、按種子生成與確定性合併"""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutdown_track_pool()
+
+    def setUp(self):
+        self.generator = MusicGenerator()
+
+    def test_same_seed_is_reproducible(self):
+        """測試相同種子生成相同的 MIDI，不同種子結果不同"""
+        first = self.generator.generate_music(parameters(11))
+        second = self.generator.generate_music(parameters(11))
+        other = self.generator.generate_music(parameters(12))
+
+        self.assertEqual(first["midi_data"], second["midi_data"])
+        self.assertNotEqual(first["midi_data"], other["midi_data"])
+        self.assertEqual(first["analysis"]["track_count"], 12)
+        self.assertEqual(first["analysis"]["seed"], 11)
+
+    def test_parallel_matches_sequential(self):
+        """測試進程池中並行生成的結果與順序生成完全相同"""
+        sequential = self.generator.generate_music(parameters(21), parallel=False)
+        parallel = MusicGenerator(parallel_tracks=True, max_workers=2).generate_music(parameters(21))
+
+        self.assertEqual(sequential["midi_data"], parallel["midi_data"])
+        self.assertEqual(sequential["analysis"], parallel["analysis"])
+
+    def test_tracks_share_skeleton(self):
+        """測試各音軌使用同一和弦進行，且音軌只依賴骨架與自己的種子"""
+        generator = self.generator
+        skeleton = generator.plan_skeleton("C", "classical", 40, 4, 0.6, "happy", "normal", seed=5)
+        plans = generator.plan_tracks(list(CLASSICAL_INSTRUMENTS), "classical")
+        self.assertEqual([plan.index for plan in plans], list(range(12)))
+        self.assertEqual(plans[0].method, "_generate_melody")
+        self.assertTrue(generator.plan_tracks(['piano', 'violin'], "pop")[1].counter_melody)
+
+        # 單獨生成某個音軌與在整批中生成的結果相同
+        events = [generator.generate_track(skeleton, plan) for plan in plans]
+        self.assertEqual(generator.generate_track(skeleton, plans[4]), events[4])
+        self.assertTrue(all(events))
+
+        # 生成結束後清除骨架，之後單獨調用生成方法時仍隨機選擇和弦進行
+        self.assertIsNone(generator.skeleton)
+        self.assertEqual(len(skeleton.chords), len(skeleton.progression))
+
+    def test_caller_instruments_are_not_modified(self):
+        """測試擴展樂器組合時不修改調用方的列表"""
+        instruments = ['piano']
+        result = self.generator.generate_music(parameters(3, genre="jazz", instruments=instruments))
+        self.assertEqual(instruments, ['piano'])
+        self.assertEqual(result["analysis"]["instruments"], ['piano', 'bass', 'drums', 'saxophone'])
+
+
+if __name__ == "__main__":
+    unittest.main()
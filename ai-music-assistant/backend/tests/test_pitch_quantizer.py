@@ -0,0 +1,75 @@
+"""測試音高量化"""
+
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.audio_processing.pitch_quantizer import parse_key, scale_table, snap_to_scale
+
+
+def reference_snap(midi_pitch, scale):
+    """逐幀的最近音階值搜索（舊實現）"""
+    corrected = midi_pitch.copy()
+    for i in range(len(corrected)):
+        if not np.isnan(corrected[i]):
+            corrected[i] = min(scale, key=lambda x: abs(x - corrected[i]))
+    return corrected
+
+
+class TestPitchQuantizer(unittest.TestCase):
+    """測試音階查找表與向量化校正"""
+
+    def test_parse_key(self):
+        """測試調性解析"""
+        self.assertEqual(parse_key("C"), (0, 'major'))
+        self.assertEqual(parse_key("Am"), (9, 'minor'))
+        self.assertEqual(parse_key("F#m"), (6, 'minor'))
+        self.assertEqual(parse_key("Bb"), (10, 'major'))
+        self.assertEqual(parse_key("D dorian"), (2, 'dorian'))
+        with self.assertRaises(ValueError):
+            parse_key("H")
+
+    def test_scale_table(self):
+        """測試查找表內容且為共享的只讀數組"""
+        table = scale_table("Am")
+        self.assertIs(table, scale_table("Am"))
+        self.assertFalse(table.flags.writeable)
+        self.assertEqual(sorted(set(int(v) % 12 for v in table)), [0, 2, 4, 5, 7, 9, 11])
+        self.assertEqual(table[0], 0)
+        self.assertEqual(table[-1], 127)
+
+    def test_matches_reference(self):
+        """測試與逐幀實現結果一致，NaN 原樣保留"""
+        rng = np.random.default_rng(0)
+        pitch = rng.uniform(36, 96, 5000)
+        pitch[rng.random(5000) < 0.2] = np.nan
+        # 包含剛好位於兩個音階音中間的值
+        pitch[:4] = [60.5, 64.5, 61.0, 70.0]
+        scale = scale_table("E")
+
+        result = snap_to_scale(pitch, scale)
+        np.testing.assert_array_equal(result, reference_snap(pitch, list(scale)))
+        self.assertTrue(np.all(np.isnan(result) == np.isnan(pitch)))
+
+    def test_hysteresis(self):
+        """測試遲滯抑制兩個音階音之間的抖動"""
+        scale = scale_table("C")
+        pitch = np.array([60.0, 60.9, 61.1, 60.9, 61.2, 61.9, 62.0, np.nan, 61.1])
+
+        plain = snap_to_scale(pitch, scale)
+        held = snap_to_scale(pitch, scale, hysteresis=0.5)
+
+        np.testing.assert_array_equal(plain[:7], [60, 60, 62, 60, 62, 62, 62])
+        np.testing.assert_array_equal(held[:7], [60, 60, 60, 60, 60, 62, 62])
+        self.assertTrue(np.isnan(held[7]))
+        # 無聲幀之後重新開始
+        self.assertEqual(held[8], 62)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""測試進度推送總線"""
+
+import sys
+import asyncio
+import unittest
+from pathlib import Path
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.storage.progress_bus import ProgressBus, is_terminal
+
+
+def progress(value: float, status: str = "PROCESSING"):
+    return {"status": status, "progress": value}
+
+
+class TestProgressBus(unittest.TestCase):
+    """測試發布、訂閱與慢速消費者處理"""
+
+    def test_publish_reaches_topic_subscribers_only(self):
+        """測試事件只推送給同一主題的訂閱者，取消訂閱後不再推送"""
+        async def scenario():
+            bus = ProgressBus()
+            async with bus.subscribe("a") as first, bus.subscribe("a") as second:
+                other = bus.subscribe("b")
+                delivered = bus.publish("a", progress(10))
+                events = [await first.get(0.1), await second.get(0.1), await other.get(0.01)]
+                other.close()
+            after = bus.publish("a", progress(20))
+            return delivered, events, after, bus.stats()
+
+        delivered, events, after, stats = asyncio.run(scenario())
+        self.assertEqual(delivered, 2)
+        self.assertEqual(events, [progress(10), progress(10), None])
+        self.assertEqual(after, 0)
+        self.assertEqual((stats["topics"], stats["subscribers"], stats["published"]), (0, 0, 2))
+
+    def test_slow_consumer_keeps_latest_events(self):
+        """測試緩衝區滿時丟棄最舊的事件，終結事件不會丟失且發布不阻塞"""
+        async def scenario():
+            bus = ProgressBus(max_buffer=3)
+            subscription = bus.subscribe("cmd")
+            for value in range(10):
+                bus.publish("cmd", progress(value * 10))
+            bus.publish("cmd", progress(100, "COMPLETED"))
+
+            events = []
+            while True:
+                event = await subscription.get(0.01)
+                if event is None:
+                    break
+                events.append(event)
+            subscription.close()
+            return events, subscription.dropped, bus.stats()
+
+        events, dropped, stats = asyncio.run(scenario())
+        self.assertEqual([event["progress"] for event in events], [80, 90, 100])
+        self.assertTrue(is_terminal(events[-1]))
+        self.assertEqual(dropped, 8)
+        self.assertEqual(stats["dropped"], 8)
+
+    def test_waiting_subscriber_is_woken(self):
+        """測試等待中的訂閱者在事件發布後立即收到"""
+        async def scenario():
+            bus = ProgressBus()
+            subscription = bus.subscribe("cmd")
+            waiter = asyncio.ensure_future(subscription.get(1.0))
+            await asyncio.sleep(0)
+            bus.publish("cmd", progress(50))
+            return await waiter
+
+        self.assertEqual(asyncio.run(scenario()), progress(50))
+
+
+if __name__ == "__main__":
+    unittest.main()
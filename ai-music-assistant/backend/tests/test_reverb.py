@@ -0,0 +1,79 @@
+"""測試Freeverb混響"""
+
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.rendering.reverb import FreeverbReverb, comb_filter, allpass_filter
+
+
+def reference_comb(signal, delay, feedback, damping):
+    """逐樣本的 Freeverb 梳狀濾波器"""
+    buffer = [0.0] * delay
+    store = 0.0
+    output = []
+    for n, sample in enumerate(signal):
+        out = buffer[n % delay]
+        store = out * (1 - damping) + store * damping
+        buffer[n % delay] = sample + store * feedback
+        output.append(out)
+    return np.array(output)
+
+
+def reference_allpass(signal, delay, feedback=0.5):
+    """逐樣本的 Freeverb 全通濾波器"""
+    buffer = [0.0] * delay
+    output = []
+    for n, sample in enumerate(signal):
+        buffered = buffer[n % delay]
+        output.append(buffered - sample)
+        buffer[n % delay] = sample + buffered * feedback
+    return np.array(output)
+
+
+class TestReverb(unittest.TestCase):
+    """測試塊處理濾波器與逐樣本實現一致"""
+
+    def setUp(self):
+        self.signal = np.random.default_rng(0).uniform(-1, 1, 2000)
+
+    def test_comb_matches_reference(self):
+        """測試梳狀濾波器"""
+        expected = reference_comb(self.signal, 37, 0.84, 0.2)
+        np.testing.assert_allclose(comb_filter(self.signal, 37, 0.84, 0.2), expected, atol=1e-10)
+
+    def test_allpass_matches_reference(self):
+        """測試全通濾波器"""
+        expected = reference_allpass(self.signal, 23)
+        np.testing.assert_allclose(allpass_filter(self.signal, 23), expected, atol=1e-10)
+
+    def test_shapes(self):
+        """測試單聲道與立體聲輸出形狀"""
+        reverb = FreeverbReverb(sample_rate=16000)
+        mono = reverb.process(self.signal)
+        stereo = reverb.process(np.stack([self.signal, -self.signal], axis=1))
+
+        self.assertEqual(mono.shape, self.signal.shape)
+        self.assertEqual(stereo.shape, (len(self.signal), 2))
+        self.assertTrue(np.all(np.isfinite(stereo)))
+
+    def test_impulse_has_tail(self):
+        """測試脈衝產生衰減的混響尾音，且乾信號不變"""
+        impulse = np.zeros(16000)
+        impulse[0] = 1.0
+        output = FreeverbReverb(sample_rate=16000, wet_level=1.0, dry_level=0.0).process(impulse)
+
+        self.assertEqual(output[0], 0.0)
+        early = np.abs(output[:4000]).sum()
+        late = np.abs(output[12000:]).sum()
+        self.assertGreater(early, 0)
+        self.assertLess(late, early)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+"""測試樂譜解析緩存"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import music21
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.music_theory.score_cache import BYTES_PER_ELEMENT, ParsedScore, ScoreCache
+
+
+def make_score(count: int = 4) -> music21.stream.Score:
+    part = music21.stream.Part()
+    for index in range(count):
+        part.append(music21.chord.Chord([60 + index, 64 + index, 67 + index], quarterLength=1.0))
+    score = music21.stream.Score()
+    score.insert(0, part)
+    return score
+
+
+class CountingParser:
+    """記錄解析次數的解析函數"""
+
+    def __init__(self, count: int = 4):
+        self.count = count
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, path: str) -> music21.stream.Score:
+        with self._lock:
+            self.calls += 1
+        return make_score(self.count)
+
+
+class TestScoreCache(unittest.TestCase):
+    """測試解析去重、分析結果緩存、容量限制與磁盤層"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_same_content_is_parsed_once(self):
+        """測試內容相同的文件只解析一次，共用展平結果與音符數組"""
+        cache = ScoreCache()
+        parser = CountingParser()
+        first = cache.get_or_parse(self.write("a.mid", b"MThd-one"), parser)
+        second = cache.get_or_parse(self.write("b.mid", b"MThd-one"), parser)
+        other = cache.get_or_parse(self.write("c.mid", b"MThd-two"), parser)
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(parser.calls, 2)
+        self.assertIs(first.flat, second.flat)
+        self.assertEqual(first.notes.pitch.tolist()[:3], [60, 64, 67])
+        self.assertEqual(len(first.notes), 12)
+
+    def test_concurrent_requests_parse_once(self):
+        """測試同一內容的並發請求只解析一次"""
+        cache = ScoreCache()
+        parser = CountingParser()
+        path = self.write("a.mid", b"MThd-concurrent")
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_parse(path, parser)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(parser.calls, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_analysis_results_are_memoized(self):
+        """測試各項分析只計算一次"""
+        parsed = ParsedScore(None, make_score())
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return "C"
+
+        self.assertEqual(parsed.memo("key", compute), "C")
+        self.assertEqual(parsed.memo("key", compute), "C")
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(parsed.dirty)
+
+    def test_concurrent_analyses_share_one_result(self):
+        """測試共用的樂譜被並發分析時，展平與各項分析只計算一次"""
+        parsed = ParsedScore(None, make_score())
+        calls = []
+
+        def compute():
+            calls.append(1)
+            threading.Event().wait(0.02)
+            return len(parsed.flat.notes)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append((parsed.flat, parsed.memo("count", compute))))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(flat is results[0][0] and count == 4 for flat, count in results))
+
+    def test_memory_layer_is_bounded(self):
+        """測試記憶體層按估算大小淘汰最久未使用的樂譜"""
+        cache = ScoreCache(memory_max_bytes=10 * BYTES_PER_ELEMENT)
+        parser = CountingParser(count=4)
+        for index in range(3):
+            cache.get_or_parse(self.write(f"{index}.mid", f"MThd-{index}".encode()), parser)
+
+        stats = cache.stats()["memory"]
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["evictions"], 1)
+
+        cache.get_or_parse(self.write("again.mid", b"MThd-0"), parser)
+        self.assertEqual(parser.calls, 4)
+
+    def test_disk_layer_keeps_score_and_results(self):
+        """測試磁盤層在新的緩存實例中恢復樂譜與分析結果"""
+        cache_dir = os.path.join(self.directory.name, "scores")
+        path = self.write("a.mid", b"MThd-disk")
+        parser = CountingParser()
+
+        cache = ScoreCache(cache_dir=cache_dir)
+        parsed = cache.get_or_parse(path, parser)
+        parsed.memo("tempo", lambda: 96)
+        cache.save_results(parsed)
+        self.assertFalse(parsed.dirty)
+
+        restored = ScoreCache(cache_dir=cache_dir).get_or_parse(path, parser)
+        self.assertEqual(parser.calls, 1)
+        self.assertEqual(restored.memo("tempo", lambda: 0), 96)
+        self.assertEqual(len(restored.flat.notes), 4)
+        self.assertEqual(restored.notes, parsed.notes)
+
+    def test_disk_layer_is_private(self):
+        """測試磁盤層目錄權限為 0700、文件權限為 0600，且不讀取其他用戶的文件"""
+        cache_dir = os.path.join(self.directory.name, "scores")
+        os.makedirs(cache_dir, mode=0o755)
+        path = self.write("a.mid", b"MThd-private")
+
+        cache = ScoreCache(cache_dir=cache_dir)
+        self.assertEqual(os.stat(cache_dir).st_mode & 0o777, 0o700)
+        cache.put(cache.get_or_parse(path, CountingParser()))
+        files = os.listdir(cache_dir)
+        self.assertEqual(len(files), 1)
+        self.assertEqual(os.stat(os.path.join(cache_dir, files[0])).st_mode & 0o777, 0o600)
+
+        other_user = ScoreCache(cache_dir=cache_dir)
+        parser = CountingParser()
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            other_user.get_or_parse(path, parser)
+        self.assertEqual(parser.calls, 1)
+        self.assertEqual(other_user.stats()["disk_hits"], 0)
+
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            self.assertFalse(ScoreCache(cache_dir=cache_dir).stats()["disk_enabled"])
+
+
+if __name__ == "__main__":
+    unittest.main()
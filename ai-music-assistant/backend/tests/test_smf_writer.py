@@ -0,0 +1,124 @@
+"""測試標準 MIDI 文件寫入"""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import mido
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.note_array import NoteArray
+from backend.mcp.smf_writer import DRUM_CHANNEL, SMFTrack, encode_smf, encode_vlq, write_smf
+
+
+def read_notes(data: bytes):
+    """用 mido 讀出每個音軌的 (開始tick, 結束tick, 音高, 力度, 通道)"""
+    midi_file = mido.MidiFile(file=io.BytesIO(data))
+    tracks = []
+    for track in midi_file.tracks:
+        now, active, notes = 0, {}, []
+        for message in track:
+            now += message.time
+            if message.type == 'note_on' and message.velocity > 0:
+                active.setdefault(message.note, []).append((now, message.velocity))
+            elif message.type in ('note_on', 'note_off'):
+                start, velocity = active[message.note].pop(0)
+                notes.append((start, now, message.note, velocity, message.channel))
+        tracks.append(sorted(notes))
+    return midi_file, tracks
+
+
+class TestSMFWriter(unittest.TestCase):
+    """測試編碼結果可被 mido 正確讀回"""
+
+    def test_variable_length_quantities(self):
+        """測試可變長度數值的邊界"""
+        cases = {0: "00", 0x7F: "7f", 0x80: "8100", 0x3FFF: "ff7f", 0x4000: "818000",
+                 0x1FFFFF: "ffff7f", 0x200000: "81808000", 0x0FFFFFFF: "ffffff7f"}
+        for value, expected in cases.items():
+            self.assertEqual(encode_vlq(value).hex(), expected)
+        with self.assertRaises(ValueError):
+            encode_vlq(0x10000000)
+
+    def test_round_trip(self):
+        """測試多音軌的速度、拍號、音色與音符"""
+        melody = NoteArray([60, 64, 67, 72], [0.0, 1.0, 2.0, 200.0], [1.0, 1.5, 0.5, 2.0], [100, 90, 80, 70])
+        drums = NoteArray([36, 38], [0.0, 0.5], [0.25, 0.25], [127, 110])
+        data = encode_smf([SMFTrack(melody, program=40, name="Lead"), SMFTrack(drums, channel=DRUM_CHANNEL)],
+                          tempo=90, time_signature="3/4", ticks_per_beat=480)
+
+        midi_file, tracks = read_notes(data)
+        self.assertEqual((midi_file.type, midi_file.ticks_per_beat, len(midi_file.tracks)), (1, 480, 3))
+        meta = {message.type: message for message in midi_file.tracks[0]}
+        self.assertEqual(meta['set_tempo'].tempo, mido.bpm2tempo(90))
+        self.assertEqual((meta['time_signature'].numerator, meta['time_signature'].denominator), (3, 4))
+        self.assertEqual(midi_file.tracks[1].name, "Lead")
+        self.assertEqual([m.program for m in midi_file.tracks[1] if m.type == 'program_change'], [40])
+
+        self.assertEqual(tracks[1], [(0, 480, 60, 100, 0), (480, 1200, 64, 90, 0),
+                                     (960, 1200, 67, 80, 0), (96000, 96960, 72, 70, 0)])
+        self.assertEqual(tracks[2], [(0, 120, 36, 127, 9), (240, 360, 38, 110, 9)])
+
+    def test_repeated_note_ends_before_restart(self):
+        """測試同一 tick 上先結束舊音符再開始新音符，且使用 running status"""
+        notes = NoteArray([60, 60, 60], [0.0, 1.0, 2.0], [1.0, 1.0, 1.0], [100, 100, 100])
+        data = encode_smf([SMFTrack(notes)], ticks_per_beat=96)
+        _, tracks = read_notes(data)
+        self.assertEqual([note[:2] for note in tracks[1]], [(0, 96), (96, 192), (192, 288)])
+
+        # 重複音符的開始與結束事件交替，每個事件都帶狀態字節；和弦的同類事件連續，省略重複的狀態字節
+        chord = NoteArray([60, 64, 67], [0.0, 0.0, 0.0], [1.0, 1.0, 1.0])
+        self.assertLess(len(encode_smf([SMFTrack(chord)])), len(encode_smf([SMFTrack(notes)])))
+
+    def test_matches_midiutil(self):
+        """測試與 midiutil 寫出的音符相同"""
+        from midiutil import MIDIFile
+
+        rng = np.random.default_rng(1)
+        count = 500
+        notes = NoteArray(rng.integers(30, 90, count), np.round(rng.uniform(0, 100, count) * 4) / 4,
+                          rng.choice([0.25, 0.5, 1.0], count), rng.integers(40, 120, count))
+        # midiutil 會合併相互重疊的同音高音符，只比較不重疊的情況
+        notes = notes.sorted()
+        keep = np.ones(count, dtype=bool)
+        last_end = {}
+        for index, (pitch, start, end) in enumerate(zip(notes.pitch.tolist(), notes.start.tolist(), notes.end.tolist())):
+            keep[index] = start >= last_end.get(pitch, -1.0)
+            if keep[index]:
+                last_end[pitch] = end
+        notes = notes[keep]
+
+        midi = MIDIFile(1, ticks_per_quarternote=960, eventtime_is_ticks=False)
+        midi.addTempo(0, 0, 120)
+        for pitch, start, duration, velocity in zip(notes.pitch.tolist(), notes.start.tolist(),
+                                                    notes.duration.tolist(), notes.velocity.tolist()):
+            midi.addNote(0, 0, pitch, start, duration, velocity)
+        buffer = io.BytesIO()
+        midi.writeFile(buffer)
+
+        _, expected = read_notes(buffer.getvalue())
+        _, actual = read_notes(encode_smf([SMFTrack(notes)]))
+        self.assertEqual(actual[1], [note for track in expected for note in track])
+
+    def test_write_to_path_and_file(self):
+        """測試寫入路徑與文件對象"""
+        tracks = [SMFTrack(NoteArray([60], [0.0], [1.0]))]
+        buffer = io.BytesIO()
+        size = write_smf(buffer, tracks, tempo=100)
+        self.assertEqual(size, len(buffer.getvalue()))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "out.mid")
+            write_smf(path, tracks, tempo=100)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), buffer.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
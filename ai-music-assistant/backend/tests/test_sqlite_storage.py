@@ -0,0 +1,155 @@
+"""測試SQLite存儲的連接池與批次寫入"""
+
+import os
+import sys
+import asyncio
+import tempfile
+import unittest
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.mcp.storage.sqlite_storage import SQLiteStorage
+
+
+class TestSQLiteStorage(unittest.TestCase):
+    """測試SQLite存儲"""
+    
+    def setUp(self):
+        """設置測試環境"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "test.db")
+    
+    def tearDown(self):
+        """清理測試環境"""
+        self.temp_dir.cleanup()
+    
+    def test_upsert_reuses_pooled_connection(self):
+        """測試重複保存同一鍵只保留一條記錄且不新建連接"""
+        async def run():
+            storage = SQLiteStorage(db_path=self.db_path, table_name="items", pool_size=2)
+            for i in range(20):
+                result = await storage.save("task", {"progress": i})
+                self.assertTrue(result.success)
+            
+            get_result = await storage.get("task")
+            rows = await storage.query("SELECT COUNT(*) FROM items")
+            pool_size = storage.pool.size
+            await storage.close()
+            return get_result.data, rows.data[0][0], pool_size
+        
+        data, count, pool_size = asyncio.run(run())
+        self.assertEqual(data, {"progress": 19})
+        self.assertEqual(count, 1)
+        self.assertEqual(pool_size, 1)
+    
+    def test_update_and_delete_missing_key(self):
+        """測試更新或刪除不存在的鍵會返回錯誤"""
+        async def run():
+            storage = SQLiteStorage(db_path=self.db_path, table_name="items")
+            update_result = await storage.update("missing", {"a": 1})
+            delete_result = await storage.delete("missing")
+            await storage.close()
+            return update_result, delete_result
+        
+        update_result, delete_result = asyncio.run(run())
+        self.assertFalse(update_result.success)
+        self.assertFalse(delete_result.success)
+    
+    def test_batched_writes_are_visible_and_persisted(self):
+        """測試批次寫入在提交前可讀，關閉後已持久化"""
+        async def run():
+            storage = SQLiteStorage(db_path=self.db_path, table_name="items", batch_writes=True)
+            await asyncio.gather(*(storage.save(f"k{i}", {"i": i}) for i in range(50)))
+            await storage.delete("k0")
+            
+            pending_get = await storage.get("k7")
+            deleted_exists = await storage.exists("k0")
+            await storage.close()
+            
+            reopened = SQLiteStorage(db_path=self.db_path, table_name="items")
+            keys = await reopened.list("k*")
+            await reopened.close()
+            return pending_get.data, deleted_exists, sorted(keys.data)
+        
+        pending_data, deleted_exists, keys = asyncio.run(run())
+        self.assertEqual(pending_data, {"i": 7})
+        self.assertFalse(deleted_exists)
+        self.assertEqual(len(keys), 49)
+        self.assertNotIn("k0", keys)
+
+    def test_inflight_batch_is_readable(self):
+        """測試批次提交完成前，其他連接的讀取仍能讀到正在提交的寫入"""
+        async def run():
+            storage = SQLiteStorage(db_path=self.db_path, table_name="items", batch_writes=True)
+            gate = asyncio.Event()
+            pool = storage.batcher.pool
+
+            class GatedPool:
+                @asynccontextmanager
+                async def acquire(self):
+                    await gate.wait()
+                    async with pool.acquire() as conn:
+                        yield conn
+
+            storage.batcher.pool = GatedPool()
+            await storage.save("task", {"progress": 50})
+            flush = asyncio.ensure_future(storage.batcher.flush())
+            await asyncio.sleep(0)
+
+            queued = storage.batcher.pending_count
+            inflight_get = await storage.get("task")
+            inflight_exists = await storage.exists("task")
+            gate.set()
+            await flush
+            after_get = await storage.get("task")
+            await storage.close()
+            return queued, inflight_get.data, inflight_exists, after_get.data
+
+        queued, inflight_data, inflight_exists, after_data = asyncio.run(run())
+        self.assertEqual(queued, 0)
+        self.assertEqual(inflight_data, {"progress": 50})
+        self.assertTrue(inflight_exists)
+        self.assertEqual(after_data, {"progress": 50})
+
+    def test_failed_size_flush_is_retried(self):
+        """測試達到批次上限觸發的提交失敗時，寫入保留在隊列中並自動重試"""
+        async def run():
+            storage = SQLiteStorage(db_path=self.db_path, table_name="items", batch_writes=True)
+            # 每次寫入都達到上限，不會另外安排定時提交
+            storage.batcher.max_batch_size = 1
+            pool = storage.batcher.pool
+            failures = []
+
+            class FailingOncePool:
+                @asynccontextmanager
+                async def acquire(self):
+                    if not failures:
+                        failures.append(1)
+                        raise OSError("磁盤已滿")
+                    async with pool.acquire() as conn:
+                        yield conn
+
+            storage.batcher.pool = FailingOncePool()
+            with self.assertLogs("backend.mcp.storage.connection_pool", level="ERROR"):
+                await storage.save("a", {"i": 1})
+                for _ in range(200):
+                    await asyncio.sleep(0.01)
+                    if storage.batcher.flushed_writes:
+                        break
+
+            flushed = storage.batcher.flushed_writes
+            pending = storage.batcher.pending_count
+            rows = await storage.query("SELECT COUNT(*) FROM items")
+            await storage.close()
+            return failures, flushed, pending, rows.data[0][0]
+
+        failures, flushed, pending, count = asyncio.run(run())
+        self.assertEqual(failures, [1])
+        self.assertEqual((flushed, pending, count), (1, 0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+"""測試串流轉錄的窗口切分與音符拼接"""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import mido
+import numpy as np
+import soundfile as sf
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.audio_processing import basic_pitch_service
+from backend.audio_processing.analysis_cache import AnalysisCache
+from backend.audio_processing.streaming_transcriber import (
+    NoteStitcher, iter_audio_windows, normalize_note_event, write_note_events_midi
+)
+
+
+def transcribe_in_windows(notes, total, window, overlap):
+    """模擬逐窗口轉錄：每個窗口只看到與其相交的部分音符（時間相對於窗口）"""
+    stitcher = NoteStitcher(overlap)
+    result = []
+    offset = 0.0
+    while True:
+        end = min(offset + window, total)
+        is_last = end >= total
+        visible = [
+            (max(start, offset) - offset, min(stop, end) - offset, pitch, 0.8)
+            for start, stop, pitch in notes
+            if start < end and stop > offset
+        ]
+        result.extend(stitcher.add_window(offset, end - offset, visible, is_last=is_last))
+        if is_last:
+            break
+        offset += window - overlap
+    return sorted(result + stitcher.finish())
+
+
+class TestStreamingTranscriber(unittest.TestCase):
+    """測試串流轉錄輔助函數"""
+
+    def test_windows_cover_file(self):
+        """測試窗口按重疊切分並覆蓋整個文件"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "long.wav")
+            sf.write(path, np.zeros((44100 * 25, 2), dtype=np.float32), 44100)
+
+            windows = list(iter_audio_windows(path, window_seconds=10, overlap_seconds=2, sample_rate=44100))
+
+        self.assertEqual([w.offset for w in windows], [0.0, 8.0, 16.0])
+        self.assertEqual([w.is_last for w in windows], [False, False, True])
+        self.assertAlmostEqual(windows[0].duration, 10.0)
+        self.assertAlmostEqual(windows[-1].offset + windows[-1].duration, 25.0)
+        self.assertEqual(windows[-1].progress, 1.0)
+        self.assertEqual(windows[0].samples.ndim, 1)
+
+    def test_stitching_matches_whole_file(self):
+        """測試跨越邊界與位於重疊區的音符各只出現一次且長度完整"""
+        notes = [
+            (0.5, 1.5, 60),
+            (9.5, 12.0, 62),   # 跨越第一個窗口末端
+            (8.2, 9.0, 64),    # 完全位於重疊區
+            (7.0, 20.0, 65),   # 跨越兩個窗口
+            (23.0, 24.5, 67),
+        ]
+        result = transcribe_in_windows(notes, total=25.0, window=10.0, overlap=2.0)
+
+        self.assertEqual([(round(s, 3), round(e, 3), p) for s, e, p, _ in result],
+                         sorted((s, e, p) for s, e, p in notes))
+
+    def test_normalize_and_write_midi(self):
+        """測試音符事件格式轉換與MIDI輸出"""
+        self.assertEqual(normalize_note_event((1.0, 2.0, 60, 0.5, [])), (1.0, 2.0, 60, 0.5))
+        self.assertEqual(normalize_note_event({"start_time": 1.0, "duration": 0.5, "pitch": 62}),
+                         (1.0, 1.5, 62, 0.8))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "out.mid")
+            write_note_events_midi([(0.0, 0.5, 60, 1.0), (0.5, 1.0, 62, 0.5)], path)
+            messages = [m for m in mido.MidiFile(path) if m.type in ('note_on', 'note_off')]
+
+        self.assertEqual([m.type for m in messages], ['note_on', 'note_off', 'note_on', 'note_off'])
+        self.assertAlmostEqual(sum(m.time for m in messages), 1.0, places=3)
+
+    def test_stream_loads_model_once(self):
+        """測試逐窗口推理共用一次載入的模型，窗口文件寫在私有臨時目錄中並在結束後刪除"""
+        loaded = []
+        window_paths = []
+
+        class FakeModel:
+            def __init__(self, model_path):
+                loaded.append(model_path)
+
+        def predict(audio_path, model, **kwargs):
+            self.assertIsInstance(model, FakeModel)
+            window_paths.append(audio_path)
+            return {}, None, [(0.5, 1.0, 60, 0.8, [])]
+
+        inference = SimpleNamespace(Model=FakeModel, predict=predict)
+        with mock.patch.object(basic_pitch_service, "DEPENDENCIES_AVAILABLE", True), \
+                mock.patch.object(basic_pitch_service, "basic_pitch_inference", inference), \
+                tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "long.wav")
+            sf.write(path, np.zeros(22050 * 25, dtype=np.float32), 22050)
+
+            service = basic_pitch_service.BasicPitchService("model", analysis_cache=AnalysisCache(""))
+            chunks = list(service.stream_note_events(path, window_seconds=10, overlap_seconds=2))
+
+        self.assertEqual(loaded, ["model"])
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(len(set(window_paths)), 1)
+        window_dir = os.path.dirname(window_paths[0])
+        self.assertNotEqual(window_dir, tempfile.gettempdir())
+        self.assertFalse(os.path.exists(window_dir))
+
+    def test_melody_uses_decoded_pcm(self):
+        """測試提供已解碼PCM時不重新解碼上傳文件，以模型採樣率的臨時WAV推理"""
+        predicted = []
+
+        class FakeModel:
+            def __init__(self, model_path):
+                pass
+
+        def predict(audio_path, model, **kwargs):
+            self.assertNotEqual(audio_path, path)
+            info = sf.info(audio_path)
+            predicted.append((audio_path, info.samplerate, info.frames))
+            return {}, None, [{"pitch": 60, "start_time": 0.5, "duration": 0.5, "amplitude": 0.8}]
+
+        inference = SimpleNamespace(Model=FakeModel, predict=predict)
+        with mock.patch.object(basic_pitch_service, "DEPENDENCIES_AVAILABLE", True), \
+                mock.patch.object(basic_pitch_service, "basic_pitch_inference", inference), \
+                mock.patch("librosa.load", side_effect=AssertionError("不應重新解碼")), \
+                tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "upload.wav")
+            y = np.zeros(44100, dtype=np.float32)
+            sf.write(path, y, 44100)
+
+            service = basic_pitch_service.BasicPitchService("model", analysis_cache=AnalysisCache(""))
+            melody = service.audio_to_melody(path, y, 44100)
+
+        self.assertEqual([note.pitch for note in melody.notes], [60])
+        self.assertEqual(len(predicted), 1)
+        pcm_path, samplerate, frames = predicted[0]
+        self.assertEqual(samplerate, 22050)
+        self.assertEqual(frames, 22050)
+        self.assertFalse(os.path.exists(os.path.dirname(pcm_path)))
+
+
+if __name__ == "__main__":
+    unittest.main()
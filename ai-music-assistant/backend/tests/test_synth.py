@@ -0,0 +1,93 @@
+"""測試批次波表合成器"""
+
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.rendering.synth import BatchSynthesizer, adsr_lengths, midi_to_frequency
+
+
+def note(pitch, start_time, duration, velocity=100):
+    """建立簡單的音符對象"""
+    return SimpleNamespace(pitch=pitch, start_time=start_time, duration=duration, velocity=velocity)
+
+
+class TestBatchSynthesizer(unittest.TestCase):
+    """測試波表合成與緩存"""
+
+    sample_rate = 16000
+
+    def test_sine_matches_direct_synthesis(self):
+        """測試波表結果與直接計算的正弦波一致"""
+        synth = BatchSynthesizer()
+        audio = synth.render([note(69, 0.5, 0.25, velocity=127)], self.sample_rate)
+
+        length = int(0.25 * self.sample_rate)
+        t = np.arange(length) / self.sample_rate
+        envelope = synth.envelope(*adsr_lengths(length, self.sample_rate), length)
+        expected = np.sin(2 * np.pi * midi_to_frequency(69) * t) * envelope
+
+        start = int(0.5 * self.sample_rate)
+        np.testing.assert_allclose(audio[start:start + length], expected, atol=1e-4)
+        self.assertFalse(np.any(audio[:start]))
+
+    def test_repeated_notes_share_envelope(self):
+        """測試相同時長的音符重用包絡"""
+        synth = BatchSynthesizer()
+        notes = [note(60 + i % 3, i * 0.1, 0.2) for i in range(30)]
+        synth.render(notes, self.sample_rate, instrument_type='string')
+
+        self.assertEqual(synth.stats()["envelope_misses"], 1)
+        self.assertEqual(synth.stats()["envelope_hits"], 2)
+
+    def test_templates_cached_across_renders(self):
+        """測試不含噪聲的波形跨渲染調用重用，帶偏移渲染與絕對位置渲染一致，噪聲樂器不緩存"""
+        synth = BatchSynthesizer(seed=0)
+        full = synth.render([note(60, 0.5, 0.2)], self.sample_rate)
+        offset = int(0.25 * self.sample_rate)
+        block = synth.render([note(60, 0.5, 0.2)], self.sample_rate, out=np.zeros(len(full) - offset, dtype=np.float32),
+                             offset=offset)
+
+        np.testing.assert_array_equal(block, full[offset:])
+        self.assertEqual(synth.stats()["template_hits"], 1)
+
+        synth.render([note(38, 0.0, 0.2)] * 2, self.sample_rate, instrument_type='percussion')
+        synth.render([note(38, 0.0, 0.2)], self.sample_rate, instrument_type='percussion')
+        self.assertEqual(synth.stats()["templates"], 1)
+
+        small = BatchSynthesizer(max_template_samples=self.sample_rate)
+        small.render([note(60, 0.0, 0.6), note(62, 0.0, 0.6)], self.sample_rate)
+        self.assertEqual(small.stats()["templates"], 1)
+
+    def test_noisy_notes_get_their_own_noise(self):
+        """測試同音高同時長的噪聲樂器音符各自生成噪聲"""
+        length = int(0.2 * self.sample_rate)
+        for instrument_type in ('percussion', 'wind'):
+            synth = BatchSynthesizer(seed=0)
+            audio = synth.render([note(38, 0.0, 0.2), note(38, 0.5, 0.2)], self.sample_rate,
+                                 instrument_type=instrument_type)
+
+            second = int(0.5 * self.sample_rate)
+            self.assertFalse(np.allclose(audio[:length], audio[second:second + length]), instrument_type)
+
+    def test_render_into_preallocated_buffer(self):
+        """測試疊加到預先分配的緩衝區並截斷超出部分"""
+        synth = BatchSynthesizer(seed=0)
+        out = np.ones(self.sample_rate, dtype=np.float32)
+        result = synth.render([note(60, 0.9, 0.5)], self.sample_rate, instrument_type='wind', out=out)
+
+        self.assertIs(result, out)
+        self.assertTrue(np.all(out[:int(0.9 * self.sample_rate)] == 1.0))
+
+        with self.assertRaises(ValueError):
+            synth.render([], self.sample_rate, out=np.zeros(10))
+
+
+if __name__ == "__main__":
+    unittest.main()
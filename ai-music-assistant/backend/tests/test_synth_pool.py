@@ -0,0 +1,163 @@
+"""測試FluidSynth合成器池"""
+
+import sys
+import threading
+import unittest
+from io import BytesIO
+from pathlib import Path
+
+import mido
+import numpy as np
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.rendering.synth_pool import FluidSynthPool, SynthPoolBusyError
+
+
+class RecordingSynth:
+    """記錄調用的合成器替身，介面與 fluidsynth.Synth 相同"""
+
+    sfloads = 0
+
+    def __init__(self, gain=0.2, samplerate=44100):
+        self.events = []
+        self.resets = 0
+
+    def sfload(self, path):
+        RecordingSynth.sfloads += 1
+        return 1
+
+    def program_select(self, channel, sfid, bank, preset):
+        pass
+
+    def system_reset(self):
+        self.resets += 1
+
+    def noteon(self, channel, key, velocity):
+        self.events.append(("on", channel, key))
+
+    def noteoff(self, channel, key):
+        self.events.append(("off", channel, key))
+
+    def program_change(self, channel, program):
+        self.events.append(("program", channel, program))
+
+    def cc(self, channel, control, value):
+        pass
+
+    def pitch_bend(self, channel, value):
+        pass
+
+    def get_samples(self, length):
+        return np.ones(length * 2, dtype=np.int16)
+
+    def delete(self):
+        pass
+
+
+def build_midi() -> bytes:
+    """建立一秒長的單音MIDI（120 BPM）"""
+    midi_file = mido.MidiFile(ticks_per_beat=480)
+    track = mido.MidiTrack()
+    midi_file.tracks.append(track)
+    track.append(mido.Message('program_change', program=40, time=0))
+    track.append(mido.Message('note_on', note=60, velocity=100, time=0))
+    track.append(mido.Message('note_off', note=60, velocity=0, time=960))
+    buffer = BytesIO()
+    midi_file.save(file=buffer)
+    return buffer.getvalue()
+
+
+class TestFluidSynthPool(unittest.TestCase):
+    """測試合成器重用、重置與並行借出"""
+
+    def setUp(self):
+        RecordingSynth.sfloads = 0
+
+    def make_pool(self, size):
+        return FluidSynthPool("test.sf2", size=size, sample_rate=1000, synth_factory=RecordingSynth)
+
+    def test_render_reuses_synth(self):
+        """測試多次渲染只載入一次音色庫，且每次渲染後重置"""
+        pool = self.make_pool(size=1)
+        midi_data = build_midi()
+
+        for _ in range(3):
+            audio = pool.render(midi_data, tail_seconds=0.5)
+
+        self.assertEqual(audio.shape, (1500, 2))
+        self.assertEqual(RecordingSynth.sfloads, 1)
+        entry = pool._instances[0]
+        self.assertEqual(entry.renders, 3)
+        self.assertEqual(entry.synth.resets, 4)
+        self.assertIn(("program", 0, 40), entry.synth.events)
+        self.assertEqual(entry.synth.events[-1], ("off", 0, 60))
+
+    def test_concurrent_acquire_uses_separate_synths(self):
+        """測試同時借出的合成器互不相同，且不超過池大小"""
+        pool = self.make_pool(size=2)
+        barrier = threading.Barrier(2)
+        acquired = []
+
+        def worker():
+            with pool.acquire() as entry:
+                acquired.append(entry)
+                barrier.wait(timeout=5)
+
+        threads = [threading.Thread(target=worker) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIsNot(acquired[0], acquired[1])
+        self.assertEqual(pool.warm_up(), 2)
+        self.assertEqual(RecordingSynth.sfloads, 2)
+
+    def test_failed_render_discards_synth(self):
+        """測試渲染出錯時丟棄合成器"""
+        pool = self.make_pool(size=1)
+        with self.assertRaises(ValueError):
+            with pool.acquire():
+                raise ValueError("boom")
+
+        self.assertEqual(pool.stats()["created"], 0)
+        pool.render(build_midi())
+        self.assertEqual(RecordingSynth.sfloads, 2)
+
+    def test_render_blocks(self):
+        """測試按塊渲染的長度與一次性渲染相同，提前關閉時合成器仍歸還"""
+        pool = self.make_pool(size=1)
+        midi_data = build_midi()
+
+        blocks = list(pool.render_blocks(midi_data, block_seconds=0.4, tail_seconds=0.5))
+        self.assertEqual([len(block) for block in blocks], [400, 400, 400, 300])
+        self.assertEqual(pool.render_length(midi_data, tail_seconds=0.5), 1500)
+        np.testing.assert_array_equal(np.concatenate(blocks), pool.render(midi_data, tail_seconds=0.5))
+
+        stream = pool.render_blocks(midi_data, block_seconds=0.1)
+        next(stream)
+        stream.close()
+        entry = pool._instances[0]
+        self.assertEqual(pool._idle.qsize(), 1)
+        self.assertEqual(entry.renders, 2)
+        self.assertEqual(entry.synth.resets, 4)
+
+    def test_render_blocks_waits_with_timeout(self):
+        """測試按塊渲染在返回前借出合成器，池滿時等待超時即報錯"""
+        pool = self.make_pool(size=1)
+        midi_data = build_midi()
+
+        stream = pool.render_blocks(midi_data, block_seconds=0.1)
+        self.assertEqual((pool.stats()["created"], pool.stats()["idle"]), (1, 0))
+        with self.assertRaises(SynthPoolBusyError):
+            pool.render_blocks(midi_data, timeout=0.01)
+
+        stream.close()
+        self.assertEqual(pool.stats()["idle"], 1)
+        self.assertEqual(len(list(pool.render_blocks(midi_data, timeout=0.01))), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
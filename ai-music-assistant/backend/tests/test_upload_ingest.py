@@ -0,0 +1,185 @@
+"""測試上傳音頻接收"""
+
+import io
+import os
+import sys
+import asyncio
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import soundfile as sf
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+# 添加專案根目錄到Python路徑
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.audio_processing.upload_ingest import (
+    UploadSizeLimitMiddleware, UploadTooLargeError, UploadTooLongError, ingest_upload
+)
+from backend.audio_processing.analysis_cache import AnalysisCache, AudioAnalysis
+from backend.audio_processing.basic_pitch_service import BasicPitchService
+
+
+class ChunkedUpload:
+    """按塊返回數據的上傳對象，記錄讀取的字節數"""
+
+    def __init__(self, data: bytes, filename: str = "take.wav"):
+        self.file = io.BytesIO(data)
+        self.filename = filename
+        self.bytes_read = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        chunk = self.file.read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def wav_bytes(seconds: float, sample_rate: int = 8000, channels: int = 1) -> bytes:
+    buffer = io.BytesIO()
+    samples = np.zeros((int(seconds * sample_rate), channels), dtype=np.float32)
+    samples[:, 0] = 0.5
+    sf.write(buffer, samples, sample_rate, format='WAV', subtype='PCM_16')
+    return buffer.getvalue()
+
+
+class TestUploadIngest(unittest.TestCase):
+    """測試串流接收、上限檢查與清理"""
+
+    def ingest(self, upload, **kwargs):
+        return asyncio.run(ingest_upload(upload, chunk_size=16 * 1024, **kwargs))
+
+    def test_decode_once_and_cleanup(self):
+        """測試解碼結果共享且只讀，退出上下文後刪除臨時目錄"""
+        data = wav_bytes(2.0, channels=2)
+        with self.ingest(ChunkedUpload(data)) as upload:
+            self.assertEqual(upload.size, len(data))
+            self.assertTrue(upload.path.endswith(".wav"))
+            pcm, sample_rate = upload.decode()
+
+            self.assertIs(upload.pcm, pcm)
+            self.assertEqual(sample_rate, 8000)
+            self.assertEqual(pcm.shape, (16000,))
+            self.assertFalse(pcm.flags.writeable)
+            self.assertAlmostEqual(upload.duration, 2.0)
+            workdir = upload.workdir
+
+        self.assertFalse(os.path.exists(workdir))
+
+    def test_deferred_cleanup(self):
+        """測試推遲清理時目錄保留到清理函數被調用"""
+        upload = self.ingest(ChunkedUpload(wav_bytes(0.5)))
+        with upload:
+            cleanup = upload.defer_cleanup()
+        self.assertTrue(os.path.exists(upload.path))
+        cleanup()
+        self.assertFalse(os.path.exists(upload.workdir))
+
+    def test_size_limit_stops_reading(self):
+        """測試超出大小上限時停止讀取"""
+        upload = ChunkedUpload(b"\0" * (1024 * 1024))
+        with self.assertRaises(UploadTooLargeError):
+            self.ingest(upload, max_bytes=100 * 1024)
+        self.assertLess(upload.bytes_read, 200 * 1024)
+
+    def test_duration_limit_from_header(self):
+        """測試根據文件頭聲明的時長在接收完之前拒絕"""
+        data = wav_bytes(60.0)
+        upload = ChunkedUpload(data)
+        with self.assertRaises(UploadTooLongError):
+            self.ingest(upload, max_duration=10.0)
+        self.assertLess(upload.bytes_read, len(data) // 2)
+
+    def test_detect_key_uses_decoded_pcm(self):
+        """測試調性檢測直接使用已解碼的PCM，不重新讀取文件"""
+        sample_rate = 22050
+        t = np.arange(sample_rate * 2) / sample_rate
+        # A 大三和弦，根音較強
+        pcm = sum(np.sin(2 * np.pi * freq * t) * weight
+                  for freq, weight in [(220.0, 1.5), (277.18, 1.0), (329.63, 1.0)]).astype(np.float32)
+        pcm.flags.writeable = False
+
+        service = BasicPitchService(analysis_cache=AnalysisCache(""))
+        with mock.patch("librosa.load", side_effect=AssertionError("不應重新解碼")):
+            self.assertEqual(service.detect_key(y=pcm, sr=sample_rate), "A")
+
+    def test_concurrent_f0_is_computed_once(self):
+        """測試同一音頻的並發基頻分析只執行一次 pYIN"""
+        cache = AnalysisCache("")
+        service = BasicPitchService(analysis_cache=cache)
+        analysis = AudioAnalysis("k", {}, None, [])
+        cache.put(analysis)
+        calls = []
+
+        def slow_pyin(y, fmin, fmax, sr):
+            calls.append(1)
+            threading.Event().wait(0.05)
+            return np.zeros(4), np.zeros(4, dtype=bool), np.zeros(4)
+
+        pcm = np.zeros(800, dtype=np.float32)
+        results = []
+        with mock.patch.object(service, "analyze", return_value=analysis), \
+                mock.patch("librosa.pyin", side_effect=slow_pyin):
+            threads = [threading.Thread(target=lambda: results.append(service.analyze_f0("take.wav", pcm, 8000)))
+                       for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(result.has_f0 for result in results))
+
+
+class TestUploadSizeLimitMiddleware(unittest.TestCase):
+    """測試在接收請求流時強制執行大小上限"""
+
+    def setUp(self):
+        self.calls = []
+        app = FastAPI()
+
+        @app.post("/api/audio/upload")
+        async def upload(audio: UploadFile = File(...)):
+            self.calls.append(audio.filename)
+            return {"success": True}
+
+        @app.post("/api/other")
+        async def other(audio: UploadFile = File(...)):
+            return {"success": True}
+
+        app.add_middleware(UploadSizeLimitMiddleware, max_bytes=4096, overhead_bytes=1024)
+        self.client = TestClient(app)
+
+    def test_declared_length_rejected_before_parsing(self):
+        """測試 Content-Length 超限的請求不進入端點，其他路徑不受限制"""
+        small = self.client.post("/api/audio/upload", files={"audio": ("a.wav", b"\0" * 1024)})
+        large = self.client.post("/api/audio/upload", files={"audio": ("b.wav", b"\0" * 8192)})
+        other = self.client.post("/api/other", files={"audio": ("c.wav", b"\0" * 8192)})
+
+        self.assertEqual(small.status_code, 200)
+        self.assertEqual(large.status_code, 413)
+        self.assertEqual(other.status_code, 200)
+        self.assertEqual(self.calls, ["a.wav"])
+
+    def test_chunked_body_stops_at_limit(self):
+        """測試沒有 Content-Length 的請求在累計字節超限時中止"""
+        def body():
+            for _ in range(64):
+                yield b"\0" * 1024
+
+        response = self.client.post(
+            "/api/audio/upload",
+            content=body(),
+            headers={"content-type": "multipart/form-data; boundary=limit"}
+        )
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
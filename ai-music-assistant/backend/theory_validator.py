@@ -13,6 +13,14 @@ from typing import Dict, List, Tuple, Optional, Any, Union
 import numpy as np
 from enum import Enum
 
+try:
+    from .mcp.note_array import NoteArray
+    from .music_theory.key_detection import detect_key, MAJOR
+except ImportError:
+    # 作為腳本直接運行時
+    from mcp.note_array import NoteArray
+    from music_theory.key_detection import detect_key, MAJOR
+
 # 設置日誌記錄
 logging.basicConfig(
     level=logging.INFO,
@@ -24,6 +32,7 @@ logger = logging.getLogger('theory_validator')
 MAJOR_SCALE = [0, 2, 4, 5, 7, 9, 11]  # 大調音階的半音間隔
 MINOR_SCALE = [0, 2, 3, 5, 7, 8, 10]  # 小調音階的半音間隔
 
+
 # 定義和弦類型
 class ChordType(Enum):
     MAJOR = "major"
@@ -123,88 +132,56 @@ class TheoryValidator:
         """初始化理論驗證器"""
         logger.info("初始化音樂理論驗證器")
     
-    def analyze_key(self, notes: List[Note]) -> Tuple[int, KeyType]:
+    def analyze_key(self, notes: Union[List[Note], NoteArray]) -> Tuple[int, KeyType]:
         """
         分析一系列音符的調性
         
         Args:
-            notes: 要分析的音符列表
+            notes: 要分析的音符列表或音符數組
             
         Returns:
             調性根音和調性類型
         """
-        # 統計每個音高類別的出現次數
-        pitch_counts = np.zeros(12)
-        for note in notes:
-            pitch_counts[note.pitch_class] += note.duration
-        
-        # 嘗試每個可能的調性，看哪個最匹配
-        best_correlation = -1
-        best_key = (0, KeyType.MAJOR)
-        
-        # 檢查所有可能的大調和小調
-        for root in range(12):
-            # 建立調性模板
-            major_template = np.zeros(12)
-            for interval in MAJOR_SCALE:
-                major_template[(root + interval) % 12] = 1
-            
-            minor_template = np.zeros(12)
-            for interval in MINOR_SCALE:
-                minor_template[(root + interval) % 12] = 1
-            
-            # 計算相關性
-            major_correlation = np.corrcoef(pitch_counts, major_template)[0, 1]
-            minor_correlation = np.corrcoef(pitch_counts, minor_template)[0, 1]
-            
-            # 更新最佳匹配
-            if major_correlation > best_correlation:
-                best_correlation = major_correlation
-                best_key = (root, KeyType.MAJOR)
-            
-            if minor_correlation > best_correlation:
-                best_correlation = minor_correlation
-                best_key = (root, KeyType.MINOR)
-        
-        return best_key
+        estimate = detect_key(notes)
+        return (estimate.tonic, KeyType.MAJOR if estimate.mode == MAJOR else KeyType.MINOR)
     
-    def identify_chords(self, notes: List[Note], segment_size: float = 1.0) -> List[Chord]:
+    def identify_chords(self, notes: Union[List[Note], NoteArray], segment_size: float = 1.0) -> List[Chord]:
         """
         識別樂曲中的和弦
         
         Args:
-            notes: 要分析的音符列表
+            notes: 要分析的音符列表或音符數組
             segment_size: 分段大小（以拍為單位）
             
         Returns:
             識別出的和弦列表
         """
-        # 按時間分段
-        max_time = max(note.duration for note in notes)
-        segments = []
+        array = NoteArray.from_notes(notes)
+        if not len(array):
+            return []
         
-        for i in range(int(max_time / segment_size) + 1):
-            start_time = i * segment_size
-            end_time = (i + 1) * segment_size
-            segment_notes = [note for note in notes if start_time <= note.duration < end_time]
-            segments.append(segment_notes)
+        # 按時間分段
+        segment_index = np.floor(array.duration / segment_size).astype(np.int64)
+        order = np.argsort(segment_index, kind="stable")
+        boundaries = np.flatnonzero(np.diff(segment_index[order])) + 1
         
         chords = []
+        pitch_classes_all = array.pitch_class.tolist()
         
         # 分析每個段落中的和弦
-        for segment in segments:
-            if not segment:
-                continue
+        for members in np.split(order, boundaries):
+            members = members.tolist()
+            if isinstance(notes, NoteArray):
+                segment = [Note(int(array.pitch[i]), float(array.duration[i]), int(array.velocity[i])) for i in members]
+            else:
+                segment = [notes[i] for i in members]
             
             # 統計音高類別
-            pitch_classes = [note.pitch_class for note in segment]
+            pitch_classes = [pitch_classes_all[i] for i in members]
             pitch_counts = {}
             
             for pc in pitch_classes:
-                if pc in pitch_counts:
-                    pitch_counts[pc] += 1
-                else:
-                    pitch_counts[pc] = 1
+                pitch_counts[pc] = pitch_counts.get(pc, 0) + 1
             
             # 找出最可能的根音
             root = max(pitch_counts, key=pitch_counts.get)
@@ -291,48 +268,59 @@ class TheoryValidator:
         
         return parallel_fifths
     
-    def analyze_melody(self, notes: List[Note]) -> Dict[str, Any]:
+    def analyze_melody(self, notes: Union[List[Note], NoteArray]) -> Dict[str, Any]:
         """
         分析旋律特徵
         
         Args:
-            notes: 要分析的音符列表
+            notes: 要分析的音符列表或音符數組
             
         Returns:
             旋律分析結果
         """
-        if not notes:
+        array = NoteArray.from_notes(notes)
+        if not len(array):
             return {"error": "無音符可分析"}
         
-        pitches = [note.pitch for note in notes]
-        intervals = [pitches[i] - pitches[i-1] for i in range(1, len(pitches))]
+        pitches = array.pitch.astype(np.int64)
+        intervals = np.diff(pitches)
+        
+        largest_interval = 0
+        most_common_interval = 0
+        if len(intervals):
+            largest_interval = int(intervals[np.argmax(np.abs(intervals))])
+            values, counts = np.unique(intervals, return_counts=True)
+            most_common_interval = int(values[np.argmax(counts)])
         
         return {
-            "note_count": len(notes),
-            "pitch_range": max(pitches) - min(pitches),
-            "average_pitch": sum(pitches) / len(pitches),
-            "largest_interval": max(intervals, key=abs) if intervals else 0,
-            "most_common_interval": max(set(intervals), key=intervals.count) if intervals else 0,
-            "intervals": intervals
+            "note_count": len(array),
+            "pitch_range": int(pitches.max() - pitches.min()),
+            "average_pitch": float(pitches.mean()),
+            "largest_interval": largest_interval,
+            "most_common_interval": most_common_interval,
+            "intervals": intervals.tolist()
         }
     
-    def validate(self, notes: List[Note]) -> Dict[str, Any]:
+    def validate(self, notes: Union[List[Note], NoteArray]) -> Dict[str, Any]:
         """
         對音樂作品進行全面的理論驗證
         
         Args:
-            notes: 作品中的音符列表
+            notes: 作品中的音符列表或音符數組
             
         Returns:
             包含分析結果和建議的字典
         """
-        if not notes:
+        if not len(notes):
             return {"error": "無音符可分析"}
         
+        # 只轉換一次，各項分析共用同一個音符數組
+        array = NoteArray.from_notes(notes)
+        
         # 執行各種分析
-        key_root, key_type = self.analyze_key(notes)
+        key_root, key_type = self.analyze_key(array)
         chords = self.identify_chords(notes)
-        melody_analysis = self.analyze_melody(notes)
+        melody_analysis = self.analyze_melody(array)
         parallel_fifths = self.check_parallel_fifths(chords)
         
         # 生成和弦進行
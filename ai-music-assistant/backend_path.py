@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+後端導入路徑
+
+供獨立腳本（text_to_music.py、intention_based_music.py、simplified_mcp）導入
+ai-music-assistant 的 backend 包。專案根目錄也有名為 backend 的包，導入時讓
+ai-music-assistant 目錄優先，導入後移除，腳本從任何目錄運行時行為都相同。
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+
+# ai-music-assistant 目錄（本文件所在目錄）
+AI_MUSIC_ASSISTANT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@contextmanager
+def backend_on_path():
+    """在 with 塊內讓 ai-music-assistant 的 backend 包優先導入
+
+    Raises:
+        ImportError: 已導入的 backend 包不是 ai-music-assistant 的 backend 包時
+    """
+    cached = sys.modules.get("backend")
+    if cached is not None:
+        cached_dir = os.path.dirname(os.path.dirname(os.path.abspath(cached.__file__ or "")))
+        if cached_dir != AI_MUSIC_ASSISTANT_DIR:
+            raise ImportError(f"已導入其他位置的 backend 包: {cached_dir}")
+
+    sys.path.insert(0, AI_MUSIC_ASSISTANT_DIR)
+    try:
+        yield
+    finally:
+        sys.path.remove(AI_MUSIC_ASSISTANT_DIR)
@@ -21,11 +21,14 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# 嘗試導入MIDI工具
+# 導入 ai-music-assistant 後端的 MIDI 寫入模組
+from backend_path import backend_on_path
 try:
-    from midiutil import MIDIFile
-except ImportError:
-    logger.error("缺少midiutil套件，請執行: pip install midiutil")
+    with backend_on_path():
+        from backend.mcp.note_array import NoteArray
+        from backend.mcp.smf_writer import SMFTrack, write_smf
+except ImportError as e:
+    logger.error(f"無法導入MIDI寫入模組: {e}，請確保ai-music-assistant目錄完整並已安裝numpy")
     sys.exit(1)
     
 try:
@@ -514,35 +517,22 @@ class MusicCreator:
         if output_dir and not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
-        # 創建MIDI文件，3軌道：旋律、和弦、低音
-        midi = MIDIFile(3)
-        
-        # 設置軌道名稱
-        midi.addTrackName(0, 0, "Melody")
-        midi.addTrackName(1, 0, "Chords")
-        midi.addTrackName(2, 0, "Bass")
-        
-        # 設置速度
-        midi.addTempo(0, 0, tempo)
-        midi.addTempo(1, 0, tempo)
-        midi.addTempo(2, 0, tempo)
-        
-        # 添加旋律音符
-        for note in melody:
-            midi.addNote(0, 0, note.pitch, note.start_time, note.duration, note.velocity)
-        
-        # 添加和弦音符
-        for chord in chords:
-            for pitch in chord["notes"]:
-                midi.addNote(1, 0, pitch, chord["start_time"], chord["duration"], 70)
+        # 和弦展開為同時開始的音符
+        chord_notes = [
+            {"pitch": pitch, "start_time": chord["start_time"], "duration": chord["duration"], "velocity": 70}
+            for chord in chords
+            for pitch in chord["notes"]
+        ]
         
-        # 添加低音聲部
-        for note in bass:
-            midi.addNote(2, 0, note.pitch, note.start_time, note.duration, note.velocity)
+        # 3軌道：旋律、和弦、低音，速度寫在總譜軌道中
+        tracks = [
+            SMFTrack(NoteArray.from_notes(melody), name="Melody"),
+            SMFTrack(NoteArray.from_notes(chord_notes), name="Chords"),
+            SMFTrack(NoteArray.from_notes(bass), name="Bass")
+        ]
         
         # 寫入MIDI文件
-        with open(output_path, "wb") as f:
-            midi.writeFile(f)
+        write_smf(output_path, tracks, tempo=tempo)
         
         logger.info(f"MIDI文件已保存至: {output_path}")
         return output_path
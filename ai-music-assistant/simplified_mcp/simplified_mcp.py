@@ -12,7 +12,12 @@ import random
 import logging
 from typing import Dict, List, Any, Optional
 from enum import Enum
-from midiutil import MIDIFile
+
+# 導入 ai-music-assistant 後端的 MIDI 寫入模組
+from backend_path import backend_on_path
+with backend_on_path():
+    from backend.mcp.note_array import NoteArray
+    from backend.mcp.smf_writer import DRUM_CHANNEL, SMFTrack, write_smf
 
 # 配置日誌
 logging.basicConfig(level=logging.INFO, 
@@ -712,68 +717,19 @@ class SimplifiedMCP:
             tempo: 速度
             output_path: 輸出路徑
         """
-        # 創建MIDI文件，四個軌道：旋律、和弦、低音和鼓
-        midi = MIDIFile(4)
-        
-        # 設置速度
-        for i in range(4):
-            midi.addTempo(i, 0, tempo)
-        
-        # 設置樂器音色
-        midi.addProgramChange(0, 0, 0, 0)   # 旋律: 鋼琴
-        midi.addProgramChange(1, 1, 0, 48)  # 和弦: 弦樂合奏
-        midi.addProgramChange(2, 2, 0, 33)  # 低音: 電貝斯
-        # 鼓不需要設置音色，直接使用MIDI打擊樂通道(10)
-        
-        # 添加旋律
-        for note in melody:
-            midi.addNote(
-                track=0, 
-                channel=0, 
-                pitch=note.pitch, 
-                time=note.start_time, 
-                duration=note.duration, 
-                volume=note.velocity
-            )
-        
-        # 添加和弦
-        for note in chords:
-            midi.addNote(
-                track=1, 
-                channel=1, 
-                pitch=note.pitch, 
-                time=note.start_time, 
-                duration=note.duration, 
-                volume=note.velocity
-            )
-        
-        # 添加低音
-        for note in bass:
-            midi.addNote(
-                track=2, 
-                channel=2, 
-                pitch=note.pitch, 
-                time=note.start_time, 
-                duration=note.duration, 
-                volume=note.velocity
-            )
-        
-        # 添加鼓聲部
-        for note in drums:
-            midi.addNote(
-                track=3, 
-                channel=9,  # MIDI通道10(索引9)用於打擊樂器
-                pitch=note.pitch, 
-                time=note.start_time, 
-                duration=note.duration, 
-                volume=note.velocity
-            )
+        # 四個軌道：旋律、和弦、低音和鼓，速度寫在總譜軌道中
+        tracks = [
+            SMFTrack(NoteArray.from_notes(melody), channel=0, program=0, name="Melody"),   # 鋼琴
+            SMFTrack(NoteArray.from_notes(chords), channel=1, program=48, name="Chords"),  # 弦樂合奏
+            SMFTrack(NoteArray.from_notes(bass), channel=2, program=33, name="Bass"),      # 電貝斯
+            # 鼓不需要設置音色，直接使用MIDI打擊樂通道(10)
+            SMFTrack(NoteArray.from_notes(drums), channel=DRUM_CHANNEL, name="Drums")
+        ]
         
         # 確保輸出目錄存在
         os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
         
         # 寫入文件
-        with open(output_path, "wb") as f:
-            midi.writeFile(f)
+        write_smf(output_path, tracks, tempo=tempo)
         
         logger.info(f"MIDI文件已保存至 {output_path}") 
\ No newline at end of file
@@ -13,6 +13,7 @@ import sys
 import json
 import logging
 import argparse
+import importlib
 from typing import Dict, Any, List, Optional, Tuple
 from enum import Enum
 from pathlib import Path
@@ -24,11 +25,16 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# 嘗試導入必要的MIDI工具
+# 導入 ai-music-assistant 後端的 MIDI 寫入模組
+# ai-music-assistant 目錄名含連字符，導入路徑輔助模組時以字符串指定模組名；
+# 輔助模組只在導入期間讓其優先，以免影響下方從當前目錄導入的同名模組
 try:
-    from midiutil import MIDIFile
-except ImportError:
-    logger.error("缺少midiutil套件，請執行: pip install midiutil")
+    backend_on_path = importlib.import_module('ai-music-assistant.backend_path').backend_on_path
+    with backend_on_path():
+        from backend.mcp.note_array import NoteArray
+        from backend.mcp.smf_writer import DRUM_CHANNEL, SMFTrack, write_smf
+except ImportError as e:
+    logger.error(f"無法導入MIDI寫入模組: {e}，請確保ai-music-assistant目錄完整並已安裝numpy")
     sys.exit(1)
     
 try:
@@ -692,14 +698,8 @@ class TextToMusicConverter:
             if instrument not in instrument_roles:
                 instrument_roles[instrument] = default_roles.get(instrument.lower(), "harmony")
         
-        # 創建MIDI文件，每個樂器一個軌道
-        track_count = len(instruments) + 1  # 加1是為了給總譜留一個軌道
-        midi = MIDIFile(track_count)
-        
-        # 設置速度
+        # MIDI文件每個樂器一個軌道，速度寫在總譜軌道中
         tempo = music_params.get_param("tempo")
-        for i in range(track_count):
-            midi.addTempo(i, 0, tempo)
         
         # 樂器到MIDI程序號的映射
         instrument_program_map = {
@@ -742,21 +742,6 @@ class TextToMusicConverter:
             "drums": 118        # 鼓組使用General MIDI percussion channel
         }
         
-        # 設置樂器音色
-        for i, instrument in enumerate(instruments):
-            # 獲取MIDI程序號
-            program = instrument_program_map.get(instrument.lower(), 0)  # 默認為鋼琴
-            # 鼓組特殊處理，使用第10通道(索引9)
-            if instrument.lower() == "drums" or instrument.lower() == "percussion":
-                channel = 9
-            else:
-                channel = i % 16
-                if channel == 9:  # 避開第10通道(索引9)，它保留給打擊樂器
-                    channel = 15
-            
-            # 設置樂器音色
-            midi.addProgramChange(i, channel, 0, program)
-        
         # 所有音符列表 (按樂器分類)
         all_notes_by_instrument = {instr: [] for instr in instruments}
         
@@ -888,32 +873,31 @@ class TextToMusicConverter:
             current_time += section.length_bars * 4.0
         
         # 寫入MIDI文件
+        tracks = []
         for i, instrument in enumerate(instruments):
+            # 獲取MIDI程序號
+            program = instrument_program_map.get(instrument.lower(), 0)  # 默認為鋼琴
             # 鼓組特殊處理，使用第10通道(索引9)
             if instrument.lower() == "drums" or instrument.lower() == "percussion":
-                channel = 9
+                channel = DRUM_CHANNEL
             else:
                 channel = i % 16
-                if channel == 9:  # 避開第10通道(索引9)，它保留給打擊樂器
+                if channel == DRUM_CHANNEL:  # 避開第10通道(索引9)，它保留給打擊樂器
                     channel = 15
-                    
-            # 寫入該樂器的所有音符
-            for note in all_notes_by_instrument[instrument]:
-                midi.addNote(
-                    track=i, 
-                    channel=channel, 
-                    pitch=note["pitch"], 
-                    time=note["start_time"], 
-                    duration=note["duration"], 
-                    volume=note["velocity"]
-                )
+            
+            # 該樂器的所有音符
+            tracks.append(SMFTrack(
+                NoteArray.from_notes(all_notes_by_instrument[instrument]),
+                channel=channel,
+                program=program,
+                name=instrument
+            ))
         
         # 確保輸出目錄存在
         os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
         
         # 寫入文件
-        with open(output_path, "wb") as f:
-            midi.writeFile(f)
+        write_smf(output_path, tracks, tempo=tempo)
         
         logger.info(f"結構化MIDI文件已保存至 {output_path}，包含 {len(instruments)} 個樂器軌道")
         
@@ -1138,54 +1122,23 @@ class TextToMusicConverter:
         Returns:
             str: MIDI文件路徑
         """
-        # 創建MIDI文件，三個軌道：旋律、和弦和低音
-        midi = MIDIFile(3)
-        
-        # 設置速度
-        midi.addTempo(0, 0, tempo)
-        midi.addTempo(1, 0, tempo)
-        midi.addTempo(2, 0, tempo)
-        
-        # 添加旋律
-        for note in melody:
-            midi.addNote(
-                track=0, 
-                channel=0, 
-                pitch=note.pitch, 
-                time=note.start_time, 
-                duration=note.duration, 
-                volume=note.velocity
-            )
-        
-        # 添加和弦
-        for chord in chords:
-            for note in chord["notes"]:
-                midi.addNote(
-                    track=1, 
-                    channel=1, 
-                    pitch=note, 
-                    time=chord["start_time"], 
-                    duration=chord["duration"], 
-                    volume=70
-                )
-        
-        # 添加低音
-        for note in bass:
-            midi.addNote(
-                track=2, 
-                channel=2, 
-                pitch=note.pitch, 
-                time=note.start_time, 
-                duration=note.duration, 
-                volume=note.velocity
-            )
+        # 三個軌道：旋律、和弦和低音
+        chord_notes = [
+            {"pitch": note, "start_time": chord["start_time"], "duration": chord["duration"], "velocity": 70}
+            for chord in chords
+            for note in chord["notes"]
+        ]
+        tracks = [
+            SMFTrack(NoteArray.from_notes(melody), channel=0),
+            SMFTrack(NoteArray.from_notes(chord_notes), channel=1),
+            SMFTrack(NoteArray.from_notes(bass), channel=2)
+        ]
         
         # 確保輸出目錄存在
         os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
         
         # 寫入文件
-        with open(output_path, "wb") as f:
-            midi.writeFile(f)
+        write_smf(output_path, tracks, tempo=tempo)
         
         logger.info(f"MIDI文件已保存至 {output_path}")
         